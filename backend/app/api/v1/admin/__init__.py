@@ -1,13 +1,17 @@
 from fastapi import APIRouter
 
-from . import auth, dashboard, refunds, trips, users, vehicles
+from . import auth, chain_sync, dashboard, exports, pricing, refunds, search, trips, users, vehicles
 
 router = APIRouter()
 router.include_router(auth.router)
 router.include_router(dashboard.router)
+router.include_router(pricing.router)
 router.include_router(refunds.router)
 router.include_router(vehicles.router)
 router.include_router(users.router)
 router.include_router(trips.router)
+router.include_router(chain_sync.router)
+router.include_router(exports.router)
+router.include_router(search.router)
 
 __all__ = ["router"]
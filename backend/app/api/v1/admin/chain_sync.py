@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, Path
+
+from app.config import settings
+from app.core.database import async_session_maker
+from app.dependencies.admin import get_current_admin
+from app.schemas.admin import ChainSyncRequest
+from app.services.chain_sync_service import SYNC_TARGETS, ChainStatusSync
+
+router = APIRouter(prefix="/admin/chain-sync", tags=["admin-chain-sync"])
+
+
+@router.post("/{object_type}")
+async def bulk_sync_chain_status(
+    payload: ChainSyncRequest,
+    object_type: str = Path(..., description="user / vehicle"),
+    _=Depends(get_current_admin),
+):
+    """
+    批次同步鏈上狀態：指定 object_ids，或 all_stale 同步過期的資料列。
+    單次最多 CHAIN_SYNC_API_MAX_OBJECTS 個物件，全量同步請用
+    contracts/tools/monitoring/chain_sync.py。車輛只回報與鏈上不一致的狀態（drift），不寫入。
+    """
+    if object_type not in SYNC_TARGETS:
+        raise HTTPException(status_code=404, detail=f"不支援的物件類型: {object_type}")
+    if bool(payload.object_ids) == payload.all_stale:
+        raise HTTPException(status_code=400, detail="請指定 object_ids 或 all_stale 其中之一")
+    max_objects = settings.CHAIN_SYNC_API_MAX_OBJECTS
+    if payload.object_ids and len(payload.object_ids) > max_objects:
+        raise HTTPException(status_code=400, detail=f"單次最多同步 {max_objects} 個物件")
+
+    sync = ChainStatusSync(object_type)
+    pages = (
+        sync.sync_ids(async_session_maker, payload.object_ids) if payload.object_ids else
+        sync.sync_stale(async_session_maker, limit=min(payload.limit or max_objects, max_objects))
+    )
+    changes = {}
+    try:
+        async for page in pages:
+            changes.update(page)
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return {**sync.summary(), "changes": {str(key): value for key, value in changes.items()}}
@@ -1,21 +1,36 @@
+import logging
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import case, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_async_session
+from app.core.database import get_admin_async_session
 from app.dependencies.admin import get_current_admin
-from app.models import PaymentTransaction, Trip, User, Vehicle
+from app.models import PaymentTransaction, Review, Trip, User, Vehicle
+from app.services.analytics_store import analytics_store
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/admin/dashboard", tags=["admin-dashboard"])
 
 
+async def _from_store(query: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+    """分析資料可用時由 DuckDB 回應；未啟用、尚未匯出或查詢失敗時返回 None（改查 PostgreSQL）"""
+    if not analytics_store.ready():
+        return None
+    try:
+        return await query()
+    except Exception as e:
+        logger.warning(f"⚠️ Analytics query failed, falling back to PostgreSQL: {e}")
+        return None
+
+
 @router.get("/totals")
 async def get_totals(
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     total_users = (await session.execute(select(func.count(User.id)))).scalar() or 0
     total_drivers = (
@@ -49,7 +64,7 @@ async def get_revenue(
     startDate: str | None = Query(default=None),
     endDate: str | None = Query(default=None),
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     if period_type not in {"daily", "monthly", "yearly"}:
         raise HTTPException(status_code=400, detail="無效的類型")
@@ -88,6 +103,7 @@ async def get_revenue(
         .order_by(group_expr.asc())
     )
 
+    start_dt = end_dt = None
     if startDate:
         start_dt = _parse_date(startDate)
         stmt = stmt.where(date_column >= start_dt)
@@ -95,7 +111,9 @@ async def get_revenue(
         end_dt = _parse_date(endDate) + timedelta(days=1)
         stmt = stmt.where(date_column < end_dt)
 
-    results = (await session.execute(stmt)).all()
+    results = await _from_store(lambda: analytics_store.revenue(period_type, start_dt, end_dt))
+    if results is None:
+        results = (await session.execute(stmt)).all()
 
     def _format_date(value: datetime) -> str:
         return value.strftime(formatter)
@@ -156,7 +174,7 @@ async def get_growth(
     period_type: str,
     baseDate: str | None = Query(default=None),
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     if period_type not in {"daily", "weekly", "monthly", "yearly"}:
         raise HTTPException(status_code=400, detail="無效的類型")
@@ -188,10 +206,15 @@ async def get_growth(
         func.coalesce(PaymentTransaction.completed_at, PaymentTransaction.created_at) < previous_end,
     )
 
-    current_trip_count = (await session.execute(trip_stmt)).scalar() or 0
-    current_revenue = float((await session.execute(revenue_stmt)).scalar() or 0)
-    previous_trip_count = (await session.execute(prev_trip_stmt)).scalar() or 0
-    previous_revenue = float((await session.execute(prev_revenue_stmt)).scalar() or 0)
+    current = await _from_store(lambda: analytics_store.period_totals(current_start, current_end))
+    previous = await _from_store(lambda: analytics_store.period_totals(previous_start, previous_end))
+    if current is not None and previous is not None:
+        (current_trip_count, current_revenue), (previous_trip_count, previous_revenue) = current, previous
+    else:
+        current_trip_count = (await session.execute(trip_stmt)).scalar() or 0
+        current_revenue = float((await session.execute(revenue_stmt)).scalar() or 0)
+        previous_trip_count = (await session.execute(prev_trip_stmt)).scalar() or 0
+        previous_revenue = float((await session.execute(prev_revenue_stmt)).scalar() or 0)
 
     def _growth(current_value: float, previous_value: float) -> float:
         if previous_value == 0:
@@ -226,7 +249,7 @@ async def get_growth(
 @router.get("/payment-distribution")
 async def get_payment_distribution(
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     stmt = (
         select(
@@ -237,7 +260,9 @@ async def get_payment_distribution(
         .where(PaymentTransaction.status == "completed")
         .group_by(PaymentTransaction.payment_type)
     )
-    rows = (await session.execute(stmt)).all()
+    rows = await _from_store(analytics_store.payment_distribution)
+    if rows is None:
+        rows = (await session.execute(stmt)).all()
 
     distribution: Dict[str, Dict[str, float | int]] = {}
     for payment_type, count, amount in rows:
@@ -266,3 +291,39 @@ async def get_payment_distribution(
         "data": data,
         "totalAmount": total_amount,
     }
+
+
+@router.get("/rating-distribution")
+async def get_rating_distribution(
+    _=Depends(get_current_admin),
+    session: AsyncSession = Depends(get_admin_async_session),
+):
+    rows = await _from_store(analytics_store.rating_distribution)
+    if rows is None:
+        stmt = select(Review.rating, func.count(Review.review_id)).group_by(Review.rating).order_by(Review.rating)
+        rows = (await session.execute(stmt)).all()
+
+    counts = {int(rating): int(count or 0) for rating, count in rows if rating is not None}
+    total = sum(counts.values())
+    return {
+        "data": [{"rating": rating, "count": counts.get(rating, 0)} for rating in range(1, 6)],
+        "total": total,
+        "average": round(sum(rating * count for rating, count in counts.items()) / total, 2) if total else 0.0,
+    }
+
+
+@router.get("/analytics-status")
+async def get_analytics_status(_=Depends(get_current_admin)):
+    return analytics_store.get_status()
+
+
+@router.post("/analytics-export")
+async def run_analytics_export(
+    full: bool = Query(default=False, description="重新匯出全部月份"),
+    _=Depends(get_current_admin),
+):
+    """立即匯出一輪分析資料（full 時包含較早月份中沒有時間戳記的狀態變更）"""
+    try:
+        return await analytics_store.export_once(full=full)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
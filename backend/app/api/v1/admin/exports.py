@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+from functools import partial
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
+
+from app.core.database import route_session
+from app.dependencies.admin import get_current_admin
+from app.services.export_service import export_rows, prepare_export
+
+router = APIRouter(prefix="/admin/exports", tags=["admin-exports"])
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _parse_date(date_str: str | None) -> datetime | None:
+    if not date_str:
+        return None
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="日期格式應為 YYYY-MM-DD") from exc
+
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str = Path(..., description="trips / payments / reviews"),
+    format: str = Query(default="csv", description="csv / parquet"),
+    start_date: str | None = Query(default=None, description="YYYY-MM-DD（含）"),
+    end_date: str | None = Query(default=None, description="YYYY-MM-DD（含）"),
+    status: list[str] | None = Query(default=None),
+    _=Depends(get_current_admin),
+):
+    """
+    串流匯出行程 / 支付 / 評價：伺服器端游標逐批讀取，每批一個 CSV 區塊或 Parquet row group，
+    記憶體用量與匯出列數無關。日期篩選 trips.requested_at，其餘為 created_at。
+    """
+    start = _parse_date(start_date)
+    end = _parse_date(end_date)
+    try:
+        _, stmt = prepare_export(dataset, format, start, end + timedelta(days=1) if end else None, status)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    filename = f"{dataset}_{start_date or 'all'}_{end_date or 'now'}.{format}"
+    return StreamingResponse(
+        export_rows(dataset, format, stmt, partial(route_session, "export")),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.dependencies.admin import get_current_admin
+from app.services.pricing_service import pricing_service
+
+router = APIRouter(prefix="/admin/pricing", tags=["admin-pricing"])
+
+
+@router.get("")
+async def get_pricing_rates(_=Depends(get_current_admin)):
+    return pricing_service.get_status()
+
+
+@router.post("/reload")
+async def reload_pricing_rates(_=Depends(get_current_admin)):
+    """立即重新載入費率表（檔案變更也會在數秒內自動生效）"""
+    try:
+        pricing_service.reload()
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return pricing_service.get_status()
@@ -6,10 +6,11 @@ from sqlalchemy import and_, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased
 
-from app.core.database import get_async_session
+from app.core.database import get_admin_async_session
 from app.dependencies.admin import get_current_admin
 from app.models import RefundRequest, Trip, User, Vehicle
 from app.schemas.admin import RefundUpdateRequest
+from app.services.search_service import contains_filter
 
 router = APIRouter(prefix="/admin/refunds", tags=["admin-refunds"])
 
@@ -22,7 +23,7 @@ async def list_refunds(
     search_type: str | None = Query(default=None),
     search_value: str | None = Query(default=None),
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     owner_alias = aliased(User)
 
@@ -57,13 +58,15 @@ async def list_refunds(
                 raise HTTPException(status_code=400, detail="行程 ID 必須為數字") from exc
             stmt = stmt.where(RefundRequest.trip_id == numeric_value)
         elif search_type == "user_name":
-            like_value = f"%{search_value}%"
             stmt = stmt.where(
-                or_(
-                    User.display_name.ilike(like_value),
-                    User.username.ilike(like_value),
-                    owner_alias.display_name.ilike(like_value),
-                    owner_alias.username.ilike(like_value),
+                contains_filter(
+                    (
+                        User.display_name,
+                        User.username,
+                        owner_alias.display_name,
+                        owner_alias.username,
+                    ),
+                    search_value,
                 )
             )
 
@@ -104,7 +107,7 @@ async def update_refund(
     refund_id: int,
     payload: RefundUpdateRequest,
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     refund = await session.get(RefundRequest, refund_id)
     if not refund:
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_admin_async_session
+from app.dependencies.admin import get_current_admin
+from app.models import User, Vehicle
+from app.services.search_service import SEARCH_TARGETS, admin_search
+
+router = APIRouter(prefix="/admin/search", tags=["admin-search"])
+
+
+async def _load_items(session: AsyncSession, target: str, hits):
+    """依排序後的主鍵載入顯示欄位"""
+    keys = [key for key, _ in hits]
+    if target == "users":
+        rows = (await session.execute(select(User).where(User.id.in_(keys)))).scalars().all()
+        by_key = {
+            user.id: {
+                "id": user.id,
+                "username": user.username,
+                "display_name": user.display_name,
+                "user_type": user.user_type,
+            }
+            for user in rows
+        }
+    elif target == "plates":
+        rows = (await session.execute(select(Vehicle).where(Vehicle.vehicle_id.in_(keys)))).scalars().all()
+        by_key = {
+            vehicle.vehicle_id: {
+                "vehicle_id": vehicle.vehicle_id,
+                "plate_number": vehicle.plate_number,
+                "model": vehicle.model,
+                "owner_id": vehicle.owner_id,
+            }
+            for vehicle in rows
+        }
+    else:
+        by_key = {key: {"model": key} for key in keys}
+    return [{**by_key[key], "score": score} for key, score in hits if key in by_key]
+
+
+@router.get("/{target}")
+async def search(
+    target: str = Path(..., description="users / plates / vehicle_models"),
+    q: str = Query(..., min_length=1),
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=20, ge=1, le=100),
+    _=Depends(get_current_admin),
+    session: AsyncSession = Depends(get_admin_async_session),
+):
+    """依相似度排序的分頁搜尋（pg_trgm，未安裝時使用程序內 n-gram 索引）"""
+    if target not in SEARCH_TARGETS:
+        raise HTTPException(status_code=404, detail=f"不支援的搜尋對象: {target}")
+    try:
+        hits, total = await admin_search.search(session, target, q, page_size, (page - 1) * page_size)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    return {
+        "backend": await admin_search.backend(session),
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "items": await _load_items(session, target, hits),
+    }
@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import or_, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased
 
-from app.core.database import get_async_session
+from app.config import settings
+from app.core.database import get_admin_async_session
 from app.dependencies.admin import get_current_admin
 from app.models import Trip, User, Vehicle
 from app.schemas.admin import TripStatusUpdate
+from app.services.search_service import contains_filter
+from app.services.trip_partition_service import trip_partition_maintainer
+from app.services.trip_reaper import trip_reaper
+from app.services.trip_service import estimate_cache
 
 router = APIRouter(prefix="/admin/trips", tags=["admin-trips"])
 
@@ -27,7 +32,7 @@ async def list_trips(
     search_type: str | None = Query(default=None),
     search_value: str | None = Query(default=None),
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     rider_alias = aliased(User)
     driver_alias = aliased(User)
@@ -67,19 +72,21 @@ async def list_trips(
                 raise HTTPException(status_code=400, detail="車主 ID 必須為數字") from exc
             stmt = stmt.where(Vehicle.owner_id == owner_id)
         elif search_type == "user_name":
-            like_value = f"%{search_value}%"
             stmt = stmt.where(
-                or_(
-                    rider_alias.display_name.ilike(like_value),
-                    rider_alias.username.ilike(like_value),
-                    driver_alias.display_name.ilike(like_value),
-                    driver_alias.username.ilike(like_value),
+                contains_filter(
+                    (
+                        rider_alias.display_name,
+                        rider_alias.username,
+                        driver_alias.display_name,
+                        driver_alias.username,
+                    ),
+                    search_value,
                 )
             )
         elif search_type == "plate_number":
-            stmt = stmt.where(Vehicle.plate_number.ilike(f"%{search_value}%"))
+            stmt = stmt.where(contains_filter((Vehicle.plate_number,), search_value))
         elif search_type == "vehicle_model":
-            stmt = stmt.where(Vehicle.model.ilike(f"%{search_value}%"))
+            stmt = stmt.where(contains_filter((Vehicle.model,), search_value))
 
     rows = (await session.execute(stmt)).all()
 
@@ -130,11 +137,57 @@ async def list_trips(
     return data
 
 
+@router.get("/reaper")
+async def get_reaper_status(_=Depends(get_current_admin)):
+    """逾時行程清理的規則與最近一輪結果"""
+    return trip_reaper.get_status()
+
+
+@router.post("/reaper/sweep")
+async def run_reaper_sweep(_=Depends(get_current_admin)):
+    """立即清理一輪逾時行程（個別行程請用 PUT /{trip_id}/status）"""
+    reaped = await trip_reaper.sweep()
+    return {"message": "逾時行程清理完成", "reaped": reaped}
+
+
+@router.get("/partitions")
+async def get_partition_status(
+    _=Depends(get_current_admin),
+    session: AsyncSession = Depends(get_admin_async_session),
+):
+    """行程月分區與冷資料歸檔狀態"""
+    return await trip_partition_maintainer.get_status(session)
+
+
+@router.get("/estimate-cache")
+async def get_estimate_cache_stats(_=Depends(get_current_admin)):
+    """行程預估快取統計 (命中率、延遲)"""
+    return {
+        "enabled": settings.ESTIMATE_CACHE_ENABLED,
+        "cell_size_deg": settings.ESTIMATE_CACHE_CELL_DEG,
+        **estimate_cache.get_stats(),
+    }
+
+
+@router.get("/payment/gas-budgets")
+async def get_gas_budgets(_=Depends(get_current_admin)):
+    """各合約函數目前使用的 gas 預算（歷史 p99 × 安全係數，或預設值）"""
+    from app.services.gas_budget_service import gas_budget_estimator
+    return gas_budget_estimator.get_status()
+
+
+@router.get("/payment/gas-pool")
+async def get_gas_pool(_=Depends(get_current_admin)):
+    """操作錢包的 gas coin 池狀態（可用 / 租用中的 coin 數與餘額）"""
+    from app.services.gas_coin_pool import gas_coin_pool
+    return gas_coin_pool.get_status()
+
+
 @router.get("/{trip_id}")
 async def get_trip(
     trip_id: int,
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     trip = await session.get(Trip, trip_id)
     if not trip:
@@ -211,7 +264,7 @@ async def update_trip_status(
     trip_id: int,
     payload: TripStatusUpdate,
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     if payload.status not in VALID_TRIP_STATUSES:
         raise HTTPException(status_code=400, detail="無效的狀態值")
@@ -3,9 +3,11 @@ from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from app.core.database import get_async_session
+from app.core.database import get_admin_async_session
 from app.dependencies.admin import get_current_admin
 from app.models import Trip, User, Vehicle
+from app.services.outbox_service import chain_outbox_worker
+from app.services.search_service import contains_filter
 
 router = APIRouter(prefix="/admin/users", tags=["admin-users"])
 
@@ -19,10 +21,12 @@ def _user_display_name(user: User | None) -> str | None:
 @router.get("")
 async def list_users(
     type: str | None = Query(default=None),
+    search: str | None = Query(default=None, description="用戶名稱 / 顯示名稱"),
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     data = []
+    name_filter = contains_filter((User.username, User.display_name), search) if search else None
 
     include_riders = type in (None, "", "rider")
     include_drivers = type in (None, "", "driver")
@@ -35,6 +39,8 @@ async def list_users(
             .group_by(User.id)
             .order_by(User.id.desc())
         )
+        if name_filter is not None:
+            rider_stmt = rider_stmt.where(name_filter)
         for user, trip_count in (await session.execute(rider_stmt)).all():
             data.append(
                 {
@@ -56,6 +62,8 @@ async def list_users(
             .group_by(User.id)
             .order_by(User.id.desc())
         )
+        if name_filter is not None:
+            driver_stmt = driver_stmt.where(name_filter)
         for user, vehicle_count in (await session.execute(driver_stmt)).all():
             data.append(
                 {
@@ -72,12 +80,21 @@ async def list_users(
     return data
 
 
+@router.get("/chain-outbox")
+async def get_chain_outbox_status(
+    _=Depends(get_current_admin),
+    session: AsyncSession = Depends(get_admin_async_session),
+):
+    """用戶 / 車輛鏈上註冊 outbox 的積壓與失敗數"""
+    return await chain_outbox_worker.get_status(session)
+
+
 @router.get("/{user_type}/{user_id}")
 async def get_user_detail(
     user_type: str = Path(..., regex="^(rider|driver)$"),
     user_id: int = Path(...),
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     user = await session.get(User, user_id)
     if not user:
@@ -97,7 +114,7 @@ async def get_user_detail(
 async def get_driver_vehicles(
     user_id: int,
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     stmt = (
         select(Vehicle)
@@ -125,7 +142,7 @@ async def get_driver_vehicles(
 async def get_rider_trips(
     user_id: int,
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     stmt = (
         select(Trip)
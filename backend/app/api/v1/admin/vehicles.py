@@ -2,14 +2,15 @@ from datetime import datetime
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import or_, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from app.core.database import get_async_session
+from app.core.database import get_admin_async_session
 from app.dependencies.admin import get_current_admin
 from app.models import User, Vehicle
 from app.schemas.admin import VehicleStatusUpdate
+from app.services.search_service import contains_filter
 
 router = APIRouter(prefix="/admin/vehicles", tags=["admin-vehicles"])
 
@@ -22,7 +23,7 @@ async def list_vehicles(
     search_type: str | None = Query(default=None),
     search_value: str | None = Query(default=None),
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     stmt = select(Vehicle).options(joinedload(Vehicle.owner)).order_by(Vehicle.vehicle_id.desc())
 
@@ -31,16 +32,11 @@ async def list_vehicles(
 
     if search_type and search_value:
         if search_type == "plate_number":
-            stmt = stmt.where(Vehicle.plate_number.ilike(f"%{search_value}%"))
+            stmt = stmt.where(contains_filter((Vehicle.plate_number,), search_value))
         elif search_type == "model":
-            stmt = stmt.where(Vehicle.model.ilike(f"%{search_value}%"))
+            stmt = stmt.where(contains_filter((Vehicle.model,), search_value))
         elif search_type == "owner_name":
-            stmt = stmt.join(Vehicle.owner).where(
-                or_(
-                    User.display_name.ilike(f"%{search_value}%"),
-                    User.username.ilike(f"%{search_value}%"),
-                )
-            )
+            stmt = stmt.join(Vehicle.owner).where(contains_filter((User.display_name, User.username), search_value))
         elif search_type == "owner_id":
             try:
                 owner_id = int(search_value)
@@ -81,7 +77,7 @@ async def list_vehicles(
 async def get_vehicle(
     vehicle_id: str,
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     vehicle = await session.get(Vehicle, vehicle_id)
     if not vehicle:
@@ -117,7 +113,7 @@ async def update_vehicle_status(
     vehicle_id: str,
     payload: VehicleStatusUpdate,
     _=Depends(get_current_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ):
     if payload.status not in VALID_VEHICLE_STATUSES:
         raise HTTPException(status_code=400, detail="無效的狀態值")
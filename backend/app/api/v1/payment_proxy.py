@@ -11,6 +11,10 @@ import logging
 
 from app.core.database import get_async_session
 from app.models.ride import Trip
+from app.models.user import User
+from app.services.chain_event_service import ChainEventService, LockCriteria
+from app.services.gas_coin_pool import gas_coin_pool
+from app.services.payment_registry import FINAL_STATUSES, PaymentRegistry, expected_amount_mist, stored_result
 from app.services.sui_service import sui_service
 from app.config import settings
 
@@ -32,13 +36,21 @@ async def process_payment(
 ):
     """
     處理乘客支付：
+    0. 查詢 processed_payments：已處理的轉帳直接返回保存的結果（重試不再接觸鏈）
     1. 驗證乘客已轉帳到臨時地址
     2. 調用智能合約 lock_payment
     3. 保存 escrow_object_id
     """
+    registry = PaymentRegistry(db)
+    record, claimed = None, False
     try:
         logger.info(f"🔄 處理支付: Trip {request.trip_id}, TX {request.tx_hash}")
         
+        # 0. 冪等查詢（唯一索引）
+        record = await registry.get(request.tx_hash)
+        if record and record.status in FINAL_STATUSES:
+            return _replay(record, request.trip_id)
+        
         # 1. 獲取行程信息
         result = await db.execute(
             select(Trip).where(Trip.trip_id == request.trip_id)
@@ -48,38 +60,82 @@ async def process_payment(
         if not trip:
             raise HTTPException(status_code=404, detail="行程不存在")
         
-        # 2. 驗證轉帳交易
-        logger.info(f"📝 驗證轉帳交易: {request.tx_hash}")
-        
-        # 臨時託管地址（使用操作錢包地址）
-        temp_escrow_address = settings.PLATFORM_WALLET
-        
-        verification = await sui_service.verify_payment_transaction(
-            tx_hash=request.tx_hash,
-            expected_recipient=temp_escrow_address,
-            expected_amount=trip.estimated_fare
-        )
-        
-        if not verification.get('valid'):
-            error_msg = verification.get('error', '交易驗證失敗')
-            logger.error(f"❌ 驗證失敗: {error_msg}")
-            raise HTTPException(status_code=400, detail=error_msg)
-        
-        logger.info(f"✅ 轉帳驗證成功: {verification['amount_received']} MIST")
+        record, claimed = await registry.claim(request.tx_hash, request.trip_id)
+        if not claimed:
+            if record.status in FINAL_STATUSES or record.trip_id != request.trip_id:
+                return _replay(record, request.trip_id)
+            raise HTTPException(status_code=409, detail="此交易正在處理中，請稍後重試")
+        
+        # 已有託管：先前的處理結果不明（例如鎖定後逾時）時採用事件索引的鎖定，不重複鎖定；
+        # 只採用操作錢包以這筆轉帳的金額、向行程司機送出的鎖定（lock_payment 任何人都可以調用）
+        driver = await db.get(User, trip.driver_id) if trip.driver_id else None
+        lock = None
+        if record.amount_received is not None and driver and driver.wallet_address:
+            lock = await ChainEventService(db).find_lock(request.trip_id, LockCriteria.of(
+                gas_coin_pool.operator_addresses(), driver.wallet_address, record.amount_received
+            ))
+        if lock or trip.escrow_object_id:
+            if lock:
+                trip.escrow_object_id = lock.object_id
+                trip.payment_tx_hash = request.tx_hash
+                await registry.mark(record, "locked", escrow_object_id=lock.object_id,
+                                    contract_tx_hash=lock.tx_digest)
+                logger.info(f"♻️ 採用已索引的鎖定: Trip {request.trip_id}, Escrow {lock.object_id}")
+                return stored_result(record)
+            await registry.mark(record, "rejected", error="此行程已鎖定支付")
+            raise HTTPException(status_code=409, detail="此行程已鎖定支付")
+        
+        # 2. 驗證轉帳交易（重試時沿用已保存的驗證結果）
+        if record.amount_received is None:
+            logger.info(f"📝 驗證轉帳交易: {request.tx_hash}")
+            
+            # 臨時託管地址（使用操作錢包地址）
+            temp_escrow_address = settings.PLATFORM_WALLET
+            
+            try:
+                expected_amount = expected_amount_mist(trip.fare)
+            except ValueError as e:
+                await registry.mark(record, "failed", error=str(e))
+                raise HTTPException(status_code=400, detail=str(e))
+            
+            verification = await sui_service.verify_payment_transaction(
+                tx_hash=request.tx_hash,
+                expected_recipient=temp_escrow_address,
+                expected_amount=expected_amount
+            )
+            
+            if not verification.get('valid'):
+                error_msg = verification.get('error', '交易驗證失敗')
+                logger.error(f"❌ 驗證失敗: {error_msg}")
+                # 交易尚未索引等暫時性錯誤可重試，其餘（交易失敗、金額不符）保存為終態
+                await registry.mark(record, "failed" if verification.get('retryable') else "rejected",
+                                    error=error_msg)
+                raise HTTPException(status_code=400, detail=error_msg)
+            
+            logger.info(f"✅ 轉帳驗證成功: {verification['amount_received']} MIST")
+            
+            # 計算平台費用（10%）
+            total_amount = verification['amount_received']
+            platform_fee = int(total_amount * 0.1)
+            record.amount_received = total_amount
+            record.platform_fee = platform_fee
+            await db.commit()
+        else:
+            total_amount, platform_fee = record.amount_received, record.platform_fee
         
         # 3. 調用智能合約 lock_payment
         logger.info(f"📞 調用智能合約 lock_payment...")
         
-        # 計算平台費用（10%）
-        total_amount = verification['amount_received']
-        platform_fee = int(total_amount * 0.1)
+        if not driver or not driver.wallet_address:
+            await registry.mark(record, "failed", error="行程尚未指派司機")
+            raise HTTPException(status_code=400, detail="行程尚未指派司機")
         
         # 使用後端的操作錢包調用合約
         contract_result = await sui_service.call_contract_lock_payment(
             package_id=settings.CONTRACT_PACKAGE_ID,
             amount_mist=total_amount,
             trip_id=request.trip_id,
-            driver_address=trip.driver_wallet_address,
+            driver_address=driver.wallet_address,
             platform_address=settings.PLATFORM_WALLET,
             platform_fee_mist=platform_fee
         )
@@ -87,6 +143,7 @@ async def process_payment(
         if not contract_result.get('success'):
             error_msg = contract_result.get('error', '智能合約調用失敗')
             logger.error(f"❌ 合約調用失敗: {error_msg}")
+            await registry.mark(record, "failed", error=error_msg)
             raise HTTPException(status_code=500, detail=error_msg)
         
         escrow_object_id = contract_result.get('escrow_object_id')
@@ -96,34 +153,36 @@ async def process_payment(
         logger.info(f"   Escrow Object ID: {escrow_object_id}")
         logger.info(f"   Contract TX: {contract_tx_hash}")
         
-        # 4. 更新行程記錄
+        # 4. 更新行程記錄（與支付紀錄在同一個交易中提交）
         trip.escrow_object_id = escrow_object_id
         trip.payment_tx_hash = request.tx_hash
-        # 添加 contract_tx_hash 字段（如果模型中沒有，可以先註釋掉）
-        # trip.contract_tx_hash = contract_tx_hash
-        
-        await db.commit()
-        await db.refresh(trip)
+        await registry.mark(record, "locked", escrow_object_id=escrow_object_id, contract_tx_hash=contract_tx_hash)
         
         logger.info(f"✅ 支付處理完成: Trip {request.trip_id}")
         
-        return {
-            "success": True,
-            "message": "支付處理成功",
-            "escrow_object_id": escrow_object_id,
-            "payment_tx_hash": request.tx_hash,
-            "contract_tx_hash": contract_tx_hash,
-            "amount_received": verification['amount_received'],
-            "platform_fee": platform_fee
-        }
+        return stored_result(record)
         
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"❌ 處理支付失敗: {e}")
+        if claimed:
+            # 釋放處理權，讓重試不必等待租約到期
+            await db.rollback()
+            await registry.mark(record, "failed", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _replay(record, trip_id: int):
+    """已處理轉帳的保存結果"""
+    if record.trip_id != trip_id:
+        raise HTTPException(status_code=409, detail=f"此交易已用於行程 {record.trip_id}")
+    if record.status == "rejected":
+        raise HTTPException(status_code=400, detail=record.error or "交易驗證失敗")
+    logger.info(f"♻️ 重複的支付請求: Trip {trip_id}, TX {record.tx_hash}")
+    return stored_result(record)
+
+
 @router.get("/temp-escrow-address")
 async def get_temp_escrow_address():
     """
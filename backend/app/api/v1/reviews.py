@@ -12,12 +12,12 @@ from typing import List, Optional
 
 from app.core.database import get_async_session
 from app.models.review import Review
-from app.models.trip import Trip
+from app.models.ride import Trip
 from app.models.user import User
 from app.schemas.review import ReviewResponse, ReviewCreate, ReviewUpdate
 from app.api.deps import get_current_user
 
-router = APIRouter(prefix="/api/reviews", tags=["reviews"])
+router = APIRouter(prefix="/reviews", tags=["reviews"])
 
 @router.post("/", response_model=ReviewResponse)
 async def add_review(
@@ -5,6 +5,7 @@
 """
 
 import logging
+from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, HTTPException, Depends, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
@@ -38,7 +39,7 @@ async def get_trip_estimate(
     """
     service = TripService(db)
     try:
-        estimate = await service.get_trip_estimate(pickup_lat, pickup_lng, dropoff_lat, dropoff_lng)
+        estimate = await service.get_cached_trip_estimate(pickup_lat, pickup_lng, dropoff_lat, dropoff_lng)
         return estimate
     except Exception as e:
         raise HTTPException(
@@ -232,10 +233,12 @@ async def get_available_trips(
     from app.models.ride import Trip
     
     try:
-        # 查詢可用行程：狀態為 requested 且沒有司機
+        # 查詢可用行程：狀態為 requested 且沒有司機（逾時未配對的行程已被清理，叫車時間下限只略過舊分區）
+        since = datetime.now(timezone.utc) - timedelta(days=settings.TRIP_ACTIVE_MAX_AGE_DAYS)
         query = select(Trip).where(
             Trip.status == 'requested',
-            Trip.driver_id.is_(None)
+            Trip.driver_id.is_(None),
+            Trip.requested_at >= since
         ).order_by(desc(Trip.requested_at)).offset(offset).limit(limit)
         
         result = await db.execute(query)
@@ -425,6 +428,38 @@ async def confirm_payment_lock(
             detail=f"確認支付失敗: {str(e)}"
         )
 
+@router.get("/{trip_id}/escrow")
+async def get_trip_escrow_state(
+    trip_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    查詢行程的鏈上託管狀態（來自事件索引，不呼叫節點）
+    """
+    service = TripService(db)
+    trip = await service._get_trip_by_id(trip_id)
+    if not trip:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="行程不存在"
+        )
+    
+    if trip.user_id != current_user.id and trip.driver_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="無權限查看此行程"
+        )
+    
+    escrow_state = await service.chain_events.get_escrow_state(
+        trip_id, trip.escrow_object_id, await service._lock_criteria(trip)
+    )
+    return {
+        "trip_id": trip_id,
+        "indexed": escrow_state is not None,
+        **(escrow_state or {"state": None, "escrow_object_id": trip.escrow_object_id})
+    }
+
 @router.post("/{trip_id}/verify-payment")
 async def verify_trip_payment(
     trip_id: int,
@@ -5,10 +5,11 @@
 基於隊友Flask邏輯的FastAPI實現
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, func
 from typing import List, Optional
+import json
 import time
 import math
 import random
@@ -19,10 +20,13 @@ logger = logging.getLogger(__name__)
 from app.core.database import get_async_session
 from app.models.vehicle import Vehicle
 from app.models.user import User
-from app.schemas.vehicle import VehicleResponse, VehicleCreate, VehicleUpdate, VehicleLocationUpdate
+from app.schemas.vehicle import (
+    VehicleBulkResponse, VehicleResponse, VehicleCreate, VehicleUpdate, VehicleLocationUpdate
+)
 from app.api.deps import get_current_user
 from app.services.location_service import LocationService
-from app.services.contract_service import contract_service
+from app.services.outbox_service import chain_outbox_worker, enqueue, vehicle_registration
+from app.services.vehicle_service import VehicleOnboardingService, parse_vehicle_csv, vehicle_data_hash
 
 router = APIRouter(prefix="/vehicles", tags=["vehicles"])
 
@@ -135,33 +139,48 @@ async def register_vehicle(
     )
     
     session.add(vehicle)
+    # 鏈上註冊寫入同一個交易的 outbox，由 chain_outbox_worker 送出並寫回 blockchain_object_id
+    if not vehicle.blockchain_object_id and current_user.wallet_address:
+        enqueue(session, vehicle_registration(
+            current_user.wallet_address, vehicle.vehicle_id, vehicle.vehicle_type, vehicle.hourly_rate,
+            vehicle_data_hash(vehicle_data),
+        ))
     await session.commit()
     await session.refresh(vehicle)
+    chain_outbox_worker.wake()
     
-    # 在智能合約中註冊車輛
+    return vehicle
+
+@router.post("/bulk", response_model=VehicleBulkResponse)
+async def bulk_register_vehicles(
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    批次上架車輛（車隊業者）
+
+    請求內容為 VehicleCreate 的 JSON 陣列，或 Content-Type: text/csv（第一列為欄位名稱）。
+    每列各自回報結果；新車輛的鏈上註冊與車輛在同一個交易寫入 outbox，由背景工作批次送出。
+    """
+    body = await request.body()
     try:
-        contract_result = await contract_service.register_vehicle_on_chain(
-            owner_address=current_user.wallet_address,
-            vehicle_data={
-                "vehicle_id": vehicle.vehicle_id,
-                "vehicle_type": vehicle.vehicle_type,
-                "hourly_rate": vehicle.hourly_rate
-            }
-        )
-        
-        if contract_result.get("success"):
-            # 更新車輛的區塊鏈對象ID
-            vehicle.blockchain_object_id = contract_result.get("object_id")
-            await session.commit()
-            logger.info(f"✅ Vehicle registered on blockchain: {contract_result['transaction_hash']}")
+        if request.headers.get("content-type", "").startswith("text/csv"):
+            rows = parse_vehicle_csv(body.decode("utf-8"))
         else:
-            logger.warning(f"⚠️ Vehicle blockchain registration failed: {contract_result.get('error')}")
-            
-    except Exception as e:
-        logger.error(f"❌ Vehicle blockchain registration error: {e}")
-        # 不影響車輛創建
-    
-    return vehicle
+            rows = json.loads(body or b"null")
+            if not isinstance(rows, list):
+                raise ValueError("請求內容必須是車輛的 JSON 陣列")
+        result = await VehicleOnboardingService(session).bulk_register(
+            current_user.id, rows, owner_address=current_user.wallet_address
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await session.commit()
+    if result["queued"]:
+        chain_outbox_worker.wake()
+
+    return {"summary": result["summary"], "results": result["results"]}
 
 @router.put("/{vehicle_id}/location")
 async def update_vehicle_location(
@@ -17,7 +17,58 @@ class Settings(BaseSettings):
     
     # 數據庫配置
     DATABASE_URL: str = os.getenv("DATABASE_URL", "postgresql+asyncpg://autodrive:autodrive2025@db:5432/autodrive_dev")
-    
+
+    # 數據庫連線池配置（development / production）
+    DB_PROFILE: str = os.getenv("DB_PROFILE", "development")
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() == "true"  # SQL 日誌，與 DEBUG 分開
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500
+
+    # 伺服器端 statement_timeout（毫秒，僅 production 配置生效，0 = 不限制）
+    DB_STATEMENT_TIMEOUT_MS: int = 5000
+    DB_ADMIN_STATEMENT_TIMEOUT_MS: int = 30000
+    DB_EXPORT_STATEMENT_TIMEOUT_MS: int = 0
+
+    # 動態加價（網格供需）配置
+    SURGE_ENABLED: bool = os.getenv("SURGE_ENABLED", "true").lower() == "true"
+    SURGE_CELL_SIZE_DEG: float = 0.02  # 約 2.2 公里
+    SURGE_NEIGHBOR_RING: int = 1  # 供需統計包含周圍幾圈網格
+    SURGE_REFRESH_SECONDS: float = 5.0
+    SURGE_DEMAND_WINDOW_MINUTES: int = 15  # 只計入最近的未配對行程
+    SURGE_RATIO_THRESHOLD: float = 1.0  # 需求/供給 超過此值才加價
+    SURGE_SENSITIVITY: float = 0.5
+    SURGE_MAX_MULTIPLIER: float = 3.0
+    SURGE_STALE_SECONDS: float = 60.0  # 超過此時間未更新視為失效，回到 1.0
+
+    # 行程預估快取（依量化後的上下車網格）
+    ESTIMATE_CACHE_ENABLED: bool = os.getenv("ESTIMATE_CACHE_ENABLED", "true").lower() == "true"
+    ESTIMATE_CACHE_TTL_SECONDS: float = 5.0
+    ESTIMATE_CACHE_CELL_DEG: float = 0.001  # 約 110 公尺
+    ESTIMATE_CACHE_MAX_ENTRIES: int = 10000
+
+    # 歷史車速表（取代固定 30 km/h）
+    SPEED_TABLE_PATH: str = os.getenv("SPEED_TABLE_PATH", "data/speed_table.json")
+    SPEED_TABLE_CELL_DEG: float = 0.02
+    SPEED_TABLE_DEFAULT_KMH: float = 30.0
+    SPEED_TABLE_MIN_SAMPLES: int = 5  # 樣本數不足的網格退回該小時的全域平均
+    SPEED_TABLE_MIN_TRIP_KMH: float = 3.0  # 單筆行程車速過濾範圍
+    SPEED_TABLE_MAX_TRIP_KMH: float = 120.0
+    SPEED_TABLE_UTC_OFFSET_HOURS: int = 8  # 一週中的小時以當地時間計算
+
+    # 定價費率表（JSON，未設定或檔案不存在時使用內建費率）
+    PRICING_RATES_PATH: str = os.getenv("PRICING_RATES_PATH", "data/pricing_rates.json")
+    PRICING_RELOAD_CHECK_SECONDS: float = 5.0
+
+    # 監控
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    HEALTH_CACHE_SECONDS: float = 5.0  # /health 的下游檢查結果快取時間
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2.0
+    QUERY_COUNTER_ENABLED: bool = os.getenv("QUERY_COUNTER_ENABLED", "true").lower() == "true"
+    QUERY_REPEAT_THRESHOLD: int = 3  # 同一請求中相同語句執行達此次數視為 N+1
+
     # Redis 配置
     REDIS_URL: str = "redis://redis:6379"
     
@@ -32,9 +83,31 @@ class Settings(BaseSettings):
     CONTRACT_PACKAGE_ID: str = os.getenv("CONTRACT_PACKAGE_ID", "")
     USER_REGISTRY_ID: str = os.getenv("USER_REGISTRY_ID", "")
     VEHICLE_REGISTRY_ID: str = os.getenv("VEHICLE_REGISTRY_ID", "")
+    # trip_receipt::ReceiptIssuer（create_receipt_for 只接受其 operators 中的操作錢包，以 add_operator 加入）
+    # 新發佈的套件由 init 建立；升級的套件不會執行 init，需由 UserRegistry 的 admin 呼叫 create_issuer
+    RECEIPT_ISSUER_ID: str = os.getenv("RECEIPT_ISSUER_ID", "")
     MATCHING_SERVICE_ID: str = os.getenv("MATCHING_SERVICE_ID", "")
     PLATFORM_WALLET: str = os.getenv("PLATFORM_WALLET_ADDRESS", "0x0000000000000000000000000000000000000000000000000000000000000000")
     
+    # 鏈上事件索引（contracts/tools/monitoring/event_listener.py）
+    EVENT_INDEXER_PAGE_SIZE: int = 50  # suix_queryEvents 單頁上限
+    EVENT_INDEXER_POLL_SECONDS: float = 2.0  # 追上最新事件後的輪詢間隔
+    EVENT_INDEXER_MAX_BACKOFF_SECONDS: float = 30.0
+    
+    # 合約交易效能追蹤（延遲與 gas，contract_tx_metrics）
+    CONTRACT_PERF_TRACKING_ENABLED: bool = os.getenv("CONTRACT_PERF_TRACKING_ENABLED", "true").lower() == "true"
+    CONTRACT_PERF_POLL_SECONDS: float = 0.5  # 等待 checkpoint 的輪詢間隔
+    CONTRACT_PERF_FINALITY_TIMEOUT_SECONDS: float = 30.0
+    
+    # Gas 預算估算（每個 Move 函數 p99 × 安全係數，見 contracts/tools/analyzers/gas_optimizer.py）
+    GAS_BUDGET_ESTIMATION_ENABLED: bool = os.getenv("GAS_BUDGET_ESTIMATION_ENABLED", "true").lower() == "true"
+    GAS_BUDGET_MARGIN: float = 1.2
+    GAS_BUDGET_MIN_SAMPLES: int = 20  # 樣本不足時使用預設預算
+    GAS_BUDGET_WINDOW_DAYS: int = 7
+    GAS_BUDGET_REFRESH_SECONDS: float = 300.0
+    GAS_BUDGET_MIN_MIST: int = 1_000_000
+    GAS_BUDGET_MAX_MIST: int = 50_000_000
+    
     # Mock 模式設置（默認關閉，使用真實區塊鏈驗證）
     MOCK_MODE: bool = os.getenv("MOCK_MODE", "false").lower() == "true"
     
@@ -44,6 +117,83 @@ class Settings(BaseSettings):
     # 操作錢包私鑰（僅用於支付 gas 費用，不涉及資金轉移）
     # 資金流向：乘客 → 智能合約 → 司機（直接轉帳）
     OPERATOR_PRIVATE_KEY: str = os.getenv("OPERATOR_PRIVATE_KEY", "")
+    # 多個操作錢包（逗號分隔），未設定時只使用 OPERATOR_PRIVATE_KEY
+    OPERATOR_PRIVATE_KEYS: str = os.getenv("OPERATOR_PRIVATE_KEYS", "")
+    # user / vehicle registry 的 admin 錢包（register_*_for 只接受 admin 送出）；
+    # 只有一個操作錢包時可留空
+    REGISTRY_ADMIN_ADDRESS: str = os.getenv("REGISTRY_ADMIN_ADDRESS", "")
+    
+    # Gas coin 池（每筆進行中的交易租用一個預先拆分的 gas coin，見 app/services/gas_coin_pool.py）
+    GAS_POOL_ENABLED: bool = os.getenv("GAS_POOL_ENABLED", "true").lower() == "true"
+    GAS_POOL_TARGET_COINS: int = int(os.getenv("GAS_POOL_TARGET_COINS", "8"))  # 每個操作錢包
+    # lock_payment 的付款從租用的 coin 拆出，coin 面額需涵蓋一般車資 + gas 預算
+    GAS_POOL_COIN_BALANCE_MIST: int = int(os.getenv("GAS_POOL_COIN_BALANCE_MIST", "500000000"))
+    GAS_POOL_MIN_COIN_BALANCE_MIST: int = 50_000_000  # 低於此餘額的 coin 會被合併（= GAS_BUDGET_MAX_MIST）
+    GAS_POOL_REBALANCE_GAS_BUDGET_MIST: int = 20_000_000
+    GAS_POOL_REBALANCE_SECONDS: float = 30.0
+    GAS_POOL_LEASE_TIMEOUT_SECONDS: float = 5.0
+    
+    # 結算批次提交（release_payment / create_receipt 合併為一筆 PTB，見 app/services/settlement_batcher.py）
+    SETTLEMENT_BATCHING_ENABLED: bool = os.getenv("SETTLEMENT_BATCHING_ENABLED", "true").lower() == "true"
+    SETTLEMENT_BATCH_MAX_SIZE: int = int(os.getenv("SETTLEMENT_BATCH_MAX_SIZE", "20"))  # 每筆 PTB 的 Move 呼叫數上限
+    SETTLEMENT_BATCH_FLUSH_MS: float = float(os.getenv("SETTLEMENT_BATCH_FLUSH_MS", "200"))  # 第一筆呼叫後最多等待
+    
+    # 託管對帳（trips 與鏈上 Escrow 比對，見 app/services/reconciliation_service.py）
+    RECONCILE_PAGE_SIZE: int = int(os.getenv("RECONCILE_PAGE_SIZE", "1000"))  # 每頁行程數（每頁一個資料庫交易）
+    RECONCILE_RPC_CONCURRENCY: int = int(os.getenv("RECONCILE_RPC_CONCURRENCY", "8"))  # 並行的 sui_multiGetObjects 請求
+    
+    # 逾時行程清理（見 app/services/trip_reaper.py）
+    TRIP_MAX_WAIT_TIME_MINUTES: float = float(os.getenv("TRIP_MAX_WAIT_TIME_MINUTES", "15"))  # REQUESTED 等待配對上限
+    STALE_ACCEPTED_TRIP_MINUTES: float = float(os.getenv("STALE_ACCEPTED_TRIP_MINUTES", "30"))  # ACCEPTED 未鎖定託管上限
+    TRIP_REAPER_ENABLED: bool = os.getenv("TRIP_REAPER_ENABLED", "true").lower() == "true"
+    TRIP_REAPER_INTERVAL_SECONDS: float = 60.0
+    TRIP_REAPER_BATCH_SIZE: int = 500  # 每個交易取消的行程數
+    TRIP_REAPER_MAX_BATCHES: int = 20  # 每輪每種狀態最多批數
+    TRIP_ACTIVE_MAX_AGE_DAYS: float = 7.0  # 可接單行程列表的叫車時間下限（查詢只需掃描最近的分區；一人一單的檢查不使用）
+    
+    # 行程月分區與冷資料歸檔（見 app/services/trip_partition_service.py）
+    TRIP_PARTITION_MAINTENANCE_ENABLED: bool = os.getenv("TRIP_PARTITION_MAINTENANCE_ENABLED", "true").lower() == "true"
+    TRIP_PARTITION_MAINTENANCE_INTERVAL_SECONDS: float = 3600.0
+    TRIP_PARTITION_MONTHS_AHEAD: int = 3  # 預先建立的未來月分區數
+    TRIP_ARCHIVE_AFTER_MONTHS: int = int(os.getenv("TRIP_ARCHIVE_AFTER_MONTHS", "0"))  # 早於此月數的分區歸檔（0 = 不歸檔）
+    TRIP_ARCHIVE_MODE: str = os.getenv("TRIP_ARCHIVE_MODE", "detach")  # detach（移到 trips_archive schema）/ file（gzip CSV 後刪除）
+    TRIP_ARCHIVE_DIR: str = os.getenv("TRIP_ARCHIVE_DIR", "archive/trips")
+    
+    # 車隊批次上架（見 app/services/vehicle_service.py）
+    VEHICLE_BULK_MAX_ROWS: int = 5000
+    VEHICLE_BULK_INSERT_CHUNK: int = 1000  # 每個多列 INSERT 的列數（asyncpg 參數上限 32767）
+    
+    # 鏈上註冊 outbox（與用戶 / 車輛同一交易寫入，見 app/services/outbox_service.py）
+    CHAIN_OUTBOX_ENABLED: bool = os.getenv("CHAIN_OUTBOX_ENABLED", "true").lower() == "true"
+    CHAIN_OUTBOX_POLL_SECONDS: float = 1.0  # 沒有新項目通知時的輪詢間隔
+    CHAIN_OUTBOX_BATCH_SIZE: int = 200  # 每次領取的項目數
+    CHAIN_OUTBOX_CONCURRENCY: int = 16  # 未啟用結算批次時的並行鏈上呼叫數
+    CHAIN_OUTBOX_CLAIM_SECONDS: float = 120.0  # 領取後的租約，工作中斷時逾期自動重試
+    CHAIN_OUTBOX_MAX_ATTEMPTS: int = 8  # 超過後標記為 failed
+    CHAIN_OUTBOX_RETRY_BASE_SECONDS: float = 5.0  # 重試間隔 = base * 2^(attempts-1)
+    
+    # 鏈上狀態批次同步（users / vehicles 與 UserProfile / Vehicle 物件，見 app/services/chain_sync_service.py）
+    CHAIN_SYNC_PAGE_SIZE: int = int(os.getenv("CHAIN_SYNC_PAGE_SIZE", "1000"))  # 每頁物件數（每頁一個 UPDATE）
+    CHAIN_SYNC_RPC_CONCURRENCY: int = int(os.getenv("CHAIN_SYNC_RPC_CONCURRENCY", "8"))  # 並行的 sui_multiGetObjects 請求
+    CHAIN_SYNC_STALE_MINUTES: float = 60.0  # chain_synced_at 超過此時間（或從未同步）視為過期
+    CHAIN_SYNC_API_MAX_OBJECTS: int = 5000  # 單次 API 請求最多同步的物件數（更多請用 CLI）
+    
+    # 支付處理冪等紀錄（processed_payments，見 app/services/payment_registry.py）
+    PAYMENT_PROCESSING_LEASE_SECONDS: float = 120.0  # 處理中紀錄超過此時間未完成，允許重試取得處理權
+    
+    # 管理後台串流匯出（見 app/services/export_service.py）
+    EXPORT_CHUNK_ROWS: int = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))  # 伺服器端游標每次讀取的列數（CSV 區塊 / Parquet row group）
+    
+    # 管理後台搜尋（用戶名稱 / 車牌 / 車型，見 app/services/search_service.py）
+    ADMIN_SEARCH_BACKEND: str = os.getenv("ADMIN_SEARCH_BACKEND", "auto")  # auto / trigram（pg_trgm）/ ngram（程序內索引）
+    ADMIN_SEARCH_SIMILARITY_THRESHOLD: float = 0.6  # 與 pg_trgm.word_similarity_threshold 預設值相同
+    ADMIN_SEARCH_NGRAM_REFRESH_SECONDS: float = 300.0  # 程序內索引重建間隔（新資料在此時間內可能搜尋不到）
+    
+    # 儀表板分析資料（Parquet + DuckDB，見 app/services/analytics_store.py）
+    ANALYTICS_STORE_ENABLED: bool = os.getenv("ANALYTICS_STORE_ENABLED", "false").lower() == "true"
+    ANALYTICS_DIR: str = os.getenv("ANALYTICS_DIR", "data/analytics")
+    ANALYTICS_EXPORT_INTERVAL_SECONDS: float = 900.0
+    ANALYTICS_REFRESH_MONTHS: int = 2  # 每輪一定重新匯出的最近月份數（較早的月份只在有時間戳記的變更時重新匯出）
     
     class Config:
         env_file = ".env"
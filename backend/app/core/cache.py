@@ -0,0 +1,142 @@
+# backend/app/core/cache.py
+"""
+進程內短 TTL 快取
+
+- 固定 TTL、有容量上限（超過時淘汰最舊的項目）
+- single-flight：相同 key 的並行請求只計算一次，其餘等待同一個結果
+- 記錄命中率與延遲，供監控端點使用
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class CacheStats:
+    """快取統計"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # 等待其他請求計算結果的次數
+        self.errors = 0
+        self.evictions = 0
+        self.hit_latency_ms = 0.0
+        self.miss_latency_ms = 0.0
+        self.max_miss_latency_ms = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        served_from_cache = self.hits + self.coalesced
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "evictions": self.evictions,
+            "hit_rate": round(served_from_cache / lookups, 4) if lookups else 0.0,
+            "avg_hit_latency_ms": round(self.hit_latency_ms / served_from_cache, 3) if served_from_cache else 0.0,
+            "avg_miss_latency_ms": round(self.miss_latency_ms / self.misses, 3) if self.misses else 0.0,
+            "max_miss_latency_ms": round(self.max_miss_latency_ms, 3),
+        }
+
+
+class SingleFlightTTLCache:
+    """帶 single-flight 的 TTL 快取（僅適用於單一事件迴圈）"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """取得未過期的值，不存在時返回 None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        取得快取值，不存在時計算
+
+        同一 key 正在計算時直接等待該結果；計算失敗不寫入快取，例外同樣傳給等待者
+        """
+        started = time.perf_counter()
+
+        value = self.get(key)
+        if value is not None:
+            self.stats.hits += 1
+            self.stats.hit_latency_ms += (time.perf_counter() - started) * 1000
+            return value
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.stats.coalesced += 1
+            try:
+                # shield：等待者被取消時不影響正在計算的請求
+                value = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # 負責計算的請求被取消，由目前的請求重新計算
+                return await self.get_or_compute(key, compute)
+            self.stats.hit_latency_ms += (time.perf_counter() - started) * 1000
+            return value
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            self.stats.errors += 1
+            future.set_exception(e)
+            # 沒有等待者時避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+        finally:
+            del self._in_flight[key]
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats.misses += 1
+        self.stats.miss_latency_ms += elapsed_ms
+        self.stats.max_miss_latency_ms = max(self.stats.max_miss_latency_ms, elapsed_ms)
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            **self.stats.to_dict(),
+        }
@@ -1,19 +1,177 @@
 # backend/app/core/database.py
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import settings
+from app.core import metrics, query_counter
 import logging
 
 logger = logging.getLogger(__name__)
 
+# asyncpg 拋出時代表連線已不可用的例外（伺服器重啟、連線被終止等）
+_ASYNCPG_DISCONNECT_ERRORS = {
+    "ConnectionDoesNotExistError",
+    "ConnectionFailureError",
+    "AdminShutdownError",
+    "CannotConnectNowError",
+    "CrashShutdownError",
+    "IdleSessionTimeoutError",
+}
+
+# db_query_duration_seconds 的 operation 標籤（其餘記為 OTHER）
+_QUERY_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK"}
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """記錄 checkout 等待時間的連線池（包含建立新連線的時間）"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.db_pool_checkout_timeouts.inc()
+            raise
+        finally:
+            metrics.db_pool_checkout_wait.observe(time.perf_counter() - started)
+
+
+def statement_timeout_ms(route_class: str, profile: Optional[str] = None) -> Optional[int]:
+    """
+    取得路由類別對應的伺服器端 statement_timeout（毫秒）
+
+    - interactive: 乘客/司機 API（行程生命週期）
+    - admin: 管理後台查詢
+    - export: 批次匯出 / 背景工作（0 代表不限制）
+
+    development 配置不設定逾時，返回 None
+    """
+    if (profile or settings.DB_PROFILE) != "production":
+        return None
+    timeouts = {
+        "interactive": settings.DB_STATEMENT_TIMEOUT_MS,
+        "admin": settings.DB_ADMIN_STATEMENT_TIMEOUT_MS,
+        "export": settings.DB_EXPORT_STATEMENT_TIMEOUT_MS,
+    }
+    if route_class not in timeouts:
+        raise ValueError(f"未知的路由類別: {route_class}")
+    return timeouts[route_class]
+
+
+def engine_options(profile: str, database_url: str) -> Dict[str, Any]:
+    """
+    依配置名稱產生 create_async_engine 參數
+
+    development: 保持原本行為（每次 checkout 先 pre-ping）
+    production: 移除 pre-ping 的額外往返，改用 pool_recycle + 錯誤觸發的連線失效；
+                調整 asyncpg prepared statement 快取並設定伺服器端 statement_timeout
+    """
+    options: Dict[str, Any] = {
+        "echo": settings.DB_ECHO,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "poolclass": InstrumentedQueuePool,
+    }
+
+    if profile != "production":
+        options["pool_pre_ping"] = True
+        return options
+
+    options["pool_pre_ping"] = False
+    options["pool_recycle"] = settings.DB_POOL_RECYCLE_SECONDS
+    # LIFO 讓閒置連線自然被 recycle，熱連線保持 prepared statement 快取
+    options["pool_use_lifo"] = True
+
+    if "asyncpg" in database_url:
+        options["connect_args"] = {
+            # SQLAlchemy asyncpg 介面層的 prepared statement LRU 快取（每條連線）
+            # 使用 pgbouncer transaction 模式時需設為 0
+            "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+            "server_settings": {
+                "application_name": settings.APP_NAME,
+                "statement_timeout": str(statement_timeout_ms("interactive", profile)),
+                # 短小的 OLTP 查詢不需要 JIT，避免編譯開銷
+                "jit": "off",
+            },
+        }
+
+    return options
+
+
+def _is_driver_disconnect(exc: Optional[BaseException]) -> bool:
+    """沿著例外鏈檢查是否為 asyncpg 連線中斷類錯誤"""
+    while exc is not None:
+        if type(exc).__name__ in _ASYNCPG_DISCONNECT_ERRORS:
+            return True
+        exc = exc.__cause__
+    return False
+
+
+def instrument_engine(async_engine: AsyncEngine) -> None:
+    """掛上查詢時間量測（db_query_duration_seconds 與每個請求的查詢計數）"""
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+    def _record_query_duration(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        query_counter.record(statement, elapsed)
+        operation = statement.lstrip()[:8].split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        if operation not in _QUERY_OPERATIONS:
+            operation = "OTHER"
+        metrics.db_query_duration.observe(elapsed, operation)
+
+    @event.listens_for(async_engine.sync_engine, "handle_error")
+    def _discard_query_timer(context):
+        # 失敗的查詢不會觸發 after_cursor_execute
+        if context.connection is not None:
+            timers = context.connection.info.get("query_started")
+            if timers:
+                timers.pop()
+
+
+def build_engine(profile: str, database_url: Optional[str] = None) -> AsyncEngine:
+    """建立異步引擎，production 配置額外掛上錯誤觸發的連線失效"""
+    url = database_url or settings.DATABASE_URL
+    async_engine = create_async_engine(url, **engine_options(profile, url))
+    instrument_engine(async_engine)
+
+    if profile == "production":
+        @event.listens_for(async_engine.sync_engine, "handle_error")
+        def _invalidate_on_disconnect(context):
+            # 不做 pre-ping 時，由失敗的查詢負責讓壞掉的連線（以及整個連線池）失效
+            if not context.is_disconnect and _is_driver_disconnect(context.original_exception):
+                context.is_disconnect = True
+            if context.is_disconnect:
+                logger.warning(f"⚠️ Database connection lost, invalidating pool: {context.original_exception}")
+
+    return async_engine
+
+
 # 創建異步引擎
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10
-)
+engine = build_engine(settings.DB_PROFILE)
+
+
+def _pool_usage() -> Dict[tuple, float]:
+    """連線池使用量（輸出 /metrics 時計算）"""
+    pool = engine.sync_engine.pool
+    return {
+        ("checked_out",): pool.checkedout(),
+        ("idle",): pool.checkedin(),
+        ("overflow",): max(pool.overflow(), 0),
+    }
+
+
+metrics.registry.gauge("db_pool_connections", "Database pool connections by state", ("state",), callback=_pool_usage)
 
 # 創建會話工廠
 async_session_maker = async_sessionmaker(
@@ -25,16 +183,44 @@ async_session_maker = async_sessionmaker(
 class Base(DeclarativeBase):
     pass
 
+# create_all 不會修改已存在的表，新增欄位 / 索引在此補上（必須可重複執行）
+SCHEMA_UPGRADES = [
+    "ALTER TABLE trips ADD COLUMN IF NOT EXISTS surge_multiplier DOUBLE PRECISION NOT NULL DEFAULT 1.0",
+    "ALTER TABLE trips ADD COLUMN IF NOT EXISTS pricing_vehicle_type VARCHAR(20)",
+    "ALTER TABLE chain_event_cursors ALTER COLUMN source TYPE VARCHAR(200)",
+    "CREATE INDEX IF NOT EXISTS ix_trips_status_requested_at ON trips (status, requested_at)",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS chain_synced_at TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE vehicles ADD COLUMN IF NOT EXISTS chain_synced_at TIMESTAMP WITH TIME ZONE",
+]
+
+# 依賴選用擴充套件的索引：各自在獨立交易中執行，第一個失敗時記錄警告並略過其餘（見 app/services/search_service.py）
+OPTIONAL_SCHEMA_UPGRADES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users USING gin (username gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_display_name_trgm ON users USING gin (display_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_vehicles_plate_number_trgm ON vehicles USING gin (plate_number gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_vehicles_model_trgm ON vehicles USING gin (model gin_trgm_ops)",
+]
+
 async def init_db():
     """初始化資料庫"""
     try:
         async with engine.begin() as conn:
             # 創建所有表格
             await conn.run_sync(Base.metadata.create_all)
+            for statement in SCHEMA_UPGRADES:
+                await conn.exec_driver_sql(statement)
             logger.info("✅ Database tables created successfully")
     except Exception as e:
         logger.error(f"❌ Database initialization failed: {e}")
         raise
+    for statement in OPTIONAL_SCHEMA_UPGRADES:
+        try:
+            async with engine.begin() as conn:
+                await conn.exec_driver_sql(statement)
+        except Exception as e:
+            logger.warning(f"⚠️ Optional schema upgrades skipped at '{statement.split(' ON ')[0]}': {getattr(e, 'orig', e)}")
+            break
 
 async def get_async_session() -> AsyncSession:
     """獲取資料庫會話"""
@@ -42,4 +228,46 @@ async def get_async_session() -> AsyncSession:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+
+def _apply_statement_timeout(session: AsyncSession, timeout_ms: int) -> None:
+    """每個交易開始時以 SET LOCAL 覆寫 statement_timeout（僅對非預設的路由類別）"""
+
+    @event.listens_for(session.sync_session, "after_begin")
+    def _set_local_timeout(sync_session, transaction, connection):
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+@asynccontextmanager
+async def route_session(route_class: str):
+    """
+    開啟指定路由類別的資料庫會話
+
+    interactive 的逾時已在連線層設定，不需額外往返；
+    其他類別在每個交易開始時覆寫 statement_timeout。
+    串流回應在路由返回後才讀取資料，需在產生器內自行開啟會話
+    """
+    timeout_ms = statement_timeout_ms(route_class)
+    async with async_session_maker() as session:
+        if timeout_ms is not None and timeout_ms != statement_timeout_ms("interactive"):
+            _apply_statement_timeout(session, timeout_ms)
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+def session_dependency(route_class: str):
+    """產生指定路由類別的資料庫會話依賴"""
+    async def _get_session() -> AsyncSession:
+        async with route_session(route_class) as session:
+            yield session
+
+    _get_session.__name__ = f"get_{route_class}_async_session"
+    return _get_session
+
+
+# 管理後台與匯出類路由使用較寬鬆的逾時
+get_admin_async_session = session_dependency("admin")
+get_export_async_session = session_dependency("export")
@@ -0,0 +1,101 @@
+# backend/app/core/health.py
+"""
+健康檢查
+
+實際檢查資料庫、Redis 與 Sui fullnode；結果快取數秒，
+避免負載平衡器 / 監控高頻探測時對下游造成額外負擔（並行探測只執行一次檢查）
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.core.cache import SingleFlightTTLCache
+
+logger = logging.getLogger(__name__)
+
+STATUS_UP = "up"
+STATUS_DOWN = "down"
+STATUS_SKIPPED = "skipped"
+
+
+class HealthChecker:
+    """下游依賴健康檢查"""
+
+    def __init__(self, cache_seconds: Optional[float] = None, timeout_seconds: Optional[float] = None):
+        self.timeout_seconds = timeout_seconds if timeout_seconds is not None else settings.HEALTH_CHECK_TIMEOUT_SECONDS
+        self._cache = SingleFlightTTLCache(
+            ttl_seconds=cache_seconds if cache_seconds is not None else settings.HEALTH_CACHE_SECONDS,
+            max_entries=1,
+        )
+        self._redis = None
+
+    async def _run_check(self, check: Callable[[], Awaitable[Any]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(check(), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            return {"status": STATUS_DOWN, "error": f"timeout after {self.timeout_seconds}s"}
+        except Exception as e:
+            return {"status": STATUS_DOWN, "error": str(e) or type(e).__name__}
+        result = {"status": STATUS_UP, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+        if detail is not None:
+            result["detail"] = detail
+        return result
+
+    async def _check_database(self):
+        from app.core.database import engine
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _check_redis(self):
+        if self._redis is None:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(settings.REDIS_URL, socket_connect_timeout=self.timeout_seconds)
+        await self._redis.ping()
+
+    async def _check_blockchain(self):
+        from app.utils.blockchain import sui_rpc_call
+        result = await sui_rpc_call("sui_getLatestCheckpointSequenceNumber", [], timeout=self.timeout_seconds)
+        if "error" in result:
+            raise RuntimeError(result["error"].get("message", "RPC error"))
+        return {"checkpoint": result.get("result")}
+
+    async def _check_all(self) -> Dict[str, Any]:
+        checks = [self._run_check(self._check_database), self._run_check(self._check_redis)]
+        if not settings.MOCK_MODE:
+            checks.append(self._run_check(self._check_blockchain))
+        results = await asyncio.gather(*checks)
+
+        services = {"api": {"status": STATUS_UP}, "database": results[0], "redis": results[1]}
+        services["blockchain"] = results[2] if not settings.MOCK_MODE else {"status": STATUS_SKIPPED, "detail": "mock mode"}
+
+        if services["database"]["status"] == STATUS_DOWN:
+            status = "unhealthy"
+        elif any(service["status"] == STATUS_DOWN for service in services.values()):
+            status = "degraded"
+        else:
+            status = "healthy"
+
+        for name, service in services.items():
+            if service["status"] == STATUS_DOWN:
+                logger.warning(f"⚠️ Health check failed for {name}: {service.get('error')}")
+
+        return {"status": status, "checked_at": time.time(), "services": services}
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def check(self) -> Dict[str, Any]:
+        """取得（快取的）健康狀態；資料庫不可用時 status 為 unhealthy"""
+        return await self._cache.get_or_compute("health", self._check_all)
+
+
+# 全局實例
+health_checker = HealthChecker()
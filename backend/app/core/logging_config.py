@@ -1,59 +1,232 @@
 """
 日誌配置模組
+
+非阻塞日誌管線：
+- 根日誌記錄器只掛一個 QueueHandler，事件迴圈上只做取樣判斷與入列
+- QueueListener 在背景執行緒格式化並寫入 stdout / 輪替檔案（磁碟 I/O 不在事件迴圈上）
+- 佇列有上限，滿了直接丟棄 INFO 以下的記錄（計數），不讓日誌拖慢請求
+- 可輸出 JSON（LOG_FORMAT=json）
+- 熱路徑可依 logger 名稱取樣（LOG_SAMPLING="app.services.sui_service=0.1,..."），
+  WARNING 以上一律保留
 """
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from typing import Dict, Optional
+
+_listener: Optional[QueueListener] = None
+
+# 標準 LogRecord 屬性，其餘的 extra 欄位會輸出到 JSON
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """每筆記錄一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    依 logger 名稱（前綴）取樣 WARNING 以下的記錄
+
+    rates: {"app.services.sui_service": 0.1} 代表只保留 10% 的 INFO / DEBUG
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # 最長前綴優先
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+        self._cache: Dict[str, float] = {}
+        self.sampled_out = 0
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            for prefix, prefix_rate in self.rates:
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = prefix_rate
+                    break
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        # 同步模式下多個處理器共用同一個取樣結果
+        keep = getattr(record, "_sample_keep", None)
+        if keep is None:
+            rate = self._rate(record.name)
+            keep = rate >= 1.0 or random.random() < rate
+            record._sample_keep = keep
+            if not keep:
+                self.sampled_out += 1
+        return keep
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    只入列、不格式化的 QueueHandler
+
+    標準 QueueHandler.prepare() 會在呼叫端執行完整的 Formatter；這裡只合併訊息參數
+    （args 可能在之後被修改）與例外堆疊，時間戳 / JSON 序列化都交給背景執行緒。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.WARNING:
+                # 警告以上不丟棄，寧可短暫阻塞
+                self.queue.put(record)
+            else:
+                self.dropped += 1
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """解析 "logger=rate,logger=rate"，格式錯誤時拋出 ValueError"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        if not name or not rate:
+            raise ValueError(f"無法解析日誌取樣設定: {item}")
+        rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
 
-def setup_logging(log_level: str = "INFO", log_to_file: bool = True):
+def setup_logging(log_level: str = "INFO", log_to_file: bool = True, log_format: str = "text",
+                  async_logging: bool = True, sampling: Optional[Dict[str, float]] = None,
+                  queue_size: int = 10000, log_dir: Optional[str] = None):
     """
     設置應用程式日誌
-    
+
     Args:
         log_level: 日誌級別 (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_to_file: 是否輸出到檔案
+        log_format: text 或 json
+        async_logging: 是否經由佇列在背景執行緒輸出
+        sampling: 各 logger 的 INFO / DEBUG 取樣比例
+        queue_size: 佇列上限（滿了丟棄 INFO 以下）
+        log_dir: 日誌目錄，預設為專案根目錄的 logs/
     """
-    # 創建日誌目錄
-    log_dir = Path(__file__).parent.parent.parent.parent / "logs"
-    log_dir.mkdir(exist_ok=True)
-    
+    global _listener
+    stop_logging()
+
+    level = getattr(logging, log_level.upper())
+
     # 日誌格式
-    log_format = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    # 根日誌記錄器
-    root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, log_level.upper()))
-    
-    # 清除現有的處理器
-    root_logger.handlers.clear()
-    
-    # 控制台處理器
+    if log_format == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+
+    # 實際輸出的處理器
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(getattr(logging, log_level.upper()))
-    console_handler.setFormatter(log_format)
-    root_logger.addHandler(console_handler)
-    
+    console_handler.setLevel(level)
+    console_handler.setFormatter(formatter)
+    handlers = [console_handler]
+
     # 檔案處理器（如果啟用）
+    log_file = None
     if log_to_file:
-        log_file = log_dir / "backend.log"
+        directory = Path(log_dir) if log_dir else Path(__file__).parent.parent.parent.parent / "logs"
+        directory.mkdir(exist_ok=True)
+        log_file = directory / "backend.log"
         file_handler = RotatingFileHandler(
             log_file,
             maxBytes=10 * 1024 * 1024,  # 10MB
             backupCount=5,
             encoding='utf-8'
         )
-        file_handler.setLevel(getattr(logging, log_level.upper()))
-        file_handler.setFormatter(log_format)
-        root_logger.addHandler(file_handler)
-        
-        logging.info(f"日誌檔案: {log_file}")
-    
+        file_handler.setLevel(level)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    # 根日誌記錄器
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    root_logger.handlers.clear()
+
+    if async_logging:
+        queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+        _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        root_handlers = [queue_handler]
+    else:
+        root_handlers = handlers
+
+    if sampling:
+        sampling_filter = SamplingFilter(sampling)
+        for handler in root_handlers:
+            handler.addFilter(sampling_filter)
+    for handler in root_handlers:
+        root_logger.addHandler(handler)
+
+    if log_file:
+        logging.info("日誌檔案: %s", log_file)
+
     # 設置第三方庫的日誌級別
     logging.getLogger("uvicorn").setLevel(logging.WARNING)
     logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
-    
+
     return root_logger
+
+
+def stop_logging():
+    """停止背景輸出執行緒並寫出佇列中剩餘的記錄"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> Dict[str, int]:
+    """佇列深度、因佇列已滿丟棄與取樣略過的記錄數"""
+    stats = {"queue_depth": 0, "dropped": 0, "sampled_out": 0}
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, NonBlockingQueueHandler):
+            stats["queue_depth"] += handler.queue.qsize()
+            stats["dropped"] += handler.dropped
+        for log_filter in handler.filters:
+            if isinstance(log_filter, SamplingFilter):
+                stats["sampled_out"] += log_filter.sampled_out
+    return stats
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,131 @@
+# backend/app/core/query_counter.py
+"""
+每個請求的 SQL 查詢計數
+
+SQLAlchemy 的 cursor 事件（見 database.instrument_engine）把每條語句記錄到目前
+context 中所有啟用的 QueryStats：
+
+- QueryCountMiddleware: 每個請求一份統計；DEBUG 時以回應標頭輸出，
+  並記錄 db_queries_per_request / db_time_per_request_seconds 指標
+- 同一請求中相同語句（參數化後的 SQL 文字）重複執行達門檻時視為 N+1 並發出警告
+- track_queries(): 測試與腳本用，可巢狀使用（tests/conftest.py 的 query_budget fixture）
+"""
+
+import logging
+from collections import Counter as StatementCounter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = "x-db-query-count"
+QUERY_TIME_HEADER = "x-db-time-ms"
+REPEATED_QUERY_HEADER = "x-db-repeated-queries"
+
+_active: ContextVar[Tuple["QueryStats", ...]] = ContextVar("active_query_stats", default=())
+
+db_queries_per_request = metrics.registry.histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+db_time_per_request = metrics.registry.histogram(
+    "db_time_per_request_seconds", "Total database time per HTTP request", ("route",),
+    buckets=metrics.DB_BUCKETS,
+)
+db_repeated_query_requests = metrics.registry.counter(
+    "db_repeated_query_requests_total", "Requests that repeated an identical statement (possible N+1)", ("route",),
+)
+
+
+class QueryStats:
+    """單一範圍（請求 / 測試區塊）內的查詢統計"""
+
+    __slots__ = ("count", "total_seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.statements: StatementCounter = StatementCounter()
+
+    def add(self, statement: str, elapsed_seconds: float):
+        self.count += 1
+        self.total_seconds += elapsed_seconds
+        self.statements[statement] += 1
+
+    @property
+    def total_ms(self) -> float:
+        return self.total_seconds * 1000
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+        """執行次數達門檻的相同語句（依次數由多到少）"""
+        threshold = threshold or settings.QUERY_REPEAT_THRESHOLD
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+
+
+def record(statement: str, elapsed_seconds: float):
+    """由 SQLAlchemy after_cursor_execute 事件呼叫"""
+    active = _active.get()
+    if not active:
+        return
+    statement = " ".join(statement.split())
+    for stats in active:
+        stats.add(statement, elapsed_seconds)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """統計區塊內執行的查詢"""
+    stats = QueryStats()
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+class QueryCountMiddleware:
+    """每個請求的查詢數量與資料庫時間"""
+
+    def __init__(self, app, emit_headers: Optional[bool] = None):
+        self.app = app
+        self.emit_headers = settings.DEBUG if emit_headers is None else emit_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_wrapper(message):
+                if self.emit_headers and message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((QUERY_COUNT_HEADER.encode(), str(stats.count).encode()))
+                    headers.append((QUERY_TIME_HEADER.encode(), f"{stats.total_ms:.2f}".encode()))
+                    headers.append((REPEATED_QUERY_HEADER.encode(), str(len(stats.repeated())).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._report(scope, stats)
+
+    @staticmethod
+    def _report(scope, stats: QueryStats):
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        db_queries_per_request.observe(stats.count, route)
+        db_time_per_request.observe(stats.total_seconds, route)
+
+        repeated = stats.repeated()
+        if repeated:
+            db_repeated_query_requests.inc(route)
+            sql, count = repeated[0]
+            logger.warning(
+                f"⚠️ Possible N+1 on {scope['method']} {route}: {stats.count} queries, "
+                f"statement repeated {count}x: {sql[:200]}"
+            )
+
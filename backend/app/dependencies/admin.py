@@ -2,7 +2,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_async_session
+from app.core.database import get_admin_async_session
 from app.core.security import verify_token
 from app.models import AdminUser
 
@@ -12,7 +12,7 @@ _admin_bearer = HTTPBearer(auto_error=True)
 
 async def get_current_admin(
     credentials: HTTPAuthorizationCredentials = Depends(_admin_bearer),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_async_session),
 ) -> AdminUser:
     token = credentials.credentials
     admin_id = verify_token(token)
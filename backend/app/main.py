@@ -1,16 +1,24 @@
 # backend/app/main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 import logging
 import os
 
 # 設置日誌
-from app.core.logging_config import setup_logging
+from app.core.logging_config import logging_stats, parse_sampling, setup_logging
 
 log_level = os.getenv("LOG_LEVEL", "INFO")
 log_to_file = os.getenv("LOG_TO_FILE", "true").lower() == "true"
-setup_logging(log_level=log_level, log_to_file=log_to_file)
+setup_logging(
+    log_level=log_level,
+    log_to_file=log_to_file,
+    log_format=os.getenv("LOG_FORMAT", "text"),
+    async_logging=os.getenv("LOG_ASYNC", "true").lower() == "true",
+    # 例如 "app.services.sui_service=0.1,app.services.trip_service=0.5"
+    sampling=parse_sampling(os.getenv("LOG_SAMPLING", "")),
+)
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +27,37 @@ async def lifespan(app: FastAPI):
     """應用生命週期管理"""
     logger.info("🚀 Starting AutoDrive API...")
     # 啟動時的初始化
+    from app.services.speed_table import speed_table_service
+    from app.services.surge_service import surge_service
+    from app.services.gas_budget_service import gas_budget_estimator
+    from app.services.gas_coin_pool import gas_coin_pool
+    from app.services.trip_reaper import trip_reaper
+    from app.services.outbox_service import chain_outbox_worker
+    from app.services.trip_partition_service import trip_partition_maintainer
+    from app.services.analytics_store import analytics_store
+    speed_table_service.load()
+    surge_service.start()
+    gas_budget_estimator.start()
+    gas_coin_pool.start()
+    trip_reaper.start()
+    chain_outbox_worker.start()
+    trip_partition_maintainer.start()
+    analytics_store.start()
     yield
     # 關閉時的清理
+    await surge_service.stop()
+    await gas_budget_estimator.stop()
+    await trip_reaper.stop()
+    await chain_outbox_worker.stop()
+    await trip_partition_maintainer.stop()
+    await analytics_store.stop()
+    from app.services.settlement_batcher import settlement_batcher
+    await settlement_batcher.close()
+    await gas_coin_pool.stop()
+    from app.services.contract_metrics_service import contract_performance_tracker
+    await contract_performance_tracker.close()
+    from app.core.health import health_checker
+    await health_checker.close()
     logger.info("👋 Shutting down AutoDrive API...")
 
 app = FastAPI(
@@ -39,6 +76,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+from app.config import settings
+from app.core import metrics
+from app.core.query_counter import QueryCountMiddleware
+
+# 查詢計數在內層，路由資訊（scope["route"]）由 Prometheus 中介層共用
+metrics.registry.gauge(
+    "log_records", "Log pipeline queue depth and records dropped or sampled out", ("state",),
+    callback=lambda: {(state,): value for state, value in logging_stats().items()},
+)
+
+if settings.QUERY_COUNTER_ENABLED:
+    app.add_middleware(QueryCountMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.PrometheusMiddleware)
+
 @app.get("/")
 async def root():
     return {
@@ -49,26 +101,29 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """健康檢查端點"""
-    return {
-        "status": "healthy",
-        "services": {
-            "api": "running",
-            "database": "pending",  # 稍後實作
-            "redis": "pending",     # 稍後實作
-            "blockchain": "pending" # 稍後實作
-        }
-    }
+    """健康檢查端點（資料庫、Redis、區塊鏈節點；結果快取數秒）"""
+    from app.core.health import health_checker
+    result = await health_checker.check()
+    status_code = 503 if result["status"] == "unhealthy" else 200
+    return JSONResponse(status_code=status_code, content=result)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus 指標"""
+    return Response(content=metrics.registry.render(), media_type=metrics.MetricsRegistry.CONTENT_TYPE)
+
 from app.api.v1 import users as users_v1
 from app.api.v1 import vehicles as vehicles_v1
 from app.api.v1 import trips as trips_v1
 from app.api.v1 import wallet as wallet_v1
 from app.api.v1 import payment_proxy
+from app.api.v1 import reviews as reviews_v1
 from app.api.v1.admin import router as admin_router
 
 app.include_router(users_v1.router, prefix="/api/v1")
 app.include_router(vehicles_v1.router, prefix="/api/v1")
 app.include_router(trips_v1.router, prefix="/api/v1")
+app.include_router(reviews_v1.router, prefix="/api/v1")
 app.include_router(wallet_v1.router, prefix="/api/v1/wallet", tags=["wallet"])
 app.include_router(payment_proxy.router, prefix="/api/v1/payment", tags=["payment"])
 app.include_router(admin_router, prefix="/api/v1")
@@ -5,9 +5,12 @@ from .user import User
 from .vehicle import Vehicle
 from .ride import Trip
 from .review import Review
-from .payment import PaymentMethod, PaymentTransaction
+from .payment import PaymentMethod, PaymentTransaction, ProcessedPayment
 from .refund import RefundRequest
 from .admin_user import AdminUser
+from .chain_event import ChainEvent, ChainEventCursor
+from .contract_metric import ContractTxMetric
+from .outbox import ChainOutbox
 
 # 確保所有模型都被導入，這樣 Base.metadata 才能找到它們
 __all__ = [
@@ -18,6 +21,11 @@ __all__ = [
     "Review", 
     "PaymentMethod", 
     "PaymentTransaction",
+    "ProcessedPayment",
     "RefundRequest",
-    "AdminUser"
+    "AdminUser",
+    "ChainEvent",
+    "ChainEventCursor",
+    "ContractTxMetric",
+    "ChainOutbox"
 ]
@@ -0,0 +1,60 @@
+# backend/app/models/chain_event.py
+
+"""
+鏈上事件索引模型
+由 contracts/tools/monitoring/event_listener.py 寫入，後端以查表取代逐筆 RPC 確認
+"""
+
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class ChainEvent(Base):
+    """
+    已索引的 Move 事件（payment_escrow / trip_receipt）
+    """
+
+    __tablename__ = "chain_events"
+
+    id = Column(BigInteger, primary_key=True)
+
+    # === 事件識別（Sui EventID） ===
+    tx_digest = Column(String(64), nullable=False, comment="交易 digest")
+    event_seq = Column(Integer, nullable=False, comment="交易內的事件序號")
+
+    # === 事件內容 ===
+    module = Column(String(50), nullable=False, comment="Move 模組：payment_escrow, trip_receipt")
+    event_name = Column(String(50), nullable=False, comment="事件名稱：PaymentLocked, PaymentReleased ...")
+    event_type = Column(String(255), nullable=False, comment="完整事件型別 package::module::Struct")
+    trip_id = Column(BigInteger, nullable=True, comment="後端行程ID")
+    object_id = Column(String(66), nullable=True, comment="託管 / 收據對象ID")
+    sender = Column(String(66), nullable=True, comment="交易發送者")
+    parsed_json = Column(JSONB, nullable=False, comment="事件欄位")
+    timestamp_ms = Column(BigInteger, nullable=True, comment="鏈上時間戳（毫秒）")
+
+    indexed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("tx_digest", "event_seq", name="uq_chain_events_event_id"),
+        Index("ix_chain_events_trip_event", "trip_id", "event_name"),
+        Index("ix_chain_events_object_id", "object_id"),
+    )
+
+    def __repr__(self):
+        return f"<ChainEvent(trip_id={self.trip_id}, event={self.event_name}, tx={self.tx_digest})>"
+
+
+class ChainEventCursor(Base):
+    """
+    索引器的分頁游標（每個事件來源一筆），與事件寫入在同一個交易中更新
+    """
+
+    __tablename__ = "chain_event_cursors"
+
+    source = Column(String(200), primary_key=True, comment="事件來源，例如 <package>::payment_escrow")
+    tx_digest = Column(String(64), nullable=True, comment="最後處理的事件 txDigest")
+    event_seq = Column(Integer, nullable=True, comment="最後處理的事件 eventSeq")
+    events_indexed = Column(BigInteger, default=0, nullable=False, comment="累計索引事件數")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
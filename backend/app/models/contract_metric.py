@@ -0,0 +1,57 @@
+# backend/app/models/contract_metric.py
+
+"""
+合約交易效能時間序列
+每筆 Move 呼叫一列：提交到確定的延遲與 effects.gasUsed 明細
+"""
+
+from sqlalchemy import BigInteger, Column, DateTime, Float, Index, Integer, String
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class ContractTxMetric(Base):
+    """
+    合約交易的延遲與 gas 用量
+
+    source=backend: 後端提交時記錄（含延遲）
+    source=backfill: performance_tracker 從鏈上回填（只有 gas，沒有提交時間）
+    source=dry_run: gas_optimizer 的 dry-run 結果（只用於 gas 預算估算）
+    """
+
+    __tablename__ = "contract_tx_metrics"
+
+    id = Column(BigInteger, primary_key=True)
+    tx_digest = Column(String(64), unique=True, nullable=False, comment="交易 digest")
+
+    # === Move 呼叫 ===
+    package_id = Column(String(66), nullable=False, comment="合約套件ID（升級後會變更）")
+    module = Column(String(50), nullable=False)
+    function = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, comment="success, failure")
+    error = Column(String(500), nullable=True, comment="失敗原因（MoveAbort 等）")
+    source = Column(String(20), nullable=False, default="backend", comment="backend, backfill, dry_run")
+
+    # === 延遲（毫秒，回填資料為空） ===
+    execute_latency_ms = Column(Float, nullable=True, comment="提交到取得 effects")
+    finality_latency_ms = Column(Float, nullable=True, comment="提交到納入 checkpoint")
+
+    # === effects.gasUsed（MIST） ===
+    computation_cost = Column(BigInteger, nullable=False, default=0)
+    storage_cost = Column(BigInteger, nullable=False, default=0)
+    storage_rebate = Column(BigInteger, nullable=False, default=0)
+    non_refundable_storage_fee = Column(BigInteger, nullable=False, default=0)
+    gas_used = Column(BigInteger, nullable=False, default=0, comment="computation + storage - rebate")
+    gas_budget = Column(BigInteger, nullable=True)
+
+    checkpoint = Column(BigInteger, nullable=True)
+    executed_epoch = Column(Integer, nullable=True)
+    executed_at = Column(DateTime(timezone=True), nullable=False, comment="鏈上時間（回填）或提交時間")
+    recorded_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_contract_tx_metrics_function_time", "module", "function", "executed_at"),
+    )
+
+    def __repr__(self):
+        return f"<ContractTxMetric({self.module}::{self.function}, gas={self.gas_used}, tx={self.tx_digest})>"
@@ -0,0 +1,47 @@
+# backend/app/models/outbox.py
+
+"""
+鏈上副作用的交易式 outbox
+與用戶 / 車輛在同一個交易中寫入，由 app/services/outbox_service.py 的背景工作送出並寫回物件ID
+"""
+
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class ChainOutbox(Base):
+    """
+    待送出的鏈上註冊（register_user / register_vehicle）
+    """
+
+    __tablename__ = "chain_outbox"
+
+    id = Column(BigInteger, primary_key=True)
+
+    # === 副作用內容 ===
+    kind = Column(String(30), nullable=False, comment="register_user, register_vehicle")
+    aggregate_id = Column(String(50), nullable=False, comment="users.id 或 vehicles.vehicle_id")
+    payload = Column(JSONB, nullable=False, comment="鏈上呼叫參數（地址、hex 哈希等）")
+
+    # === 處理狀態 ===
+    status = Column(String(20), default="pending", nullable=False, comment="pending, done, failed")
+    attempts = Column(Integer, default=0, nullable=False, comment="已嘗試次數")
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False,
+                             comment="下次可領取時間（領取後延後作為租約）")
+    last_error = Column(Text, nullable=True)
+
+    # === 結果 ===
+    tx_digest = Column(String(64), nullable=True, comment="註冊交易 digest")
+    object_id = Column(String(66), nullable=True, comment="建立的鏈上物件ID")
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_chain_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    def __repr__(self):
+        return f"<ChainOutbox(kind={self.kind}, aggregate_id={self.aggregate_id}, status={self.status})>"
@@ -5,7 +5,7 @@ Payment 相關資料庫模型
 管理支付方式與交易記錄
 """
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, CheckConstraint, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, Float, Boolean, DateTime, CheckConstraint, ForeignKey, Text, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -219,3 +219,94 @@ class PaymentTransaction(Base):
     
     def __repr__(self):
         return f"<PaymentTransaction {self.transaction_id} ({self.status})>"
+
+
+class ProcessedPayment(Base):
+    """
+    已處理的乘客轉帳（以交易 hash 為鍵）
+
+    /payment/process-payment 先查此表：重試直接返回保存的結果，不再驗證交易或重複鎖定託管
+    """
+    
+    __tablename__ = "processed_payments"
+    
+    id = Column(BigInteger, primary_key=True)
+    
+    tx_hash = Column(
+        String(100),
+        nullable=False,
+        comment="乘客轉帳的交易 hash"
+    )
+    
+    trip_id = Column(
+        Integer,
+        ForeignKey("trips.trip_id"),
+        nullable=False,
+        comment="行程ID"
+    )
+    
+    # === 處理結果 ===
+    status = Column(
+        String(20),
+        default="processing",
+        nullable=False,
+        comment="處理狀態：processing, locked, rejected, failed"
+    )
+    
+    amount_received = Column(
+        BigInteger,
+        nullable=True,
+        comment="驗證到的轉帳金額（MIST）"
+    )
+    
+    platform_fee = Column(
+        BigInteger,
+        nullable=True,
+        comment="平台費用（MIST）"
+    )
+    
+    escrow_object_id = Column(
+        String(66),
+        nullable=True,
+        comment="lock_payment 建立的託管對象ID"
+    )
+    
+    contract_tx_hash = Column(
+        String(100),
+        nullable=True,
+        comment="lock_payment 交易 hash"
+    )
+    
+    error = Column(
+        Text,
+        nullable=True,
+        comment="驗證或合約調用失敗原因"
+    )
+    
+    # === 時間戳記 ===
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+        comment="首次處理時間"
+    )
+    
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+        comment="最後更新時間"
+    )
+    
+    # === 約束條件 ===
+    __table_args__ = (
+        UniqueConstraint("tx_hash", name="uq_processed_payments_tx_hash"),
+        CheckConstraint(
+            "status IN ('processing', 'locked', 'rejected', 'failed')",
+            name='valid_processed_payment_status'
+        ),
+    )
+    
+    def __repr__(self):
+        return f"<ProcessedPayment {self.tx_hash} ({self.status})>"
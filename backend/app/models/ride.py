@@ -5,7 +5,7 @@ Trip 資料庫模型
 管理乘車行程的完整生命週期
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, CheckConstraint, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, CheckConstraint, ForeignKey, Index, Text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -144,6 +144,20 @@ class Trip(Base):
         comment="總金額"
     )
     
+    surge_multiplier = Column(
+        Float,
+        default=1.0,
+        nullable=False,
+        server_default="1.0",
+        comment="叫車時的動態加價倍率"
+    )
+    
+    pricing_vehicle_type = Column(
+        String(20),
+        nullable=True,
+        comment="計價車型（sedan, suv, minivan, luxury）"
+    )
+    
     # === 區塊鏈支付 ===
     payment_status = Column(
         String(20),
@@ -251,6 +265,8 @@ class Trip(Base):
             'fare >= 0',
             name='valid_fare'
         ),
+        # 逾時行程清理與 /trips/available 依狀態 + 叫車時間掃描
+        Index('ix_trips_status_requested_at', 'status', 'requested_at'),
     )
     
     def __repr__(self):
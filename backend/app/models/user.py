@@ -47,6 +47,12 @@ class User(Base):
         comment="智能合約中的 UserProfile 對象ID"
     )
     
+    chain_synced_at = Column(
+        DateTime(timezone=True), 
+        nullable=True,
+        comment="最後一次與鏈上 UserProfile 狀態同步的時間"
+    )
+    
     # === 傳統身份 (Web2) ===
     username = Column(
         String(50), 
@@ -104,6 +104,12 @@ class Vehicle(Base):
         comment="IOTA智能合約中的車輛對象ID"
     )
     
+    chain_synced_at = Column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="最後一次與鏈上 Vehicle 狀態同步的時間"
+    )
+    
     # === 費率設定 ===
     hourly_rate = Column(
         Integer,
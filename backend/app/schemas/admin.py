@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, EmailStr, Field
 
@@ -47,3 +47,9 @@ class TripStatusUpdate(BaseModel):
 
 class GrowthQuery(BaseModel):
     baseDate: Optional[datetime] = None
+
+
+class ChainSyncRequest(BaseModel):
+    object_ids: Optional[List[str]] = Field(default=None, description="要同步的鏈上物件ID")
+    all_stale: bool = Field(default=False, description="同步所有過期（或從未同步）的資料列")
+    limit: Optional[int] = Field(default=None, ge=1, description="all_stale 時最多同步的資料列數")
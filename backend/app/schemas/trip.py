@@ -84,6 +84,8 @@ class TripFareBreakdown(BaseModel):
     per_km_rate: int = Field(..., description="每公里費率 (micro IOTA)")
     per_minute_rate: int = Field(..., description="每分鐘費率 (micro IOTA)")
     platform_fee_rate: float = Field(..., description="平台費率 (百分比)")
+    surge_multiplier: float = Field(1.0, description="動態加價倍率")
+    vehicle_type: Optional[str] = Field(None, description="計價車型")
 
 class TripResponse(BaseModel):
     """行程響應模型"""
@@ -152,6 +154,7 @@ class TripEstimate(BaseModel):
     estimated_distance_km: float
     estimated_duration_minutes: int
     estimated_fare: TripFareBreakdown
+    quotes: Dict[str, TripFareBreakdown] = Field(default_factory=dict, description="各車型報價")
     available_vehicles_count: int
     estimated_wait_time_minutes: int
 
@@ -5,7 +5,7 @@ Vehicle Pydantic 模型
 """
 
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class VehicleBase(BaseModel):
@@ -111,4 +111,18 @@ class VehicleStatusUpdate(BaseModel):
         valid_statuses = ['available', 'on_trip', 'offline', 'maintenance']
         if v not in valid_statuses:
             raise ValueError(f'車輛狀態必須是: {", ".join(valid_statuses)}')
-        return v
\ No newline at end of file
+        return v
+
+
+class VehicleBulkRowResult(BaseModel):
+    """批次上架的單列結果"""
+    row: int = Field(..., description="列號（從 0 開始）")
+    vehicle_id: Optional[str] = None
+    status: str = Field(..., description="created / invalid / duplicate / exists / conflict")
+    error: Optional[str] = None
+    chain_registration: Optional[str] = Field(None, description="queued：鏈上註冊已寫入 outbox")
+
+class VehicleBulkResponse(BaseModel):
+    """批次上架響應模型"""
+    summary: Dict[str, int]
+    results: List[VehicleBulkRowResult]
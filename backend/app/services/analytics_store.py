@@ -0,0 +1,317 @@
+# backend/app/services/analytics_store.py
+"""
+儀表板分析資料（Parquet + DuckDB）
+
+儀表板的營收 / 成長 / 分佈統計原本是直接對 PostgreSQL 的彙總查詢，與叫車流量競爭資源。
+
+1. 背景工作每 ANALYTICS_EXPORT_INTERVAL_SECONDS 將 trips、payment_transactions、reviews
+   匯出為 ANALYTICS_DIR/{資料集}/month=YYYY-MM/data.parquet（依 requested_at / created_at 分月，
+   沿用 export_service 的伺服器端游標與 row group 寫入）。第一次匯出全部月份，之後重新匯出
+   最近 ANALYTICS_REFRESH_MONTHS 個月，以及上次匯出後有資料列變更的月份（CHANGE_COLUMNS 的
+   時間戳記晚於上次匯出）；每個資料集的 _manifest.json 記錄已匯出的月份。
+   沒有時間戳記的變更（例如付款改為 failed / refunded）只在最近的月份內反映，
+   較早的月份以 POST /admin/dashboard/analytics-export?full=true 全部重新匯出
+2. 查詢以 DuckDB（程序內、每次查詢一個連線、在執行緒中執行）讀取 Parquet，
+   依 hive 分區欄位 month 略過不相關的檔案
+3. ANALYTICS_STORE_ENABLED 且所有資料集都已匯出時，儀表板端點改由此處回應；
+   否則（或查詢失敗時）照舊查詢 PostgreSQL
+
+資料最多延遲一個匯出間隔。trip_partition_service 歸檔的行程月份不在熱資料表中；
+歸檔前已匯出的月份檔案會保留（全部重新匯出時不會再包含這些行程）。
+需要 pyarrow 與 duckdb（選用依賴）。
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, or_, select
+
+from app.config import settings
+from app.core import metrics
+from app.services.export_service import EXPORT_DATASETS, PARQUET_AVAILABLE, parquet_chunks, stream_partitions
+from app.services.trip_partition_service import add_months, month_start
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_DATASETS = ("trips", "payments", "reviews")
+
+# 資料列建立後會被更新的時間戳記：晚於上次匯出時重新匯出該資料列所在的月份
+CHANGE_COLUMNS = {
+    "trips": ("matched_at", "picked_up_at", "completed_at", "cancelled_at"),
+    "payments": ("completed_at",),
+    "reviews": ("updated_at",),
+}
+
+analytics_rows_exported = metrics.registry.counter(
+    "analytics_export_rows_total", "Rows written to the analytics Parquet store", ("dataset",),
+)
+analytics_query_duration = metrics.registry.histogram(
+    "analytics_query_seconds", "Duration of DuckDB dashboard queries",
+)
+
+# 付款時間：完成時間，未完成時為建立時間（與 PostgreSQL 版本的儀表板相同）
+_PAID_AT = "CAST(coalesce(completed_at, created_at) AS TIMESTAMP)"
+
+
+def month_key(month: date) -> str:
+    return f"{month.year:04d}-{month.month:02d}"
+
+
+def month_range(first: date, last: date) -> List[date]:
+    months = []
+    while first <= last:
+        months.append(first)
+        first = add_months(first, 1)
+    return months
+
+
+class AnalyticsStore:
+    """分月 Parquet 匯出與 DuckDB 查詢"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or settings.ANALYTICS_DIR
+        self._task: Optional[asyncio.Task] = None
+        self._last_run: Optional[Dict] = None
+
+    @property
+    def available(self) -> bool:
+        return PARQUET_AVAILABLE and DUCKDB_AVAILABLE
+
+    def _manifest_path(self, dataset: str) -> str:
+        return os.path.join(self.root, dataset, "_manifest.json")
+
+    def load_manifest(self, dataset: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._manifest_path(dataset), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save_manifest(self, dataset: str, manifest: Dict[str, Any]) -> None:
+        path = self._manifest_path(dataset)
+        with open(f"{path}.partial", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(f"{path}.partial", path)
+
+    def ready(self) -> bool:
+        """是否由分析資料回應儀表板查詢"""
+        return (settings.ANALYTICS_STORE_ENABLED and self.available
+                and all(self.load_manifest(dataset) for dataset in ANALYTICS_DATASETS))
+
+    # === 匯出 ===
+
+    async def months_to_export(self, session, dataset: str, now: datetime, full: bool = False) -> List[date]:
+        """
+        第一次匯出（或 full）：最早一筆資料的月份到本月；
+        之後：最近 ANALYTICS_REFRESH_MONTHS 個月與上次匯出後有資料列變更的月份
+        """
+        spec = EXPORT_DATASETS[dataset]
+        current = month_start(now)
+        recent = month_range(add_months(current, 1 - max(1, settings.ANALYTICS_REFRESH_MONTHS)), current)
+        manifest = self.load_manifest(dataset)
+        if manifest and not full:
+            if not manifest.get("updated_at"):
+                return recent
+            since = datetime.fromisoformat(manifest["updated_at"])
+            changed = (await session.execute(
+                select(func.date_trunc("month", func.timezone("UTC", spec.date_column))).distinct()
+                .where(or_(*(getattr(spec.model, name) >= since for name in CHANGE_COLUMNS[dataset])))
+            )).all()
+            return sorted({*recent, *(month_start(row[0]) for row in changed if row[0] is not None)})
+        first = (await session.execute(select(func.min(spec.date_column)))).scalar()
+        return month_range(month_start(first), current) if first else recent
+
+    async def export_month(self, dataset: str, month: date) -> int:
+        """
+        匯出一個月（沒有資料時寫入只含 schema 的檔案，讓 DuckDB 的檢視仍可建立）
+
+        Returns:
+            匯出的列數
+        """
+        from app.core.database import route_session
+
+        spec = EXPORT_DATASETS[dataset]
+        start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+        end_month = add_months(month, 1)
+        end = datetime(end_month.year, end_month.month, 1, tzinfo=timezone.utc)
+        directory = os.path.join(self.root, dataset, f"month={month_key(month)}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "data.parquet")
+        counter = [0]
+        async with route_session("export") as session:
+            with open(f"{path}.partial", "wb") as f:
+                async for chunk in parquet_chunks(spec.columns, stream_partitions(session, spec.statement(start, end)),
+                                                  counter):
+                    f.write(chunk)
+        os.replace(f"{path}.partial", path)
+        return counter[0]
+
+    async def export_once(self, session_maker=None, now: Optional[datetime] = None,
+                          full: bool = False) -> Dict[str, Any]:
+        """匯出一輪（每個月一個檔案，寫完後以 rename 取代，查詢不會讀到寫到一半的檔案；full 時重新匯出全部月份）"""
+        if not self.available:
+            raise RuntimeError("分析資料需要安裝 pyarrow 與 duckdb")
+        if session_maker is None:
+            from app.core.database import async_session_maker as session_maker
+
+        started = time.perf_counter()
+        now = now or datetime.now(timezone.utc)
+        summary: Dict[str, Any] = {"at": now.isoformat(), "datasets": {}}
+        for dataset in ANALYTICS_DATASETS:
+            async with session_maker() as session:
+                months = await self.months_to_export(session, dataset, now, full=full)
+            manifest = self.load_manifest(dataset) or {"months": {}}
+            rows = 0
+            for month in months:
+                count = await self.export_month(dataset, month)
+                manifest["months"][month_key(month)] = {"rows": count, "exported_at": now.isoformat()}
+                rows += count
+            manifest["updated_at"] = now.isoformat()
+            self._save_manifest(dataset, manifest)
+            analytics_rows_exported.inc(dataset, amount=rows)
+            summary["datasets"][dataset] = {"months": len(months), "rows": rows}
+        summary["seconds"] = round(time.perf_counter() - started, 2)
+        self._last_run = summary
+        logger.info(f"📊 分析資料已匯出: {summary['datasets']}（{summary['seconds']}s）")
+        return summary
+
+    # === 查詢 ===
+
+    def _connect(self):
+        connection = duckdb.connect()
+        try:
+            # 與 PostgreSQL（UTC）相同的 date_trunc 邊界
+            connection.execute("SET TimeZone = 'UTC'")
+        except duckdb.Error:
+            pass
+        for dataset in ANALYTICS_DATASETS:
+            pattern = os.path.join(self.root, dataset, "month=*", "data.parquet")
+            if glob.glob(pattern):
+                connection.execute(
+                    f"CREATE VIEW {dataset} AS SELECT * FROM read_parquet('{pattern}', hive_partitioning = true)"
+                )
+        return connection
+
+    def _execute(self, sql: str, params: Sequence[Any]) -> List[Tuple]:
+        started = time.perf_counter()
+        connection = self._connect()
+        try:
+            return connection.execute(sql, list(params)).fetchall()
+        finally:
+            connection.close()
+            analytics_query_duration.observe(time.perf_counter() - started)
+
+    async def query(self, sql: str, params: Sequence[Any] = ()) -> List[Tuple]:
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    async def revenue(self, period_type: str, start: Optional[datetime], end: Optional[datetime]) -> List[Tuple]:
+        """(bucket, 信用卡營收, 點數營收, 總營收, 筆數)，與 /admin/dashboard/revenue 的 PostgreSQL 查詢相同"""
+        unit = {"daily": "day", "monthly": "month", "yearly": "year"}[period_type]
+        clauses, params = ["status = 'completed'"], []
+        if start:
+            clauses.append(f"{_PAID_AT} >= ?")
+            params.append(start)
+        if end:
+            # 完成時間不早於建立時間：建立月份晚於 end 的檔案不可能相符
+            clauses += [f"{_PAID_AT} < ?", "month <= ?"]
+            params += [end, month_key(month_start(end))]
+        return await self.query(
+            f"SELECT date_trunc('{unit}', {_PAID_AT}) AS bucket, "
+            "sum(CASE WHEN payment_type = 'fiat' THEN amount ELSE 0 END), "
+            "sum(CASE WHEN payment_type <> 'fiat' THEN amount ELSE 0 END), "
+            "sum(amount), count(transaction_id) "
+            f"FROM payments WHERE {' AND '.join(clauses)} GROUP BY 1 ORDER BY 1",
+            params,
+        )
+
+    async def period_totals(self, start: datetime, end: datetime) -> Tuple[int, float]:
+        """期間內的叫車數與已完成付款金額"""
+        trips = await self.query(
+            "SELECT count(*) FROM trips WHERE CAST(requested_at AS TIMESTAMP) >= ? "
+            "AND CAST(requested_at AS TIMESTAMP) < ? AND month BETWEEN ? AND ?",
+            [start, end, month_key(month_start(start)), month_key(month_start(end))],
+        )
+        revenue = await self.query(
+            f"SELECT coalesce(sum(amount), 0) FROM payments WHERE status = 'completed' "
+            f"AND {_PAID_AT} >= ? AND {_PAID_AT} < ? AND month <= ?",
+            [start, end, month_key(month_start(end))],
+        )
+        return int(trips[0][0]), float(revenue[0][0])
+
+    async def payment_distribution(self) -> List[Tuple]:
+        """(payment_type, 筆數, 金額)"""
+        return await self.query(
+            "SELECT payment_type, count(transaction_id), sum(amount) FROM payments "
+            "WHERE status = 'completed' GROUP BY payment_type"
+        )
+
+    async def rating_distribution(self) -> List[Tuple]:
+        """(評分, 筆數)"""
+        return await self.query("SELECT rating, count(*) FROM reviews GROUP BY rating ORDER BY rating")
+
+    # === 背景工作 ===
+
+    async def _run(self):
+        while True:
+            try:
+                await self.export_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Analytics export failed: {e}")
+            await asyncio.sleep(settings.ANALYTICS_EXPORT_INTERVAL_SECONDS)
+
+    def start(self):
+        """啟動背景匯出"""
+        if not settings.ANALYTICS_STORE_ENABLED or self._task is not None:
+            return
+        if not self.available:
+            logger.warning("⚠️ Analytics store disabled: pyarrow / duckdb not installed")
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Analytics export started (every {settings.ANALYTICS_EXPORT_INTERVAL_SECONDS}s)")
+
+    async def stop(self):
+        """停止背景匯出"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_status(self) -> Dict[str, Any]:
+        manifests = {dataset: self.load_manifest(dataset) for dataset in ANALYTICS_DATASETS}
+        return {
+            "enabled": settings.ANALYTICS_STORE_ENABLED,
+            "available": self.available,
+            "running": self._task is not None,
+            "serving": self.ready(),
+            "datasets": {
+                dataset: {
+                    "months": len(manifest["months"]),
+                    "rows": sum(month["rows"] for month in manifest["months"].values()),
+                    "updated_at": manifest.get("updated_at"),
+                } if manifest else None
+                for dataset, manifest in manifests.items()
+            },
+            "last_run": self._last_run,
+        }
+
+
+# 全局實例
+analytics_store = AnalyticsStore()
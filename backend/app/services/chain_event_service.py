@@ -0,0 +1,216 @@
+# backend/app/services/chain_event_service.py
+"""
+鏈上事件索引服務
+
+contracts/tools/monitoring/event_listener.py 以 suix_queryEvents 從持久化游標分頁讀取
+payment_escrow / trip_receipt 的事件，解碼後批次寫入 chain_events；
+後端確認託管鎖定 / 釋放時改為查表，索引落後時才退回逐筆 RPC。
+
+lock_payment 任何人都可以調用：以相同 trip_id 鎖定的事件必須符合 LockCriteria
+（送出者、司機地址、金額）才視為行程的鎖定，其餘略過。
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chain_event import ChainEvent, ChainEventCursor
+
+logger = logging.getLogger(__name__)
+
+# 被索引的 Move 模組
+INDEXED_MODULES = ("payment_escrow", "trip_receipt")
+
+# 事件名稱 -> 託管狀態
+ESCROW_EVENT_STATES = {
+    "PaymentLocked": "locked",
+    "PaymentReleased": "released",
+    "PaymentRefunded": "refunded",
+}
+
+# 事件中代表對象ID的欄位
+_OBJECT_ID_FIELDS = ("escrow_id", "receipt_id")
+
+
+def _to_int(value: Any) -> Optional[int]:
+    """Move 的 u64 在 parsedJson 中為字串"""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_address(address: Optional[str]) -> str:
+    """Sui 地址比較用：小寫、去掉 0x 與前導零"""
+    return (address or "").lower().removeprefix("0x").lstrip("0")
+
+
+@dataclass(frozen=True)
+class LockCriteria:
+    """
+    可接受的鎖定事件
+
+    senders: 可接受的送出者（乘客自行鎖定時為乘客錢包，代付時為平台操作錢包）
+    driver: 司機錢包
+    amount_mist: 鎖定總額；以 micro 為單位比較（錢包端以浮點數換算 MIST 的捨入誤差）
+    """
+    senders: Tuple[str, ...]
+    driver: Optional[str]
+    amount_mist: int
+
+    @classmethod
+    def of(cls, senders: Iterable[Optional[str]], driver: Optional[str], amount_mist: int) -> "LockCriteria":
+        return cls(tuple(normalize_address(s) for s in senders if s), normalize_address(driver), amount_mist)
+
+    def matches(self, event: ChainEvent) -> bool:
+        parsed = event.parsed_json or {}
+        sender = normalize_address(event.sender)
+        total = _to_int(parsed.get("total_amount"))
+        return (
+            bool(sender) and sender in self.senders
+            and normalize_address(parsed.get("passenger")) == sender
+            and bool(self.driver) and normalize_address(parsed.get("driver")) == self.driver
+            and total is not None and round(total / 1000) == round(self.amount_mist / 1000)
+        )
+
+
+def decode_event(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    將 suix_queryEvents 回傳的單一事件轉為 chain_events 的一列
+
+    事件型別格式: <package>::<module>::<Struct>，泛型參數（<...>）不保留在事件名稱中
+    """
+    event_id = raw.get("id") or {}
+    event_type = raw.get("type", "")
+    parts = event_type.split("<", 1)[0].split("::")
+    if len(parts) != 3 or not event_id.get("txDigest"):
+        raise ValueError(f"無法解析事件: {event_type or raw}")
+
+    parsed = raw.get("parsedJson") or {}
+    object_id = next((parsed[field] for field in _OBJECT_ID_FIELDS if parsed.get(field)), None)
+
+    return {
+        "tx_digest": event_id["txDigest"],
+        "event_seq": int(event_id.get("eventSeq", 0)),
+        "module": raw.get("transactionModule") or parts[1],
+        "event_name": parts[2],
+        "event_type": event_type,
+        "trip_id": _to_int(parsed.get("trip_id")),
+        "object_id": object_id,
+        "sender": raw.get("sender"),
+        "parsed_json": parsed,
+        "timestamp_ms": _to_int(raw.get("timestampMs")),
+    }
+
+
+class ChainEventService:
+    """鏈上事件索引的讀寫"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    # ========================================================================
+    # 寫入（索引器）
+    # ========================================================================
+
+    async def get_cursor(self, source: str) -> Optional[Dict[str, Any]]:
+        """取得事件來源的游標，尚未索引過返回 None（從頭開始）"""
+        cursor = await self.db.get(ChainEventCursor, source)
+        if not cursor or not cursor.tx_digest:
+            return None
+        return {"txDigest": cursor.tx_digest, "eventSeq": str(cursor.event_seq)}
+
+    async def store_page(self, source: str, rows: List[Dict[str, Any]],
+                         next_cursor: Optional[Dict[str, Any]]) -> int:
+        """
+        批次寫入一頁事件並推進游標（同一個交易）
+
+        以 (tx_digest, event_seq) 去重，重複處理同一頁不會產生重複資料；
+        返回實際新增的事件數
+        """
+        inserted = 0
+        if rows:
+            result = await self.db.execute(
+                insert(ChainEvent).values(rows).on_conflict_do_nothing(
+                    index_elements=["tx_digest", "event_seq"]
+                ).returning(ChainEvent.id)
+            )
+            inserted = len(result.fetchall())
+
+        if next_cursor:
+            cursor = await self.db.get(ChainEventCursor, source)
+            if cursor is None:
+                cursor = ChainEventCursor(source=source, events_indexed=0)
+                self.db.add(cursor)
+            cursor.tx_digest = next_cursor["txDigest"]
+            cursor.event_seq = int(next_cursor["eventSeq"])
+            cursor.events_indexed = (cursor.events_indexed or 0) + inserted
+
+        await self.db.commit()
+        return inserted
+
+    # ========================================================================
+    # 讀取（後端）
+    # ========================================================================
+
+    async def get_escrow_state(self, trip_id: int, escrow_ref: Optional[str] = None,
+                               criteria: Optional[LockCriteria] = None) -> Optional[Dict[str, Any]]:
+        """
+        由已索引事件推導行程的託管狀態
+
+        Args:
+            trip_id: 行程ID
+            escrow_ref: 託管對象ID或鎖定交易 digest，提供時只看該託管
+            criteria: 提供時只採用符合的鎖定事件
+
+        Returns:
+            {"state", "escrow_object_id", "lock_tx", "release_tx", "refund_tx", "receipt_id"}；
+            沒有（符合的）鎖定事件或索引尚未追上時返回 None
+        """
+        result = await self.db.execute(
+            select(ChainEvent)
+            .where(and_(ChainEvent.trip_id == trip_id, ChainEvent.module.in_(INDEXED_MODULES)))
+            .order_by(ChainEvent.timestamp_ms, ChainEvent.id)
+        )
+        events = list(result.scalars().all())
+
+        lock = next(
+            (e for e in events if e.event_name == "PaymentLocked"
+             and (escrow_ref is None or escrow_ref in (e.object_id, e.tx_digest))
+             and (criteria is None or criteria.matches(e))),
+            None
+        )
+        if lock is None:
+            return None
+
+        state = {
+            "state": "locked",
+            "escrow_object_id": lock.object_id,
+            "lock_tx": lock.tx_digest,
+            "release_tx": None,
+            "refund_tx": None,
+            "receipt_id": None,
+        }
+        for event in events:
+            if event.event_name == "ReceiptCreated":
+                state["receipt_id"] = event.object_id
+            elif event.object_id == lock.object_id and event.event_name in ("PaymentReleased", "PaymentRefunded"):
+                state["state"] = ESCROW_EVENT_STATES[event.event_name]
+                key = "release_tx" if event.event_name == "PaymentReleased" else "refund_tx"
+                state[key] = event.tx_digest
+        return state
+
+    async def find_lock(self, trip_id: int, criteria: LockCriteria) -> Optional[ChainEvent]:
+        """行程最早符合 criteria 的鎖定事件（不符合的鎖定略過）"""
+        result = await self.db.execute(
+            select(ChainEvent)
+            .where(and_(ChainEvent.trip_id == trip_id, ChainEvent.event_name == "PaymentLocked"))
+            .order_by(ChainEvent.timestamp_ms, ChainEvent.id)
+        )
+        return next((e for e in result.scalars() if criteria.matches(e)), None)
@@ -0,0 +1,208 @@
+# backend/app/services/chain_sync_service.py
+"""
+鏈上狀態批次同步
+
+/api/contract/sync-status/{object_type}/{object_id} 每個物件一次 HTTP 請求與一次 RPC。
+批次同步:
+
+1. 指定物件ID清單，或掃描所有過期的資料列（有 blockchain_object_id，且 chain_synced_at
+   為空或早於 CHAIN_SYNC_STALE_MINUTES），以主鍵鍵集分頁（CHAIN_SYNC_PAGE_SIZE 筆）
+2. 每 50 個物件一次 sui_multiGetObjects，最多 CHAIN_SYNC_RPC_CONCURRENCY 個請求並行
+3. Move 狀態碼經 ContractStatus 映射為後端狀態
+4. 每頁一個 UPDATE：變更的狀態以 CASE 寫入，並更新整頁的 chain_synced_at
+
+車輛只回報不寫入（report_only）：vehicle_registry 建立的車輛為 offline，後端的上線 / 載客
+狀態不會寫回鏈上，以鏈上狀態覆蓋會把 available / on_trip 的車輛全部改為 offline。
+不一致的資料列計入 drift 並在結果中回報鏈上狀態。
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, or_, select, update
+
+from app.config import settings
+from app.models.user import User
+from app.models.vehicle import Vehicle
+from app.services.iota_contract_service import ContractStatus
+from app.services.reconciliation_service import multi_get_objects
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SyncTarget:
+    """可同步的物件類型：資料表、鏈上型別與狀態映射"""
+    model: Any
+    key: Any
+    column: Any
+    move_type: str
+    move_to_backend: Dict[int, Any]
+    backend_to_move: Dict[Any, int]
+    report_only: bool = False  # 鏈上狀態不是權威來源時只回報不一致，不寫入
+
+    def plan(self, current: Any, move_status: int) -> Tuple[str, Any]:
+        """
+        比對後端與鏈上狀態
+
+        Returns:
+            ("changed", 新值) / ("drift", 鏈上狀態)（report_only）/ ("unchanged", None) / ("unknown_status", None)
+        """
+        if move_status not in self.move_to_backend:
+            return "unknown_status", None
+        value = self.move_to_backend[move_status]
+        # 後端較細的狀態映射到同一個 Move 狀態時（例如 maintenance -> offline）不覆蓋
+        if value == current or self.backend_to_move.get(current) == move_status:
+            return "unchanged", None
+        return ("drift" if self.report_only else "changed"), value
+
+
+SYNC_TARGETS = {
+    "user": SyncTarget(User, User.id, User.is_active, "::user_registry::UserProfile",
+                       ContractStatus.USER_STATUS_MOVE_TO_BACKEND, ContractStatus.USER_STATUS_BACKEND_TO_MOVE),
+    "vehicle": SyncTarget(Vehicle, Vehicle.vehicle_id, Vehicle.status, "::vehicle_registry::Vehicle",
+                          ContractStatus.VEHICLE_STATUS_MOVE_TO_BACKEND, ContractStatus.VEHICLE_STATUS_BACKEND_TO_MOVE,
+                          report_only=True),
+}
+
+
+def move_status(obj: Optional[Dict[str, Any]], move_type: str) -> Tuple[str, Optional[int]]:
+    """
+    sui_multiGetObjects 的單一結果 -> (結果, Move 狀態碼)
+
+    結果為 ok / missing（物件不存在）/ type_mismatch（不是預期的 Move 型別）/ unknown_status
+    """
+    data = (obj or {}).get("data")
+    if not data:
+        return "missing", None
+    content = data.get("content") or {}
+    if not (content.get("type") or data.get("type") or "").endswith(move_type):
+        return "type_mismatch", None
+    try:
+        return "ok", int((content.get("fields") or {})["status"])
+    except (KeyError, TypeError, ValueError):
+        return "unknown_status", None
+
+
+class ChainStatusSync:
+    """以 sui_multiGetObjects 分頁同步 users / vehicles 的鏈上狀態"""
+
+    def __init__(self, object_type: str, node_url: Optional[str] = None, page_size: Optional[int] = None,
+                 rpc_concurrency: Optional[int] = None):
+        if object_type not in SYNC_TARGETS:
+            raise ValueError(f"不支援的物件類型: {object_type}（可用: {', '.join(SYNC_TARGETS)}）")
+        self.object_type = object_type
+        self.target = SYNC_TARGETS[object_type]
+        self.node_url = node_url
+        self.page_size = page_size or settings.CHAIN_SYNC_PAGE_SIZE
+        self.rpc_concurrency = rpc_concurrency or settings.CHAIN_SYNC_RPC_CONCURRENCY
+        self.stats: Dict[str, int] = {
+            "rows": 0, "objects": 0, "rpc_calls": 0, "changed": 0, "drift": 0, "unchanged": 0,
+            "missing": 0, "type_mismatch": 0, "unknown_status": 0, "not_linked": 0,
+        }
+        self.started = time.perf_counter()
+
+    def _select(self):
+        target = self.target
+        return select(target.key, target.model.blockchain_object_id, target.column)
+
+    async def sync_page(self, session, rows: List[Any]) -> Dict[str, Any]:
+        """
+        同步一頁資料列（呼叫端提交交易）
+
+        Returns:
+            {主鍵: 新狀態}（只含有變更的資料列；report_only 時為不一致資料列的鏈上狀態，不寫入）
+        """
+        target = self.target
+        objects = await multi_get_objects(
+            [row.blockchain_object_id for row in rows], {"showContent": True, "showType": True},
+            self.rpc_concurrency, self.node_url, self.stats,
+        )
+        changes: Dict[Any, Any] = {}
+        synced: List[Any] = []
+        for key, object_id, current in rows:
+            outcome, status = move_status(objects.get(object_id), target.move_type)
+            if outcome == "ok":
+                outcome, value = target.plan(current, status)
+                if outcome in ("changed", "drift"):
+                    changes[key] = value
+            if outcome in ("changed", "drift", "unchanged"):
+                synced.append(key)
+            self.stats[outcome] += 1
+        self.stats["rows"] += len(rows)
+        if changes:
+            logger.info("🔄 %s 鏈上狀態同步: %s 筆中 %s 筆%s", self.object_type, len(rows), len(changes),
+                        "與鏈上不一致（僅回報）" if target.report_only else "變更")
+
+        if synced:
+            values: Dict[str, Any] = {"chain_synced_at": datetime.now(timezone.utc)}
+            if changes and not target.report_only:
+                values[target.column.key] = case(changes, value=target.key, else_=target.column)
+            await session.execute(
+                update(target.model)
+                .where(target.key.in_(synced))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        return changes
+
+    async def sync_ids(self, session_maker, object_ids: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """同步指定的物件ID（依 blockchain_object_id 對應資料列），逐頁產生變更"""
+        unique = list(dict.fromkeys(object_ids))
+        for start in range(0, len(unique), self.page_size):
+            chunk = unique[start:start + self.page_size]
+            async with session_maker() as session:
+                result = await session.execute(
+                    self._select().where(self.target.model.blockchain_object_id.in_(chunk))
+                )
+                rows = result.all()
+                self.stats["not_linked"] += len(chunk) - len(rows)
+                changes = await self.sync_page(session, rows) if rows else {}
+                await session.commit()
+            yield changes
+
+    async def sync_stale(self, session_maker, limit: Optional[int] = None,
+                         stale_minutes: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """以主鍵鍵集分頁同步所有過期的資料列，逐頁產生變更"""
+        target = self.target
+        model = target.model
+        stale_before = datetime.now(timezone.utc) - timedelta(
+            minutes=settings.CHAIN_SYNC_STALE_MINUTES if stale_minutes is None else stale_minutes
+        )
+        cursor = None
+        while True:
+            page_size = min(self.page_size, limit - self.stats["rows"]) if limit else self.page_size
+            if page_size <= 0:
+                return
+            stmt = (
+                self._select()
+                .where(and_(model.blockchain_object_id.isnot(None),
+                            or_(model.chain_synced_at.is_(None), model.chain_synced_at < stale_before)))
+                .order_by(target.key)
+                .limit(page_size)
+            )
+            if cursor is not None:
+                stmt = stmt.where(target.key > cursor)
+            async with session_maker() as session:
+                rows = (await session.execute(stmt)).all()
+                if not rows:
+                    return
+                changes = await self.sync_page(session, rows)
+                await session.commit()
+            cursor = rows[-1][0]
+            yield changes
+            if len(rows) < page_size:
+                return
+
+    def summary(self) -> Dict[str, Any]:
+        """統計與吞吐量"""
+        elapsed = time.perf_counter() - self.started
+        return {
+            "object_type": self.object_type,
+            **self.stats,
+            "seconds": round(elapsed, 2),
+            "objects_per_second": round(self.stats["objects"] / elapsed, 1) if elapsed else None,
+        }
@@ -0,0 +1,254 @@
+# backend/app/services/contract_metrics_service.py
+"""
+合約交易效能追蹤
+
+- 後端提交交易後，背景 task 輪詢 sui_getTransactionBlock 直到交易納入 checkpoint，
+  記錄提交到取得 effects / 提交到確定的延遲與 effects.gasUsed 明細（不阻塞請求）
+- contracts/tools/monitoring/performance_tracker.py 從鏈上回填前端送出的交易（只有 gas）
+- 依 Move 函數（可再依套件ID分組）產生百分位報表，比較合約升級前後的差異
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.contract_metric import ContractTxMetric
+from app.utils.blockchain import sui_rpc_call
+
+logger = logging.getLogger(__name__)
+
+# 追蹤的 Move 函數
+TRACKED_FUNCTIONS: Tuple[Tuple[str, str], ...] = (
+    ("payment_escrow", "lock_payment"),
+    ("payment_escrow", "release_payment"),
+    ("payment_escrow", "refund_payment"),
+    ("trip_receipt", "create_receipt"),
+)
+
+REPORT_PERCENTILES = (0.5, 0.9, 0.99)
+
+# 報表中計算百分位的欄位
+_REPORT_COLUMNS = {
+    "gas_used": ContractTxMetric.gas_used,
+    "computation_cost": ContractTxMetric.computation_cost,
+    "storage_cost": ContractTxMetric.storage_cost,
+    "execute_latency_ms": ContractTxMetric.execute_latency_ms,
+    "finality_latency_ms": ContractTxMetric.finality_latency_ms,
+}
+
+
+def parse_gas_used(effects: Dict[str, Any]) -> Dict[str, int]:
+    """effects.gasUsed（字串）轉為整數，gas_used 為實際扣款（computation + storage - rebate）"""
+    gas = effects.get("gasUsed") or {}
+    row = {
+        "computation_cost": int(gas.get("computationCost", 0)),
+        "storage_cost": int(gas.get("storageCost", 0)),
+        "storage_rebate": int(gas.get("storageRebate", 0)),
+        "non_refundable_storage_fee": int(gas.get("nonRefundableStorageFee", 0)),
+    }
+    row["gas_used"] = row["computation_cost"] + row["storage_cost"] - row["storage_rebate"]
+    return row
+
+
+def move_calls(tx_block: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """交易中的 Move 呼叫 (package, module, function)"""
+    data = ((tx_block.get("transaction") or {}).get("data") or {}).get("transaction") or {}
+    calls = []
+    for command in data.get("transactions", []):
+        call = command.get("MoveCall") if isinstance(command, dict) else None
+        if call:
+            calls.append((call.get("package"), call.get("module"), call.get("function")))
+    return calls
+
+
+def metric_row(tx_block: Dict[str, Any], package_id: Optional[str] = None, module: Optional[str] = None,
+               function: Optional[str] = None, **extra: Any) -> Dict[str, Any]:
+    """
+    由 sui_getTransactionBlock（showInput + showEffects）結果產生 contract_tx_metrics 的一列
+
+    未指定 module / function 時取交易中第一個追蹤中的 Move 呼叫
+    """
+    effects = tx_block.get("effects") or {}
+    if not effects:
+        raise ValueError(f"交易缺少 effects: {tx_block.get('digest')}")
+
+    if module is None or function is None:
+        tracked = [call for call in move_calls(tx_block) if call[1:] in TRACKED_FUNCTIONS]
+        if not tracked:
+            raise ValueError(f"交易不含追蹤中的 Move 呼叫: {tx_block.get('digest')}")
+        package_id, module, function = tracked[0]
+
+    status = effects.get("status") or {}
+    gas_data = ((tx_block.get("transaction") or {}).get("data") or {}).get("gasData") or {}
+    timestamp_ms = tx_block.get("timestampMs")
+
+    row = {
+        "tx_digest": tx_block["digest"],
+        "package_id": package_id or "",
+        "module": module,
+        "function": function,
+        "status": status.get("status", "unknown"),
+        "error": (status.get("error") or None) and status["error"][:500],
+        "source": "backfill",
+        "gas_budget": int(gas_data["budget"]) if gas_data.get("budget") else None,
+        "checkpoint": int(tx_block["checkpoint"]) if tx_block.get("checkpoint") else None,
+        "executed_epoch": int(effects["executedEpoch"]) if effects.get("executedEpoch") else None,
+        "executed_at": (
+            datetime.fromtimestamp(int(timestamp_ms) / 1000, tz=timezone.utc)
+            if timestamp_ms else datetime.now(timezone.utc)
+        ),
+        **parse_gas_used(effects),
+    }
+    row.update(extra)
+    return row
+
+
+async def store_metrics(db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """
+    批次寫入（以 tx_digest 去重，由呼叫端提交交易），返回寫入筆數
+
+    後端記錄的延遲優先：回填資料不會覆蓋已存在的延遲，後端記錄則補上延遲欄位
+    """
+    if not rows:
+        return 0
+    stmt = insert(ContractTxMetric).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["tx_digest"],
+        set_={
+            "execute_latency_ms": func.coalesce(stmt.excluded.execute_latency_ms, ContractTxMetric.execute_latency_ms),
+            "finality_latency_ms": func.coalesce(stmt.excluded.finality_latency_ms, ContractTxMetric.finality_latency_ms),
+            "source": case((stmt.excluded.source == "backend", "backend"), else_=ContractTxMetric.source),
+        },
+    ).returning(ContractTxMetric.id)
+    result = await db.execute(stmt)
+    return len(result.fetchall())
+
+
+async def percentile_report(
+    db: AsyncSession,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    by_package: bool = False,
+    percentiles: Sequence[float] = REPORT_PERCENTILES,
+) -> List[Dict[str, Any]]:
+    """
+    每個 Move 函數的 gas / 延遲百分位
+
+    Returns:
+        [{"module", "function", ["package_id"], "count", "failures", "gas_used": {"p50": ...}, ...}]
+    """
+    group = [ContractTxMetric.module, ContractTxMetric.function]
+    if by_package:
+        group.append(ContractTxMetric.package_id)
+
+    columns = [
+        func.count().label("count"),
+        func.count().filter(ContractTxMetric.status != "success").label("failures"),
+    ]
+    labels = []
+    for name, column in _REPORT_COLUMNS.items():
+        for q in percentiles:
+            label = f"{name}__p{int(round(q * 100))}"
+            columns.append(func.percentile_cont(q).within_group(column).label(label))
+            labels.append((name, f"p{int(round(q * 100))}", label))
+
+    # dry-run 結果只用於預算估算，不代表實際效能
+    conditions = [ContractTxMetric.source != "dry_run"]
+    if since:
+        conditions.append(ContractTxMetric.executed_at >= since)
+    if until:
+        conditions.append(ContractTxMetric.executed_at < until)
+
+    query = select(*group, *columns).where(and_(*conditions)).group_by(*group).order_by(*group)
+
+    report = []
+    for row in (await db.execute(query)).mappings():
+        entry = {"module": row["module"], "function": row["function"],
+                 "count": row["count"], "failures": row["failures"]}
+        if by_package:
+            entry["package_id"] = row["package_id"]
+        for name, key, label in labels:
+            value = row[label]
+            entry.setdefault(name, {})[key] = round(float(value), 2) if value is not None else None
+        report.append(entry)
+    return report
+
+
+class ContractPerformanceTracker:
+    """後端提交的交易：背景等待確定並記錄延遲與 gas"""
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.CONTRACT_PERF_TRACKING_ENABLED and not settings.MOCK_MODE
+
+    def track(self, package_id: str, module: str, function: str, tx_digest: str,
+              started: float, gas_budget: Optional[int] = None):
+        """
+        在交易提交並取得 digest 後呼叫（不等待）
+
+        Args:
+            started: 提交前的 time.perf_counter()
+        """
+        if not self.enabled or not tx_digest:
+            return
+        execute_latency_ms = (time.perf_counter() - started) * 1000
+        task = asyncio.get_running_loop().create_task(
+            self._await_finality(package_id, module, function, tx_digest, started, execute_latency_ms, gas_budget)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _await_finality(self, package_id: str, module: str, function: str, tx_digest: str,
+                              started: float, execute_latency_ms: float, gas_budget: Optional[int]):
+        from app.core.database import async_session_maker
+
+        deadline = started + settings.CONTRACT_PERF_FINALITY_TIMEOUT_SECONDS
+        tx_block, finality_latency_ms = None, None
+        try:
+            while time.perf_counter() < deadline:
+                response = await sui_rpc_call(
+                    "sui_getTransactionBlock", [tx_digest, {"showInput": True, "showEffects": True}]
+                )
+                tx_block = response.get("result")
+                if tx_block and tx_block.get("checkpoint"):
+                    finality_latency_ms = (time.perf_counter() - started) * 1000
+                    break
+                await asyncio.sleep(settings.CONTRACT_PERF_POLL_SECONDS)
+
+            if not tx_block:
+                logger.warning("⚠️ 交易未在時限內確定，略過效能記錄: %s", tx_digest)
+                return
+
+            row = metric_row(
+                tx_block, package_id, module, function,
+                source="backend",
+                execute_latency_ms=execute_latency_ms,
+                finality_latency_ms=finality_latency_ms,
+            )
+            if gas_budget and not row["gas_budget"]:
+                row["gas_budget"] = gas_budget
+            async with async_session_maker() as session:
+                await store_metrics(session, [row])
+                await session.commit()
+        except Exception as e:
+            # 效能記錄失敗不影響業務流程
+            logger.warning(f"記錄合約效能失敗 ({module}::{function}, {tx_digest}): {e}")
+
+    async def close(self):
+        """等待進行中的記錄完成（關閉時）"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# 全局實例
+contract_performance_tracker = ContractPerformanceTracker()
@@ -12,6 +12,7 @@ import json
 
 from app.config import settings
 from app.schemas.payment import PaymentStatus, TransactionStatus
+from app.utils.blockchain import sui_rpc_call
 
 logger = logging.getLogger(__name__)
 
@@ -252,7 +253,6 @@ class ContractService:
             # 這裡我們先驗證合約存在，然後返回模擬結果
             
             # 驗證合約包是否存在
-            import httpx
             verify_payload = {
                 "jsonrpc": "2.0",
                 "id": 1,
@@ -263,15 +263,7 @@ class ContractService:
                 ]
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    settings.SUI_NODE_URL,
-                    json=verify_payload,
-                    timeout=10.0,
-                    headers={"Content-Type": "application/json"}
-                )
-                response.raise_for_status()
-                verify_result = response.json()
+            verify_result = await sui_rpc_call(verify_payload["method"], verify_payload["params"])
             
             if "error" in verify_result:
                 raise Exception(f"Contract not found: {verify_result['error']}")
@@ -5,10 +5,15 @@
 
 import logging
 import hashlib
+import time
 from typing import Dict, Any
 from datetime import datetime
 
 from app.config import settings
+from app.services.contract_metrics_service import contract_performance_tracker
+from app.services.gas_budget_service import gas_budget_estimator
+from app.services.settlement_batcher import settlement_batcher
+from app.utils.blockchain import sui_rpc_call
 
 logger = logging.getLogger(__name__)
 
@@ -47,7 +52,7 @@ class EscrowService:
                     "platform_fee": str(platform_fee)
                 },
                 "type_arguments": [],
-                "gas_budget": "10000000"
+                "gas_budget": str(gas_budget_estimator.budget_for("payment_escrow", "lock_payment"))
             }
             
             logger.info(f"🔒 準備鎖定支付: trip={trip_id}, amount={amount} MIST")
@@ -80,7 +85,8 @@ class EscrowService:
         escrow_object_id: str,
         driver_wallet: str,
         trip_id: int,
-        amount_mist: int = None
+        amount_mist: int = None,
+        lock_verified: bool = False
     ) -> Dict[str, Any]:
         """
         釋放支付 - 執行實際的鏈上交易
@@ -89,6 +95,7 @@ class EscrowService:
             escrow_object_id: 託管對象ID (從行程記錄獲取)
             driver_wallet: 司機錢包地址
             trip_id: 行程ID
+            lock_verified: 事件索引已確認鎖定時為 True，略過鎖定交易的 RPC 查詢
             
         Returns:
             交易結果
@@ -105,15 +112,16 @@ class EscrowService:
             # 導入 sui_service 來驗證和執行轉帳
             from app.services.sui_service import sui_service
             
-            # 驗證原始支付交易仍然有效
-            tx_status = await sui_service.get_transaction_status(escrow_object_id)
-            
-            if tx_status.status != "confirmed":
-                logger.error(f"❌ 支付交易無效: {escrow_object_id}")
-                return {
-                    "success": False,
-                    "error": f"支付交易狀態異常: {tx_status.status}"
-                }
+            # 驗證原始支付交易仍然有效（事件索引已確認時不需再查詢節點）
+            if not lock_verified:
+                tx_status = await sui_service.get_transaction_status(escrow_object_id)
+                
+                if tx_status.status != "confirmed":
+                    logger.error(f"❌ 支付交易無效: {escrow_object_id}")
+                    return {
+                        "success": False,
+                        "error": f"支付交易狀態異常: {tx_status.status}"
+                    }
             
             logger.info(f"✅ 支付交易驗證通過，準備轉帳給司機")
             
@@ -127,12 +135,15 @@ class EscrowService:
             logger.info(f"   Trip ID: {trip_id}")
             logger.info(f"   Driver: {driver_wallet}")
             
-            # 調用合約的 release_payment 函數
-            release_result = await sui_service.call_contract_release_payment(
-                package_id=self.package_id,
-                escrow_object_id=escrow_object_id,
-                trip_id=trip_id
-            )
+            # 調用合約的 release_payment 函數（批次器與其他行程的結算合併為一筆 PTB）
+            if settlement_batcher.enabled:
+                release_result = await settlement_batcher.release(self.package_id, escrow_object_id, trip_id)
+            else:
+                release_result = await sui_service.call_contract_release_payment(
+                    package_id=self.package_id,
+                    escrow_object_id=escrow_object_id,
+                    trip_id=trip_id
+                )
             
             if release_result.get("success"):
                 release_tx_hash = release_result.get("transaction_hash")
@@ -231,9 +242,24 @@ class EscrowService:
                     "status": "receipt_created"
                 }
             
+            elif settlement_batcher.enabled and settings.RECEIPT_ISSUER_ID:
+                # 操作錢包代乘客建立收據，與其他行程的結算合併為一筆 PTB
+                result = await settlement_batcher.create_receipt(
+                    self.package_id, settings.RECEIPT_ISSUER_ID, trip_id, passenger_address, driver_address,
+                    pickup_hash, dropoff_hash, distance_km, final_amount
+                )
+                if not result.get("success"):
+                    raise Exception(result.get("error"))
+                
+                return {
+                    "success": True,
+                    "receipt_id": result.get("receipt_id"),
+                    "transaction_hash": result["transaction_hash"]
+                }
+            
             else:
-                import httpx
                 
+                gas_budget = gas_budget_estimator.budget_for("trip_receipt", "create_receipt")
                 tx_data = {
                     "jsonrpc": "2.0",
                     "id": 1,
@@ -252,23 +278,21 @@ class EscrowService:
                             str(distance_km),
                             str(final_amount)
                         ],
-                        "gasBudget": "10000000"
+                        "gasBudget": str(gas_budget)
                     }
                 }
                 
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        self.node_url,
-                        json=tx_data,
-                        headers={"Content-Type": "application/json"},
-                        timeout=30.0
-                    )
-                    response.raise_for_status()
-                    result = response.json()
+                started = time.perf_counter()
+                result = await sui_rpc_call(tx_data["method"], tx_data["params"], timeout=30.0, node_url=self.node_url)
                 
                 if "error" in result:
                     raise Exception(f"RPC Error: {result['error']}")
                 
+                contract_performance_tracker.track(
+                    self.package_id, "trip_receipt", "create_receipt", result["result"]["digest"], started,
+                    gas_budget=gas_budget
+                )
+                
                 return {
                     "success": True,
                     "receipt_id": result["result"]["objectId"],
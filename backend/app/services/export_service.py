@@ -0,0 +1,229 @@
+# backend/app/services/export_service.py
+"""
+管理後台串流匯出（行程 / 支付 / 評價）
+
+admin/trips 與 admin/dashboard 一次載入整個結果集；匯出改為:
+
+1. 伺服器端游標（AsyncSession.stream + yield_per）每次讀取 EXPORT_CHUNK_ROWS 列
+2. 每批轉為一個 CSV 區塊或 Parquet row group 後立即送出，記憶體用量與總列數無關
+3. 以日期區間（requested_at / created_at）與狀態篩選，依主鍵排序（reviews 沒有狀態）
+
+Parquet 需要 pyarrow（選用依賴），未安裝時只提供 CSV。
+"""
+
+import csv
+import io
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Iterable, List, Optional, Sequence
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, Numeric, and_, select
+
+from app.config import settings
+from app.core import metrics
+from app.models.payment import PaymentTransaction
+from app.models.review import Review
+from app.models.ride import Trip
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+rows_exported = metrics.registry.counter(
+    "admin_export_rows_total", "Rows streamed by admin exports", ("dataset", "format"),
+)
+
+
+@dataclass(frozen=True)
+class ExportDataset:
+    """可匯出的資料集：資料表、日期篩選欄位與狀態欄位（沒有狀態時為 None）"""
+    model: Any
+    date_column: Any
+    status_column: Any
+    statuses: Sequence[str]
+
+    @property
+    def columns(self) -> List[Any]:
+        return list(self.model.__table__.columns)
+
+    def statement(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                  statuses: Optional[Iterable[str]] = None):
+        """
+        匯出查詢（end 不含）
+
+        Raises:
+            ValueError: 狀態不在允許清單中
+        """
+        statuses = list(statuses or [])
+        invalid = sorted(set(statuses) - set(self.statuses))
+        if invalid:
+            raise ValueError(f"無效的狀態: {', '.join(invalid)}")
+        conditions = []
+        if start:
+            conditions.append(self.date_column >= start)
+        if end:
+            conditions.append(self.date_column < end)
+        if statuses:
+            conditions.append(self.status_column.in_(statuses))
+        stmt = select(*self.columns).order_by(*self.model.__table__.primary_key.columns)
+        return stmt.where(and_(*conditions)) if conditions else stmt
+
+
+EXPORT_DATASETS = {
+    "trips": ExportDataset(
+        Trip, Trip.requested_at, Trip.status,
+        ("requested", "matched", "accepted", "picked_up", "in_progress", "completed", "cancelled"),
+    ),
+    "payments": ExportDataset(
+        PaymentTransaction, PaymentTransaction.created_at, PaymentTransaction.status,
+        ("pending", "completed", "failed", "refunded"),
+    ),
+    "reviews": ExportDataset(Review, Review.created_at, None, ()),
+}
+
+
+def get_dataset(name: str) -> ExportDataset:
+    if name not in EXPORT_DATASETS:
+        raise ValueError(f"不支援的匯出資料集: {name}（可用: {', '.join(EXPORT_DATASETS)}）")
+    return EXPORT_DATASETS[name]
+
+
+async def stream_partitions(session, stmt, chunk_rows: Optional[int] = None) -> AsyncIterator[List[Any]]:
+    """以伺服器端游標逐批讀取（每批 chunk_rows 列）"""
+    chunk_rows = chunk_rows or settings.EXPORT_CHUNK_ROWS
+    result = await session.stream(stmt.execution_options(yield_per=chunk_rows))
+    try:
+        async for partition in result.partitions():
+            yield partition
+    finally:
+        # 關閉伺服器端游標（客戶端中斷或呼叫端在同一交易中繼續執行 DDL 時）
+        await result.close()
+
+
+async def csv_chunks(columns: List[Any], partitions: AsyncIterator[List[Any]],
+                     counter: Optional[List[int]] = None) -> AsyncIterator[bytes]:
+    """CSV：標頭一個區塊，之後每批一個區塊"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in columns])
+    yield buffer.getvalue().encode("utf-8")
+    async for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        if counter is not None:
+            counter[0] += len(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def arrow_schema(columns: List[Any]):
+    """SQLAlchemy 欄位型別 -> Arrow schema"""
+    fields = []
+    for column in columns:
+        if isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, (Float, Numeric)):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us", tz="UTC" if column.type.timezone else None)
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type, nullable=True))
+    return pa.schema(fields)
+
+
+class _ChunkSink(io.RawIOBase):
+    """ParquetWriter 的輸出：累積寫入的位元組，由產生器逐段取出"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+async def parquet_chunks(columns: List[Any], partitions: AsyncIterator[List[Any]],
+                         counter: Optional[List[int]] = None) -> AsyncIterator[bytes]:
+    """Parquet：每批寫成一個 row group，寫入的位元組立即送出，檔尾在最後一個區塊"""
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        async for rows in partitions:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            if counter is not None:
+                counter[0] += len(rows)
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def prepare_export(dataset_name: str, export_format: str, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None, statuses: Optional[Iterable[str]] = None):
+    """
+    驗證匯出參數並建立查詢（在回應開始前呼叫，錯誤才能以 400 返回）
+
+    Returns:
+        (資料集, 查詢)
+
+    Raises:
+        ValueError: 資料集、格式或狀態無效
+    """
+    dataset = get_dataset(dataset_name)
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"不支援的匯出格式: {export_format}（可用: {', '.join(EXPORT_FORMATS)}）")
+    if export_format == "parquet" and not PARQUET_AVAILABLE:
+        raise ValueError("Parquet 匯出需要安裝 pyarrow")
+    if start and end and start >= end:
+        raise ValueError("開始日期需早於結束日期")
+    return dataset, dataset.statement(start, end, statuses)
+
+
+async def export_rows(dataset_name: str, export_format: str, stmt, session_factory,
+                      chunk_rows: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    串流匯出的位元組區塊（在產生器內開啟會話，供 StreamingResponse 使用）
+
+    session_factory: 無參數、返回 async context manager 的會話工廠
+    """
+    dataset = get_dataset(dataset_name)
+    encode = csv_chunks if export_format == "csv" else parquet_chunks
+    counter = [0]
+    started = time.perf_counter()
+    try:
+        async with session_factory() as session:
+            async for chunk in encode(dataset.columns, stream_partitions(session, stmt, chunk_rows), counter):
+                yield chunk
+    finally:
+        rows_exported.inc(dataset_name, export_format, amount=counter[0])
+        logger.info("📤 匯出 %s (%s): %s 列，%.1fs", dataset_name, export_format, counter[0],
+                    time.perf_counter() - started)
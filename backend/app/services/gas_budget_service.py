@@ -0,0 +1,194 @@
+# backend/app/services/gas_budget_service.py
+"""
+Gas 預算估算
+
+背景工作定期從 contract_tx_metrics（鏈上 effects 與 dry-run 結果）計算每個 Move 函數
+成功交易的 gas 百分位，預算 = p99(computation + storage) × GAS_BUDGET_MARGIN；
+請求路徑只做 O(1) 查表。樣本數不足的函數使用原本寫死在呼叫點的預算。
+
+預算必須涵蓋未扣除 storage rebate 的總額（rebate 在執行後才退回），
+預估手續費則使用扣除 rebate 後的 p50。
+"""
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, func, select
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+MoveFunction = Tuple[str, str]
+
+# 沒有歷史資料時的預算（MIST），沿用原本各呼叫點的數值
+DEFAULT_BUDGETS: Dict[MoveFunction, int] = {
+    ("payment_escrow", "lock_payment"): 10_000_000,
+    ("payment_escrow", "release_payment"): 10_000_000,
+    ("payment_escrow", "refund_payment"): 10_000_000,
+    ("trip_receipt", "create_receipt"): 10_000_000,
+    ("user_registry", "register_user"): 10_000_000,
+    ("user_registry", "register_user_for"): 10_000_000,
+    ("vehicle_registry", "register_vehicle"): 15_000_000,
+    ("vehicle_registry", "register_vehicle_for"): 15_000_000,
+    ("vehicle_registry", "set_vehicle_status"): 10_000_000,
+    ("ride_matching", "create_ride_request"): 20_000_000,
+    ("ride_matching", "match_request"): 25_000_000,
+    ("ride_matching", "complete_ride"): 15_000_000,
+}
+FALLBACK_BUDGET = 10_000_000
+
+# 預算取整單位（MIST）
+BUDGET_STEP = 100_000
+
+
+def recommend_budget(p99_gross: float, margin: Optional[float] = None,
+                     min_budget: Optional[int] = None, max_budget: Optional[int] = None) -> int:
+    """p99 × 安全係數，向上取整並限制在上下限之間"""
+    margin = settings.GAS_BUDGET_MARGIN if margin is None else margin
+    min_budget = settings.GAS_BUDGET_MIN_MIST if min_budget is None else min_budget
+    max_budget = settings.GAS_BUDGET_MAX_MIST if max_budget is None else max_budget
+    budget = math.ceil(p99_gross * margin / BUDGET_STEP) * BUDGET_STEP
+    return int(min(max(budget, min_budget), max_budget))
+
+
+@dataclass
+class BudgetEstimate:
+    """單一 Move 函數的預算"""
+    budget: int
+    source: str  # history, default
+    samples: int = 0
+    p99_gross: Optional[float] = None
+    p50_net: Optional[float] = None
+
+
+class GasBudgetEstimator:
+    """每個 Move 函數的 gas 預算快取"""
+
+    def __init__(self):
+        self._estimates: Dict[MoveFunction, BudgetEstimate] = {}
+        self._computed_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ========================================================================
+    # 請求路徑：O(1) 查表
+    # ========================================================================
+
+    def budget_for(self, module: str, function: str) -> int:
+        """交易的 gas 預算（MIST）"""
+        estimate = self._estimates.get((module, function))
+        if estimate is not None:
+            return estimate.budget
+        return DEFAULT_BUDGETS.get((module, function), FALLBACK_BUDGET)
+
+    def expected_fee(self, module: str, function: str) -> int:
+        """預估實際扣除的手續費（MIST，扣除 storage rebate 後的 p50）"""
+        estimate = self._estimates.get((module, function))
+        if estimate is not None and estimate.p50_net is not None:
+            return int(estimate.p50_net)
+        # 沒有資料時保守地以預算估計
+        return self.budget_for(module, function)
+
+    # ========================================================================
+    # 背景更新
+    # ========================================================================
+
+    def apply(self, stats: Dict[MoveFunction, Dict[str, float]]) -> Dict[MoveFunction, BudgetEstimate]:
+        """由統計結果重建預算表（樣本不足的函數使用預設值）"""
+        estimates: Dict[MoveFunction, BudgetEstimate] = {}
+        for key, row in stats.items():
+            if row["samples"] < settings.GAS_BUDGET_MIN_SAMPLES or row["p99_gross"] is None:
+                continue
+            estimates[key] = BudgetEstimate(
+                budget=recommend_budget(row["p99_gross"]),
+                source="history",
+                samples=int(row["samples"]),
+                p99_gross=float(row["p99_gross"]),
+                p50_net=float(row["p50_net"]) if row["p50_net"] is not None else None,
+            )
+        self._estimates = estimates
+        self._computed_at = time.monotonic()
+        return estimates
+
+    async def refresh(self) -> Dict[MoveFunction, BudgetEstimate]:
+        """從 contract_tx_metrics 重新計算（最近 GAS_BUDGET_WINDOW_DAYS 天的成功交易）"""
+        from app.core.database import async_session_maker
+        from app.models.contract_metric import ContractTxMetric as M
+
+        since = datetime.now(timezone.utc) - timedelta(days=settings.GAS_BUDGET_WINDOW_DAYS)
+        gross = M.computation_cost + M.storage_cost
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(
+                    M.module,
+                    M.function,
+                    func.count().label("samples"),
+                    func.percentile_cont(0.99).within_group(gross).label("p99_gross"),
+                    func.percentile_cont(0.5).within_group(M.gas_used).label("p50_net"),
+                )
+                .where(and_(M.status == "success", M.executed_at >= since))
+                .group_by(M.module, M.function)
+            )
+            stats = {
+                (row.module, row.function): {"samples": row.samples, "p99_gross": row.p99_gross, "p50_net": row.p50_net}
+                for row in result
+            }
+        return self.apply(stats)
+
+    async def _run(self):
+        while True:
+            try:
+                estimates = await self.refresh()
+                logger.debug("⛽ Gas budgets refreshed: %s", {
+                    f"{module}::{function}": e.budget for (module, function), e in estimates.items()
+                })
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 更新失敗時保留舊的預算表
+                logger.warning(f"⚠️ Gas budget refresh failed: {e}")
+            await asyncio.sleep(settings.GAS_BUDGET_REFRESH_SECONDS)
+
+    def start(self):
+        """啟動背景更新工作"""
+        if not settings.GAS_BUDGET_ESTIMATION_ENABLED or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Gas budget estimator started (every {settings.GAS_BUDGET_REFRESH_SECONDS}s)")
+
+    async def stop(self):
+        """停止背景更新工作"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_status(self) -> Dict:
+        """目前的預算表"""
+        budgets = {}
+        for module, function in sorted(set(DEFAULT_BUDGETS) | set(self._estimates)):
+            estimate = self._estimates.get((module, function))
+            budgets[f"{module}::{function}"] = {
+                "budget": self.budget_for(module, function),
+                "source": estimate.source if estimate else "default",
+                "samples": estimate.samples if estimate else 0,
+            }
+        return {
+            "computed_seconds_ago": (
+                round(time.monotonic() - self._computed_at, 1) if self._computed_at is not None else None
+            ),
+            "budgets": budgets,
+        }
+
+
+# 全局實例
+gas_budget_estimator = GasBudgetEstimator()
@@ -0,0 +1,506 @@
+# backend/app/services/gas_coin_pool.py
+"""
+Gas coin 池
+
+原本每筆合約呼叫都取 client.get_gas() 的第一個 coin，同時進行的結算會爭用同一個
+gas 物件，互相序列化或因物件版本衝突失敗。這裡為每個操作錢包（OPERATOR_PRIVATE_KEYS，
+可設定多個）維護一組預先拆分好的 gas coin:
+
+- 每筆進行中的交易租用一個 coin（lease），以 use_gas_object 指定，交易結束後歸還；
+  沒有可用 coin 時等待，超過 GAS_POOL_LEASE_TIMEOUT_SECONDS 拋出 GasPoolExhaustedError
+- 背景工作每 GAS_POOL_REBALANCE_SECONDS 秒從鏈上重新讀取 coin（修正餘額估計），
+  並以一筆 PTB 把低於 GAS_POOL_MIN_COIN_BALANCE_MIST 的零碎 coin 合併、
+  從最大的 coin 拆出新的 coin，補到每個錢包 GAS_POOL_TARGET_COINS 個
+- 池深度（各狀態 coin 數）、租用等待時間與逾時次數輸出到 /metrics
+
+coin 只在單一進程內互斥；多個 worker 時請讓每個進程使用不同的操作錢包。
+"""
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.core import metrics
+from app.utils.blockchain import sui_rpc_call
+
+logger = logging.getLogger(__name__)
+
+SUI_COIN_TYPE = "0x2::sui::SUI"
+
+gas_pool_lease_wait = metrics.registry.histogram(
+    "gas_pool_lease_wait_seconds", "Time spent waiting for a gas coin lease",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+gas_pool_lease_timeouts = metrics.registry.counter(
+    "gas_pool_lease_timeouts_total", "Gas coin leases that timed out waiting for a free coin",
+)
+gas_pool_rebalances = metrics.registry.counter(
+    "gas_pool_rebalances_total", "Gas coin pool rebalance transactions by outcome", ("outcome",),
+)
+
+
+class GasPoolExhaustedError(RuntimeError):
+    """沒有可租用的 gas coin"""
+
+
+@dataclass
+class GasCoin:
+    """操作錢包擁有的 SUI coin"""
+    object_id: str
+    balance: int
+    owner: str
+    version: Optional[str] = None
+    digest: Optional[str] = None
+
+
+@dataclass
+class RebalancePlan:
+    """單一錢包的調整：零碎 coin 合併到 source，再從 source 拆出 split_count 個 coin"""
+    source: GasCoin
+    merge: List[GasCoin] = field(default_factory=list)
+    split_count: int = 0
+
+
+@dataclass
+class MoveCall:
+    """
+    PTB 中的一個 Move 呼叫
+
+    arguments 為 (型別, 值)：object / u64 / address / vector_u8
+    """
+    package: str
+    module: str
+    function: str
+    arguments: List[Tuple[str, Any]] = field(default_factory=list)
+
+    @property
+    def target(self) -> str:
+        return f"{self.package}::{self.module}::{self.function}"
+
+
+def plan_rebalance(coins: List[GasCoin], target_count: int, coin_balance: int,
+                   min_balance: int) -> Optional[RebalancePlan]:
+    """
+    計算把錢包調整到 target_count 個可用 coin（餘額 >= min_balance）所需的合併與拆分
+
+    以最大的 coin 作為 gas 與拆分來源，拆分後它至少保留 coin_balance；
+    不需要調整時返回 None
+    """
+    if not coins:
+        return None
+    ordered = sorted(coins, key=lambda c: c.balance, reverse=True)
+    source, rest = ordered[0], ordered[1:]
+    dust = [c for c in rest if c.balance < min_balance]
+    usable = len(rest) - len(dust) + 1
+
+    total = source.balance + sum(c.balance for c in dust)
+    affordable = max((total - coin_balance) // coin_balance, 0) if coin_balance > 0 else 0
+    split_count = min(max(target_count - usable, 0), affordable)
+
+    if split_count == 0 and not dust:
+        return None
+    return RebalancePlan(source=source, merge=dust, split_count=split_count)
+
+
+class PysuiOperator:
+    """以 pysui 簽署交易的操作錢包（同步 client 在執行緒中執行，不阻塞事件迴圈）"""
+
+    def __init__(self, private_key: str, node_url: Optional[str] = None):
+        from pysui import SuiConfig, SyncClient
+
+        self.config = SuiConfig.user_config(rpc_url=node_url or settings.SUI_NODE_URL, prv_keys=[private_key])
+        self.client = SyncClient(self.config)
+        self.address = str(self.config.active_address)
+
+    async def execute(self, build: Callable[[Any], None], gas_coin_id: str, gas_budget: int) -> Any:
+        """build(txn) 加入交易指令，以 gas_coin_id 支付 gas，返回 pysui 的 SuiRpcResult"""
+        def run():
+            from pysui.sui.sui_txn import SyncTransaction
+
+            txn = SyncTransaction(client=self.client)
+            build(txn)
+            return txn.execute(gas_budget=str(gas_budget), use_gas_object=gas_coin_id)
+
+        return await asyncio.to_thread(run)
+
+    async def execute_calls(self, calls: List[MoveCall], gas_coin_id: str, gas_budget: int) -> Dict[str, Any]:
+        """
+        以一筆 PTB 依序執行多個 Move 呼叫
+
+        Returns:
+            {"digest", "status", "error", "events": [{"type", "parsedJson"}]}（與 JSON-RPC 欄位一致）
+        """
+        from pysui.sui.sui_types.address import SuiAddress
+        from pysui.sui.sui_types.collections import SuiArray
+        from pysui.sui.sui_types.scalars import ObjectID, SuiU8, SuiU64
+
+        converters = {
+            "object": ObjectID,
+            "u64": lambda value: SuiU64(int(value)),
+            "address": SuiAddress,
+            "vector_u8": lambda value: SuiArray([SuiU8(b) for b in value]),
+        }
+
+        def build(txn):
+            for call in calls:
+                txn.move_call(target=call.target,
+                              arguments=[converters[kind](value) for kind, value in call.arguments])
+
+        result = await self.execute(build, gas_coin_id, gas_budget)
+        if not result.is_ok():
+            raise RuntimeError(str(result.result_data))
+        tx = result.result_data
+        events = []
+        for event in tx.events or []:
+            parsed = event.parsed_json
+            events.append({"type": event.event_type,
+                           "parsedJson": json.loads(parsed) if isinstance(parsed, str) else parsed})
+        return {
+            "digest": tx.digest,
+            "status": tx.effects.status.status,
+            "error": getattr(tx.effects.status, "error", None),
+            "events": events,
+        }
+
+    async def rebalance(self, plan: RebalancePlan, coin_balance: int, gas_budget: int) -> str:
+        """執行調整交易，返回交易 digest"""
+        from pysui.sui.sui_types.address import SuiAddress
+        from pysui.sui.sui_types.scalars import ObjectID
+
+        def build(txn):
+            if plan.merge:
+                txn.merge_coins(merge_to=txn.gas, merge_from=[ObjectID(c.object_id) for c in plan.merge])
+            if plan.split_count:
+                split = txn.split_coin(coin=txn.gas, amounts=[coin_balance] * plan.split_count)
+                coins = split if isinstance(split, list) else [split]
+                txn.transfer_objects(transfers=coins, recipient=SuiAddress(self.address))
+
+        result = await self.execute(build, plan.source.object_id, gas_budget)
+        if not result.is_ok():
+            raise RuntimeError(str(result.result_data))
+        return result.result_data.digest
+
+
+class GasLease:
+    """租用中的 gas coin"""
+
+    def __init__(self, coin: GasCoin, operator):
+        self.coin = coin
+        self.operator = operator
+        self.spent = 0
+
+    @property
+    def address(self) -> str:
+        return self.coin.owner
+
+    async def execute(self, build: Callable[[Any], None], gas_budget: int, amount: int = 0) -> Any:
+        """
+        以租用的 coin 支付 gas 執行交易
+
+        Args:
+            amount: 交易中從 gas coin 拆出的金額（txn.split_coin(coin=txn.gas, ...)）
+        """
+        # 歸還時先以預算保守估計扣除的金額，下次重新讀取時修正
+        self.spent = gas_budget + amount
+        return await self.operator.execute(build, self.coin.object_id, gas_budget)
+
+    async def execute_calls(self, calls: List[MoveCall], gas_budget: int) -> Dict[str, Any]:
+        """以租用的 coin 支付 gas，一筆 PTB 執行多個 Move 呼叫"""
+        self.spent = gas_budget
+        return await self.operator.execute_calls(calls, self.coin.object_id, gas_budget)
+
+
+class GasCoinPool:
+    """多個操作錢包的 gas coin 池"""
+
+    def __init__(self):
+        self._operators: Dict[str, Any] = {}
+        self._available: Dict[str, Dict[str, GasCoin]] = {}
+        self._leased: Dict[str, GasCoin] = {}
+        # 交易結果不明（例外、逾時）的 coin，直到下次從鏈上重新讀取前不再租出（object_id -> owner）
+        self._quarantined: Dict[str, str] = {}
+        self._waiters: Set[asyncio.Future] = set()
+        self._loaded = False
+        self._task: Optional[asyncio.Task] = None
+
+    # ========================================================================
+    # 設定
+    # ========================================================================
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._operators)
+
+    def add_operator(self, operator) -> str:
+        """加入操作錢包（需要 address 屬性與 execute / execute_calls / rebalance 方法）"""
+        self._operators[operator.address] = operator
+        self._available.setdefault(operator.address, {})
+        return operator.address
+
+    def configure(self):
+        """依 OPERATOR_PRIVATE_KEYS（未設定時使用 OPERATOR_PRIVATE_KEY）建立操作錢包"""
+        keys = [key.strip() for key in settings.OPERATOR_PRIVATE_KEYS.split(",") if key.strip()]
+        if not keys and settings.OPERATOR_PRIVATE_KEY:
+            keys = [settings.OPERATOR_PRIVATE_KEY]
+        for key in keys:
+            try:
+                self.add_operator(PysuiOperator(key))
+            except Exception as e:
+                logger.error(f"❌ 無法載入操作錢包: {e}")
+
+    def operator_addresses(self) -> List[str]:
+        """操作錢包地址（代付鎖定與結算的送出者）"""
+        if not self._operators:
+            self.configure()
+        return list(self._operators)
+
+    def admin_address(self) -> Optional[str]:
+        """
+        registry admin 的操作錢包地址（REGISTRY_ADMIN_ADDRESS，只有一個操作錢包時為該錢包）；
+        無法決定或 admin 不在操作錢包中時返回 None
+        """
+        operators = self.operator_addresses()
+        if settings.REGISTRY_ADMIN_ADDRESS:
+            wanted = settings.REGISTRY_ADMIN_ADDRESS.lower()
+            return next((address for address in operators if address.lower() == wanted), None)
+        return operators[0] if len(operators) == 1 else None
+
+    async def ensure_loaded(self):
+        """背景工作尚未啟動時（例如腳本直接呼叫）載入操作錢包與 coin"""
+        if not self._operators:
+            self.configure()
+        if self._operators and not self._loaded:
+            await self.refresh()
+
+    def _notify(self):
+        """喚醒等待 coin 的租用者"""
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    # ========================================================================
+    # 租用
+    # ========================================================================
+
+    def _take(self, min_balance: int, owner: Optional[str] = None) -> Optional[GasCoin]:
+        """從可用 coin 最多的錢包（指定 owner 時只從該錢包）取出餘額最大的 coin"""
+        best = None
+        for coin_owner, coins in sorted(self._available.items(), key=lambda item: len(item[1]), reverse=True):
+            if owner is not None and coin_owner != owner:
+                continue
+            candidates = [c for c in coins.values() if c.balance >= min_balance]
+            if candidates:
+                best = max(candidates, key=lambda c: c.balance)
+                break
+        if best is not None:
+            del self._available[best.owner][best.object_id]
+            self._leased[best.object_id] = best
+        return best
+
+    def _satisfiable(self, min_balance: int, owner: Optional[str] = None) -> bool:
+        """池中（含租用中）是否有任何 coin 足以支付"""
+        coins = list(self._leased.values()) + [c for owned in self._available.values() for c in owned.values()]
+        return any(c.balance >= min_balance and owner in (None, c.owner) for c in coins)
+
+    async def _acquire(self, min_balance: int, timeout: float, owner: Optional[str] = None) -> GasCoin:
+        if not self._operators:
+            raise GasPoolExhaustedError("未設定操作錢包（OPERATOR_PRIVATE_KEYS）")
+        if owner is not None and owner not in self._operators:
+            raise GasPoolExhaustedError(f"{owner} 不是操作錢包")
+
+        started = time.perf_counter()
+        deadline = started + timeout
+        while True:
+            coin = self._take(min_balance, owner)
+            if coin is not None:
+                gas_pool_lease_wait.observe(time.perf_counter() - started)
+                return coin
+            if not self._satisfiable(min_balance, owner):
+                raise GasPoolExhaustedError(f"沒有餘額 >= {min_balance} MIST 的 gas coin")
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                gas_pool_lease_timeouts.inc()
+                raise GasPoolExhaustedError(f"等待 gas coin 逾時（{timeout}s）")
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.add(waiter)
+            try:
+                await asyncio.wait_for(waiter, timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._waiters.discard(waiter)
+
+    def _release(self, coin: GasCoin, spent: Optional[int]):
+        self._leased.pop(coin.object_id, None)
+        if spent is None:
+            self._quarantined[coin.object_id] = coin.owner
+            logger.warning("⚠️ Gas coin 交易結果不明，暫停使用直到重新讀取: %s", coin.object_id)
+        elif coin.owner in self._available:
+            coin.balance -= spent
+            self._available[coin.owner][coin.object_id] = coin
+        self._notify()
+
+    @asynccontextmanager
+    async def lease(self, min_balance: int, timeout: Optional[float] = None,
+                    owner: Optional[str] = None) -> AsyncIterator[GasLease]:
+        """
+        租用一個餘額 >= min_balance 的 gas coin（指定 owner 時只租用該操作錢包的 coin）
+
+        Usage:
+            async with gas_coin_pool.lease(gas_budget) as lease:
+                result = await lease.execute(build, gas_budget)
+        """
+        timeout = settings.GAS_POOL_LEASE_TIMEOUT_SECONDS if timeout is None else timeout
+        await self.ensure_loaded()
+        coin = await self._acquire(min_balance, timeout, owner)
+        lease = GasLease(coin, self._operators[coin.owner])
+        try:
+            yield lease
+        except BaseException:
+            self._release(coin, None)
+            raise
+        self._release(coin, lease.spent)
+
+    # ========================================================================
+    # 從鏈上讀取與調整
+    # ========================================================================
+
+    def set_coins(self, owner: str, coins: List[GasCoin]):
+        """以鏈上讀到的 coin 取代可用清單（租用中的 coin 保持不變）"""
+        self._available[owner] = {c.object_id: c for c in coins if c.object_id not in self._leased}
+        self._loaded = True
+        for object_id, quarantined_owner in list(self._quarantined.items()):
+            if quarantined_owner == owner:
+                del self._quarantined[object_id]
+        self._notify()
+
+    async def fetch_coins(self, owner: str) -> List[GasCoin]:
+        coins, cursor = [], None
+        while True:
+            response = await sui_rpc_call("suix_getCoins", [owner, SUI_COIN_TYPE, cursor, 50])
+            if "error" in response:
+                raise RuntimeError(f"suix_getCoins 失敗: {response['error']}")
+            page = response["result"]
+            coins.extend(
+                GasCoin(object_id=c["coinObjectId"], balance=int(c["balance"]), owner=owner,
+                        version=c.get("version"), digest=c.get("digest"))
+                for c in page.get("data", [])
+            )
+            cursor = page.get("nextCursor")
+            if not page.get("hasNextPage") or not cursor:
+                return coins
+
+    async def refresh(self):
+        """重新讀取每個錢包的 coin"""
+        for owner in list(self._operators):
+            self.set_coins(owner, await self.fetch_coins(owner))
+
+    async def rebalance(self) -> int:
+        """合併零碎 coin、拆出新的 coin，返回執行的調整交易數"""
+        executed = 0
+        for owner, operator in list(self._operators.items()):
+            plan = plan_rebalance(
+                list(self._available.get(owner, {}).values()),
+                settings.GAS_POOL_TARGET_COINS,
+                settings.GAS_POOL_COIN_BALANCE_MIST,
+                settings.GAS_POOL_MIN_COIN_BALANCE_MIST,
+            )
+            if plan is None:
+                continue
+            # 參與調整的 coin 先移出可用清單，避免同時被租出
+            involved = [plan.source] + plan.merge
+            for coin in involved:
+                self._available[owner].pop(coin.object_id, None)
+                self._leased[coin.object_id] = coin
+            try:
+                digest = await operator.rebalance(
+                    plan, settings.GAS_POOL_COIN_BALANCE_MIST, settings.GAS_POOL_REBALANCE_GAS_BUDGET_MIST
+                )
+                gas_pool_rebalances.inc("success")
+                executed += 1
+                logger.info("⛽ Gas coin 池調整 %s: 合併 %s 個、拆出 %s 個 (%s)",
+                            owner[:10], len(plan.merge), plan.split_count, digest)
+            except Exception as e:
+                gas_pool_rebalances.inc("failure")
+                logger.warning(f"⚠️ Gas coin 池調整失敗 ({owner[:10]}): {e}")
+            finally:
+                for coin in involved:
+                    self._leased.pop(coin.object_id, None)
+            self.set_coins(owner, await self.fetch_coins(owner))
+        return executed
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+                await self.rebalance()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Gas coin 池更新失敗: {e}")
+            await asyncio.sleep(settings.GAS_POOL_REBALANCE_SECONDS)
+
+    def start(self):
+        """載入操作錢包並啟動背景調整工作"""
+        if not settings.GAS_POOL_ENABLED or settings.MOCK_MODE or self._task is not None:
+            return
+        if not self._operators:
+            self.configure()
+        if not self._operators:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Gas coin pool started ({len(self._operators)} operators, "
+                    f"target {settings.GAS_POOL_TARGET_COINS} coins each)")
+
+    async def stop(self):
+        """停止背景調整工作"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    # ========================================================================
+    # 狀態
+    # ========================================================================
+
+    def depth(self) -> Dict[tuple, float]:
+        """各錢包各狀態的 coin 數（輸出 /metrics 時計算）"""
+        values: Dict[tuple, float] = {}
+        for owner, coins in self._available.items():
+            usable = sum(1 for c in coins.values() if c.balance >= settings.GAS_POOL_MIN_COIN_BALANCE_MIST)
+            values[(owner, "available")] = usable
+            values[(owner, "low_balance")] = len(coins) - usable
+            values[(owner, "leased")] = sum(1 for c in self._leased.values() if c.owner == owner)
+            values[(owner, "quarantined")] = sum(1 for o in self._quarantined.values() if o == owner)
+        return values
+
+    def get_status(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "operators": {
+                owner: {
+                    "available": len(coins),
+                    "leased": sum(1 for c in self._leased.values() if c.owner == owner),
+                    "balance": sum(c.balance for c in coins.values()),
+                }
+                for owner, coins in self._available.items()
+            },
+            "quarantined": len(self._quarantined),
+        }
+
+
+# 全局實例
+gas_coin_pool = GasCoinPool()
+
+metrics.registry.gauge(
+    "gas_pool_coins", "Gas coins per operator by state", ("owner", "state"), callback=gas_coin_pool.depth,
+)
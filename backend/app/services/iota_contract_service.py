@@ -15,6 +15,7 @@ except ImportError:
     SDK_AVAILABLE = False
 
 from app.config import settings
+from app.services.gas_budget_service import gas_budget_estimator
 
 class ContractStatus:
     """狀態映射類"""
@@ -33,6 +34,18 @@ class ContractStatus:
         "maintenance": 0  # 映射到 offline
     }
     
+    # User Status Mapping（users.is_active）
+    USER_STATUS_MOVE_TO_BACKEND = {
+        0: True,           # USER_STATUS_ACTIVE
+        1: False,          # USER_STATUS_SUSPENDED
+        2: False           # USER_STATUS_BANNED
+    }
+    
+    USER_STATUS_BACKEND_TO_MOVE = {
+        True: 0,
+        False: 1           # 停用映射到 suspended
+    }
+    
     # Ride Status Mapping
     RIDE_STATUS_MOVE_TO_BACKEND = {
         0: "requested",    # STATUS_PENDING
@@ -101,7 +114,7 @@ class IOTAContractService:
                         list((did_identifier or "").encode('utf-8'))  # vector<u8> 格式
                     ],
                     "typeArguments": [],
-                    "gasBudget": "10000000"
+                    "gasBudget": str(gas_budget_estimator.budget_for("user_registry", "register_user"))
                 }
             }
             
@@ -150,7 +163,7 @@ class IOTAContractService:
                         str(hourly_rate)
                     ],
                     "typeArguments": [],
-                    "gasBudget": "15000000"
+                    "gasBudget": str(gas_budget_estimator.budget_for("vehicle_registry", "register_vehicle"))
                 }
             }
             
@@ -201,7 +214,7 @@ class IOTAContractService:
                         str(move_status)    # u8 狀態
                     ],
                     "typeArguments": [],
-                    "gasBudget": "10000000"
+                    "gasBudget": str(gas_budget_estimator.budget_for("vehicle_registry", "set_vehicle_status"))
                 }
             }
             
@@ -255,7 +268,7 @@ class IOTAContractService:
                         str(passenger_count)
                     ],
                     "typeArguments": [],
-                    "gasBudget": "20000000"
+                    "gasBudget": str(gas_budget_estimator.budget_for("ride_matching", "create_ride_request"))
                 }
             }
             
@@ -307,7 +320,7 @@ class IOTAContractService:
                         str(agreed_price)
                     ],
                     "typeArguments": [],
-                    "gasBudget": "25000000"
+                    "gasBudget": str(gas_budget_estimator.budget_for("ride_matching", "match_request"))
                 }
             }
             
@@ -350,7 +363,7 @@ class IOTAContractService:
                         ride_match_object_id
                     ],
                     "typeArguments": [],
-                    "gasBudget": "15000000"
+                    "gasBudget": str(gas_budget_estimator.budget_for("ride_matching", "complete_ride"))
                 }
             }
             
@@ -126,6 +126,34 @@ class LocationService:
         # 最少 1 分鐘，四捨五入
         return max(1, round(time_minutes))
     
+    @staticmethod
+    def grid_cell(lat: float, lng: float, cell_size_deg: float = 0.01) -> Tuple[int, int]:
+        """
+        將座標量化為網格索引
+        
+        Args:
+            lat, lng: 座標
+            cell_size_deg: 網格邊長 (度)，0.01 度約 1.1 公里
+            
+        Returns:
+            (緯度索引, 經度索引) 元組
+        """
+        return math.floor(lat / cell_size_deg), math.floor(lng / cell_size_deg)
+    
+    @staticmethod
+    def grid_cell_center(cell: Tuple[int, int], cell_size_deg: float = 0.01) -> Tuple[float, float]:
+        """
+        取得網格中心座標
+        
+        Args:
+            cell: grid_cell 返回的網格索引
+            cell_size_deg: 網格邊長 (度)
+            
+        Returns:
+            (緯度, 經度) 元組
+        """
+        return (cell[0] + 0.5) * cell_size_deg, (cell[1] + 0.5) * cell_size_deg
+    
     @staticmethod
     def format_distance(distance_km: float) -> str:
         """
@@ -0,0 +1,319 @@
+# backend/app/services/outbox_service.py
+"""
+鏈上註冊的交易式 outbox
+
+註冊用戶 / 車輛原本先提交一次、同步呼叫 contract_service.register_*_on_chain、再提交一次：
+註冊延遲包含鏈上確認時間，鏈上失敗則留下沒有 blockchain_object_id 的資料且不會重試。
+
+改為:
+1. 呼叫端在同一個交易中寫入用戶 / 車輛與 chain_outbox 項目，只提交一次
+2. ChainOutboxWorker 以 FOR UPDATE SKIP LOCKED 領取到期項目（領取時把 next_attempt_at
+   延後 CHAIN_OUTBOX_CLAIM_SECONDS 作為租約，工作中斷時逾期後自動重新領取）
+3. 批次器啟用時 register_user_for / register_vehicle_for 合併為 PTB，否則沿用 contract_service
+4. 成功的物件ID以批次 UPDATE 寫回 users / vehicles；失敗以指數退避重試，
+   超過 CHAIN_OUTBOX_MAX_ATTEMPTS 次標記為 failed
+"""
+
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, case, func, insert, select, update
+
+from app.config import settings
+from app.core import metrics
+from app.models.outbox import ChainOutbox
+from app.models.user import User
+from app.models.vehicle import Vehicle
+
+logger = logging.getLogger(__name__)
+
+# 重試間隔上限
+MAX_RETRY_DELAY_SECONDS = 3600
+
+outbox_processed = metrics.registry.counter(
+    "chain_outbox_processed_total", "Chain outbox entries processed", ("kind", "outcome"),
+)
+outbox_lag = metrics.registry.histogram(
+    "chain_outbox_lag_seconds", "Time from enqueue to on-chain registration",
+)
+
+
+def user_registration(user: User) -> Dict[str, Any]:
+    """用戶的鏈上註冊項目（did_hash 為用戶名與錢包地址的 SHA-256）"""
+    did_hash = hashlib.sha256(f"{user.username}{user.wallet_address}".encode("utf-8")).digest()
+    return {
+        "kind": "register_user",
+        "aggregate_id": str(user.id),
+        "payload": {"user_address": user.wallet_address, "did_hash": did_hash.hex(), "user_type": user.user_type},
+    }
+
+
+def vehicle_registration(owner_address: str, vehicle_id: str, vehicle_type: str, hourly_rate: float,
+                         data_hash: bytes) -> Dict[str, Any]:
+    """車輛的鏈上註冊項目（data_hash 見 vehicle_service.vehicle_data_hash）"""
+    return {
+        "kind": "register_vehicle",
+        "aggregate_id": vehicle_id,
+        "payload": {"owner_address": owner_address, "data_hash": data_hash.hex(),
+                    "vehicle_type": vehicle_type, "hourly_rate": hourly_rate},
+    }
+
+
+def enqueue(session, entry: Dict[str, Any]) -> ChainOutbox:
+    """在呼叫端的交易中加入一個項目（隨呼叫端提交）"""
+    item = ChainOutbox(**entry)
+    session.add(item)
+    return item
+
+
+async def enqueue_many(session, entries: List[Dict[str, Any]], chunk_size: int = 1000) -> int:
+    """在呼叫端的交易中以多列 INSERT 加入項目"""
+    for start in range(0, len(entries), chunk_size):
+        await session.execute(insert(ChainOutbox).values(entries[start:start + chunk_size]))
+    return len(entries)
+
+
+def retry_delay(attempts: int) -> float:
+    """第 attempts 次失敗後的等待秒數"""
+    return min(settings.CHAIN_OUTBOX_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), MAX_RETRY_DELAY_SECONDS)
+
+
+class ChainOutboxWorker:
+    """送出 chain_outbox 的鏈上註冊並寫回物件ID"""
+
+    def __init__(self, batch_size: Optional[int] = None):
+        self.batch_size = batch_size or settings.CHAIN_OUTBOX_BATCH_SIZE
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def wake(self):
+        """有新項目提交時通知背景工作立即處理"""
+        self._wakeup.set()
+
+    async def claim(self, session, now: datetime) -> List[Any]:
+        """
+        領取一批到期項目並延後 next_attempt_at（呼叫端提交交易）
+
+        Returns:
+            [(id, kind, aggregate_id, payload, attempts, created_at)]，attempts 已包含本次
+        """
+        due = (
+            select(ChainOutbox.id)
+            .where(and_(ChainOutbox.status == "pending", ChainOutbox.next_attempt_at <= now))
+            .order_by(ChainOutbox.next_attempt_at, ChainOutbox.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            update(ChainOutbox)
+            .where(ChainOutbox.id.in_(due.scalar_subquery()))
+            .values(attempts=ChainOutbox.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=settings.CHAIN_OUTBOX_CLAIM_SECONDS))
+            .returning(ChainOutbox.id, ChainOutbox.kind, ChainOutbox.aggregate_id, ChainOutbox.payload,
+                       ChainOutbox.attempts, ChainOutbox.created_at)
+            .execution_options(synchronize_session=False)
+        )
+        return result.all()
+
+    async def execute(self, entries: List[Any]) -> List[Dict[str, Any]]:
+        """送出鏈上註冊：批次器啟用時合併為 PTB，否則以 contract_service 並行送出"""
+        from app.services.contract_service import contract_service
+        from app.services.settlement_batcher import settlement_batcher
+
+        semaphore = asyncio.Semaphore(settings.CHAIN_OUTBOX_CONCURRENCY)
+
+        async def run(entry) -> Dict[str, Any]:
+            payload = entry.payload
+            try:
+                if entry.kind == "register_user":
+                    if settlement_batcher.enabled:
+                        return await settlement_batcher.register_user(
+                            settings.CONTRACT_PACKAGE_ID, settings.USER_REGISTRY_ID, payload["user_address"],
+                            bytes.fromhex(payload["did_hash"]), int(entry.aggregate_id),
+                        )
+                    async with semaphore:
+                        return await contract_service.register_user_on_chain(
+                            user_address=payload["user_address"], did_hash=bytes.fromhex(payload["did_hash"]),
+                            user_type=payload["user_type"],
+                        )
+                if entry.kind == "register_vehicle":
+                    if settlement_batcher.enabled:
+                        return await settlement_batcher.register_vehicle(
+                            settings.CONTRACT_PACKAGE_ID, settings.VEHICLE_REGISTRY_ID, payload["owner_address"],
+                            bytes.fromhex(payload["data_hash"]), entry.aggregate_id,
+                        )
+                    async with semaphore:
+                        return await contract_service.register_vehicle_on_chain(
+                            owner_address=payload["owner_address"],
+                            vehicle_data={"vehicle_id": entry.aggregate_id, "vehicle_type": payload["vehicle_type"],
+                                          "hourly_rate": payload["hourly_rate"]},
+                        )
+                return {"success": False, "error": f"未知的 outbox 類型: {entry.kind}"}
+            except Exception as e:
+                return {"success": False, "error": str(e)}
+
+        return await asyncio.gather(*(run(entry) for entry in entries))
+
+    async def complete(self, session, entries: List[Any], results: List[Dict[str, Any]], now: datetime) -> Dict[str, int]:
+        """
+        寫回物件ID並更新項目狀態（呼叫端提交交易）
+
+        Returns:
+            {"done", "retry", "failed"}
+        """
+        # 成功但沒有物件ID（mock 退回、未解析到 Registered 事件）不算完成，否則 blockchain_object_id 永遠為空
+        results = [
+            result if not result.get("success") or result.get("object_id") else
+            {**result, "success": False, "error": f"註冊交易未回傳物件ID（tx {result.get('transaction_hash')}）"}
+            for result in results
+        ]
+        done = [(entry, result) for entry, result in zip(entries, results) if result.get("success")]
+        errors = [(entry, result) for entry, result in zip(entries, results) if not result.get("success")]
+        counts = {"done": len(done), "retry": 0, "failed": 0}
+
+        # 寫回物件ID（只補空值，不覆蓋人工或 /sync-status 設定的值）
+        user_ids = {int(entry.aggregate_id): result["object_id"] for entry, result in done
+                    if entry.kind == "register_user"}
+        if user_ids:
+            await session.execute(
+                update(User)
+                .where(and_(User.id.in_(list(user_ids)), User.blockchain_object_id.is_(None)))
+                .values(blockchain_object_id=case(user_ids, value=User.id))
+                .execution_options(synchronize_session=False)
+            )
+        vehicle_ids = {entry.aggregate_id: result["object_id"] for entry, result in done
+                       if entry.kind == "register_vehicle"}
+        if vehicle_ids:
+            await session.execute(
+                update(Vehicle)
+                .where(and_(Vehicle.vehicle_id.in_(list(vehicle_ids)), Vehicle.blockchain_object_id.is_(None)))
+                .values(blockchain_object_id=case(vehicle_ids, value=Vehicle.vehicle_id))
+                .execution_options(synchronize_session=False)
+            )
+
+        if done:
+            await session.execute(
+                update(ChainOutbox)
+                .where(ChainOutbox.id.in_([entry.id for entry, _ in done]))
+                .values(status="done", processed_at=now, last_error=None,
+                        tx_digest=case({entry.id: result.get("transaction_hash") for entry, result in done},
+                                       value=ChainOutbox.id),
+                        object_id=case({entry.id: result.get("object_id") for entry, result in done},
+                                       value=ChainOutbox.id))
+                .execution_options(synchronize_session=False)
+            )
+            for entry, _ in done:
+                outbox_processed.inc(entry.kind, "done")
+                outbox_lag.observe((now - entry.created_at).total_seconds())
+
+        if errors:
+            statuses, next_attempts = {}, {}
+            for entry, result in errors:
+                exhausted = entry.attempts >= settings.CHAIN_OUTBOX_MAX_ATTEMPTS
+                statuses[entry.id] = "failed" if exhausted else "pending"
+                next_attempts[entry.id] = now + timedelta(seconds=retry_delay(entry.attempts))
+                counts["failed" if exhausted else "retry"] += 1
+                outbox_processed.inc(entry.kind, "failed" if exhausted else "retry")
+                logger.warning("⚠️ %s %s 鏈上註冊失敗（第 %s 次）: %s", entry.kind, entry.aggregate_id,
+                               entry.attempts, result.get("error"))
+            values = {
+                "status": case(statuses, value=ChainOutbox.id),
+                "next_attempt_at": case(next_attempts, value=ChainOutbox.id),
+                "last_error": case({entry.id: str(result.get("error"))[:1000] for entry, result in errors},
+                                   value=ChainOutbox.id),
+            }
+            if counts["failed"]:
+                values["processed_at"] = case(
+                    {entry_id: now for entry_id, status in statuses.items() if status == "failed"},
+                    value=ChainOutbox.id, else_=None,
+                )
+            await session.execute(
+                update(ChainOutbox)
+                .where(ChainOutbox.id.in_(list(statuses)))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        return counts
+
+    async def drain_once(self, session_maker=None) -> Dict[str, int]:
+        """
+        處理一批到期項目：領取（一個交易）-> 送出 -> 寫回（一個交易）
+
+        Returns:
+            {"claimed", "done", "retry", "failed"}
+        """
+        if session_maker is None:
+            from app.core.database import async_session_maker as session_maker
+
+        async with session_maker() as session:
+            entries = await self.claim(session, datetime.now(timezone.utc))
+            await session.commit()
+        if not entries:
+            return {"claimed": 0, "done": 0, "retry": 0, "failed": 0}
+
+        results = await self.execute(entries)
+        async with session_maker() as session:
+            counts = await self.complete(session, entries, results, datetime.now(timezone.utc))
+            await session.commit()
+        logger.info("⛓️ chain outbox: %s", counts)
+        return {"claimed": len(entries), **counts}
+
+    async def _run(self):
+        while True:
+            try:
+                drained = await self.drain_once()
+                if drained["claimed"] >= self.batch_size:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Chain outbox drain failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.CHAIN_OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self):
+        """啟動背景送出工作"""
+        if not settings.CHAIN_OUTBOX_ENABLED or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Chain outbox worker started (batch {self.batch_size})")
+
+    async def stop(self):
+        """停止背景送出工作（已領取的項目於租約逾期後重新處理）"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def get_status(self, session) -> Dict[str, Any]:
+        """各類型 / 狀態的項目數與最舊的待處理項目"""
+        result = await session.execute(
+            select(ChainOutbox.kind, ChainOutbox.status, func.count(), func.min(ChainOutbox.created_at))
+            .group_by(ChainOutbox.kind, ChainOutbox.status)
+        )
+        counts: Dict[str, Dict[str, int]] = {}
+        oldest_pending = None
+        for kind, status, count, oldest in result.all():
+            counts.setdefault(kind, {})[status] = count
+            if status == "pending" and (oldest_pending is None or oldest < oldest_pending):
+                oldest_pending = oldest
+        return {
+            "enabled": settings.CHAIN_OUTBOX_ENABLED,
+            "running": self._task is not None,
+            "counts": counts,
+            "oldest_pending_at": oldest_pending.isoformat() if oldest_pending else None,
+        }
+
+
+# 全局實例
+chain_outbox_worker = ChainOutboxWorker()
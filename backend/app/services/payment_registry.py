@@ -0,0 +1,104 @@
+# backend/app/services/payment_registry.py
+"""
+已處理支付的冪等紀錄
+
+/payment/process-payment 每次呼叫都會重新驗證轉帳（sui_getTransactionBlock）並調用
+lock_payment；行動端逾時重試會重複 RPC，甚至對同一筆轉帳鎖定兩次託管。
+
+processed_payments 以交易 hash 為唯一鍵:
+- 先以索引查詢：已鎖定 / 已拒絕的轉帳直接返回保存的結果，不再接觸鏈
+- 新轉帳以 INSERT ... ON CONFLICT DO NOTHING 取得處理權，同時到達的重試返回處理中
+- 可重試的失敗（節點尚未索引交易、合約調用失敗）或逾時的處理中紀錄可重新取得處理權；
+  重新調用 lock_payment 前先查事件索引，避免對結果不明的鎖定交易重複鎖定
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import settings
+from app.models.payment import ProcessedPayment
+
+logger = logging.getLogger(__name__)
+
+# 終態：重試直接返回保存的結果
+FINAL_STATUSES = ("locked", "rejected")
+
+
+def expected_amount_mist(fare: Optional[float]) -> int:
+    """行程車費（SUI，與 TripService 相同以 micro 為最小單位）-> MIST"""
+    if not fare or fare <= 0:
+        raise ValueError("行程尚未計算車費")
+    return int(round(fare * 1_000_000)) * 1000
+
+
+def stored_result(record: ProcessedPayment) -> Dict[str, Any]:
+    """已鎖定紀錄的回應（與首次處理成功的回應相同）"""
+    return {
+        "success": True,
+        "message": "支付處理成功",
+        "escrow_object_id": record.escrow_object_id,
+        "payment_tx_hash": record.tx_hash,
+        "contract_tx_hash": record.contract_tx_hash,
+        "amount_received": record.amount_received,
+        "platform_fee": record.platform_fee,
+    }
+
+
+class PaymentRegistry:
+    """processed_payments 的查詢與狀態轉換（每次轉換各自提交）"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def get(self, tx_hash: str) -> Optional[ProcessedPayment]:
+        result = await self.db.execute(
+            select(ProcessedPayment)
+            .where(ProcessedPayment.tx_hash == tx_hash)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+
+    async def claim(self, tx_hash: str, trip_id: int) -> Tuple[Optional[ProcessedPayment], bool]:
+        """
+        取得轉帳的處理權
+
+        Returns:
+            (紀錄, 是否由本請求處理)；未取得時紀錄為其他請求的處理結果或處理中狀態
+        """
+        inserted = await self.db.execute(
+            insert(ProcessedPayment)
+            .values(tx_hash=tx_hash, trip_id=trip_id, status="processing")
+            .on_conflict_do_nothing(index_elements=[ProcessedPayment.tx_hash])
+            .returning(ProcessedPayment.id)
+        )
+        claimed = inserted.scalar_one_or_none() is not None
+        if not claimed:
+            # 可重試的失敗，或處理中但超過租約（例如處理期間程序中斷）
+            lease_expired = datetime.now(timezone.utc) - timedelta(seconds=settings.PAYMENT_PROCESSING_LEASE_SECONDS)
+            reclaimed = await self.db.execute(
+                update(ProcessedPayment)
+                .where(and_(
+                    ProcessedPayment.tx_hash == tx_hash,
+                    ProcessedPayment.trip_id == trip_id,
+                    or_(ProcessedPayment.status == "failed",
+                        and_(ProcessedPayment.status == "processing", ProcessedPayment.updated_at < lease_expired)),
+                ))
+                .values(status="processing", error=None)
+                .returning(ProcessedPayment.id)
+            )
+            claimed = reclaimed.scalar_one_or_none() is not None
+        await self.db.commit()
+        return await self.get(tx_hash), claimed
+
+    async def mark(self, record: ProcessedPayment, status: str, **values) -> ProcessedPayment:
+        """更新處理狀態並提交（呼叫端可先在同一個交易中修改其他資料）"""
+        record.status = status
+        for key, value in values.items():
+            setattr(record, key, value)
+        await self.db.commit()
+        logger.info("🧾 支付紀錄 %s: trip %s -> %s", record.tx_hash, record.trip_id, status)
+        return record
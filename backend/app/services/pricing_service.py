@@ -2,45 +2,247 @@
 
 """
 費用計算服務
-複用隊友的定價邏輯
+統一的定價引擎：依車型費率表計算費用，所有金額單位為 micro（與鏈上支付一致）
+
+費率表可由 PRICING_RATES_PATH 指定的 JSON 檔覆寫，檔案變更後自動重新載入（無需重啟）。
+重新載入移除的車型不再提供新報價，但保留其費率供既有行程（pricing_vehicle_type）結算與顯示
 """
 
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.config import settings
+from app.schemas.trip import TripFareBreakdown
+
+logger = logging.getLogger(__name__)
+
+# 預設費率表 (micro)；sedan 與原本 TripService 的費率相同
+DEFAULT_RATE_TABLE: Dict[str, Any] = {
+    "platform_fee_rate": 0.1,
+    "default_vehicle_type": "sedan",
+    "vehicle_types": {
+        "sedan": {"base_fare": 50000, "per_km": 10000, "per_minute": 1000, "minimum_fare": 50000},
+        "suv": {"base_fare": 65000, "per_km": 13000, "per_minute": 1300, "minimum_fare": 65000},
+        "minivan": {"base_fare": 70000, "per_km": 14000, "per_minute": 1400, "minimum_fare": 70000},
+        "luxury": {"base_fare": 100000, "per_km": 20000, "per_minute": 2000, "minimum_fare": 100000},
+    },
+}
+
+
+class VehicleRate(NamedTuple):
+    """單一車型的編譯後費率"""
+    vehicle_type: str
+    base_fare: int
+    per_km: int
+    per_minute: int
+    minimum_fare: int
+
+
+class CompiledRates(NamedTuple):
+    """驗證並編譯後的費率表（不可變，整體替換）"""
+    platform_fee_rate: float
+    default_vehicle_type: str
+    rates: Dict[str, VehicleRate]
+    source: str
+    loaded_at: float
+
+
+def compile_rate_table(table: Dict[str, Any], source: str = "default") -> CompiledRates:
+    """驗證費率表並轉為查詢用結構，格式錯誤時拋出 ValueError"""
+    try:
+        platform_fee_rate = float(table["platform_fee_rate"])
+        vehicle_types = table["vehicle_types"]
+        rates = {
+            vehicle_type: VehicleRate(
+                vehicle_type=vehicle_type,
+                base_fare=int(rate["base_fare"]),
+                per_km=int(rate["per_km"]),
+                per_minute=int(rate["per_minute"]),
+                minimum_fare=int(rate.get("minimum_fare", rate["base_fare"])),
+            )
+            for vehicle_type, rate in vehicle_types.items()
+        }
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"費率表格式錯誤: {e}") from e
+
+    if not rates:
+        raise ValueError("費率表至少需要一種車型")
+    if not 0 <= platform_fee_rate < 1:
+        raise ValueError("平台費率必須介於 0 與 1 之間")
+    for rate in rates.values():
+        if min(rate.base_fare, rate.per_km, rate.per_minute, rate.minimum_fare) < 0:
+            raise ValueError(f"車型 {rate.vehicle_type} 的費率不可為負數")
+
+    default_vehicle_type = table.get("default_vehicle_type") or next(iter(rates))
+    if default_vehicle_type not in rates:
+        raise ValueError(f"預設車型 {default_vehicle_type} 不在費率表中")
+
+    return CompiledRates(
+        platform_fee_rate=platform_fee_rate,
+        default_vehicle_type=default_vehicle_type,
+        rates=rates,
+        source=source,
+        loaded_at=time.time(),
+    )
+
+
 class PricingService:
-    """費用計算服務"""
-    
-    # 複用隊友的費率設定
-    BASE_FARE = 50  # 起跳價
-    PER_KM = 10     # 每公里單價
-    
-    @classmethod
-    def calculate_fare(cls, distance_km: float) -> float:
+    """定價引擎"""
+
+    def __init__(self, rates_path: Optional[str] = None):
+        self.rates_path = rates_path if rates_path is not None else settings.PRICING_RATES_PATH
+        self._compiled = compile_rate_table(DEFAULT_RATE_TABLE)
+        # 重新載入時被移除的車型費率（既有行程仍依此計算）
+        self._retired: Dict[str, VehicleRate] = {}
+        self._file_mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    # ========================================================================
+    # 費率表載入
+    # ========================================================================
+
+    def reload(self) -> CompiledRates:
         """
-        計算車費
-        完全複用隊友的邏輯
+        重新載入費率表
+
+        檔案不存在時使用預設費率；檔案格式錯誤時保留目前的費率並拋出 ValueError
         """
-        if distance_km is None or distance_km <= 0:
-            return cls.BASE_FARE
-        
-        fare = cls.BASE_FARE + (cls.PER_KM * distance_km)
-        return round(fare, 0)  # 四捨五入到整數
-    
-    @classmethod
-    def calculate_service_fee(cls, fare: float, rate: float = 0.05) -> float:
-        """計算服務費（5%）"""
-        return round(fare * rate, 2)
-    
-    @classmethod
-    def calculate_total_amount(cls, distance_km: float, service_fee_rate: float = 0.05) -> dict:
-        """計算總金額"""
-        fare = cls.calculate_fare(distance_km)
-        service_fee = cls.calculate_service_fee(fare, service_fee_rate)
-        total = fare + service_fee
-        
+        with self._lock:
+            path = self.rates_path
+            if not path or not os.path.exists(path):
+                if self._compiled.source != "default":
+                    logger.warning(f"⚠️ Pricing table {path} removed, falling back to default rates")
+                self._replace(compile_rate_table(DEFAULT_RATE_TABLE))
+                self._file_mtime = None
+                return self._compiled
+
+            mtime = os.path.getmtime(path)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    compiled = compile_rate_table(json.load(f), source=path)
+            except (OSError, json.JSONDecodeError) as e:
+                raise ValueError(f"無法讀取費率表 {path}: {e}") from e
+            finally:
+                # 即使內容錯誤也記錄 mtime，避免每次檢查都重複報錯
+                self._file_mtime = mtime
+
+            self._replace(compiled)
+            logger.info(f"✅ Pricing table loaded from {path}: {', '.join(compiled.rates)}")
+            return compiled
+
+    def _replace(self, compiled: CompiledRates):
+        """替換費率表，記下被移除車型的費率（呼叫端持有鎖）"""
+        removed = {name: rate for name, rate in self._compiled.rates.items() if name not in compiled.rates}
+        if removed:
+            logger.warning(f"⚠️ Vehicle types removed from pricing table, kept for existing trips: {', '.join(removed)}")
+        self._retired = {
+            name: rate for name, rate in {**self._retired, **removed}.items() if name not in compiled.rates
+        }
+        self._compiled = compiled
+
+    def _maybe_reload(self):
+        """節流檢查檔案 mtime，變更時自動重新載入"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + settings.PRICING_RELOAD_CHECK_SECONDS
+        path = self.rates_path
+        try:
+            mtime = os.path.getmtime(path) if path else None
+        except OSError:
+            mtime = None
+        if mtime != self._file_mtime:
+            try:
+                self.reload()
+            except ValueError as e:
+                logger.error(f"❌ Pricing table reload failed, keeping previous rates: {e}")
+
+    @property
+    def rates(self) -> CompiledRates:
+        self._maybe_reload()
+        return self._compiled
+
+    def vehicle_types(self):
+        return list(self.rates.rates)
+
+    # ========================================================================
+    # 報價
+    # ========================================================================
+
+    @staticmethod
+    def _quote(rate: VehicleRate, platform_fee_rate: float, distance_km: float,
+               duration_minutes: int, surge_multiplier: float) -> TripFareBreakdown:
+        base_fare = int(rate.base_fare * surge_multiplier)
+        distance_fare = int(distance_km * rate.per_km * surge_multiplier)
+        time_fare = int(duration_minutes * rate.per_minute * surge_multiplier)
+
+        subtotal = max(base_fare + distance_fare + time_fare, rate.minimum_fare)
+        platform_fee = int(subtotal * platform_fee_rate)
+        total_amount = subtotal + platform_fee
+        driver_amount = total_amount - platform_fee
+
+        return TripFareBreakdown(
+            base_fare=base_fare,
+            distance_fare=distance_fare,
+            time_fare=time_fare,
+            platform_fee=platform_fee,
+            total_amount=total_amount,
+            driver_amount=driver_amount,
+            distance_km=distance_km,
+            duration_minutes=duration_minutes,
+            per_km_rate=rate.per_km,
+            per_minute_rate=rate.per_minute,
+            platform_fee_rate=platform_fee_rate,
+            surge_multiplier=surge_multiplier,
+            vehicle_type=rate.vehicle_type,
+        )
+
+    def quote(self, distance_km: float, duration_minutes: int, surge_multiplier: float = 1.0,
+              vehicle_type: Optional[str] = None, existing: bool = False) -> TripFareBreakdown:
+        """
+        單一車型報價，未指定車型時使用預設車型
+
+        existing: 既有行程的結算 / 顯示。車型已從費率表移除時使用移除前的費率，
+        沒有紀錄時（例如重啟後）使用預設車型，而不是拋出 ValueError
+        """
+        compiled = self.rates
+        vehicle_type = vehicle_type or compiled.default_vehicle_type
+        rate = compiled.rates.get(vehicle_type)
+        if rate is None and existing:
+            rate = self._retired.get(vehicle_type)
+            if rate is None:
+                logger.warning(f"⚠️ Unknown vehicle type {vehicle_type} on existing trip, using default rates")
+                rate = compiled.rates[compiled.default_vehicle_type]
+        if rate is None:
+            raise ValueError(f"不支援的車型: {vehicle_type}")
+        return self._quote(rate, compiled.platform_fee_rate, distance_km, duration_minutes, surge_multiplier)
+
+    def quote_all(self, distance_km: float, duration_minutes: int,
+                  surge_multiplier: float = 1.0) -> Dict[str, TripFareBreakdown]:
+        """一次計算所有車型的報價（共用同一份費率表快照）"""
+        compiled = self.rates
         return {
-            "distance_km": distance_km,
-            "base_fare": cls.BASE_FARE,
-            "per_km_rate": cls.PER_KM,
-            "fare": fare,
-            "service_fee": service_fee,
-            "total_amount": total
+            vehicle_type: self._quote(rate, compiled.platform_fee_rate, distance_km, duration_minutes, surge_multiplier)
+            for vehicle_type, rate in compiled.rates.items()
         }
+
+    def get_status(self) -> Dict[str, Any]:
+        compiled = self.rates
+        return {
+            "source": compiled.source,
+            "loaded_at": compiled.loaded_at,
+            "platform_fee_rate": compiled.platform_fee_rate,
+            "default_vehicle_type": compiled.default_vehicle_type,
+            "vehicle_types": {name: rate._asdict() for name, rate in compiled.rates.items()},
+            "retired_vehicle_types": {name: rate._asdict() for name, rate in self._retired.items()},
+        }
+
+
+# 全局實例
+pricing_service = PricingService()
@@ -12,6 +12,7 @@ from typing import Dict, Any, Optional
 from datetime import datetime
 
 from app.config import settings
+from app.services.gas_budget_service import gas_budget_estimator
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +29,7 @@ class RealBlockchainService:
         self,
         move_call: Dict[str, Any],
         sender: str,
-        gas_budget: int = 10000000
+        gas_budget: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         執行真正的區塊鏈交易
@@ -36,12 +37,15 @@ class RealBlockchainService:
         Args:
             move_call: Move 調用數據
             sender: 發送者地址
-            gas_budget: Gas 預算
+            gas_budget: Gas 預算（預設依該 Move 函數的歷史用量估算）
             
         Returns:
             交易結果
         """
         try:
+            if gas_budget is None:
+                gas_budget = gas_budget_estimator.budget_for(move_call["module"], move_call["function"])
+            
             # 1. 準備交易數據
             transaction_data = {
                 "jsonrpc": "2.0",
@@ -0,0 +1,291 @@
+# backend/app/services/reconciliation_service.py
+"""
+託管狀態對帳
+
+trips 表與鏈上 Escrow 物件的狀態會因為請求逾時、重試或前端中斷而不一致，原本只能
+用 scripts/ops/cancel_stuck_trip.sh 與逐筆 /sync-status/{object_type}/{object_id} 手動修正。
+
+對帳流程:
+1. 以 trip_id 鍵集分頁（RECONCILE_PAGE_SIZE 筆）讀取有 escrow_object_id 的行程
+2. escrow_object_id 為鎖定交易 digest 時，由 chain_events 的 PaymentLocked 事件換成物件ID
+3. 每 50 個物件一次 sui_multiGetObjects，最多 RECONCILE_RPC_CONCURRENCY 個請求並行
+4. 比對行程狀態與 Escrow.status，產生修復計畫；套用時資料庫修正以批次 UPDATE
+   （每頁一個交易，同時釋放這些行程的車輛），鏈上釋放交給 settlement_batcher 合併成 PTB
+"""
+
+import asyncio
+import logging
+import re
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, select, update
+
+from app.config import settings
+from app.models.chain_event import ChainEvent
+from app.models.ride import Trip
+from app.models.vehicle import Vehicle
+from app.utils.blockchain import sui_rpc_call
+
+logger = logging.getLogger(__name__)
+
+# sui_multiGetObjects 單次上限
+MULTI_GET_LIMIT = 50
+
+# payment_escrow::Escrow.status
+ESCROW_STATUS = {1: "locked", 2: "released", 3: "refunded"}
+
+ACTIVE_STATUSES = ("requested", "matched", "accepted", "picked_up", "in_progress")
+
+# 可自動套用的修復（其餘需要人工處理）
+AUTO_ACTIONS = ("mark_completed", "mark_cancelled", "release")
+
+_OBJECT_ID = re.compile(r"^0x[0-9a-fA-F]{1,64}$")
+
+
+async def multi_get_objects(object_ids: List[str], options: Dict[str, bool], rpc_concurrency: int,
+                            node_url: Optional[str] = None,
+                            stats: Optional[Dict[str, int]] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    以 sui_multiGetObjects 批次讀取物件（每次 50 個，最多 rpc_concurrency 個請求並行）
+
+    重複的物件ID只讀一次；有 stats 時累計 rpc_calls / objects
+    """
+    unique = list(dict.fromkeys(object_ids))
+    semaphore = asyncio.Semaphore(rpc_concurrency)
+    objects: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    async def fetch(chunk: List[str]):
+        async with semaphore:
+            response = await sui_rpc_call("sui_multiGetObjects", [chunk, options], timeout=30.0, node_url=node_url)
+        if "error" in response:
+            raise RuntimeError(f"sui_multiGetObjects 失敗: {response['error']}")
+        if stats is not None:
+            stats["rpc_calls"] += 1
+        for object_id, obj in zip(chunk, response["result"]):
+            objects[object_id] = obj
+
+    await asyncio.gather(*(
+        fetch(unique[i:i + MULTI_GET_LIMIT]) for i in range(0, len(unique), MULTI_GET_LIMIT)
+    ))
+    if stats is not None:
+        stats["objects"] += len(unique)
+    return objects
+
+
+@dataclass
+class Discrepancy:
+    """行程與鏈上託管不一致的紀錄"""
+    trip_id: int
+    escrow_ref: str
+    object_id: Optional[str]
+    trip_status: str
+    chain_status: Optional[str]
+    issue: str
+    action: str  # mark_completed / mark_cancelled / release / manual
+    chain_tx: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def is_object_id(ref: str) -> bool:
+    """escrow_object_id 欄位可能存放物件ID或鎖定交易的 digest（base58）"""
+    return bool(_OBJECT_ID.match(ref or ""))
+
+
+def escrow_status(obj: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Optional[str]]:
+    """sui_multiGetObjects 的單一結果 -> (託管狀態, trip_id)，物件不存在時返回 (None, None)"""
+    data = (obj or {}).get("data")
+    if not data:
+        return None, None
+    fields = (data.get("content") or {}).get("fields") or {}
+    try:
+        status = ESCROW_STATUS.get(int(fields.get("status")), "unknown")
+    except (TypeError, ValueError):
+        status = "unknown"
+    return status, str(fields["trip_id"]) if fields.get("trip_id") is not None else None
+
+
+def classify(trip_id: int, trip_status: str, escrow_ref: str, object_id: Optional[str],
+             obj: Optional[Dict[str, Any]]) -> Optional[Discrepancy]:
+    """比對單一行程與其託管物件，一致時返回 None"""
+    chain_status, chain_trip_id = escrow_status(obj)
+    chain_tx = ((obj or {}).get("data") or {}).get("previousTransaction")
+
+    def found(issue: str, action: str) -> Discrepancy:
+        return Discrepancy(trip_id, escrow_ref, object_id, trip_status, chain_status, issue, action, chain_tx)
+
+    if object_id is None:
+        return found("unresolved_lock_tx", "manual")
+    if chain_status is None:
+        return found("escrow_missing", "manual")
+    if chain_trip_id is not None and chain_trip_id != str(trip_id):
+        return found("trip_id_mismatch", "manual")
+
+    if trip_status in ACTIVE_STATUSES:
+        if chain_status == "released":
+            return found("released_on_chain", "mark_completed")
+        if chain_status == "refunded":
+            return found("refunded_on_chain", "mark_cancelled")
+        return None
+    if trip_status == "completed":
+        if chain_status == "locked":
+            return found("release_missing", "release")
+        if chain_status == "refunded":
+            return found("completed_but_refunded", "manual")
+        return None
+    if trip_status == "cancelled":
+        if chain_status == "locked":
+            return found("refund_missing", "manual")
+        if chain_status == "released":
+            return found("cancelled_but_released", "manual")
+    return None
+
+
+class EscrowReconciler:
+    """分頁掃描行程並與鏈上託管比對"""
+
+    def __init__(self, node_url: Optional[str] = None, page_size: Optional[int] = None,
+                 rpc_concurrency: Optional[int] = None):
+        self.node_url = node_url
+        self.page_size = page_size or settings.RECONCILE_PAGE_SIZE
+        self.rpc_concurrency = rpc_concurrency or settings.RECONCILE_RPC_CONCURRENCY
+        self.stats: Dict[str, int] = {"trips": 0, "objects": 0, "rpc_calls": 0, "discrepancies": 0}
+
+    async def fetch_objects(self, object_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """以 sui_multiGetObjects 批次讀取託管物件"""
+        return await multi_get_objects(
+            object_ids, {"showContent": True, "showPreviousTransaction": True},
+            self.rpc_concurrency, self.node_url, self.stats,
+        )
+
+    async def resolve_lock_txs(self, session, digests: List[str]) -> Dict[str, str]:
+        """鎖定交易 digest -> 託管物件ID（由已索引的 PaymentLocked 事件）"""
+        if not digests:
+            return {}
+        result = await session.execute(
+            select(ChainEvent.tx_digest, ChainEvent.object_id)
+            .where(and_(ChainEvent.event_name == "PaymentLocked", ChainEvent.tx_digest.in_(digests)))
+        )
+        return {row.tx_digest: row.object_id for row in result}
+
+    async def scan_page(self, session, after_trip_id: int) -> Tuple[List[Discrepancy], Optional[int]]:
+        """
+        比對一頁行程
+
+        Returns:
+            (不一致清單, 下一頁的起點 trip_id；沒有下一頁時為 None)
+        """
+        result = await session.execute(
+            select(Trip.trip_id, Trip.status, Trip.escrow_object_id)
+            .where(and_(Trip.escrow_object_id.isnot(None), Trip.trip_id > after_trip_id))
+            .order_by(Trip.trip_id)
+            .limit(self.page_size)
+        )
+        rows = result.all()
+        if not rows:
+            return [], None
+
+        digests = [row.escrow_object_id for row in rows if not is_object_id(row.escrow_object_id)]
+        resolved = await self.resolve_lock_txs(session, digests)
+        object_ids = {
+            row.trip_id: row.escrow_object_id if is_object_id(row.escrow_object_id) else resolved.get(row.escrow_object_id)
+            for row in rows
+        }
+        objects = await self.fetch_objects([oid for oid in object_ids.values() if oid])
+
+        discrepancies = []
+        for row in rows:
+            object_id = object_ids[row.trip_id]
+            item = classify(row.trip_id, row.status, row.escrow_object_id, object_id,
+                            objects.get(object_id) if object_id else None)
+            if item:
+                discrepancies.append(item)
+
+        self.stats["trips"] += len(rows)
+        self.stats["discrepancies"] += len(discrepancies)
+        next_after = rows[-1].trip_id if len(rows) == self.page_size else None
+        return discrepancies, next_after
+
+    async def scan(self, session_maker, after_trip_id: int = 0,
+                   limit: Optional[int] = None) -> AsyncIterator[List[Discrepancy]]:
+        """逐頁產生不一致清單（每頁使用獨立的資料庫會話）"""
+        cursor: Optional[int] = after_trip_id
+        while cursor is not None:
+            async with session_maker() as session:
+                discrepancies, cursor = await self.scan_page(session, cursor)
+            yield discrepancies
+            if limit and self.stats["trips"] >= limit:
+                return
+
+    async def apply(self, session, discrepancies: List[Discrepancy],
+                    actions=AUTO_ACTIONS) -> Dict[str, int]:
+        """
+        套用一頁的修復：資料庫狀態以批次 UPDATE 修正（呼叫端提交交易），
+        缺少的鏈上釋放交給 settlement_batcher 合併提交
+        """
+        from app.services.settlement_batcher import settlement_batcher
+        from app.services.sui_service import sui_service
+
+        applied = {action: 0 for action in actions}
+        now = datetime.now(timezone.utc)
+        by_action: Dict[str, List[Discrepancy]] = {}
+        for item in discrepancies:
+            if item.action in actions:
+                by_action.setdefault(item.action, []).append(item)
+
+        # 只更新仍處於進行中狀態的行程，避免覆蓋對帳期間的正常狀態變更
+        vehicle_ids = []
+        completed = by_action.get("mark_completed", [])
+        if completed:
+            rows = (await session.execute(
+                update(Trip)
+                .where(and_(Trip.trip_id.in_([item.trip_id for item in completed]),
+                            Trip.status.in_(ACTIVE_STATUSES)))
+                .values(status="completed", completed_at=now,
+                        blockchain_tx_id=case({item.trip_id: item.chain_tx for item in completed},
+                                              value=Trip.trip_id))
+                .returning(Trip.vehicle_id)
+                .execution_options(synchronize_session=False)
+            )).all()
+            applied["mark_completed"] += len(rows)
+            vehicle_ids += [row.vehicle_id for row in rows if row.vehicle_id]
+        cancelled = [item.trip_id for item in by_action.get("mark_cancelled", [])]
+        if cancelled:
+            rows = (await session.execute(
+                update(Trip)
+                .where(and_(Trip.trip_id.in_(cancelled), Trip.status.in_(ACTIVE_STATUSES)))
+                .values(status="cancelled", cancelled_at=now, cancellation_reason="對帳：鏈上託管已退款")
+                .returning(Trip.vehicle_id)
+                .execution_options(synchronize_session=False)
+            )).all()
+            applied["mark_cancelled"] += len(rows)
+            vehicle_ids += [row.vehicle_id for row in rows if row.vehicle_id]
+        # 與 complete_trip / cancel_trip / 逾時清理相同：結束的行程釋放車輛
+        if vehicle_ids:
+            await session.execute(
+                update(Vehicle)
+                .where(and_(Vehicle.vehicle_id.in_(vehicle_ids), Vehicle.status == "on_trip"))
+                .values(status="available")
+                .execution_options(synchronize_session=False)
+            )
+
+        # 鏈上釋放與 EscrowService.release_payment 相同：批次器啟用時合併為 PTB
+        releases = by_action.get("release", [])
+        if releases:
+            results = await asyncio.gather(*(
+                settlement_batcher.release(settings.CONTRACT_PACKAGE_ID, item.object_id, item.trip_id)
+                if settlement_batcher.enabled else
+                sui_service.call_contract_release_payment(
+                    package_id=settings.CONTRACT_PACKAGE_ID, escrow_object_id=item.object_id, trip_id=item.trip_id
+                )
+                for item in releases
+            ))
+            for item, result in zip(releases, results):
+                if result.get("success"):
+                    applied["release"] += 1
+                else:
+                    logger.warning("⚠️ 對帳釋放失敗: trip %s: %s", item.trip_id, result.get("error"))
+        return applied
@@ -0,0 +1,241 @@
+# backend/app/services/search_service.py
+"""
+管理後台搜尋（用戶名稱、車牌、車型）
+
+列表篩選（admin/trips、refunds、users、vehicles）維持子字串語意：contains_filter 產生的
+ILIKE '%value%' 由 pg_trgm 的 GIN 索引支援（查詢至少三個字元時），不截斷、不做模糊比對。
+GET /admin/search 另提供依相似度排序的分頁搜尋，兩種後端:
+
+- trigram: pg_trgm GIN 索引（OPTIONAL_SCHEMA_UPGRADES 建立）。條件為 ILIKE 子字串或
+  word_similarity >= 門檻（%> 運算子），兩者皆可使用索引；以 word_similarity 排序
+- ngram: 未安裝 pg_trgm 時（例如本機開發）使用程序內的三字元組倒排索引，規則與 pg_trgm 相同
+  （小寫、依英數字分詞、前補兩個空白後補一個空白）。索引每 ADMIN_SEARCH_NGRAM_REFRESH_SECONDS 重建
+
+分數為查詢的三字元組出現在資料中的比例；包含完整查詢字串的結果排在前面。
+"""
+
+import asyncio
+import logging
+import math
+import re
+import time
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func, literal, or_, select, text
+
+from app.config import settings
+from app.models.user import User
+from app.models.vehicle import Vehicle
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[^\W_]+")
+
+SEARCH_BACKENDS = ("trigram", "ngram")
+
+
+def trigrams(value: Optional[str]) -> FrozenSet[str]:
+    """pg_trgm 相同規則的三字元組集合"""
+    grams = set()
+    for word in _WORD.findall((value or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def interior_trigrams(value: str) -> FrozenSet[str]:
+    """不含邊界空白的三字元組：包含此字串的資料必定含有這些三字元組"""
+    return frozenset(gram for gram in trigrams(value) if " " not in gram)
+
+
+@dataclass(frozen=True)
+class SearchTarget:
+    """可搜尋的對象：主鍵（或 distinct 的值）與文字欄位"""
+    model: Any
+    key: Any
+    fields: Sequence[Any]
+    distinct: bool = False
+
+
+SEARCH_TARGETS = {
+    "users": SearchTarget(User, User.id, (User.username, User.display_name)),
+    "plates": SearchTarget(Vehicle, Vehicle.vehicle_id, (Vehicle.plate_number,)),
+    "vehicle_models": SearchTarget(Vehicle, Vehicle.model, (Vehicle.model,), distinct=True),
+}
+
+
+def get_target(name: str) -> SearchTarget:
+    if name not in SEARCH_TARGETS:
+        raise ValueError(f"不支援的搜尋對象: {name}（可用: {', '.join(SEARCH_TARGETS)}）")
+    return SEARCH_TARGETS[name]
+
+
+def gram_text(value: Optional[str]) -> str:
+    """
+    以 pg_trgm 的補白方式串接各詞（"  詞 "）：三字元組 g 屬於 trigrams(value)
+    若且唯若 g 是此字串的子字串，驗證候選時不必重新切分
+    """
+    return "".join(f"  {word} " for word in _WORD.findall((value or "").lower()))
+
+
+class NgramIndex:
+    """程序內三字元組倒排索引（每個三字元組一個 array('I') 的文件序號）"""
+
+    def __init__(self, keys: List[Any], texts: List[str]):
+        self.keys = keys
+        self.texts = texts
+        self.gram_texts = [gram_text(value) for value in texts]
+        postings: Dict[str, array] = defaultdict(lambda: array("I"))
+        for position, value in enumerate(texts):
+            for gram in trigrams(value):
+                postings[gram].append(position)
+        self.postings = dict(postings)
+
+    @classmethod
+    def build(cls, rows: Sequence[Sequence[Any]]) -> "NgramIndex":
+        """rows: (主鍵, 欄位1, 欄位2, ...)；多個欄位以換行合併"""
+        keys, texts = [], []
+        for row in rows:
+            keys.append(row[0])
+            texts.append("\n".join(value for value in row[1:] if value).lower())
+        return cls(keys, texts)
+
+    def _docs(self, gram: str) -> Sequence[int]:
+        return self.postings.get(gram, ())
+
+    def search(self, query: str, threshold: float) -> List[Tuple[Any, float]]:
+        """
+        依相似度排序的 (主鍵, 分數)
+
+        候選只取自最少見的三字元組：分數 >= 門檻的資料至少含有 ceil(門檻 x 查詢三字元組數) 個，
+        因此必定出現在最少見的 (n - 該數 + 1) 個之一；子字串相符的資料必定含有最少見的內部三字元組
+        """
+        grams = trigrams(query)
+        if not grams:
+            return []
+        needle = query.strip().lower()
+        required = max(1, math.ceil(threshold * len(grams)))
+        rarest = sorted(grams, key=lambda gram: len(self._docs(gram)))
+        candidates = set()
+        for gram in rarest[:len(grams) - required + 1]:
+            candidates.update(self._docs(gram))
+        interior = interior_trigrams(needle)
+        if interior:
+            candidates.update(self._docs(min(interior, key=lambda gram: len(self._docs(gram)))))
+
+        hits = []
+        for position in candidates:
+            padded = self.gram_texts[position]
+            shared = sum(1 for gram in grams if gram in padded)
+            if shared >= required:
+                contains = needle in self.texts[position]
+            elif shared >= len(interior) and needle in self.texts[position]:
+                contains = True
+            else:
+                continue
+            hits.append((not contains, -shared, len(self.texts[position]), position))
+        hits.sort()
+        return [(self.keys[position], round(-negative_shared / len(grams), 4))
+                for _, negative_shared, _, position in hits]
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+def contains_filter(fields: Sequence[Any], value: str):
+    """任一欄位包含 value（ILIKE 子字串，跳脫萬用字元）"""
+    like_value = f"%{_escape_like(value)}%"
+    return or_(*(field.ilike(like_value, escape="!") for field in fields))
+
+
+class AdminSearchService:
+    """管理後台搜尋（依 ADMIN_SEARCH_BACKEND 選擇後端，auto 時依 pg_trgm 是否安裝）"""
+
+    def __init__(self):
+        self._backend: Optional[str] = None
+        self._indexes: Dict[str, Tuple[float, NgramIndex]] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def backend(self, session) -> str:
+        configured = settings.ADMIN_SEARCH_BACKEND
+        if configured in SEARCH_BACKENDS:
+            return configured
+        if self._backend is None:
+            installed = (await session.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            )).scalar()
+            self._backend = "trigram" if installed else "ngram"
+            logger.info(f"🔎 管理後台搜尋後端: {self._backend}")
+        return self._backend
+
+    def invalidate(self, target_name: Optional[str] = None) -> None:
+        """捨棄程序內索引，下次搜尋時重建"""
+        if target_name:
+            self._indexes.pop(target_name, None)
+        else:
+            self._indexes.clear()
+
+    async def ngram_index(self, session, target_name: str) -> NgramIndex:
+        """取得（必要時重建）程序內索引；建立索引在執行緒中進行，不阻塞事件迴圈"""
+        cached = self._indexes.get(target_name)
+        if cached and time.monotonic() - cached[0] < settings.ADMIN_SEARCH_NGRAM_REFRESH_SECONDS:
+            return cached[1]
+        async with self._locks[target_name]:
+            cached = self._indexes.get(target_name)
+            if cached and time.monotonic() - cached[0] < settings.ADMIN_SEARCH_NGRAM_REFRESH_SECONDS:
+                return cached[1]
+            target = get_target(target_name)
+            stmt = select(target.key, *target.fields)
+            if target.distinct:
+                stmt = stmt.distinct()
+            started = time.perf_counter()
+            rows = (await session.execute(stmt.where(target.key.isnot(None)))).all()
+            index = await asyncio.to_thread(NgramIndex.build, rows)
+            self._indexes[target_name] = (time.monotonic(), index)
+            logger.info(f"🔎 重建 {target_name} 搜尋索引: {len(rows)} 筆，{time.perf_counter() - started:.2f}s")
+            return index
+
+    async def search(self, session, target_name: str, query: str, limit: int,
+                     offset: int = 0) -> Tuple[List[Tuple[Any, float]], int]:
+        """
+        Returns:
+            (依相似度排序的 [(主鍵, 分數)], 相符總數)
+
+        Raises:
+            ValueError: 搜尋對象無效或查詢為空
+        """
+        target = get_target(target_name)
+        query = (query or "").strip()
+        if not query:
+            raise ValueError("搜尋字串不可為空")
+        threshold = settings.ADMIN_SEARCH_SIMILARITY_THRESHOLD
+
+        if await self.backend(session) == "ngram":
+            hits = (await self.ngram_index(session, target_name)).search(query, threshold)
+            return hits[offset:offset + limit], len(hits)
+
+        # %> 使用 pg_trgm.word_similarity_threshold（僅在目前交易內生效）
+        await session.execute(select(func.set_config("pg_trgm.word_similarity_threshold", str(threshold), True)))
+        contains = contains_filter(target.fields, query)
+        condition = or_(contains, *(field.op("%>")(query) for field in target.fields))
+        scores = [func.word_similarity(literal(query), func.coalesce(field, "")) for field in target.fields]
+        score = (func.greatest(*scores) if len(scores) > 1 else scores[0]).label("score")
+        stmt = select(target.key, score).where(condition)
+        if target.distinct:
+            stmt = stmt.distinct()
+        total = (await session.execute(select(func.count()).select_from(stmt.subquery()))).scalar() or 0
+        # 與 ngram 後端相同：包含完整查詢字串的結果優先，再依相似度
+        ranked = stmt.add_columns(case((contains, 0), else_=1).label("partial")).subquery()
+        rows = (await session.execute(
+            select(ranked.c[0], ranked.c.score)
+            .order_by(ranked.c.partial, ranked.c.score.desc(), ranked.c[0])
+            .offset(offset).limit(limit)
+        )).all()
+        return [(key, round(float(value), 4)) for key, value in rows], total
+
+
+admin_search = AdminSearchService()
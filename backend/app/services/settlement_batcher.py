@@ -0,0 +1,240 @@
+# backend/app/services/settlement_batcher.py
+"""
+結算批次提交
+
+每個完成的行程原本各自送出 release_payment 與 create_receipt 交易，每筆都要付出
+完整的交易成本與確認延遲。批次器在 SETTLEMENT_BATCH_FLUSH_MS 的時間窗內累積待送出的
+呼叫，以一筆 PTB（多個 Move 呼叫）提交，滿 SETTLEMENT_BATCH_MAX_SIZE 個時立即送出；
+呼叫端各自等待自己那一筆的結果。
+
+chain_outbox 的 register_user_for / register_vehicle_for 也經由同一個批次器送出；
+registry 只接受 admin 送出，註冊呼叫另外累積成批，只以 admin 操作錢包的 gas coin 提交
+（不與可由任一操作錢包送出的 release / create_receipt_for 合併，避免一筆 abort 連帶失敗）。
+
+PTB 是原子的：任一呼叫 abort 會讓整筆交易失敗。依 effects 錯誤中的 command 索引
+把失敗的呼叫回報給它的呼叫端，其餘呼叫重新提交。
+"""
+
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from app.config import settings
+from app.core import metrics
+from app.services.gas_budget_service import gas_budget_estimator
+from app.services.gas_coin_pool import MoveCall, gas_coin_pool
+
+logger = logging.getLogger(__name__)
+
+# effects.status.error 中失敗指令的索引，例如 "MoveAbort(...) in command 3"
+_FAILED_COMMAND = re.compile(r"in command (\d+)")
+
+# 建立物件的呼叫 -> (事件型別後綴, 物件ID欄位)；每個呼叫發出一個事件，依指令順序對應
+_CREATED_EVENTS = {
+    "register_user_for": ("::events::UserRegistered", "user_id"),
+    "register_vehicle_for": ("::events::VehicleRegistered", "vehicle_id"),
+}
+
+settlement_batch_size = metrics.registry.histogram(
+    "settlement_batch_size", "Move calls per settlement PTB",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+settlement_batches = metrics.registry.counter(
+    "settlement_batches_total", "Settlement PTBs submitted by outcome", ("outcome",),
+)
+
+
+@dataclass
+class _Pending:
+    key: Any  # 行程ID（結算）或車輛ID（上架），用於對應事件與記錄
+    call: MoveCall
+    future: asyncio.Future
+    enqueued: float = field(default_factory=time.perf_counter)
+
+def failed_command(error: Optional[str]) -> Optional[int]:
+    """從 effects 錯誤訊息取出失敗的指令索引"""
+    match = _FAILED_COMMAND.search(error or "")
+    return int(match.group(1)) if match else None
+
+
+class SettlementBatcher:
+    """release_payment / create_receipt / register_*_for 的 PTB 批次器"""
+
+    def __init__(self, pool=gas_coin_pool, max_batch_size: Optional[int] = None,
+                 flush_ms: Optional[float] = None):
+        self.pool = pool
+        self.max_batch_size = max_batch_size or settings.SETTLEMENT_BATCH_MAX_SIZE
+        self.flush_ms = settings.SETTLEMENT_BATCH_FLUSH_MS if flush_ms is None else flush_ms
+        # 依送出的操作錢包分批：None 為任一操作錢包，否則為指定地址（registry admin）
+        self._pending: Dict[Optional[str], List[_Pending]] = {}
+        self._timers: Dict[Optional[str], asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SETTLEMENT_BATCHING_ENABLED and not settings.MOCK_MODE
+
+    # ========================================================================
+    # 呼叫端
+    # ========================================================================
+
+    async def release(self, package_id: str, escrow_object_id: str, trip_id: int) -> Dict[str, Any]:
+        """
+        釋放託管支付
+
+        Returns:
+            {"success", "transaction_hash", "batch_size"} 或 {"success": False, "error"}
+        """
+        call = MoveCall(package_id, "payment_escrow", "release_payment",
+                        [("object", escrow_object_id), ("u64", trip_id)])
+        return await self._submit(trip_id, call)
+
+    async def create_receipt(self, package_id: str, issuer_id: str, trip_id: int, passenger: str, driver: str,
+                             pickup_hash: bytes, dropoff_hash: bytes, distance: int,
+                             final_amount: int) -> Dict[str, Any]:
+        """
+        為乘客建立鏈上收據（create_receipt_for，操作錢包須列在 ReceiptIssuer 的 operators）
+
+        Returns:
+            {"success", "transaction_hash", "receipt_id", "batch_size"} 或 {"success": False, "error"}
+        """
+        call = MoveCall(package_id, "trip_receipt", "create_receipt_for", [
+            ("object", issuer_id), ("address", passenger), ("u64", trip_id), ("address", driver),
+            ("vector_u8", pickup_hash), ("vector_u8", dropoff_hash),
+            ("u64", distance), ("u64", final_amount),
+        ])
+        return await self._submit(trip_id, call)
+
+    async def register_user(self, package_id: str, registry_id: str, user_address: str,
+                            did_hash: bytes, user_id: int) -> Dict[str, Any]:
+        """
+        代用戶註冊鏈上檔案（register_user_for，操作錢包須為 registry admin）
+
+        Returns:
+            {"success", "transaction_hash", "object_id", "batch_size"} 或 {"success": False, "error"}
+        """
+        call = MoveCall(package_id, "user_registry", "register_user_for", [
+            ("object", registry_id), ("address", user_address), ("vector_u8", did_hash),
+        ])
+        return await self._submit_as_admin(user_id, call)
+
+    async def register_vehicle(self, package_id: str, registry_id: str, owner: str,
+                               vehicle_data_hash: bytes, vehicle_id: str) -> Dict[str, Any]:
+        """
+        代車主註冊車輛（register_vehicle_for，操作錢包須為 registry admin）
+
+        Returns:
+            {"success", "transaction_hash", "object_id", "batch_size"} 或 {"success": False, "error"}
+        """
+        call = MoveCall(package_id, "vehicle_registry", "register_vehicle_for", [
+            ("object", registry_id), ("address", owner), ("vector_u8", vehicle_data_hash),
+        ])
+        return await self._submit_as_admin(vehicle_id, call)
+
+    async def _submit_as_admin(self, key: Any, call: MoveCall) -> Dict[str, Any]:
+        admin = self.pool.admin_address()
+        if admin is None:
+            return {"success": False,
+                    "error": "無法決定 registry admin 操作錢包（請設定 REGISTRY_ADMIN_ADDRESS）"}
+        return await self._submit(key, call, owner=admin)
+
+    async def _submit(self, key: Any, call: MoveCall, owner: Optional[str] = None) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        item = _Pending(key, call, loop.create_future())
+        pending = self._pending.setdefault(owner, [])
+        pending.append(item)
+        if len(pending) >= self.max_batch_size:
+            self._flush(owner)
+        elif owner not in self._timers:
+            self._timers[owner] = loop.call_later(self.flush_ms / 1000, self._flush, owner)
+        return await item.future
+
+    # ========================================================================
+    # 提交
+    # ========================================================================
+
+    def _flush(self, owner: Optional[str] = None):
+        """取出該批目前累積的呼叫（每筆最多 max_batch_size 個）並在背景提交"""
+        timer = self._timers.pop(owner, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(owner, [])
+        while pending:
+            batch, pending = pending[:self.max_batch_size], pending[self.max_batch_size:]
+            task = asyncio.get_running_loop().create_task(self._execute(batch, owner))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _resolve(item: _Pending, result: Dict[str, Any]):
+        if not item.future.done():
+            item.future.set_result(result)
+
+    async def _execute(self, batch: List[_Pending], owner: Optional[str] = None):
+        remaining = list(batch)
+        while remaining:
+            gas_budget = sum(
+                gas_budget_estimator.budget_for(item.call.module, item.call.function) for item in remaining
+            )
+            settlement_batch_size.observe(len(remaining))
+            try:
+                async with self.pool.lease(gas_budget, owner=owner) as lease:
+                    result = await lease.execute_calls([item.call for item in remaining], gas_budget)
+            except Exception as e:
+                settlement_batches.inc("error")
+                logger.error(f"❌ 結算批次提交失敗 ({len(remaining)} 筆): {e}")
+                for item in remaining:
+                    self._resolve(item, {"success": False, "error": str(e)})
+                return
+
+            if result["status"] == "success":
+                settlement_batches.inc("success")
+                receipts = {
+                    str(event["parsedJson"].get("trip_id")): event["parsedJson"].get("receipt_id")
+                    for event in result.get("events", [])
+                    if event.get("type", "").endswith("::trip_receipt::ReceiptCreated")
+                }
+                created = {
+                    function: iter([
+                        event["parsedJson"].get(field) for event in result.get("events", [])
+                        if event.get("type", "").endswith(suffix)
+                    ])
+                    for function, (suffix, field) in _CREATED_EVENTS.items()
+                }
+                logger.info("📦 結算批次已提交: %s 筆, tx %s", len(remaining), result["digest"])
+                for item in remaining:
+                    outcome = {"success": True, "transaction_hash": result["digest"], "batch_size": len(remaining)}
+                    if item.call.module == "trip_receipt":
+                        outcome["receipt_id"] = receipts.get(str(item.key))
+                    elif item.call.function in created:
+                        outcome["object_id"] = next(created[item.call.function], None)
+                    self._resolve(item, outcome)
+                return
+
+            settlement_batches.inc("failure")
+            index = failed_command(result.get("error"))
+            if index is None or index >= len(remaining):
+                for item in remaining:
+                    self._resolve(item, {"success": False, "error": result.get("error"),
+                                         "transaction_hash": result["digest"]})
+                return
+            # 只有失敗的呼叫回報錯誤，其餘重新提交
+            failed = remaining.pop(index)
+            logger.warning("⚠️ 結算批次中 %s 的 %s 失敗，重新提交其餘 %s 筆: %s",
+                           failed.key, failed.call.function, len(remaining), result.get("error"))
+            self._resolve(failed, {"success": False, "error": result.get("error"),
+                                   "transaction_hash": result["digest"]})
+
+    async def close(self):
+        """送出尚未提交的呼叫並等待完成（關閉時）"""
+        for owner in list(self._pending):
+            self._flush(owner)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# 全局實例
+settlement_batcher = SettlementBatcher()
@@ -0,0 +1,271 @@
+# backend/app/services/speed_table.py
+"""
+歷史車速表
+
+離線由已完成行程（distance_km / actual_duration_minutes）依上車網格與一週中的小時
+彙總出平均車速，啟動時載入記憶體，取代固定 30 km/h 的行駛時間估算。
+
+建表:
+    python -m app.services.speed_table build [--output data/speed_table.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_WEEK = 168
+# 1970-01-01 是星期四；以星期一 00:00 為第 0 小時
+_EPOCH_HOUR_OFFSET = 3 * 24
+
+# 網格鍵打包成單一整數，避免 tuple 雜湊成本（經度索引需小於 2^19，即網格 > 0.0004 度）
+_LNG_SPAN = 1 << 20
+_HOUR_SPAN = 256
+_floor = math.floor
+
+
+def pack_key(lat_idx: int, lng_idx: int, hour: int) -> int:
+    return (lat_idx * _LNG_SPAN + lng_idx) * _HOUR_SPAN + hour
+
+
+def unpack_key(key: int) -> Tuple[int, int, int]:
+    rest, hour = divmod(key, _HOUR_SPAN)
+    lng_idx = (rest + _LNG_SPAN // 2) % _LNG_SPAN - _LNG_SPAN // 2
+    return (rest - lng_idx) // _LNG_SPAN, lng_idx, hour
+
+
+def hour_of_week(timestamp: Optional[float] = None, utc_offset_hours: Optional[int] = None) -> int:
+    """取得一週中的小時索引（星期一 00:00 = 0，依設定的時區）"""
+    if timestamp is None:
+        timestamp = time.time()
+    if utc_offset_hours is None:
+        utc_offset_hours = settings.SPEED_TABLE_UTC_OFFSET_HOURS
+    return (int(timestamp // 3600) + utc_offset_hours + _EPOCH_HOUR_OFFSET) % HOURS_PER_WEEK
+
+
+class SpeedTable:
+    """
+    (上車網格, 一週中的小時) → 平均車速 (km/h)
+
+    查不到網格時退回該小時的全域平均，再退回預設車速
+    """
+
+    def __init__(self, cell_size_deg: float, default_speed_kmh: float,
+                 cells: Optional[Dict[Tuple[int, int, int], float]] = None,
+                 hourly: Optional[List[float]] = None, built_at: Optional[str] = None):
+        self.cell_size_deg = cell_size_deg
+        self.default_speed_kmh = default_speed_kmh
+        self._cells: Dict[int, float] = {pack_key(*key): speed for key, speed in (cells or {}).items()}
+        self._hourly = hourly or [default_speed_kmh] * HOURS_PER_WEEK
+        self.built_at = built_at
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def speed_kmh(self, lat: float, lng: float, hour: int) -> float:
+        """O(1) 查表（熱路徑，展開 pack_key 避免額外的函數呼叫）"""
+        size = self.cell_size_deg
+        speed = self._cells.get((_floor(lat / size) * _LNG_SPAN + _floor(lng / size)) * _HOUR_SPAN + hour)
+        if speed is None:
+            return self._hourly[hour]
+        return speed
+
+    def estimate_travel_time_minutes(self, distance_km: float, lat: float, lng: float,
+                                     hour: Optional[int] = None) -> int:
+        """
+        估算行駛時間
+
+        Args:
+            distance_km: 距離 (公里)
+            lat, lng: 出發點座標（決定使用哪個網格的車速）
+            hour: 一週中的小時，預設為現在
+
+        Returns:
+            預估時間 (分鐘)，與 LocationService.estimate_travel_time_minutes 相同的取整規則
+        """
+        if distance_km <= 0:
+            return 0
+        if hour is None:
+            hour = hour_of_week()
+        speed = self.speed_kmh(lat, lng, hour)
+        return max(1, round(distance_km / speed * 60))
+
+    # ========================================================================
+    # 序列化
+    # ========================================================================
+
+    def to_dict(self) -> Dict:
+        return {
+            "cell_size_deg": self.cell_size_deg,
+            "default_speed_kmh": self.default_speed_kmh,
+            "utc_offset_hours": settings.SPEED_TABLE_UTC_OFFSET_HOURS,
+            "built_at": self.built_at,
+            "hourly": [round(speed, 2) for speed in self._hourly],
+            # [lat_idx, lng_idx, hour_of_week, speed_kmh]
+            "cells": [[*unpack_key(key), round(speed, 2)] for key, speed in self._cells.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SpeedTable":
+        cells = {(int(lat), int(lng), int(hour)): float(speed) for lat, lng, hour, speed in data.get("cells", [])}
+        hourly = [float(speed) for speed in data.get("hourly", [])]
+        default_speed = float(data.get("default_speed_kmh", settings.SPEED_TABLE_DEFAULT_KMH))
+        if len(hourly) != HOURS_PER_WEEK:
+            hourly = None
+        return cls(
+            cell_size_deg=float(data["cell_size_deg"]),
+            default_speed_kmh=default_speed,
+            cells=cells,
+            hourly=hourly,
+            built_at=data.get("built_at"),
+        )
+
+
+class SpeedTableService:
+    """持有目前使用中的車速表"""
+
+    def __init__(self):
+        self.table = SpeedTable(
+            cell_size_deg=settings.SPEED_TABLE_CELL_DEG,
+            default_speed_kmh=settings.SPEED_TABLE_DEFAULT_KMH,
+        )
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """從 JSON 檔載入車速表，檔案不存在或格式錯誤時保留預設車速"""
+        path = path or settings.SPEED_TABLE_PATH
+        if not os.path.exists(path):
+            logger.info(f"ℹ️ Speed table not found at {path}, using {self.table.default_speed_kmh} km/h")
+            return False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.table = SpeedTable.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"❌ Failed to load speed table {path}: {e}")
+            return False
+        logger.info(f"✅ Speed table loaded: {len(self.table)} cells (built {self.table.built_at})")
+        return True
+
+    def estimate_travel_time_minutes(self, distance_km: float, lat: float, lng: float,
+                                     hour: Optional[int] = None) -> int:
+        return self.table.estimate_travel_time_minutes(distance_km, lat, lng, hour)
+
+
+# ============================================================================
+# 離線建表
+# ============================================================================
+
+# 依上車網格與一週中的小時彙總；排除不合理的單筆車速（GPS / 計時錯誤）
+_AGGREGATE_SQL = """
+WITH samples AS (
+    SELECT
+        floor(pickup_lat / :cell_size)::int AS lat_idx,
+        floor(pickup_lng / :cell_size)::int AS lng_idx,
+        ((floor(extract(epoch FROM COALESCE(picked_up_at, requested_at)) / 3600)::bigint
+          + :utc_offset + :epoch_offset) % 168)::int AS hour_of_week,
+        distance_km,
+        actual_duration_minutes
+    FROM trips
+    WHERE status = 'completed'
+      AND distance_km > 0
+      AND actual_duration_minutes > 0
+      AND distance_km / (actual_duration_minutes / 60.0) BETWEEN :min_speed AND :max_speed
+)
+SELECT lat_idx, lng_idx, hour_of_week,
+       SUM(distance_km) AS distance_km,
+       SUM(actual_duration_minutes) AS duration_minutes,
+       COUNT(*) AS samples
+FROM samples
+GROUP BY GROUPING SETS ((lat_idx, lng_idx, hour_of_week), (hour_of_week))
+"""
+
+
+def aggregate_rows(rows, cell_size_deg: float, default_speed_kmh: float, min_samples: int) -> SpeedTable:
+    """
+    將彙總結果組成車速表
+
+    rows: (lat_idx, lng_idx, hour_of_week, distance_km, duration_minutes, samples)，
+          lat_idx 為 None 的列是該小時的全域彙總
+    """
+    cells: Dict[Tuple[int, int, int], float] = {}
+    hourly = [default_speed_kmh] * HOURS_PER_WEEK
+
+    for lat_idx, lng_idx, hour, distance_km, duration_minutes, samples in rows:
+        if samples < min_samples or not duration_minutes:
+            continue
+        speed = float(distance_km) / (float(duration_minutes) / 60.0)
+        if lat_idx is None:
+            hourly[int(hour)] = speed
+        else:
+            cells[(int(lat_idx), int(lng_idx), int(hour))] = speed
+
+    return SpeedTable(
+        cell_size_deg=cell_size_deg,
+        default_speed_kmh=default_speed_kmh,
+        cells=cells,
+        hourly=hourly,
+        built_at=datetime.utcnow().isoformat(),
+    )
+
+
+async def build_speed_table(output_path: Optional[str] = None) -> SpeedTable:
+    """從資料庫彙總已完成行程並寫出 JSON 車速表"""
+    from app.core.database import async_session_maker
+
+    output_path = output_path or settings.SPEED_TABLE_PATH
+    params = {
+        "cell_size": settings.SPEED_TABLE_CELL_DEG,
+        "utc_offset": settings.SPEED_TABLE_UTC_OFFSET_HOURS,
+        "epoch_offset": _EPOCH_HOUR_OFFSET,
+        "min_speed": settings.SPEED_TABLE_MIN_TRIP_KMH,
+        "max_speed": settings.SPEED_TABLE_MAX_TRIP_KMH,
+    }
+
+    async with async_session_maker() as session:
+        result = await session.execute(text(_AGGREGATE_SQL), params)
+        rows = result.all()
+
+    table = aggregate_rows(
+        rows,
+        cell_size_deg=settings.SPEED_TABLE_CELL_DEG,
+        default_speed_kmh=settings.SPEED_TABLE_DEFAULT_KMH,
+        min_samples=settings.SPEED_TABLE_MIN_SAMPLES,
+    )
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(table.to_dict(), f, separators=(",", ":"))
+    os.replace(tmp_path, output_path)
+
+    logger.info(f"✅ Speed table built: {len(table)} cells -> {output_path}")
+    return table
+
+
+# 全局實例
+speed_table_service = SpeedTableService()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Historical speed table builder")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="從已完成行程建立車速表")
+    build_parser.add_argument("--output", default=None, help="輸出路徑（預設 SPEED_TABLE_PATH）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "build":
+        built = asyncio.run(build_speed_table(args.output))
+        print(f"{len(built)} cells written")
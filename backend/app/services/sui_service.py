@@ -6,17 +6,29 @@ Sui 區塊鏈服務
 
 import asyncio
 import logging
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Optional
 from datetime import datetime
-import httpx
 import json
 
 from app.config import settings
 from app.schemas.payment import PaymentStatus, TransactionStatus, WalletBalance
 from app.services.contract_service import contract_service
+from app.services.contract_metrics_service import contract_performance_tracker
+from app.services.gas_budget_service import gas_budget_estimator
+from app.services.gas_coin_pool import GasPoolExhaustedError, gas_coin_pool
+from app.utils.blockchain import sui_rpc_call
 
 logger = logging.getLogger(__name__)
 
+# estimate_gas_fee 的交易類型對應的 Move 函數
+GAS_FEE_FUNCTIONS = {
+    "payment": ("payment_escrow", "lock_payment"),
+    "release": ("payment_escrow", "release_payment"),
+    "refund": ("payment_escrow", "refund_payment"),
+    "receipt": ("trip_receipt", "create_receipt"),
+}
+
 class SuiService:
     """Sui 區塊鏈服務類"""
     
@@ -25,6 +37,10 @@ class SuiService:
         self.network = settings.SUI_NETWORK
         self.contract_package_id = settings.CONTRACT_PACKAGE_ID
         self.platform_wallet = settings.PLATFORM_WALLET if hasattr(settings, 'PLATFORM_WALLET') else None
+    
+    async def _rpc(self, method: str, params: List[Any], timeout: float = 10.0) -> Dict[str, Any]:
+        """呼叫 fullnode JSON-RPC（記錄延遲指標）"""
+        return await sui_rpc_call(method, params, timeout=timeout, node_url=self.node_url)
         
     async def execute_trip_payment(
         self,
@@ -89,20 +105,7 @@ class SuiService:
                 return await self._mock_wallet_balance(wallet_address)
             
             # 使用 Sui JSON-RPC 方法查詢餘額
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.node_url,
-                    json={
-                        "jsonrpc": "2.0",
-                        "id": 1,
-                        "method": "suix_getBalance",
-                        "params": [wallet_address]
-                    },
-                    headers={"Content-Type": "application/json"},
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                result = response.json()
+            result = await self._rpc("suix_getBalance", [wallet_address])
             
             # 檢查是否有錯誤
             if "error" in result:
@@ -114,7 +117,7 @@ class SuiService:
             balance_sui = balance_mist / 1_000_000_000  # 1 SUI = 1,000,000,000 MIST
             balance_micro_sui = balance_mist / 1_000  # 1 microSUI = 1,000 MIST
             
-            logger.info(f"✅ 查詢餘額成功: {wallet_address[:10]}... = {balance_sui} SUI")
+            logger.info("✅ 查詢餘額成功: %s... = %s SUI", wallet_address[:10], balance_sui)
             
             return WalletBalance(
                 wallet_address=wallet_address,
@@ -151,42 +154,31 @@ class SuiService:
             驗證結果
         """
         try:
-            logger.info(f"🔍 開始驗證交易: {tx_hash}")
-            logger.info(f"   預期收款: {expected_recipient}")
-            logger.info(f"   預期金額: {expected_amount} MIST")
+            logger.info("🔍 開始驗證交易: %s", tx_hash)
+            logger.info("   預期收款: %s", expected_recipient)
+            logger.info("   預期金額: %s MIST", expected_amount)
             
             # 獲取交易詳情
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.node_url,
-                    json={
-                        "jsonrpc": "2.0",
-                        "id": 1,
-                        "method": "sui_getTransactionBlock",
-                        "params": [
-                            tx_hash,
-                            {
-                                "showInput": True,
-                                "showEffects": True,
-                                "showEvents": True,
-                                "showBalanceChanges": True
-                            }
-                        ]
-                    },
-                    headers={"Content-Type": "application/json"},
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                result = response.json()
+            result = await self._rpc("sui_getTransactionBlock", [
+                tx_hash,
+                {
+                    "showInput": True,
+                    "showEffects": True,
+                    "showEvents": True,
+                    "showBalanceChanges": True
+                }
+            ])
             
-            logger.info(f"📡 Sui RPC 響應: {result.get('error') or 'success'}")
+            logger.info("📡 Sui RPC 響應: %s", result.get('error') or 'success')
             
             if "error" in result:
                 error_msg = f"交易不存在: {result['error'].get('message', 'Unknown error')}"
                 logger.error(f"❌ {error_msg}")
+                # 交易可能尚未被節點索引，可以重試
                 return {
                     "valid": False,
-                    "error": error_msg
+                    "error": error_msg,
+                    "retryable": True
                 }
             
             tx_data = result.get("result", {})
@@ -195,7 +187,7 @@ class SuiService:
             
             # 檢查交易狀態
             tx_status = effects.get("status", {}).get("status")
-            logger.info(f"📊 交易狀態: {tx_status}")
+            logger.info("📊 交易狀態: %s", tx_status)
             
             if tx_status != "success":
                 error_msg = f"交易失敗: {tx_status}"
@@ -206,7 +198,7 @@ class SuiService:
                 }
             
             # 驗證餘額變化
-            logger.info(f"💰 餘額變化記錄數: {len(balance_changes)}")
+            logger.info("💰 餘額變化記錄數: %s", len(balance_changes))
             recipient_received = 0
             for change in balance_changes:
                 owner = change.get("owner", {})
@@ -214,12 +206,12 @@ class SuiService:
                 if isinstance(owner, dict):
                     address = owner.get("AddressOwner")
                     amount = int(change.get("amount", 0))
-                    logger.info(f"   地址: {address[:20] if address else 'None'}... 金額: {amount}")
+                    logger.info("   地址: %s... 金額: %s", address[:20] if address else 'None', amount)
                     if address == expected_recipient:
                         if amount > 0:
                             recipient_received += amount
             
-            logger.info(f"💵 收款人收到總額: {recipient_received} MIST")
+            logger.info("💵 收款人收到總額: %s MIST", recipient_received)
             
             # 驗證金額（允許 5% 誤差，因為可能有 gas 費用）
             amount_diff = abs(recipient_received - expected_amount)
@@ -241,7 +233,7 @@ class SuiService:
                     "error": error_msg
                 }
             
-            logger.info(f"✅ 交易驗證成功: {tx_hash[:20]}... 金額: {recipient_received} MIST")
+            logger.info("✅ 交易驗證成功: %s... 金額: %s MIST", tx_hash[:20], recipient_received)
             
             return {
                 "valid": True,
@@ -256,7 +248,8 @@ class SuiService:
             logger.error(f"驗證交易失敗: {str(e)}")
             return {
                 "valid": False,
-                "error": str(e)
+                "error": str(e),
+                "retryable": True
             }
     
     async def get_transaction_status(self, tx_hash: str) -> TransactionStatus:
@@ -274,27 +267,14 @@ class SuiService:
                 return await self._mock_transaction_status(tx_hash)
             
             # 使用 Sui JSON-RPC 的 sui_getTransactionBlock 方法
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.node_url,
-                    json={
-                        "jsonrpc": "2.0",
-                        "id": 1,
-                        "method": "sui_getTransactionBlock",
-                        "params": [
-                            tx_hash,
-                            {
-                                "showInput": True,
-                                "showEffects": True,
-                                "showEvents": True
-                            }
-                        ]
-                    },
-                    headers={"Content-Type": "application/json"},
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                result = response.json()
+            result = await self._rpc("sui_getTransactionBlock", [
+                tx_hash,
+                {
+                    "showInput": True,
+                    "showEffects": True,
+                    "showEvents": True
+                }
+            ])
             
             # 檢查是否有錯誤
             if "error" in result:
@@ -327,7 +307,7 @@ class SuiService:
             gas_used = effects.get("gasUsed", {})
             timestamp_ms = tx_data.get("timestampMs")
             
-            logger.info(f"✅ 交易查詢成功: {tx_hash[:20]}... 狀態: {tx_status}")
+            logger.info("✅ 交易查詢成功: %s... 狀態: %s", tx_hash[:20], tx_status)
             
             return TransactionStatus(
                 transaction_hash=tx_hash,
@@ -370,17 +350,15 @@ class SuiService:
             交易結果，包含 escrow_object_id
         """
         try:
-            logger.info(f"📞 調用合約 lock_payment")
-            logger.info(f"   Package: {package_id}")
-            logger.info(f"   Amount: {amount_mist} MIST")
-            logger.info(f"   Trip ID: {trip_id}")
-            logger.info(f"   Driver: {driver_address}")
-            logger.info(f"   Platform: {platform_address}")
-            logger.info(f"   Platform Fee: {platform_fee_mist} MIST")
-            
-            operator_private_key = getattr(settings, 'OPERATOR_PRIVATE_KEY', None)
-            
-            if not operator_private_key:
+            logger.info("📞 調用合約 lock_payment")
+            logger.info("   Package: %s", package_id)
+            logger.info("   Amount: %s MIST", amount_mist)
+            logger.info("   Trip ID: %s", trip_id)
+            logger.info("   Driver: %s", driver_address)
+            logger.info("   Platform: %s", platform_address)
+            logger.info("   Platform Fee: %s MIST", platform_fee_mist)
+            
+            if not (settings.OPERATOR_PRIVATE_KEY or settings.OPERATOR_PRIVATE_KEYS):
                 logger.error(f"❌ 缺少操作錢包私鑰")
                 return {
                     "success": False,
@@ -389,56 +367,40 @@ class SuiService:
             
             # 使用 pysui 調用合約
             try:
-                from pysui import SuiConfig, SyncClient
-                from pysui.sui.sui_types.scalars import ObjectID, SuiString, SuiU64
-                from pysui.sui.sui_txn import SyncTransaction
-                
-                logger.info(f"🔧 使用 pysui 構建交易...")
+                from pysui.sui.sui_types.scalars import SuiString, SuiU64
                 
-                # 配置 Sui 客戶端
-                cfg = SuiConfig.user_config(
-                    rpc_url=self.node_url,
-                    prv_keys=[operator_private_key]
-                )
-                client = SyncClient(cfg)
-                
-                # 獲取操作錢包的 coin 用於支付
-                logger.info(f"💰 獲取可用的 coin...")
-                coins_result = client.get_gas()
+                logger.info("🔧 使用 pysui 構建交易...")
                 
-                if not coins_result.is_ok() or not coins_result.result_data:
-                    logger.error(f"❌ 無法獲取 coins")
-                    return {
-                        "success": False,
-                        "error": "操作錢包沒有可用的 coins"
-                    }
-                
-                # 選擇第一個 coin
-                coin_id = coins_result.result_data[0].coin_object_id
-                logger.info(f"✅ 使用 Coin: {coin_id}")
-                
-                # 構建交易
-                txn = SyncTransaction(client=client)
-                
-                # 調用合約的 lock_payment 函數
-                txn.move_call(
-                    target=f"{package_id}::payment_escrow::lock_payment",
-                    arguments=[
-                        ObjectID(coin_id),  # payment coin
-                        SuiU64(trip_id),  # trip_id
-                        SuiString(driver_address),  # driver
-                        SuiString(platform_address),  # platform
-                        SuiU64(platform_fee_mist)  # platform_fee
-                    ]
-                )
+                def build(txn):
+                    # 付款從租用的 gas coin 拆出，不與其他進行中的交易共用 coin
+                    payment = txn.split_coin(coin=txn.gas, amounts=[amount_mist])
+                    
+                    # 調用合約的 lock_payment 函數
+                    txn.move_call(
+                        target=f"{package_id}::payment_escrow::lock_payment",
+                        arguments=[
+                            payment,  # payment coin
+                            SuiU64(trip_id),  # trip_id
+                            SuiString(driver_address),  # driver
+                            SuiString(platform_address),  # platform
+                            SuiU64(platform_fee_mist)  # platform_fee
+                        ]
+                    )
                 
                 # 執行交易
-                logger.info(f"📤 提交交易到 Sui 網絡...")
-                result = txn.execute(gas_budget="10000000")
+                logger.info("📤 提交交易到 Sui 網絡...")
+                gas_budget = gas_budget_estimator.budget_for("payment_escrow", "lock_payment")
+                async with gas_coin_pool.lease(gas_budget + amount_mist) as lease:
+                    logger.info("✅ 使用 Gas Coin: %s", lease.coin.object_id)
+                    started = time.perf_counter()
+                    result = await lease.execute(build, gas_budget, amount=amount_mist)
                 
                 if result.is_ok():
                     tx_digest = result.result_data.digest
-                    logger.info(f"✅ 合約調用成功: {tx_digest}")
+                    logger.info("✅ 合約調用成功: %s", tx_digest)
+                    contract_performance_tracker.track(
+                        package_id, "payment_escrow", "lock_payment", tx_digest, started, gas_budget=gas_budget
+                    )
                     
                     # 提取 escrow_object_id（從創建的對象中）
                     created_objects = result.result_data.effects.created
@@ -447,7 +409,7 @@ class SuiService:
                     if created_objects:
                         # 第一個創建的對象應該是 Escrow
                         escrow_object_id = created_objects[0].reference.object_id
-                        logger.info(f"🔐 Escrow Object ID: {escrow_object_id}")
+                        logger.info("🔐 Escrow Object ID: %s", escrow_object_id)
                     
                     return {
                         "success": True,
@@ -501,20 +463,18 @@ class SuiService:
             交易結果
         """
         try:
-            logger.info(f"📞 調用合約 release_payment")
-            logger.info(f"   Package: {package_id}")
-            logger.info(f"   Escrow: {escrow_object_id}")
-            logger.info(f"   Trip ID: {trip_id}")
+            logger.info("📞 調用合約 release_payment")
+            logger.info("   Package: %s", package_id)
+            logger.info("   Escrow: %s", escrow_object_id)
+            logger.info("   Trip ID: %s", trip_id)
             
             # 調用合約需要支付 gas，使用操作錢包
             # 注意：這個錢包只用來支付 gas，不涉及資金轉移
-            operator_private_key = getattr(settings, 'OPERATOR_PRIVATE_KEY', None)
-            
-            if not operator_private_key:
+            if not (settings.OPERATOR_PRIVATE_KEY or settings.OPERATOR_PRIVATE_KEYS):
                 logger.error(f"❌ 缺少操作錢包私鑰，無法調用合約")
-                logger.info(f"   提示：需要在 .env 中配置 OPERATOR_PRIVATE_KEY")
-                logger.info(f"   這個錢包只用來支付 gas 費用，不涉及資金轉移")
-                logger.info(f"   資金流向：乘客 → 智能合約 → 司機（直接轉帳）")
+                logger.info("   提示：需要在 .env 中配置 OPERATOR_PRIVATE_KEY")
+                logger.info("   這個錢包只用來支付 gas 費用，不涉及資金轉移")
+                logger.info("   資金流向：乘客 → 智能合約 → 司機（直接轉帳）")
                 return {
                     "success": False,
                     "error": "需要配置 OPERATOR_PRIVATE_KEY 才能調用智能合約（用於支付 gas）"
@@ -522,38 +482,33 @@ class SuiService:
             
             # 使用 pysui 調用合約
             try:
-                from pysui import SuiConfig, SyncClient
                 from pysui.sui.sui_types.scalars import ObjectID, SuiString
-                from pysui.sui.sui_txn import SyncTransaction
-                
-                logger.info(f"🔧 使用 pysui 構建交易...")
-                
-                # 配置 Sui 客戶端（使用操作錢包支付 gas）
-                cfg = SuiConfig.user_config(
-                    rpc_url=self.node_url,
-                    prv_keys=[operator_private_key]
-                )
-                client = SyncClient(cfg)
                 
-                # 構建交易
-                txn = SyncTransaction(client=client)
+                logger.info("🔧 使用 pysui 構建交易...")
                 
-                # 調用合約的 release_payment 函數
-                txn.move_call(
-                    target=f"{package_id}::payment_escrow::release_payment",
-                    arguments=[
-                        ObjectID(escrow_object_id),  # escrow 對象
-                        SuiString(str(trip_id))  # trip_id
-                    ]
-                )
+                def build(txn):
+                    # 調用合約的 release_payment 函數
+                    txn.move_call(
+                        target=f"{package_id}::payment_escrow::release_payment",
+                        arguments=[
+                            ObjectID(escrow_object_id),  # escrow 對象
+                            SuiString(str(trip_id))  # trip_id
+                        ]
+                    )
                 
-                # 執行交易
-                logger.info(f"📤 提交交易到 Sui 網絡...")
-                result = txn.execute(gas_budget="10000000")
+                # 執行交易（使用 gas coin 池中租用的 coin 支付 gas）
+                logger.info("📤 提交交易到 Sui 網絡...")
+                gas_budget = gas_budget_estimator.budget_for("payment_escrow", "release_payment")
+                async with gas_coin_pool.lease(gas_budget) as lease:
+                    started = time.perf_counter()
+                    result = await lease.execute(build, gas_budget)
                 
                 if result.is_ok():
                     tx_digest = result.result_data.digest
-                    logger.info(f"✅ 合約調用成功: {tx_digest}")
+                    logger.info("✅ 合約調用成功: %s", tx_digest)
+                    contract_performance_tracker.track(
+                        package_id, "payment_escrow", "release_payment", tx_digest, started, gas_budget=gas_budget
+                    )
                     
                     return {
                         "success": True,
@@ -574,6 +529,12 @@ class SuiService:
                     "success": False,
                     "error": "pysui SDK 未安裝，請運行: pip install pysui"
                 }
+            except GasPoolExhaustedError as e:
+                logger.error(f"❌ 沒有可用的 gas coin: {e}")
+                return {
+                    "success": False,
+                    "error": str(e)
+                }
             except Exception as e:
                 logger.error(f"❌ pysui 調用失敗: {e}")
                 # 如果 pysui 失敗，生成模擬交易
@@ -613,15 +574,15 @@ class SuiService:
             轉帳結果
         """
         try:
-            logger.info(f"💸 執行轉帳: {amount_mist} MIST → {to_address[:20]}...")
+            logger.info("💸 執行轉帳: %s MIST → %s...", amount_mist, to_address[:20])
             
             # 使用 pysui 或直接調用 RPC
             # 這裡需要使用 Sui SDK 來簽署和發送交易
             # 由於沒有安裝 pysui，我們先返回提示
             
             logger.warning(f"⚠️ 轉帳功能需要 Sui SDK 支持")
-            logger.info(f"   收款地址: {to_address}")
-            logger.info(f"   金額: {amount_mist} MIST ({amount_mist / 1_000_000_000} SUI)")
+            logger.info("   收款地址: %s", to_address)
+            logger.info("   金額: %s MIST (%s SUI)", amount_mist, amount_mist / 1_000_000_000)
             
             # TODO: 實現實際的 Sui 轉帳
             # 需要：
@@ -650,18 +611,13 @@ class SuiService:
         估算 Gas 費用
         
         Args:
-            transaction_type: 交易類型
+            transaction_type: 交易類型 (payment, release, refund, receipt)
             
         Returns:
-            估算的 Gas 費用 (micro IOTA)
+            估算的 Gas 費用 (MIST，依歷史交易的 p50；沒有資料時為預算)
         """
-        # 簡單的 Gas 費用估算
-        base_fee = 1000  # micro IOTA
-        
-        if transaction_type == "payment":
-            return base_fee * 2  # 支付交易稍微複雜
-        else:
-            return base_fee
+        module, function = GAS_FEE_FUNCTIONS.get(transaction_type, GAS_FEE_FUNCTIONS["payment"])
+        return gas_budget_estimator.expected_fee(module, function)
     
     # Mock 方法 (用於測試和開發)
     async def _mock_payment_execution(
@@ -0,0 +1,253 @@
+# backend/app/services/surge_service.py
+"""
+網格供需動態加價服務
+
+背景工作每隔數秒將未配對行程（需求）與可用車輛（供給）依上車座標分桶到網格，
+計算每個網格的加價倍率並存入記憶體表；請求路徑只做 O(1) 查表。
+"""
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, select
+
+from app.config import settings
+from app.services.location_service import LocationService
+
+logger = logging.getLogger(__name__)
+
+Cell = Tuple[int, int]
+
+
+@dataclass
+class CellStats:
+    """單一網格（含鄰近網格）的供需統計"""
+    demand: int
+    supply: int
+    multiplier: float
+    avg_supply_distance_km: Optional[float] = None
+
+
+@dataclass
+class SurgeSnapshot:
+    """某次計算的完整結果，整體替換以避免讀到半更新的表"""
+    cells: Dict[Cell, CellStats] = field(default_factory=dict)
+    computed_at: float = 0.0  # time.monotonic()
+    open_trips: int = 0
+    available_vehicles: int = 0
+
+
+class SurgeService:
+    """動態加價服務"""
+
+    def __init__(self):
+        self._snapshot = SurgeSnapshot()
+        self._task: Optional[asyncio.Task] = None
+
+    # ========================================================================
+    # 請求路徑：O(1) 查表
+    # ========================================================================
+
+    def is_fresh(self) -> bool:
+        """加價表是否在有效期內"""
+        snapshot = self._snapshot
+        return (
+            settings.SURGE_ENABLED
+            and snapshot.computed_at > 0
+            and time.monotonic() - snapshot.computed_at <= settings.SURGE_STALE_SECONDS
+        )
+
+    def get_cell_stats(self, lat: float, lng: float) -> Optional[CellStats]:
+        """取得座標所在網格的統計，表失效時返回 None"""
+        if not self.is_fresh():
+            return None
+        cell = LocationService.grid_cell(lat, lng, settings.SURGE_CELL_SIZE_DEG)
+        return self._snapshot.cells.get(cell)
+
+    def get_multiplier(self, lat: float, lng: float) -> float:
+        """取得座標的加價倍率，沒有資料時為 1.0"""
+        stats = self.get_cell_stats(lat, lng)
+        return stats.multiplier if stats else 1.0
+
+    # ========================================================================
+    # 計算
+    # ========================================================================
+
+    @staticmethod
+    def compute_multiplier(demand: int, supply: int) -> float:
+        """
+        依供需比計算倍率
+
+        需求/供給 超過門檻後線性加價，上限 SURGE_MAX_MULTIPLIER，並取到 0.1 避免倍率抖動
+        """
+        ratio = demand / max(supply, 1)
+        excess = ratio - settings.SURGE_RATIO_THRESHOLD
+        if excess <= 0:
+            return 1.0
+        multiplier = min(1.0 + settings.SURGE_SENSITIVITY * excess, settings.SURGE_MAX_MULTIPLIER)
+        return math.floor(multiplier * 10) / 10
+
+    @staticmethod
+    def build_snapshot(
+        demand_points: Iterable[Tuple[float, float]],
+        supply_points: Iterable[Tuple[float, float]],
+    ) -> SurgeSnapshot:
+        """
+        將需求與供給座標分桶並計算每個網格的倍率
+
+        每個網格的統計包含周圍 SURGE_NEIGHBOR_RING 圈網格，避免邊界附近的車輛被忽略
+        """
+        cell_size = settings.SURGE_CELL_SIZE_DEG
+        ring = settings.SURGE_NEIGHBOR_RING
+
+        demand_counts: Dict[Cell, int] = {}
+        supply_by_cell: Dict[Cell, list] = {}
+        open_trips = 0
+        available_vehicles = 0
+
+        for lat, lng in demand_points:
+            cell = LocationService.grid_cell(lat, lng, cell_size)
+            demand_counts[cell] = demand_counts.get(cell, 0) + 1
+            open_trips += 1
+
+        for lat, lng in supply_points:
+            cell = LocationService.grid_cell(lat, lng, cell_size)
+            supply_by_cell.setdefault(cell, []).append((lat, lng))
+            available_vehicles += 1
+
+        # 只有鄰近有需求或供給的網格才需要寫入
+        touched = set()
+        for cell in list(demand_counts) + list(supply_by_cell):
+            for d_lat in range(-ring, ring + 1):
+                for d_lng in range(-ring, ring + 1):
+                    touched.add((cell[0] + d_lat, cell[1] + d_lng))
+
+        cells: Dict[Cell, CellStats] = {}
+        for cell in touched:
+            demand = 0
+            nearby_supply = []
+            for d_lat in range(-ring, ring + 1):
+                for d_lng in range(-ring, ring + 1):
+                    neighbor = (cell[0] + d_lat, cell[1] + d_lng)
+                    demand += demand_counts.get(neighbor, 0)
+                    nearby_supply.extend(supply_by_cell.get(neighbor, ()))
+
+            avg_distance = None
+            if nearby_supply:
+                center_lat, center_lng = LocationService.grid_cell_center(cell, cell_size)
+                avg_distance = sum(
+                    LocationService.haversine_km(center_lat, center_lng, lat, lng)
+                    for lat, lng in nearby_supply
+                ) / len(nearby_supply)
+
+            cells[cell] = CellStats(
+                demand=demand,
+                supply=len(nearby_supply),
+                multiplier=SurgeService.compute_multiplier(demand, len(nearby_supply)),
+                avg_supply_distance_km=avg_distance,
+            )
+
+        return SurgeSnapshot(
+            cells=cells,
+            computed_at=time.monotonic(),
+            open_trips=open_trips,
+            available_vehicles=available_vehicles,
+        )
+
+    async def refresh(self) -> SurgeSnapshot:
+        """從資料庫讀取供需座標並替換加價表"""
+        from app.core.database import async_session_maker
+        from app.models.ride import Trip
+        from app.models.vehicle import Vehicle
+        from app.schemas.trip import TripStatus
+
+        since = datetime.utcnow() - timedelta(minutes=settings.SURGE_DEMAND_WINDOW_MINUTES)
+
+        async with async_session_maker() as session:
+            demand_result = await session.execute(
+                select(Trip.pickup_lat, Trip.pickup_lng).where(
+                    and_(
+                        Trip.status.in_([TripStatus.REQUESTED, TripStatus.MATCHED]),
+                        Trip.requested_at >= since,
+                    )
+                )
+            )
+            supply_result = await session.execute(
+                select(Vehicle.current_lat, Vehicle.current_lng).where(
+                    and_(
+                        Vehicle.status == "available",
+                        Vehicle.is_active == True,
+                        Vehicle.current_lat.is_not(None),
+                        Vehicle.current_lng.is_not(None),
+                    )
+                )
+            )
+            demand_points = demand_result.all()
+            supply_points = supply_result.all()
+
+        # 分桶是純 CPU 計算，資料量大時也只在背景工作中執行
+        snapshot = self.build_snapshot(demand_points, supply_points)
+        self._snapshot = snapshot
+        return snapshot
+
+    # ========================================================================
+    # 背景工作
+    # ========================================================================
+
+    async def _run(self):
+        while True:
+            try:
+                snapshot = await self.refresh()
+                surging = sum(1 for stats in snapshot.cells.values() if stats.multiplier > 1.0)
+                logger.debug(
+                    f"📈 Surge table refreshed: {len(snapshot.cells)} cells, {surging} surging, "
+                    f"{snapshot.open_trips} open trips, {snapshot.available_vehicles} vehicles"
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 更新失敗時保留舊表，超過 SURGE_STALE_SECONDS 後自動回到 1.0
+                logger.warning(f"⚠️ Surge table refresh failed: {e}")
+            await asyncio.sleep(settings.SURGE_REFRESH_SECONDS)
+
+    def start(self):
+        """啟動背景更新工作"""
+        if not settings.SURGE_ENABLED or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Surge pricing worker started (every {settings.SURGE_REFRESH_SECONDS}s)")
+
+    async def stop(self):
+        """停止背景更新工作"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("👋 Surge pricing worker stopped")
+
+    def get_status(self) -> Dict:
+        """加價表狀態摘要"""
+        snapshot = self._snapshot
+        age = time.monotonic() - snapshot.computed_at if snapshot.computed_at else None
+        return {
+            "enabled": settings.SURGE_ENABLED,
+            "fresh": self.is_fresh(),
+            "age_seconds": round(age, 1) if age is not None else None,
+            "cells": len(snapshot.cells),
+            "surging_cells": sum(1 for stats in snapshot.cells.values() if stats.multiplier > 1.0),
+            "open_trips": snapshot.open_trips,
+            "available_vehicles": snapshot.available_vehicles,
+        }
+
+
+# 全局實例
+surge_service = SurgeService()
@@ -0,0 +1,362 @@
+# backend/app/services/trip_partition_service.py
+"""
+行程月分區與冷資料歸檔
+
+trips 無限成長，進行中行程查詢、管理後台列表與儀表板都掃描（或索引）全部歷史。
+
+1. 轉換（migrate_to_partitioned，contracts/tools/monitoring/trip_partitions.py migrate）：
+   trips 改名為 trips_legacy，建立以 requested_at 做 RANGE 分區的 trips（主鍵改為
+   (trip_id, requested_at)，沿用序列、預設值、檢查條件、索引與對 users / vehicles 的外鍵），
+   依既有資料建立月分區與 trips_default 後整批複製，全程一個交易。
+   分區表的唯一鍵必須包含分區鍵，reviews / payment_transactions / refund_requests /
+   processed_payments 指向 trips(trip_id) 的外鍵會被移除。
+2. 維護（TripPartitionMaintainer 背景工作）：每 TRIP_PARTITION_MAINTENANCE_INTERVAL_SECONDS
+   預先建立 TRIP_PARTITION_MONTHS_AHEAD 個未來月分區；TRIP_ARCHIVE_AFTER_MONTHS > 0 時歸檔
+   更早的月分區。分區內仍有未結束的行程、處理中的支付或未決的退款申請時略過該月。
+   只歸檔行程本身：評價與付款紀錄留在原資料表（司機評分、付款歷史直接讀取它們），
+   trip_id 可能指向已歸檔的行程:
+   - detach: DETACH 後移到 trips_archive schema（不再被熱查詢與儀表板掃描）
+   - file: 同上，提交後再匯出為 TRIP_ARCHIVE_DIR 下的 gzip CSV，然後刪除
+
+trips 尚未分區時維護工作不做任何事。
+"""
+
+import asyncio
+import gzip
+import logging
+import os
+import re
+import time
+from datetime import date, datetime, timezone
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import column, text
+
+from app.config import settings
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SCHEMA = "trips_archive"
+DEFAULT_PARTITION = "trips_default"
+FINAL_STATUSES = ("completed", "cancelled")
+
+# 參照 trips(trip_id) 且仍在處理中的資料列：該月不歸檔
+IN_FLIGHT_CONDITIONS = {
+    "refund_requests": "status IN ('pending', 'on_hold')",
+    "processed_payments": "status IN ('processing', 'failed')",
+}
+
+_PARTITION_NAME = re.compile(r"^trips_p(\d{4})_(\d{2})$")
+
+trips_archived = metrics.registry.counter(
+    "trip_partitions_archived_total", "Monthly trip partitions archived", ("mode",),
+)
+
+
+def month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"trips_p{month.year:04d}_{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """分區名稱 -> 月份（非月分區時返回 None）"""
+    match = _PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def create_partition_sql(month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF trips "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+
+
+def archivable_months(partitions: List[str], now: datetime, after_months: int) -> List[date]:
+    """早於 after_months 個月的月分區（由舊到新）"""
+    if after_months <= 0:
+        return []
+    cutoff = add_months(month_start(now), -after_months)
+    months = [partition_month(name) for name in partitions]
+    return sorted(month for month in months if month and month < cutoff)
+
+
+async def is_partitioned(session) -> bool:
+    result = await session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('trips')"
+    ))
+    return result.scalar() is not None
+
+
+async def list_partitions(session) -> List[str]:
+    result = await session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('trips') ORDER BY c.relname"
+    ))
+    return [row[0] for row in result.all()]
+
+
+async def ensure_partitions(session, now: Optional[datetime] = None,
+                            months_ahead: Optional[int] = None) -> List[str]:
+    """
+    建立本月到未來 months_ahead 個月的分區（呼叫端提交交易）
+
+    Returns:
+        新建立的分區名稱
+    """
+    now = now or datetime.now(timezone.utc)
+    months_ahead = settings.TRIP_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    existing = set(await list_partitions(session))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(month_start(now), offset)
+        if partition_name(month) not in existing:
+            await session.execute(text(create_partition_sql(month)))
+            created.append(partition_name(month))
+    if created:
+        logger.info(f"🗓️ 已建立行程分區: {', '.join(created)}")
+    return created
+
+
+async def migrate_to_partitioned(session, months_ahead: Optional[int] = None) -> Dict[str, Any]:
+    """
+    將既有的 trips 轉換為月分區表（單一交易，期間 trips 無法讀寫）
+
+    Raises:
+        ValueError: trips 已分區，或 trips_legacy 已存在
+    """
+    if await is_partitioned(session):
+        raise ValueError("trips 已經是分區表")
+    if (await session.execute(text("SELECT to_regclass('trips_legacy')"))).scalar() is not None:
+        raise ValueError("trips_legacy 已存在，請先確認上次轉換的結果")
+
+    started = time.perf_counter()
+    # 整批複製不受連線層（interactive）的 statement_timeout 限制，只對本交易生效
+    await session.execute(text("SET LOCAL statement_timeout = 0"))
+    await session.execute(text("LOCK TABLE trips IN ACCESS EXCLUSIVE MODE"))
+    index_defs = (await session.execute(text(
+        "SELECT indexname, indexdef FROM pg_indexes "
+        "WHERE schemaname = current_schema() AND tablename = 'trips' AND indexname <> 'trips_pkey'"
+    ))).all()
+    own_fks = (await session.execute(text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = 'trips'::regclass AND contype = 'f'"
+    ))).all()
+    referencing_fks = (await session.execute(text(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE confrelid = 'trips'::regclass AND contype = 'f'"
+    ))).all()
+    bounds = (await session.execute(text("SELECT min(requested_at), count(*) FROM trips"))).one()
+
+    await session.execute(text("ALTER TABLE trips RENAME TO trips_legacy"))
+    await session.execute(text("ALTER TABLE trips_legacy RENAME CONSTRAINT trips_pkey TO trips_legacy_pkey"))
+    for name, _ in index_defs:
+        await session.execute(text(f'ALTER INDEX "{name}" RENAME TO "{name}_legacy"'))
+    for table, name in referencing_fks:
+        await session.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"'))
+
+    await session.execute(text(
+        "CREATE TABLE trips (LIKE trips_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS) "
+        "PARTITION BY RANGE (requested_at)"
+    ))
+    await session.execute(text("ALTER TABLE trips ADD CONSTRAINT trips_pkey PRIMARY KEY (trip_id, requested_at)"))
+    await session.execute(text("ALTER SEQUENCE trips_trip_id_seq OWNED BY trips.trip_id"))
+    for _, definition in index_defs:
+        await session.execute(text(definition))
+    for name, definition in own_fks:
+        await session.execute(text(f'ALTER TABLE trips ADD CONSTRAINT "{name}" {definition}'))
+
+    now = datetime.now(timezone.utc)
+    first = month_start(bounds[0]) if bounds[0] else month_start(now)
+    month, last = first, add_months(month_start(now), settings.TRIP_PARTITION_MONTHS_AHEAD
+                                    if months_ahead is None else months_ahead)
+    partitions = []
+    while month <= last:
+        await session.execute(text(create_partition_sql(month)))
+        partitions.append(partition_name(month))
+        month = add_months(month, 1)
+    await session.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF trips DEFAULT"))
+
+    await session.execute(text("INSERT INTO trips SELECT * FROM trips_legacy"))
+    copied = (await session.execute(text("SELECT count(*) FROM trips"))).scalar()
+    if copied != bounds[1]:
+        raise RuntimeError(f"複製筆數不符: trips_legacy {bounds[1]}，trips {copied}")
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"🗓️ trips 已轉換為 {len(partitions)} 個月分區（{copied} 筆，{elapsed:.1f}s）")
+    return {
+        "rows": copied,
+        "partitions": partitions,
+        "dropped_foreign_keys": [f"{table}.{name}" for table, name in referencing_fks],
+        "seconds": round(elapsed, 2),
+    }
+
+
+class TripPartitionMaintainer:
+    """定期建立未來月分區並歸檔舊分區"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._last_run: Optional[Dict] = None
+
+    async def write_archive_file(self, table: str) -> str:
+        """
+        以伺服器端游標將 trips_archive 中的一個資料表匯出為 gzip CSV
+
+        使用獨立的會話：asyncpg 的游標到交易結束才釋放，同一交易中無法再刪除該資料表
+        """
+        from app.core.database import route_session
+        from app.services.export_service import csv_chunks, stream_partitions
+
+        os.makedirs(settings.TRIP_ARCHIVE_DIR, exist_ok=True)
+        path = os.path.join(settings.TRIP_ARCHIVE_DIR, f"{table}.csv.gz")
+        partial_path = f"{path}.partial"
+        async with route_session("export") as session:
+            names = (await session.execute(text(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = :schema AND table_name = :table ORDER BY ordinal_position"
+            ), {"schema": ARCHIVE_SCHEMA, "table": table})).scalars().all()
+            with gzip.open(partial_path, "wb") as archive:
+                stmt = text(f"SELECT * FROM {ARCHIVE_SCHEMA}.{table}")
+                async for chunk in csv_chunks([column(name) for name in names], stream_partitions(session, stmt)):
+                    archive.write(chunk)
+        os.replace(partial_path, path)
+        return path
+
+    async def _in_flight(self, session, name: str) -> Dict[str, int]:
+        """參照此分區行程、仍在處理中的資料列數（依資料表）"""
+        in_flight = {}
+        for table, condition in IN_FLIGHT_CONDITIONS.items():
+            if (await session.execute(text("SELECT to_regclass(:table)"), {"table": table})).scalar() is None:
+                continue
+            count = (await session.execute(text(
+                f"SELECT count(*) FROM {table} WHERE {condition} AND trip_id IN (SELECT trip_id FROM {name})"
+            ))).scalar()
+            if count:
+                in_flight[table] = count
+        return in_flight
+
+    async def archive_month(self, session, month: date, mode: str) -> Dict[str, Any]:
+        """
+        將一個月分區移到 trips_archive（呼叫端提交交易；file 模式提交後呼叫 write_archive_files）
+
+        Returns:
+            {"partition", "status": archived / skipped, ...}
+        """
+        name = partition_name(month)
+        final = ", ".join(f"'{status}'" for status in FINAL_STATUSES)
+        open_trips = (await session.execute(text(
+            f"SELECT count(*) FROM {name} WHERE status NOT IN ({final})"
+        ))).scalar()
+        if open_trips:
+            logger.warning(f"⚠️ 分區 {name} 仍有 {open_trips} 筆未結束的行程，略過歸檔")
+            return {"partition": name, "status": "skipped", "open_trips": open_trips}
+
+        in_flight = await self._in_flight(session, name)
+        if in_flight:
+            logger.warning(f"⚠️ 分區 {name} 的行程仍有處理中的資料列 {in_flight}，略過歸檔")
+            return {"partition": name, "status": "skipped", "in_flight": in_flight}
+
+        rows = (await session.execute(text(f"SELECT count(*) FROM {name}"))).scalar()
+        await session.execute(text(f"ALTER TABLE trips DETACH PARTITION {name}"))
+        await session.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+        await session.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        trips_archived.inc(mode)
+        logger.info(f"🗄️ 已歸檔行程分區 {name}（{rows} 筆，{mode}）")
+        return {"partition": name, "status": "archived", "mode": mode, "rows": rows}
+
+    async def write_archive_files(self, session_maker, result: Dict[str, Any]) -> List[str]:
+        """file 模式：匯出已提交的歸檔分區後刪除（匯出失敗時資料仍保留在 trips_archive）"""
+        path = await self.write_archive_file(result["partition"])
+        async with session_maker() as session:
+            await session.execute(text(f"DROP TABLE {ARCHIVE_SCHEMA}.{result['partition']}"))
+            await session.commit()
+        return [path]
+
+    async def run_once(self, session_maker=None, now: Optional[datetime] = None,
+                       dry_run: bool = False) -> Dict[str, Any]:
+        """建立未來分區並歸檔舊分區（每個分區一個交易，預設使用 export 類別的逾時）"""
+        if session_maker is None:
+            from app.core.database import route_session
+            session_maker = partial(route_session, "export")
+
+        now = now or datetime.now(timezone.utc)
+        mode = settings.TRIP_ARCHIVE_MODE
+        if mode not in ("detach", "file"):
+            raise ValueError(f"未知的歸檔模式: {mode}")
+        summary: Dict[str, Any] = {"at": now.isoformat(), "partitioned": False, "created": [], "archived": []}
+        async with session_maker() as session:
+            if not await is_partitioned(session):
+                return summary
+            summary["partitioned"] = True
+            if not dry_run:
+                summary["created"] = await ensure_partitions(session, now)
+                await session.commit()
+            months = archivable_months(await list_partitions(session), now, settings.TRIP_ARCHIVE_AFTER_MONTHS)
+
+        if dry_run:
+            summary["archived"] = [{"partition": partition_name(month), "status": "pending"} for month in months]
+            return summary
+        for month in months:
+            async with session_maker() as session:
+                result = await self.archive_month(session, month, mode)
+                await session.commit()
+            if mode == "file" and result["status"] == "archived":
+                result["paths"] = await self.write_archive_files(session_maker, result)
+            summary["archived"].append(result)
+        self._last_run = summary
+        return summary
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Trip partition maintenance failed: {e}")
+            await asyncio.sleep(settings.TRIP_PARTITION_MAINTENANCE_INTERVAL_SECONDS)
+
+    def start(self):
+        """啟動背景分區維護"""
+        if not settings.TRIP_PARTITION_MAINTENANCE_ENABLED or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Trip partition maintenance started (every {settings.TRIP_PARTITION_MAINTENANCE_INTERVAL_SECONDS}s)")
+
+    async def stop(self):
+        """停止背景分區維護"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def get_status(self, session) -> Dict[str, Any]:
+        partitioned = await is_partitioned(session)
+        partitions = await list_partitions(session) if partitioned else []
+        return {
+            "enabled": settings.TRIP_PARTITION_MAINTENANCE_ENABLED,
+            "running": self._task is not None,
+            "partitioned": partitioned,
+            "partitions": partitions,
+            "archive_after_months": settings.TRIP_ARCHIVE_AFTER_MONTHS,
+            "archive_mode": settings.TRIP_ARCHIVE_MODE,
+            "last_run": self._last_run,
+        }
+
+
+# 全局實例
+trip_partition_maintainer = TripPartitionMaintainer()
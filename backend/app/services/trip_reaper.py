@@ -0,0 +1,181 @@
+# backend/app/services/trip_reaper.py
+"""
+逾時行程清理
+
+REQUESTED 超過 TRIP_MAX_WAIT_TIME_MINUTES 沒有司機接單、或 ACCEPTED 超過
+STALE_ACCEPTED_TRIP_MINUTES 仍未鎖定託管（乘客沒有簽署）的行程會一直被視為進行中，
+擋住 _get_user_active_trip 並留在 /trips/available 的掃描範圍內。原本只能以
+scripts/ops/cancel_stuck_trip.sh 逐筆手動取消。
+
+背景工作每 TRIP_REAPER_INTERVAL_SECONDS 秒清理一次：依 (status, requested_at) 索引
+每批最多 TRIP_REAPER_BATCH_SIZE 筆取消並釋放車輛，每批一個交易。ACCEPTED 從接單時間
+（matched_at，舊資料沒有時為 requested_at）起算；接單不早於叫車，requested_at 的條件仍可使用索引。
+FOR UPDATE SKIP LOCKED 讓清理不會等待（或覆蓋）正在被接單 / 取消的行程。
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, func, select, update
+
+from app.config import settings
+from app.core import metrics
+from app.models.ride import Trip
+from app.models.vehicle import Vehicle
+
+logger = logging.getLogger(__name__)
+
+trips_reaped = metrics.registry.counter(
+    "stale_trips_reaped_total", "Stale trips cancelled by the reaper", ("status",),
+)
+trip_reaper_sweep = metrics.registry.histogram(
+    "trip_reaper_sweep_seconds", "Duration of a stale trip sweep",
+)
+
+
+@dataclass(frozen=True)
+class StaleRule:
+    """一種逾時行程：狀態、逾時分鐘數、取消原因"""
+    status: str
+    minutes: float
+    reason: str
+    requires_no_escrow: bool = False
+    since_matched: bool = False  # 從 matched_at 起算
+
+    def condition(self, now: datetime):
+        cutoff = now - timedelta(minutes=self.minutes)
+        clauses = [Trip.status == self.status, Trip.requested_at < cutoff]
+        if self.since_matched:
+            clauses.append(func.coalesce(Trip.matched_at, Trip.requested_at) < cutoff)
+        if self.requires_no_escrow:
+            clauses.append(Trip.escrow_object_id.is_(None))
+        return and_(*clauses)
+
+
+def default_rules() -> List[StaleRule]:
+    return [
+        StaleRule("requested", settings.TRIP_MAX_WAIT_TIME_MINUTES, "逾時未配對，系統自動取消"),
+        StaleRule("accepted", settings.STALE_ACCEPTED_TRIP_MINUTES, "逾時未鎖定支付，系統自動取消",
+                  requires_no_escrow=True, since_matched=True),
+    ]
+
+
+class TripReaper:
+    """定期取消逾時的行程"""
+
+    def __init__(self, batch_size: Optional[int] = None, max_batches: Optional[int] = None):
+        self.batch_size = batch_size or settings.TRIP_REAPER_BATCH_SIZE
+        self.max_batches = max_batches or settings.TRIP_REAPER_MAX_BATCHES
+        self._task: Optional[asyncio.Task] = None
+        self._last_sweep: Optional[Dict] = None
+
+    async def reap_batch(self, session, rule: StaleRule, now: datetime) -> int:
+        """
+        取消一批逾時行程並釋放車輛（呼叫端提交交易）
+
+        Returns:
+            取消的行程數
+        """
+        stale = (
+            select(Trip.trip_id)
+            .where(rule.condition(now))
+            .order_by(Trip.requested_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            update(Trip)
+            .where(Trip.trip_id.in_(stale.scalar_subquery()))
+            .values(status="cancelled", cancelled_at=now, cancellation_reason=rule.reason)
+            .returning(Trip.trip_id, Trip.vehicle_id)
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+        vehicle_ids = [row.vehicle_id for row in rows if row.vehicle_id]
+        if vehicle_ids:
+            await session.execute(
+                update(Vehicle)
+                .where(and_(Vehicle.vehicle_id.in_(vehicle_ids), Vehicle.status == "on_trip"))
+                .values(status="available")
+                .execution_options(synchronize_session=False)
+            )
+        return len(rows)
+
+    async def sweep(self, session_maker=None) -> Dict[str, int]:
+        """
+        清理一輪：每種逾時行程分批處理，直到不足一批或達到 TRIP_REAPER_MAX_BATCHES
+
+        Returns:
+            {status: 取消數}
+        """
+        if session_maker is None:
+            from app.core.database import async_session_maker as session_maker
+
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        reaped: Dict[str, int] = {}
+        for rule in default_rules():
+            total = 0
+            for _ in range(self.max_batches):
+                async with session_maker() as session:
+                    count = await self.reap_batch(session, rule, now)
+                    await session.commit()
+                total += count
+                if count < self.batch_size:
+                    break
+            if total:
+                trips_reaped.inc(rule.status, amount=total)
+                logger.info("🧹 已取消 %s 筆逾時的 %s 行程", total, rule.status)
+            reaped[rule.status] = total
+
+        elapsed = time.perf_counter() - started
+        trip_reaper_sweep.observe(elapsed)
+        self._last_sweep = {"at": now.isoformat(), "seconds": round(elapsed, 3), "reaped": reaped}
+        return reaped
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Stale trip sweep failed: {e}")
+            await asyncio.sleep(settings.TRIP_REAPER_INTERVAL_SECONDS)
+
+    def start(self):
+        """啟動背景清理工作"""
+        if not settings.TRIP_REAPER_ENABLED or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Stale trip reaper started (every {settings.TRIP_REAPER_INTERVAL_SECONDS}s)")
+
+    async def stop(self):
+        """停止背景清理工作"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_status(self) -> Dict:
+        return {
+            "enabled": settings.TRIP_REAPER_ENABLED,
+            "running": self._task is not None,
+            "rules": [
+                {"status": rule.status, "minutes": rule.minutes, "requires_no_escrow": rule.requires_no_escrow}
+                for rule in default_rules()
+            ],
+            "last_sweep": self._last_sweep,
+        }
+
+
+# 全局實例
+trip_reaper = TripReaper()
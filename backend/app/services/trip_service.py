@@ -5,11 +5,15 @@ Trip 業務邏輯服務 - 重構版
 """
 
 import logging
+import time
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, func, desc
 
+from app.config import settings
+from app.core import metrics
+from app.core.cache import SingleFlightTTLCache
 from app.models.ride import Trip
 from app.models.user import User
 from app.models.vehicle import Vehicle
@@ -17,27 +21,37 @@ from app.schemas.trip import (
     TripCreate, TripResponse, TripStatus, TripFareBreakdown, 
     TripEstimate, DriverTripInfo, TripSummary
 )
+from app.services.chain_event_service import ChainEventService, LockCriteria
 from app.services.location_service import LocationService
 from app.services.escrow_service import EscrowService  # 新的託管服務
+from app.services.gas_coin_pool import gas_coin_pool
+from app.services.payment_registry import expected_amount_mist
+from app.services.surge_service import surge_service
+from app.services.speed_table import speed_table_service, hour_of_week
+from app.services.pricing_service import pricing_service
 
 logger = logging.getLogger(__name__)
 
+# 行程預估快取（進程內共用，地圖拖動時大量重複的預估請求只計算一次）
+estimate_cache = SingleFlightTTLCache(
+    ttl_seconds=settings.ESTIMATE_CACHE_TTL_SECONDS,
+    max_entries=settings.ESTIMATE_CACHE_MAX_ENTRIES
+)
+
 class TripService:
     """行程服務 - 業務邏輯完全在後端"""
     
     def __init__(self, db: AsyncSession):
         self.db = db
         self.escrow_service = EscrowService()
+        self.chain_events = ChainEventService(db)
         
-        # 費率配置 (micro IOTA)
-        self.BASE_FARE = 50000  # 起跳價
-        self.PER_KM_RATE = 10000  # 每公里費率
-        self.PER_MINUTE_RATE = 1000  # 每分鐘費率
-        self.PLATFORM_FEE_RATE = 0.1  # 平台費率 10%
+        # 費率由 pricing_service 的車型費率表統一管理 (micro IOTA)
+        self.pricing = pricing_service
         
         # 配對參數
         self.MAX_PICKUP_DISTANCE_KM = 10.0
-        self.MAX_WAIT_TIME_MINUTES = 15
+        self.MAX_WAIT_TIME_MINUTES = settings.TRIP_MAX_WAIT_TIME_MINUTES  # 逾時由 trip_reaper 取消
     
     # ========================================================================
     # 行程創建 - 純後端邏輯，不調用合約
@@ -63,8 +77,13 @@ class TripService:
             trip_data.dropoff_lat, trip_data.dropoff_lng
         )
         
-        estimated_duration = LocationService.estimate_travel_time_minutes(distance_km)
-        fare_breakdown = self._calculate_fare(distance_km, estimated_duration)
+        estimated_duration = speed_table_service.estimate_travel_time_minutes(
+            distance_km, trip_data.pickup_lat, trip_data.pickup_lng
+        )
+        surge_multiplier = surge_service.get_multiplier(trip_data.pickup_lat, trip_data.pickup_lng)
+        fare_breakdown = self._calculate_fare(
+            distance_km, estimated_duration, surge_multiplier, trip_data.preferred_vehicle_type
+        )
         
         # 創建本地行程記錄
         trip = Trip(
@@ -83,6 +102,8 @@ class TripService:
             per_km_rate=fare_breakdown.per_km_rate / 1000000,
             service_fee=fare_breakdown.platform_fee / 1000000,
             fare=fare_breakdown.total_amount / 1000000,
+            surge_multiplier=surge_multiplier,
+            pricing_vehicle_type=fare_breakdown.vehicle_type,
             requested_at=datetime.utcnow()
         )
         
@@ -97,7 +118,7 @@ class TripService:
         # except Exception as e:
         #     logger.warning(f"自動配對失敗: {e}")
         
-        logger.info(f"✅ 行程創建成功 (後端): {trip.trip_id}")
+        logger.info("✅ 行程創建成功 (後端): %s", trip.trip_id)
         return await self._build_trip_response(trip, fare_breakdown)
     
     # ========================================================================
@@ -124,10 +145,10 @@ class TripService:
         )
         
         if not available_matches:
-            logger.info(f"未找到可用司機: trip {trip_id}")
+            logger.info("未找到可用司機: trip %s", trip_id)
             return None
         
-        # 選擇最佳匹配 (距離最近)
+        # 選擇最佳匹配 (預估到達時間最短)
         best_match = available_matches[0]
         
         # 直接更新資料庫 - 不調用合約
@@ -138,7 +159,7 @@ class TripService:
         
         await self.db.commit()
         
-        logger.info(f"✅ 配對成功 (後端): trip {trip_id} <- driver {best_match['driver_id']}")
+        logger.info("✅ 配對成功 (後端): trip %s <- driver %s", trip_id, best_match['driver_id'])
         
         return DriverTripInfo(
             trip_id=trip.trip_id,
@@ -197,7 +218,7 @@ class TripService:
         
         # 計算支付金額
         total_amount = int(trip.fare * 1000000)  # 轉為 micro IOTA
-        platform_fee = int(total_amount * self.PLATFORM_FEE_RATE)
+        platform_fee = int(total_amount * self.pricing.rates.platform_fee_rate)
         
         # 準備鏈上支付鎖定
         escrow_result = await self.escrow_service.lock_payment(
@@ -208,8 +229,9 @@ class TripService:
             platform_fee=platform_fee
         )
         
-        # 更新行程狀態 (等待支付鎖定確認)
+        # 更新行程狀態 (等待支付鎖定確認)；逾時清理從接單時間起算
         trip.status = TripStatus.ACCEPTED
+        trip.matched_at = datetime.utcnow()
         
         # 更新車輛狀態
         if trip.vehicle_id:
@@ -219,7 +241,7 @@ class TripService:
         
         await self.db.commit()
         
-        logger.info(f"✅ 司機接受行程: {trip_id}, 等待支付鎖定")
+        logger.info("✅ 司機接受行程: %s, 等待支付鎖定", trip_id)
         
         return {
             "trip": await self._build_trip_response(trip),
@@ -242,16 +264,25 @@ class TripService:
         新增功能:
         - 接收前端提交的 escrow_object_id
         - 更新到行程記錄中
+        - 事件索引已有此行程符合的鎖定事件（乘客 / 司機 / 金額）時，提交的 ID 必須與之相符；
+          提交的託管已被索引但內容不符時拒絕
         """
         trip = await self._get_trip_by_id(trip_id)
         if not trip:
             raise ValueError("行程不存在")
         
+        criteria = await self._lock_criteria(trip)
+        indexed_lock = await self.chain_events.find_lock(trip_id, criteria)
+        if indexed_lock and escrow_object_id not in (indexed_lock.object_id, indexed_lock.tx_digest):
+            raise ValueError(f"託管對象與鏈上鎖定記錄不符: {indexed_lock.object_id}")
+        if indexed_lock is None and await self.chain_events.get_escrow_state(trip_id, escrow_object_id):
+            raise ValueError("託管的付款人、司機或金額與行程不符")
+        
         # 保存託管對象ID
         trip.escrow_object_id = escrow_object_id
         await self.db.commit()
         
-        logger.info(f"✅ 支付鎖定確認: trip {trip_id}, escrow {escrow_object_id}")
+        logger.info("✅ 支付鎖定確認: trip %s, escrow %s", trip_id, escrow_object_id)
         
         return await self._build_trip_response(trip)
     
@@ -278,7 +309,7 @@ class TripService:
         
         await self.db.commit()
         
-        logger.info(f"✅ 乘客已上車: trip {trip_id}")
+        logger.info("✅ 乘客已上車: trip %s", trip_id)
         
         return await self._build_trip_response(trip)
     
@@ -315,8 +346,11 @@ class TripService:
         else:
             actual_duration = trip.estimated_duration_minutes
         
-        # 重新計算最終費用
-        fare_breakdown = self._calculate_fare(trip.distance_km, actual_duration)
+        # 重新計算最終費用（沿用叫車時鎖定的加價倍率）
+        fare_breakdown = self._calculate_fare(
+            trip.distance_km, actual_duration, trip.surge_multiplier or 1.0, trip.pricing_vehicle_type,
+            existing=True
+        )
         
         # 檢查是否有託管記錄
         if not trip.escrow_object_id:
@@ -326,19 +360,34 @@ class TripService:
         driver = await self._get_user_by_id(driver_id)
         passenger = await self._get_user_by_id(trip.user_id)
         
-        logger.info(f"🚗 開始完成行程 {trip_id}，司機: {driver.username}，乘客: {passenger.username}")
-        logger.info(f"💰 託管對象ID: {trip.escrow_object_id}")
+        logger.info("🚗 開始完成行程 %s，司機: %s，乘客: %s", trip_id, driver.username, passenger.username)
+        logger.info("💰 託管對象ID: %s", trip.escrow_object_id)
         
         # 計算司機實際收益（扣除平台費用）
         driver_earnings_mist = fare_breakdown.driver_amount * 1000  # micro SUI -> MIST
         
-        # 調用鏈上支付釋放
-        release_result = await self.escrow_service.release_payment(
-            escrow_object_id=trip.escrow_object_id,
-            driver_wallet=driver.wallet_address,
-            trip_id=trip.trip_id,
-            amount_mist=driver_earnings_mist
+        # 先查事件索引；索引尚未追上時 release_payment 退回以 RPC 確認鎖定交易
+        escrow_state = await self.chain_events.get_escrow_state(
+            trip_id, trip.escrow_object_id, await self._lock_criteria(trip)
         )
+        if escrow_state is None and await self.chain_events.get_escrow_state(trip_id, trip.escrow_object_id):
+            raise ValueError("託管的付款人、司機或金額與行程不符，無法完成")
+        if escrow_state and escrow_state["state"] == "refunded":
+            raise ValueError("此行程的託管已退款，無法完成")
+        
+        if escrow_state and escrow_state["state"] == "released":
+            # 先前的完成請求已釋放支付（例如提交後逾時重試），不重複調用合約
+            logger.info("♻️ 託管已於鏈上釋放: trip %s, tx %s", trip_id, escrow_state["release_tx"])
+            release_result = {"success": True, "transaction_hash": escrow_state["release_tx"]}
+        else:
+            # 調用鏈上支付釋放
+            release_result = await self.escrow_service.release_payment(
+                escrow_object_id=trip.escrow_object_id,
+                driver_wallet=driver.wallet_address,
+                trip_id=trip.trip_id,
+                amount_mist=driver_earnings_mist,
+                lock_verified=escrow_state is not None
+            )
         
         if not release_result.get("success"):
             error_msg = release_result.get('error', '未知錯誤')
@@ -346,7 +395,7 @@ class TripService:
             raise Exception(f"支付釋放失敗: {error_msg}")
         
         blockchain_tx_id = release_result.get("transaction_hash")
-        logger.info(f"✅ 支付已成功釋放給司機，交易Hash: {blockchain_tx_id}")
+        logger.info("✅ 支付已成功釋放給司機，交易Hash: %s", blockchain_tx_id)
         
         # 更新行程狀態
         trip.status = TripStatus.COMPLETED
@@ -369,7 +418,7 @@ class TripService:
                 # 更新車輛收益
                 current_earnings = int(vehicle.total_earnings_micro_iota or 0)
                 vehicle.total_earnings_micro_iota = str(current_earnings + driver_earnings_micro)
-                logger.info(f"💰 車輛收益更新: +{driver_earnings_micro} micro SUI")
+                logger.info("💰 車輛收益更新: +%s micro SUI", driver_earnings_micro)
         
         # 更新用戶統計和收益
         passenger.total_rides_as_passenger += 1
@@ -380,7 +429,7 @@ class TripService:
         
         await self.db.commit()
         
-        logger.info(f"✅ 行程完成: trip {trip_id}, tx {release_result.get('transaction_hash')}")
+        logger.info("✅ 行程完成: trip %s, tx %s", trip_id, release_result.get('transaction_hash'))
         
         # 可選: 創建鏈上收據
         receipt_result = None
@@ -396,7 +445,7 @@ class TripService:
                 distance_km=int(trip.distance_km * 1000),  # 轉為米
                 final_amount=fare_breakdown.total_amount
             )
-            logger.info(f"✅ 鏈上收據已創建: {receipt_result.get('receipt_id')}")
+            logger.info("✅ 鏈上收據已創建: %s", receipt_result.get('receipt_id'))
         except Exception as e:
             logger.warning(f"創建鏈上收據失敗 (不影響行程): {e}")
         
@@ -442,7 +491,7 @@ class TripService:
                     escrow_object_id=trip.escrow_object_id,
                     requester_wallet=await self._get_user_wallet(user_id)
                 )
-                logger.info(f"✅ 已觸發退款: trip {trip_id}")
+                logger.info("✅ 已觸發退款: trip %s", trip_id)
             except Exception as e:
                 logger.error(f"退款失敗: {e}")
         
@@ -459,7 +508,7 @@ class TripService:
         
         await self.db.commit()
         
-        logger.info(f"✅ 行程已取消: trip {trip_id} by {cancelled_by}")
+        logger.info("✅ 行程已取消: trip %s by %s", trip_id, cancelled_by)
         
         return await self._build_trip_response(trip)
     
@@ -467,18 +516,53 @@ class TripService:
     # 預估行程 - 純後端
     # ========================================================================
     
+    async def get_cached_trip_estimate(self, pickup_lat: float, pickup_lng: float,
+                                       dropoff_lat: float, dropoff_lng: float) -> TripEstimate:
+        """
+        獲取行程預估 (快取版)
+        
+        以量化後的上下車網格為 key，TTL 內相同網格直接返回，並行的相同請求共用一次計算
+        """
+        if not settings.ESTIMATE_CACHE_ENABLED:
+            return await self.get_trip_estimate(pickup_lat, pickup_lng, dropoff_lat, dropoff_lng)
+        
+        cell_size = settings.ESTIMATE_CACHE_CELL_DEG
+        key = (
+            LocationService.grid_cell(pickup_lat, pickup_lng, cell_size),
+            LocationService.grid_cell(dropoff_lat, dropoff_lng, cell_size)
+        )
+        return await estimate_cache.get_or_compute(
+            key,
+            lambda: self.get_trip_estimate(pickup_lat, pickup_lng, dropoff_lat, dropoff_lng)
+        )
+    
     async def get_trip_estimate(self, pickup_lat: float, pickup_lng: float, 
                                dropoff_lat: float, dropoff_lng: float) -> TripEstimate:
         """獲取行程預估"""
         distance_km = LocationService.haversine_km(pickup_lat, pickup_lng, dropoff_lat, dropoff_lng)
-        duration_minutes = LocationService.estimate_travel_time_minutes(distance_km)
-        fare_breakdown = self._calculate_fare(distance_km, duration_minutes)
+        duration_minutes = speed_table_service.estimate_travel_time_minutes(distance_km, pickup_lat, pickup_lng)
+        
+        # 優先使用背景計算好的網格供需表，避免每次預估都掃描全部司機
+        cell_stats = surge_service.get_cell_stats(pickup_lat, pickup_lng)
+        if surge_service.is_fresh():
+            surge_multiplier = cell_stats.multiplier if cell_stats else 1.0
+            vehicles_count = cell_stats.supply if cell_stats else 0
+            avg_distance = cell_stats.avg_supply_distance_km if cell_stats else None
+        else:
+            surge_multiplier = 1.0
+            available_vehicles = await self._find_available_drivers(pickup_lat, pickup_lng, self.MAX_PICKUP_DISTANCE_KM)
+            vehicles_count = len(available_vehicles)
+            avg_distance = (
+                sum(v["distance_km"] for v in available_vehicles) / vehicles_count
+                if available_vehicles else None
+            )
         
-        available_vehicles = await self._find_available_drivers(pickup_lat, pickup_lng, self.MAX_PICKUP_DISTANCE_KM)
+        # 一次算出所有車型的報價，estimated_fare 為預設車型
+        quotes = self.pricing.quote_all(distance_km, duration_minutes, surge_multiplier)
+        fare_breakdown = quotes[self.pricing.rates.default_vehicle_type]
         
-        if available_vehicles:
-            avg_distance = sum(v["distance_km"] for v in available_vehicles) / len(available_vehicles)
-            wait_time = max(3, int(avg_distance * 2))
+        if vehicles_count and avg_distance is not None:
+            wait_time = max(3, speed_table_service.estimate_travel_time_minutes(avg_distance, pickup_lat, pickup_lng))
         else:
             wait_time = self.MAX_WAIT_TIME_MINUTES
         
@@ -486,7 +570,8 @@ class TripService:
             estimated_distance_km=distance_km,
             estimated_duration_minutes=duration_minutes,
             estimated_fare=fare_breakdown,
-            available_vehicles_count=len(available_vehicles),
+            quotes=quotes,
+            available_vehicles_count=vehicles_count,
             estimated_wait_time_minutes=wait_time
         )
     
@@ -494,30 +579,11 @@ class TripService:
     # 私有輔助方法
     # ========================================================================
     
-    def _calculate_fare(self, distance_km: float, duration_minutes: int) -> TripFareBreakdown:
-        """計算費用"""
-        base_fare = self.BASE_FARE
-        distance_fare = int(distance_km * self.PER_KM_RATE)
-        time_fare = int(duration_minutes * self.PER_MINUTE_RATE)
-        
-        subtotal = base_fare + distance_fare + time_fare
-        platform_fee = int(subtotal * self.PLATFORM_FEE_RATE)
-        total_amount = subtotal + platform_fee
-        driver_amount = total_amount - platform_fee
-        
-        return TripFareBreakdown(
-            base_fare=base_fare,
-            distance_fare=distance_fare,
-            time_fare=time_fare,
-            platform_fee=platform_fee,
-            total_amount=total_amount,
-            driver_amount=driver_amount,
-            distance_km=distance_km,
-            duration_minutes=duration_minutes,
-            per_km_rate=self.PER_KM_RATE,
-            per_minute_rate=self.PER_MINUTE_RATE,
-            platform_fee_rate=self.PLATFORM_FEE_RATE
-        )
+    def _calculate_fare(self, distance_km: float, duration_minutes: int,
+                        surge_multiplier: float = 1.0, vehicle_type: Optional[str] = None,
+                        existing: bool = False) -> TripFareBreakdown:
+        """計算費用（依車型費率表，加價倍率套用在起跳價、距離與時間費用上；existing 見 PricingService.quote）"""
+        return self.pricing.quote(distance_km, duration_minutes, surge_multiplier, vehicle_type, existing=existing)
     
     async def _get_trip_by_id(self, trip_id: int) -> Optional[Trip]:
         """根據ID獲取行程"""
@@ -537,6 +603,20 @@ class TripService:
         result = await self.db.execute(stmt)
         return result.scalar_one_or_none()
     
+    async def _lock_criteria(self, trip: Trip) -> LockCriteria:
+        """
+        行程可接受的鎖定事件：乘客錢包（自行鎖定）或操作錢包（代付）送出、
+        司機為行程司機、金額為行程車費（尚未計算車費時拋出 ValueError）
+        """
+        amount_mist = expected_amount_mist(trip.fare)
+        passenger = await self._get_user_by_id(trip.user_id)
+        driver = await self._get_user_by_id(trip.driver_id) if trip.driver_id else None
+        return LockCriteria.of(
+            [passenger.wallet_address if passenger else None, *gas_coin_pool.operator_addresses()],
+            driver.wallet_address if driver else None,
+            amount_mist,
+        )
+    
     async def _get_driver_vehicles(self, driver_id: int) -> list:
         """獲取司機的車輛列表"""
         from app.models.vehicle import Vehicle
@@ -557,6 +637,7 @@ class TripService:
             TripStatus.REQUESTED, TripStatus.MATCHED, TripStatus.ACCEPTED, 
             TripStatus.PICKED_UP, TripStatus.IN_PROGRESS
         ]
+        # 不加叫車時間下限：逾時清理不處理 MATCHED / PICKED_UP / IN_PROGRESS，舊的進行中行程仍須擋住新叫車
         stmt = select(Trip).where(
             and_(
                 or_(Trip.user_id == user_id, Trip.driver_id == user_id),
@@ -568,6 +649,7 @@ class TripService:
     
     async def _find_available_drivers(self, lat: float, lng: float, radius_km: float) -> List[Dict[str, Any]]:
         """查找附近可用司機"""
+        started = time.perf_counter()
         stmt = select(Vehicle, User).join(User, Vehicle.owner_id == User.id).where(
             and_(
                 Vehicle.status == "available",
@@ -580,18 +662,21 @@ class TripService:
         vehicles_and_drivers = result.all()
         
         matches = []
+        speed_table = speed_table_service.table
+        current_hour = hour_of_week()
         for vehicle, driver in vehicles_and_drivers:
             if vehicle.current_lat and vehicle.current_lng:
+                origin_lat, origin_lng = vehicle.current_lat, vehicle.current_lng
                 distance_km = LocationService.haversine_km(
                     lat, lng, vehicle.current_lat, vehicle.current_lng
                 )
             else:
-                import time
                 minute_bucket = int(time.time() // 60)
                 rand_lat, rand_lng = LocationService.random_point_near(
                     lat, lng, radius_km=radius_km,
                     seed=f"{vehicle.vehicle_id}-{minute_bucket}"
                 )
+                origin_lat, origin_lng = rand_lat, rand_lng
                 distance_km = LocationService.haversine_km(lat, lng, rand_lat, rand_lng)
             
             if distance_km <= radius_km:
@@ -602,17 +687,27 @@ class TripService:
                     "passenger_name": driver.username,
                     "passenger_phone": driver.phone_number,
                     "distance_km": distance_km,
+                    "eta_minutes": speed_table.estimate_travel_time_minutes(
+                        distance_km, origin_lat, origin_lng, current_hour
+                    ),
                     "vehicle_model": vehicle.model,
                     "vehicle_type": vehicle.vehicle_type
                 })
         
-        matches.sort(key=lambda x: x["distance_km"])
+        # 依歷史車速估算的到達時間排序，距離相同時較近者優先
+        matches.sort(key=lambda x: (x["eta_minutes"], x["distance_km"]))
+        
+        metrics.matching_duration.observe(time.perf_counter() - started)
+        metrics.matching_candidates.observe(len(matches))
         return matches
     
     async def _build_trip_response(self, trip: Trip, fare_breakdown: Optional[TripFareBreakdown] = None) -> TripResponse:
         """構建行程響應對象"""
         if not fare_breakdown and trip.distance_km and trip.estimated_duration_minutes:
-            fare_breakdown = self._calculate_fare(trip.distance_km, trip.estimated_duration_minutes)
+            fare_breakdown = self._calculate_fare(
+                trip.distance_km, trip.estimated_duration_minutes,
+                trip.surge_multiplier or 1.0, trip.pricing_vehicle_type, existing=True
+            )
         
         return TripResponse(
             trip_id=trip.trip_id,
@@ -0,0 +1,164 @@
+# backend/app/services/vehicle_service.py
+"""
+車隊批次上架
+
+單筆註冊（POST /vehicles/）每輛車兩次唯一性查詢、一次 INSERT 與一次同步的鏈上註冊；
+車隊業者一次上架數千輛車要數小時。批次上架:
+
+1. 逐列以 VehicleCreate 驗證（JSON 陣列或 CSV），並找出批次內重複的車輛ID / 車牌
+2. 一次查詢比對已存在的車輛ID與車牌
+3. 多列 INSERT ... ON CONFLICT DO NOTHING RETURNING（每次 VEHICLE_BULK_INSERT_CHUNK 列），
+   與其他請求競爭而衝突的列回報為 conflict
+4. 新車輛的鏈上註冊以多列 INSERT 寫入同一個交易的 chain_outbox，由 chain_outbox_worker
+   經 settlement_batcher 合併為 PTB 送出並寫回 blockchain_object_id（見 outbox_service.py）
+"""
+
+import csv
+import hashlib
+import io
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import settings
+from app.models.vehicle import Vehicle
+from app.schemas.vehicle import VehicleCreate
+from app.services.outbox_service import enqueue_many, vehicle_registration
+
+logger = logging.getLogger(__name__)
+
+# CSV 欄位（與 VehicleCreate 相同，空字串視為未提供）
+CSV_FIELDS = (
+    "vehicle_id", "plate_number", "model", "vehicle_type", "battery_capacity_kwh", "hourly_rate",
+    "current_charge_percent", "current_lat", "current_lng", "blockchain_object_id",
+)
+
+
+def parse_vehicle_csv(text: str) -> List[Dict[str, Any]]:
+    """CSV（第一列為欄位名稱）-> 每列一個 dict"""
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    if not reader.fieldnames or "vehicle_id" not in reader.fieldnames:
+        raise ValueError(f"CSV 缺少欄位名稱列，可用欄位: {', '.join(CSV_FIELDS)}")
+    unknown = set(reader.fieldnames) - set(CSV_FIELDS)
+    if unknown:
+        raise ValueError(f"CSV 含有未知欄位: {', '.join(sorted(unknown))}")
+    return [{key: value for key, value in row.items() if value not in (None, "")} for row in reader]
+
+
+def vehicle_data_hash(vehicle: VehicleCreate) -> bytes:
+    """鏈上 Vehicle.vehicle_data_hash：車輛ID、車牌、車型與費率的 SHA-256"""
+    data = f"{vehicle.vehicle_id}|{vehicle.plate_number}|{vehicle.vehicle_type}|{vehicle.hourly_rate}"
+    return hashlib.sha256(data.encode()).digest()
+
+
+def _validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+class VehicleOnboardingService:
+    """車輛批次上架"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def validate(self, rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Tuple[int, VehicleCreate]]]:
+        """
+        逐列驗證並排除批次內重複
+
+        Returns:
+            (每列結果，通過驗證的 (列號, VehicleCreate))
+        """
+        results: List[Dict[str, Any]] = []
+        valid: List[Tuple[int, VehicleCreate]] = []
+        seen_ids, seen_plates = {}, {}
+        for row, data in enumerate(rows):
+            result = {"row": row, "vehicle_id": data.get("vehicle_id") if isinstance(data, dict) else None}
+            results.append(result)
+            try:
+                vehicle = VehicleCreate.model_validate(data)
+            except ValidationError as e:
+                result.update(status="invalid", error=_validation_error(e))
+                continue
+            result["vehicle_id"] = vehicle.vehicle_id
+            if vehicle.vehicle_id in seen_ids:
+                result.update(status="duplicate", error=f"車輛ID與第 {seen_ids[vehicle.vehicle_id]} 列重複")
+            elif vehicle.plate_number in seen_plates:
+                result.update(status="duplicate", error=f"車牌號碼與第 {seen_plates[vehicle.plate_number]} 列重複")
+            else:
+                seen_ids[vehicle.vehicle_id] = row
+                seen_plates[vehicle.plate_number] = row
+                valid.append((row, vehicle))
+        return results, valid
+
+    async def find_existing(self, vehicles: List[VehicleCreate]) -> Tuple[set, set]:
+        """一次查詢已存在的車輛ID與車牌"""
+        if not vehicles:
+            return set(), set()
+        ids = [v.vehicle_id for v in vehicles]
+        plates = [v.plate_number for v in vehicles]
+        result = await self.session.execute(
+            select(Vehicle.vehicle_id, Vehicle.plate_number)
+            .where(or_(Vehicle.vehicle_id.in_(ids), Vehicle.plate_number.in_(plates)))
+        )
+        rows = result.all()
+        return {row.vehicle_id for row in rows}, {row.plate_number for row in rows}
+
+    async def bulk_register(self, owner_id: int, rows: List[Dict[str, Any]],
+                            owner_address: Optional[str] = None) -> Dict[str, Any]:
+        """
+        批次上架車輛（呼叫端提交交易）
+
+        有 owner_address 時，新車輛（未提供 blockchain_object_id）的鏈上註冊寫入同一個交易的 outbox
+
+        Returns:
+            {"results": 每列結果, "queued": 寫入 outbox 的項目數, "summary": {status: 數量}}
+        """
+        if len(rows) > settings.VEHICLE_BULK_MAX_ROWS:
+            raise ValueError(f"單次最多上架 {settings.VEHICLE_BULK_MAX_ROWS} 輛車")
+
+        results, valid = self.validate(rows)
+        existing_ids, existing_plates = await self.find_existing([v for _, v in valid])
+        pending: List[Tuple[int, VehicleCreate]] = []
+        for row, vehicle in valid:
+            if vehicle.vehicle_id in existing_ids:
+                results[row].update(status="exists", error="車輛ID已存在")
+            elif vehicle.plate_number in existing_plates:
+                results[row].update(status="exists", error="車牌號碼已存在")
+            else:
+                pending.append((row, vehicle))
+
+        outbox: List[Dict[str, Any]] = []
+        chunk_size = settings.VEHICLE_BULK_INSERT_CHUNK
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            result = await self.session.execute(
+                insert(Vehicle)
+                .values([{**vehicle.model_dump(), "owner_id": owner_id} for _, vehicle in chunk])
+                .on_conflict_do_nothing()
+                .returning(Vehicle.vehicle_id)
+            )
+            inserted = set(result.scalars().all())
+            for row, vehicle in chunk:
+                if vehicle.vehicle_id in inserted:
+                    results[row]["status"] = "created"
+                    if owner_address and not vehicle.blockchain_object_id:
+                        results[row]["chain_registration"] = "queued"
+                        outbox.append(vehicle_registration(
+                            owner_address, vehicle.vehicle_id, vehicle.vehicle_type, vehicle.hourly_rate,
+                            vehicle_data_hash(vehicle),
+                        ))
+                else:
+                    # 查詢之後才被其他請求寫入
+                    results[row].update(status="conflict", error="車輛ID或車牌號碼已存在")
+
+        await enqueue_many(self.session, outbox, chunk_size)
+
+        summary: Dict[str, int] = {}
+        for result in results:
+            summary[result["status"]] = summary.get(result["status"], 0) + 1
+        logger.info("🚗 批次上架車輛: owner %s, %s", owner_id, summary)
+        return {"results": results, "queued": len(outbox), "summary": summary}
+
@@ -12,9 +12,9 @@ import base64
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-import httpx
 
 from app.config import settings
+from app.utils.blockchain import sui_rpc_call
 
 logger = logging.getLogger(__name__)
 
@@ -177,20 +177,7 @@ class WalletService:
     async def get_balance(self, address: str) -> Dict[str, Any]:
         """查詢錢包餘額"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.node_url,
-                    json={
-                        'jsonrpc': '2.0',
-                        'id': 1,
-                        'method': 'suix_getBalance',
-                        'params': [address],
-                    },
-                    headers={'Content-Type': 'application/json'},
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                result = response.json()
+            result = await sui_rpc_call('suix_getBalance', [address], node_url=self.node_url)
             
             if 'error' in result:
                 raise Exception(result['error'].get('message', 'Unknown error'))
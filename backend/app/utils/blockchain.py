@@ -0,0 +1,37 @@
+# backend/app/utils/blockchain.py
+"""
+區塊鏈節點 JSON-RPC 工具
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.config import settings
+from app.core import metrics
+
+
+async def sui_rpc_call(method: str, params: List[Any], timeout: float = 10.0,
+                       node_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    呼叫 fullnode JSON-RPC 並記錄延遲（sui_rpc_duration_seconds）
+
+    返回完整的 JSON-RPC 響應（包含 result 或 error），HTTP / 連線錯誤直接拋出
+    """
+    outcome = "transport_error"
+    started = time.perf_counter()
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                node_url or settings.SUI_NODE_URL,
+                json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params},
+                headers={"Content-Type": "application/json"},
+                timeout=timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+        outcome = "rpc_error" if "error" in result else "success"
+        return result
+    finally:
+        metrics.sui_rpc_duration.observe(time.perf_counter() - started, method, outcome)
@@ -0,0 +1,7 @@
+# backend/benchmarks/__init__.py
+"""
+效能基準測試腳本
+
+在 backend 目錄下以模組方式執行，例如:
+    python -m benchmarks.db_profile_bench
+"""
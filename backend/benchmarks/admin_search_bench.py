@@ -0,0 +1,105 @@
+# backend/benchmarks/admin_search_bench.py
+"""
+管理後台搜尋基準測試
+
+以合成的用戶名稱（username + display_name）建立程序內 n-gram 索引，比較:
+- scan: 逐筆子字串比對（等同 ilike('%value%') 的全表掃描）
+- ngram: NgramIndex.search（含排序）
+
+查詢組合包含完整名稱、名稱片段、打錯一個字元與不存在的字串。
+輸出建立時間、記憶體增量與 p50 / p95 延遲。
+
+使用方式:
+    python -m benchmarks.admin_search_bench --users 1000000 --queries 200
+"""
+
+import argparse
+import random
+import resource
+import statistics
+import string
+import time
+
+from app.config import settings
+from app.services.search_service import NgramIndex
+
+SYLLABLES = ["an", "bo", "chen", "da", "en", "fang", "guo", "hui", "jie", "kai", "lin", "ming",
+             "na", "ou", "ping", "qi", "rui", "shu", "ting", "wei", "xin", "yu", "zhi", "lee", "wang"]
+
+
+def synthetic_users(n: int, seed: int = 42):
+    """(id, username, display_name)：拼音音節 + 數字的用戶名稱，約半數有顯示名稱"""
+    rng = random.Random(seed)
+    rows = []
+    for user_id in range(1, n + 1):
+        given = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+        family = rng.choice(SYLLABLES)
+        username = f"{given}{family}{rng.randrange(10000)}"
+        display_name = f"{family.title()} {given.title()}" if rng.random() < 0.5 else None
+        rows.append((user_id, username, display_name))
+    return rows
+
+
+def make_queries(rows, count: int, seed: int = 7):
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        _, username, display_name = rng.choice(rows)
+        kind = i % 4
+        if kind == 0:
+            queries.append(username)
+        elif kind == 1:
+            start = rng.randrange(max(1, len(username) - 5))
+            queries.append(username[start:start + 6])
+        elif kind == 2:
+            name = display_name or username
+            pos = rng.randrange(len(name))
+            queries.append(name[:pos] + rng.choice(string.ascii_lowercase) + name[pos + 1:])
+        else:
+            queries.append("".join(rng.choice(string.ascii_lowercase) for _ in range(8)))
+    return queries
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return statistics.median(ordered) * 1000, ordered[int(len(ordered) * 0.95) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Admin search benchmark")
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=settings.ADMIN_SEARCH_SIMILARITY_THRESHOLD)
+    args = parser.parse_args()
+
+    rows = synthetic_users(args.users)
+    queries = make_queries(rows, args.queries)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    index = NgramIndex.build(rows)
+    build_seconds = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"users: {args.users}, trigrams: {len(index.postings)}, "
+          f"build: {build_seconds:.1f}s, index memory: ~{(rss_after - rss_before) // 1024} MB")
+
+    scan_times, ngram_times, matches = [], [], []
+    for query in queries:
+        needle = query.lower()
+        started = time.perf_counter()
+        [key for key, value in zip(index.keys, index.texts) if needle in value]
+        scan_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        hits = index.search(query, args.threshold)
+        ngram_times.append(time.perf_counter() - started)
+        matches.append(len(hits))
+
+    for name, samples in (("scan", scan_times), ("ngram", ngram_times)):
+        p50, p95 = percentiles(samples)
+        print(f"{name:6s} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms")
+    print(f"matches per query: median {statistics.median(matches)}, max {max(matches)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# backend/benchmarks/db_profile_bench.py
+"""
+資料庫連線配置基準測試
+
+比較舊的引擎設定（pool_pre_ping、預設 prepared statement 快取）與
+production 配置在行程生命週期查詢組合下的 queries/sec。
+
+使用方式（需要可連線的 PostgreSQL，使用 DATABASE_URL）:
+    python -m benchmarks.db_profile_bench --concurrency 10 --duration 15
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import and_, event, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import settings
+from app.core.database import Base, build_engine
+from app.models import Trip, User, Vehicle
+
+ACTIVE_STATUSES = ["requested", "matched", "accepted", "picked_up", "in_progress"]
+
+
+def _baseline_engine(database_url: str, echo: bool):
+    """重建調整前的引擎設定"""
+    return create_async_engine(
+        database_url,
+        echo=echo,
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+    )
+
+
+async def _prepare_fixtures(session_maker) -> tuple[int, int, str]:
+    """建立測試用乘客、司機與車輛"""
+    suffix = uuid.uuid4().hex[:8]
+    async with session_maker() as session:
+        passenger = User(
+            username=f"bench_p_{suffix}",
+            wallet_address=f"0x{uuid.uuid4().hex}{uuid.uuid4().hex}",
+            user_type="passenger",
+        )
+        driver = User(
+            username=f"bench_d_{suffix}",
+            wallet_address=f"0x{uuid.uuid4().hex}{uuid.uuid4().hex}",
+            user_type="driver",
+        )
+        session.add_all([passenger, driver])
+        await session.flush()
+        vehicle = Vehicle(
+            vehicle_id=f"VB{suffix}",
+            owner_id=driver.id,
+            plate_number=f"BN-{suffix}",
+            model="Bench Model",
+        )
+        session.add(vehicle)
+        await session.commit()
+        return passenger.id, driver.id, vehicle.vehicle_id
+
+
+async def _cleanup_fixtures(session_maker, passenger_id: int, driver_id: int, vehicle_id: str):
+    async with session_maker() as session:
+        await session.execute(Trip.__table__.delete().where(Trip.user_id == passenger_id))
+        await session.execute(Vehicle.__table__.delete().where(Vehicle.vehicle_id == vehicle_id))
+        await session.execute(User.__table__.delete().where(User.id.in_([passenger_id, driver_id])))
+        await session.commit()
+
+
+async def _trip_lifecycle(session: AsyncSession, passenger_id: int, driver_id: int, vehicle_id: str):
+    """模擬 TripService 在一次完整行程中發出的查詢"""
+    # create_trip_request
+    await session.execute(
+        select(Trip).where(
+            and_(
+                or_(Trip.user_id == passenger_id, Trip.driver_id == passenger_id),
+                Trip.status.in_(ACTIVE_STATUSES),
+                Trip.user_id == -1,  # 避免並行 worker 互相干擾
+            )
+        )
+    )
+    trip = Trip(
+        user_id=passenger_id,
+        pickup_lat=25.03, pickup_lng=121.56,
+        dropoff_lat=25.05, dropoff_lng=121.52,
+        distance_km=4.2, estimated_duration_minutes=9,
+        fare=0.12, status="requested",
+        requested_at=datetime.utcnow(),
+    )
+    session.add(trip)
+    await session.commit()
+    trip_id = trip.trip_id
+
+    # accept_trip
+    await session.execute(select(Trip).where(Trip.trip_id == trip_id))
+    await session.execute(select(Vehicle).where(Vehicle.owner_id == driver_id))
+    await session.execute(select(User).where(User.id == passenger_id))
+    await session.execute(select(User).where(User.id == driver_id))
+    await session.execute(select(Vehicle).where(Vehicle.vehicle_id == vehicle_id))
+    await session.execute(
+        update(Trip).where(Trip.trip_id == trip_id)
+        .values(status="accepted", driver_id=driver_id, vehicle_id=vehicle_id)
+    )
+    await session.commit()
+
+    # pickup_passenger
+    await session.execute(select(Trip).where(Trip.trip_id == trip_id))
+    await session.execute(
+        update(Trip).where(Trip.trip_id == trip_id)
+        .values(status="picked_up", picked_up_at=datetime.utcnow())
+    )
+    await session.commit()
+
+    # complete_trip
+    await session.execute(select(Trip).where(Trip.trip_id == trip_id))
+    await session.execute(select(User).where(User.id == driver_id))
+    await session.execute(select(User).where(User.id == passenger_id))
+    await session.execute(select(Vehicle).where(Vehicle.vehicle_id == vehicle_id))
+    await session.execute(
+        update(Trip).where(Trip.trip_id == trip_id)
+        .values(status="completed", completed_at=datetime.utcnow())
+    )
+    await session.commit()
+
+
+async def run_profile(name: str, engine, concurrency: int, duration: float, async_commit: bool = False) -> dict:
+    """在指定引擎上以多個 worker 重複執行行程生命週期"""
+    query_count = 0
+
+    if async_commit:
+        # 本機磁碟 fsync 常是瓶頸，關閉同步提交以凸顯連線層差異
+        @event.listens_for(engine.sync_engine, "connect")
+        def _async_commit(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SET synchronous_commit = off")
+            cursor.close()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        nonlocal query_count
+        query_count += 1
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    passenger_id, driver_id, vehicle_id = await _prepare_fixtures(session_maker)
+
+    # 暖身，讓連線池與 prepared statement 快取就緒
+    async with session_maker() as session:
+        await _trip_lifecycle(session, passenger_id, driver_id, vehicle_id)
+
+    query_count = 0
+    lifecycles = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal lifecycles
+        async with session_maker() as session:
+            while time.perf_counter() < deadline:
+                await _trip_lifecycle(session, passenger_id, driver_id, vehicle_id)
+                lifecycles += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    await _cleanup_fixtures(session_maker, passenger_id, driver_id, vehicle_id)
+    await engine.dispose()
+
+    return {
+        "profile": name,
+        "queries": query_count,
+        "lifecycles": lifecycles,
+        "elapsed_seconds": round(elapsed, 2),
+        "queries_per_second": round(query_count / elapsed, 1),
+        "lifecycles_per_second": round(lifecycles / elapsed, 1),
+    }
+
+
+async def main(args):
+    url = args.database_url or settings.DATABASE_URL
+    results = [
+        await run_profile("baseline", _baseline_engine(url, args.baseline_echo), args.concurrency, args.duration, args.async_commit),
+        await run_profile("production", build_engine("production", url), args.concurrency, args.duration, args.async_commit),
+    ]
+
+    print(f"{'profile':<12}{'queries/s':>12}{'lifecycles/s':>15}{'queries':>10}")
+    for r in results:
+        print(f"{r['profile']:<12}{r['queries_per_second']:>12}{r['lifecycles_per_second']:>15}{r['queries']:>10}")
+
+    baseline, production = results
+    if baseline["queries_per_second"]:
+        gain = production["queries_per_second"] / baseline["queries_per_second"]
+        print(f"\nproduction / baseline = {gain:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DB profile queries/sec benchmark")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0, help="每個配置的測試秒數")
+    parser.add_argument(
+        "--baseline-echo", action="store_true",
+        help="baseline 開啟 SQL echo（還原 DEBUG=True 時的舊行為）",
+    )
+    parser.add_argument(
+        "--async-commit", action="store_true",
+        help="關閉 synchronous_commit，排除磁碟 fsync 對結果的影響",
+    )
+    asyncio.run(main(parser.parse_args()))
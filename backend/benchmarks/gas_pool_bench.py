@@ -0,0 +1,180 @@
+# backend/benchmarks/gas_pool_bench.py
+"""
+Gas coin 池與結算批次吞吐量測試
+
+對本機 fullnode 替身（benchmarks.local_fullnode）並行送出 release_payment 交易，比較:
+
+    shared  每筆交易都使用操作錢包的第一個 coin（原本 get_gas()[0] 的行為），
+            同時執行的交易因 gas 物件被占用而失敗
+    pool    GasCoinPool 租用 coin（--operators 個錢包，每個補到 GAS_POOL_TARGET_COINS 個）
+    batch   SettlementBatcher 把同一時間窗內的呼叫合併為一筆 PTB（同樣使用 coin 池）
+
+輸出成功 / 衝突筆數、吞吐量、租用等待時間與送出的交易數。
+
+使用方式:
+    python -m benchmarks.local_fullnode --port 9100 --latency sui_executeTransactionBlock=lognormal:300:0.3 &
+    python -m benchmarks.gas_pool_bench --node-url http://127.0.0.1:9100 --transactions 200 --concurrency 1,8,32
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from app.config import settings
+from app.services import gas_coin_pool as pool_module
+from app.services.gas_coin_pool import GasCoinPool, MoveCall, RebalancePlan
+from app.services.settlement_batcher import SettlementBatcher
+from app.utils.blockchain import sui_rpc_call
+from benchmarks.local_fullnode import encode_stub_transaction
+
+PACKAGE = "0x" + "a" * 64
+GAS_BUDGET = 10_000_000
+
+
+class StubOperator:
+    """以替身節點 stub 交易模擬操作錢包（build 返回 Move 呼叫清單）"""
+
+    def __init__(self, address: str, node_url: str):
+        self.address = address
+        self.node_url = node_url
+
+    async def execute(self, build: Callable[[Any], List[Dict[str, Any]]], gas_coin_id: str, gas_budget: int) -> Dict:
+        tx_bytes = encode_stub_transaction(self.address, build(None), gas_budget, gas_payment=gas_coin_id)
+        response = await sui_rpc_call(
+            "sui_executeTransactionBlock", [tx_bytes, [], {"showEffects": True}, "WaitForLocalExecution"],
+            timeout=30.0, node_url=self.node_url,
+        )
+        if "error" in response:
+            raise RuntimeError(response["error"]["message"])
+        return response["result"]
+
+    async def execute_calls(self, calls: List[MoveCall], gas_coin_id: str, gas_budget: int) -> Dict[str, Any]:
+        stub_calls = [
+            {"package": call.package, "module": call.module, "function": call.function,
+             "arguments": [list(value) if kind == "vector_u8" else value for kind, value in call.arguments]}
+            for call in calls
+        ]
+        result = await self.execute(lambda _: stub_calls, gas_coin_id, gas_budget)
+        status = result["effects"]["status"]
+        return {"digest": result["digest"], "status": status["status"], "error": status.get("error"),
+                "events": result.get("events", [])}
+
+    async def rebalance(self, plan: RebalancePlan, coin_balance: int, gas_budget: int) -> str:
+        source = plan.source.object_id
+        calls = []
+        if plan.merge:
+            calls.append({"package": "0x2", "module": "pay", "function": "join_vec",
+                          "arguments": [source, [c.object_id for c in plan.merge]]})
+        if plan.split_count:
+            calls.append({"package": "0x2", "module": "pay", "function": "split_vec",
+                          "arguments": [source, [coin_balance] * plan.split_count]})
+        result = await self.execute(lambda _: calls, source, gas_budget)
+        return result["digest"]
+
+
+def release_call(trip_id: int) -> Callable[[Any], List[Dict[str, Any]]]:
+    return lambda _: [{"package": PACKAGE, "module": "payment_escrow", "function": "release_payment",
+                       "arguments": ["0x" + "e" * 64, str(trip_id)]}]
+
+
+async def run_shared(operator: StubOperator, pool: GasCoinPool, transactions: int, concurrency: int) -> Dict:
+    coins = await pool.fetch_coins(operator.address)
+    coin_id = coins[0].object_id
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {"success": 0, "failed": 0}
+
+    async def settle(trip_id: int):
+        async with semaphore:
+            try:
+                await operator.execute(release_call(trip_id), coin_id, GAS_BUDGET)
+                outcomes["success"] += 1
+            except RuntimeError:
+                outcomes["failed"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(settle(i) for i in range(transactions)))
+    return {**outcomes, "seconds": time.perf_counter() - started}
+
+
+async def run_pool(pool: GasCoinPool, transactions: int, concurrency: int) -> Dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {"success": 0, "failed": 0}
+    waits_before = pool_module.gas_pool_lease_wait.sum(), pool_module.gas_pool_lease_wait.count()
+
+    async def settle(trip_id: int):
+        async with semaphore:
+            try:
+                async with pool.lease(GAS_BUDGET, timeout=60.0) as lease:
+                    await lease.execute(release_call(trip_id), GAS_BUDGET)
+                outcomes["success"] += 1
+            except RuntimeError:
+                outcomes["failed"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(settle(i) for i in range(transactions)))
+    waited = pool_module.gas_pool_lease_wait.sum() - waits_before[0]
+    leases = pool_module.gas_pool_lease_wait.count() - waits_before[1]
+    return {**outcomes, "seconds": time.perf_counter() - started,
+            "avg_lease_wait_ms": round(waited / leases * 1000, 2) if leases else None}
+
+
+async def run_batched(pool: GasCoinPool, transactions: int, concurrency: int, flush_ms: float) -> Dict:
+    batcher = SettlementBatcher(pool, max_batch_size=concurrency, flush_ms=flush_ms)
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {"success": 0, "failed": 0}
+    digests = set()
+
+    async def settle(trip_id: int):
+        async with semaphore:
+            result = await batcher.create_receipt(PACKAGE, trip_id, "0x" + "b" * 64, "0x" + "c" * 64,
+                                                  b"\x01" * 32, b"\x02" * 32, 1_000, 100_000_000)
+            outcomes["success" if result["success"] else "failed"] += 1
+            if result["success"]:
+                digests.add(result["transaction_hash"])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(settle(i) for i in range(transactions)))
+    return {**outcomes, "seconds": time.perf_counter() - started, "transactions": len(digests)}
+
+
+async def main(args):
+    settings.SUI_NODE_URL = args.node_url
+    settings.GAS_POOL_TARGET_COINS = args.coins
+    pool = GasCoinPool()
+    operators = [StubOperator("0x" + f"{i + 1:x}" * 64, args.node_url) for i in range(args.operators)]
+    for operator in operators:
+        pool.add_operator(operator)
+    await pool.refresh()
+    await pool.rebalance()
+    print(json.dumps(pool.get_status(), indent=2))
+
+    results = []
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        shared = await run_shared(operators[0], pool, args.transactions, concurrency)
+        pooled = await run_pool(pool, args.transactions, concurrency)
+        batched = await run_batched(pool, args.transactions, concurrency, args.flush_ms)
+        for mode, result in (("shared", shared), ("pool", pooled), ("batch", batched)):
+            result.update(mode=mode, concurrency=concurrency,
+                          tps=round(result["success"] / result["seconds"], 1))
+            results.append(result)
+            print(f"{mode:<7} c={concurrency:<4} ok={result['success']:<5} failed={result['failed']:<5} "
+                  f"{result['tps']:>8} tx/s  {result['seconds']:.2f}s"
+                  + (f"  lease wait {result['avg_lease_wait_ms']} ms" if mode == "pool" else "")
+                  + (f"  {result['transactions']} PTBs" if mode == "batch" else ""))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gas coin pool throughput benchmark")
+    parser.add_argument("--node-url", default="http://127.0.0.1:9100", help="benchmarks.local_fullnode 位址")
+    parser.add_argument("--transactions", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,8,32", help="逗號分隔的並行數")
+    parser.add_argument("--operators", type=int, default=2, help="操作錢包數")
+    parser.add_argument("--coins", type=int, default=8, help="每個操作錢包的 coin 數")
+    parser.add_argument("--flush-ms", type=float, default=50.0, help="batch 模式的批次時間窗")
+    parser.add_argument("--output", default=None, help="結果 JSON 路徑")
+    asyncio.run(main(parser.parse_args()))
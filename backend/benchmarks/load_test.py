@@ -0,0 +1,417 @@
+# backend/benchmarks/load_test.py
+"""
+叫車生命週期端到端壓力測試
+
+模擬 N 位乘客與 M 位司機完整走過
+    註冊 → 預估 → 叫車 → 接單 → 確認支付 → 上車 → 完成 → 評價
+鏈上呼叫以 MockChain 取代（可設定延遲），統計每個端點的 p50/p95/p99 延遲與吞吐量，
+結果寫成 JSON 以便比較不同版本。
+
+使用方式（需要可連線的 PostgreSQL，使用 DATABASE_URL）:
+    python -m benchmarks.load_test --passengers 50 --drivers 10 --trips-per-passenger 3
+    python -m benchmarks.load_test --base-url http://localhost:8000   # 對已啟動的服務施壓（不套用 MockChain）
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+API = "/api/v1"
+PASSWORD = "LoadTest123!"
+
+# 台北市中心附近的隨機座標
+CENTER_LAT, CENTER_LNG = 25.0330, 121.5654
+
+
+# ============================================================================
+# Mock chain
+# ============================================================================
+
+class MockChain:
+    """
+    以固定延遲 + 抖動的假實作取代所有鏈上呼叫
+
+    只替換服務實例上的方法，uninstall 後恢復原狀
+    """
+
+    def __init__(self, latency_ms: float = 50.0, jitter_ms: float = 20.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rng = random.Random(seed)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self._patches: List[tuple] = []
+
+    async def _delay(self, name: str):
+        self.calls[name] += 1
+        delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms))
+        await asyncio.sleep(delay / 1000)
+
+    @staticmethod
+    def _digest(*parts: Any) -> str:
+        return hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()
+
+    def _patch(self, target: Any, name: str, replacement):
+        self._patches.append((target, name, getattr(target, name)))
+        setattr(target, name, replacement)
+
+    def install(self):
+        from app.config import settings
+        from app.schemas.payment import PaymentStatus, TransactionStatus
+        from app.services.contract_service import contract_service
+        from app.services.escrow_service import EscrowService
+        from app.services.sui_service import sui_service
+
+        chain = self
+
+        async def register_user_on_chain(user_address, did_hash, user_type):
+            await chain._delay("register_user")
+            return {
+                "success": True,
+                "transaction_hash": chain._digest("user", user_address),
+                "object_id": "0x" + chain._digest("user_obj", user_address),
+            }
+
+        async def register_vehicle_on_chain(owner_address, vehicle_data):
+            await chain._delay("register_vehicle")
+            return {
+                "success": True,
+                "transaction_hash": chain._digest("vehicle", vehicle_data["vehicle_id"]),
+                "object_id": "0x" + chain._digest("vehicle_obj", vehicle_data["vehicle_id"]),
+            }
+
+        async def get_transaction_status(tx_hash):
+            await chain._delay("get_transaction_status")
+            return TransactionStatus(
+                transaction_hash=tx_hash,
+                status=PaymentStatus.CONFIRMED,
+                confirmation_count=1,
+                timestamp=datetime.utcnow(),
+            )
+
+        async def call_contract_release_payment(package_id, escrow_object_id, trip_id):
+            await chain._delay("release_payment")
+            return {"success": True, "transaction_hash": chain._digest("release", trip_id), "status": "confirmed"}
+
+        async def create_trip_receipt(escrow_self, trip_id, **kwargs):
+            await chain._delay("create_receipt")
+            return {"success": True, "receipt_id": f"receipt_{trip_id}", "trip_id": trip_id}
+
+        self._patch(contract_service, "register_user_on_chain", register_user_on_chain)
+        self._patch(contract_service, "register_vehicle_on_chain", register_vehicle_on_chain)
+        self._patch(sui_service, "get_transaction_status", get_transaction_status)
+        self._patch(sui_service, "call_contract_release_payment", call_contract_release_payment)
+        self._patch(EscrowService, "create_trip_receipt", create_trip_receipt)
+        self._patch(settings, "MOCK_MODE", True)
+
+    def uninstall(self):
+        while self._patches:
+            target, name, original = self._patches.pop()
+            setattr(target, name, original)
+
+
+# ============================================================================
+# 統計
+# ============================================================================
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """nearest-rank 百分位數"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    """依端點記錄延遲與錯誤"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.error_samples: Dict[str, List[str]] = defaultdict(list)
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str,
+                   expected=(200,), **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self._error(name, repr(e))
+            return None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.latencies[name].append(elapsed_ms)
+        if response.status_code not in expected:
+            self._error(name, f"{response.status_code} {response.text[:200]}")
+            return None
+        return response
+
+    def _error(self, name: str, detail: str):
+        self.errors[name] += 1
+        if len(self.error_samples[name]) < 3:
+            self.error_samples[name].append(detail)
+
+    def summary(self, elapsed_seconds: float) -> Dict[str, Dict[str, Any]]:
+        endpoints = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies.get(name, []))
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": self.errors.get(name, 0),
+                "rps": round(len(values) / elapsed_seconds, 2) if elapsed_seconds else 0.0,
+                "mean_ms": round(sum(values) / len(values), 2) if values else 0.0,
+                "p50_ms": round(percentile(values, 50), 2),
+                "p95_ms": round(percentile(values, 95), 2),
+                "p99_ms": round(percentile(values, 99), 2),
+                "max_ms": round(values[-1], 2) if values else 0.0,
+                "error_samples": self.error_samples.get(name, []),
+            }
+        return endpoints
+
+
+# ============================================================================
+# 使用者行為
+# ============================================================================
+
+def _random_point(rng: random.Random, radius_deg: float = 0.05):
+    return CENTER_LAT + rng.uniform(-radius_deg, radius_deg), CENTER_LNG + rng.uniform(-radius_deg, radius_deg)
+
+
+async def register_and_login(client, recorder: Recorder, username: str, user_type: str) -> Optional[Dict[str, Any]]:
+    wallet = "0x" + hashlib.sha256(username.encode()).hexdigest()
+    response = await recorder.call(client, "POST /users/register", "POST", f"{API}/users/register", json={
+        "username": username,
+        "password": PASSWORD,
+        "wallet_address": wallet,
+        "user_type": user_type,
+    })
+    if response is None:
+        return None
+    response = await recorder.call(client, "POST /users/login", "POST", f"{API}/users/login", json={
+        "identifier": username,
+        "password": PASSWORD,
+    })
+    if response is None:
+        return None
+    data = response.json()
+    return {"id": data["user"]["id"], "headers": {"Authorization": f"Bearer {data['access_token']}"}}
+
+
+async def setup_driver(client, recorder: Recorder, run_id: str, index: int, rng: random.Random):
+    driver = await register_and_login(client, recorder, f"lt{run_id}d{index}", "driver")
+    if driver is None:
+        return None
+    lat, lng = _random_point(rng)
+    vehicle_id = f"V{run_id[:8]}{index}".upper()
+    response = await recorder.call(client, "POST /vehicles", "POST", f"{API}/vehicles/", headers=driver["headers"], json={
+        "vehicle_id": vehicle_id,
+        "plate_number": f"LT-{run_id[:6]}-{index}",
+        "model": "Load Test EV",
+        "vehicle_type": rng.choice(["sedan", "suv", "minivan", "luxury"]),
+        "hourly_rate": 100000,
+        "current_charge_percent": 90,
+        "current_lat": lat,
+        "current_lng": lng,
+    })
+    if response is None:
+        return None
+    return driver
+
+
+async def passenger_session(client, recorder: Recorder, run_id: str, index: int, trips: int,
+                            drivers: asyncio.Queue, rng: random.Random, stats: Dict[str, int]):
+    passenger = await register_and_login(client, recorder, f"lt{run_id}p{index}", "passenger")
+    if passenger is None:
+        stats["failed_lifecycles"] += trips
+        return
+
+    for _ in range(trips):
+        pickup_lat, pickup_lng = _random_point(rng)
+        dropoff_lat, dropoff_lng = _random_point(rng)
+        query = {"pickup_lat": pickup_lat, "pickup_lng": pickup_lng,
+                 "dropoff_lat": dropoff_lat, "dropoff_lng": dropoff_lng}
+
+        if await recorder.call(client, "POST /trips/estimate", "POST", f"{API}/trips/estimate", params=query) is None:
+            stats["failed_lifecycles"] += 1
+            continue
+
+        response = await recorder.call(client, "POST /trips", "POST", f"{API}/trips/", headers=passenger["headers"], json={
+            **query, "passenger_count": 1,
+        })
+        if response is None:
+            stats["failed_lifecycles"] += 1
+            continue
+        trip_id = response.json()["trip_id"]
+
+        # 取得一位空閒司機完成這趟行程
+        driver = await drivers.get()
+        try:
+            ok = await drive_trip(client, recorder, trip_id, passenger, driver)
+        finally:
+            drivers.put_nowait(driver)
+        if not ok:
+            stats["failed_lifecycles"] += 1
+            continue
+
+        response = await recorder.call(client, "POST /reviews", "POST", f"{API}/reviews/", headers=passenger["headers"], json={
+            "trip_id": trip_id, "rating": rng.randint(3, 5),
+        })
+        stats["completed_lifecycles" if response is not None else "failed_lifecycles"] += 1
+
+
+async def drive_trip(client, recorder: Recorder, trip_id: int, passenger, driver) -> bool:
+    trip_url = f"{API}/trips/{trip_id}"
+    if await recorder.call(client, "POST /trips/{id}/accept", "POST", f"{trip_url}/accept",
+                           headers=driver["headers"], json={"estimated_arrival_minutes": 5}) is None:
+        return False
+    escrow_id = "0x" + uuid.uuid4().hex + uuid.uuid4().hex
+    if await recorder.call(client, "POST /trips/{id}/confirm-payment", "POST", f"{trip_url}/confirm-payment",
+                           headers=passenger["headers"], params={"escrow_object_id": escrow_id}) is None:
+        return False
+    if await recorder.call(client, "PUT /trips/{id}/pickup", "PUT", f"{trip_url}/pickup",
+                           headers=driver["headers"]) is None:
+        return False
+    if await recorder.call(client, "PUT /trips/{id}/complete", "PUT", f"{trip_url}/complete",
+                           headers=driver["headers"]) is None:
+        return False
+    return True
+
+
+# ============================================================================
+# 執行
+# ============================================================================
+
+@asynccontextmanager
+async def make_client(base_url: Optional[str], timeout: float, log_level: str = "WARNING"):
+    """base_url 未指定時在進程內直接呼叫 ASGI app（並執行 lifespan）"""
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+            yield client
+        return
+
+    from app.core.database import init_db
+    from app.main import app
+
+    # app 匯入時會設定日誌，之後再降低等級，避免每個請求的 INFO 日誌干擾結果
+    logging.getLogger().setLevel(log_level)
+    await init_db()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+            yield client
+
+
+async def run(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    run_id = uuid.uuid4().hex[:10]
+    recorder = Recorder()
+    stats: Dict[str, int] = defaultdict(int)
+
+    chain = None
+    if not args.base_url:
+        chain = MockChain(latency_ms=args.chain_latency_ms, jitter_ms=args.chain_jitter_ms, seed=args.seed)
+        chain.install()
+
+    try:
+        async with make_client(args.base_url, args.timeout, args.log_level) as client:
+            setup_started = time.perf_counter()
+            drivers = [
+                d for d in await asyncio.gather(*(
+                    setup_driver(client, recorder, run_id, i, rng) for i in range(args.drivers)
+                )) if d is not None
+            ]
+            if not drivers:
+                raise RuntimeError(f"沒有司機註冊成功: {dict(recorder.error_samples)}")
+            driver_queue: asyncio.Queue = asyncio.Queue()
+            for driver in drivers:
+                driver_queue.put_nowait(driver)
+            setup_seconds = time.perf_counter() - setup_started
+
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                passenger_session(client, recorder, run_id, i, args.trips_per_passenger,
+                                  driver_queue, random.Random(args.seed + i + 1), stats)
+                for i in range(args.passengers)
+            ))
+            elapsed = time.perf_counter() - started
+    finally:
+        if chain:
+            chain.uninstall()
+
+    endpoints = recorder.summary(elapsed)
+    total_requests = sum(e["requests"] for e in endpoints.values())
+    return {
+        "run_id": run_id,
+        "started_at": datetime.utcnow().isoformat(),
+        "config": {
+            "passengers": args.passengers,
+            "drivers": args.drivers,
+            "trips_per_passenger": args.trips_per_passenger,
+            "base_url": args.base_url or "in-process",
+            "chain_latency_ms": None if args.base_url else args.chain_latency_ms,
+            "chain_jitter_ms": None if args.base_url else args.chain_jitter_ms,
+            "db_profile": os.getenv("DB_PROFILE", "development"),
+        },
+        "setup_seconds": round(setup_seconds, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "completed_lifecycles": stats["completed_lifecycles"],
+        "failed_lifecycles": stats["failed_lifecycles"],
+        "lifecycles_per_second": round(stats["completed_lifecycles"] / elapsed, 2) if elapsed else 0.0,
+        "requests_per_second": round(total_requests / elapsed, 2) if elapsed else 0.0,
+        "chain_calls": dict(chain.calls) if chain else {},
+        "endpoints": endpoints,
+    }
+
+
+def print_report(result: Dict[str, Any]):
+    print(f"\nrun {result['run_id']}: {result['completed_lifecycles']} lifecycles "
+          f"({result['failed_lifecycles']} failed) in {result['elapsed_seconds']}s, "
+          f"{result['lifecycles_per_second']} lifecycles/s, {result['requests_per_second']} req/s\n")
+    print(f"{'endpoint':<34}{'reqs':>7}{'err':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, e in result["endpoints"].items():
+        print(f"{name:<34}{e['requests']:>7}{e['errors']:>6}{e['p50_ms']:>9.1f}{e['p95_ms']:>9.1f}"
+              f"{e['p99_ms']:>9.1f}{e['max_ms']:>9.1f}")
+        for sample in e["error_samples"]:
+            print(f"    ! {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ride lifecycle load test")
+    parser.add_argument("--passengers", type=int, default=20)
+    parser.add_argument("--drivers", type=int, default=5)
+    parser.add_argument("--trips-per-passenger", type=int, default=2)
+    parser.add_argument("--base-url", default=None, help="對外部服務施壓；預設在進程內執行")
+    parser.add_argument("--chain-latency-ms", type=float, default=50.0, help="MockChain 每次呼叫的平均延遲")
+    parser.add_argument("--chain-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="結果 JSON 路徑（預設 benchmarks/results/）")
+    parser.add_argument("--log-level", default="WARNING", help="壓測期間的應用日誌等級")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_TO_FILE", "false")
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", f"load_test_{datetime.utcnow():%Y%m%dT%H%M%S}_{result['run_id']}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\nresults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
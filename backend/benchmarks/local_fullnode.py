@@ -0,0 +1,755 @@
+# backend/benchmarks/local_fullnode.py
+"""
+本機 Sui fullnode 替身（JSON-RPC）
+
+實作後端用到的 JSON-RPC 子集，用來在離線環境量測與區塊鏈相關的效能，
+並可注入延遲分佈與錯誤率:
+
+    suix_getBalance / suix_getCoins / suix_getReferenceGasPrice
+    sui_getTransactionBlock / sui_executeTransactionBlock / sui_dryRunTransactionBlock
+    suix_queryEvents / suix_queryTransactionBlocks
+    sui_getObject / sui_multiGetObjects
+    sui_getLatestCheckpointSequenceNumber / sui_getChainIdentifier
+
+交易內容無法解析 BCS；若 tx_bytes 是 base64 編碼的 JSON（見 encode_stub_transaction），
+會依 payment_escrow / trip_receipt / 註冊合約與 0x2::pay::split_vec / join_vec 的語意
+更新物件狀態並發出對應事件，其他交易一律回傳成功。指定 gas_payment 的交易從該 coin 扣除
+gas，執行期間 coin 被鎖定，同時使用同一個 gas coin 的交易會被拒絕（模擬物件版本衝突）。
+
+使用方式:
+    python -m benchmarks.local_fullnode --port 9000 \\
+        --latency default=lognormal:40:0.5 \\
+        --latency sui_executeTransactionBlock=lognormal:600:0.4 \\
+        --error-rate 0.01 --seed-escrows 1000
+
+    SUI_NODE_URL=http://localhost:9000 uvicorn app.main:app
+
+執行期間可透過 GET /__stats 查看各方法的呼叫次數，POST /__config 調整延遲與錯誤率。
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+SUI_COIN_TYPE = "0x2::sui::SUI"
+REFERENCE_GAS_PRICE = 750
+ESCROW_STATUS_LOCKED, ESCROW_STATUS_RELEASED, ESCROW_STATUS_REFUNDED = 1, 2, 3
+
+_B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def base58(data: bytes) -> str:
+    """Sui 交易 digest 使用 base58 編碼的 32 bytes"""
+    number = int.from_bytes(data, "big")
+    encoded = ""
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = _B58_ALPHABET[remainder] + encoded
+    padding = len(data) - len(data.lstrip(b"\0"))
+    return "1" * padding + encoded
+
+
+def encode_stub_transaction(sender: str, calls: List[Dict[str, Any]], gas_budget: int = 10_000_000,
+                            gas_payment: Optional[str] = None) -> str:
+    """
+    產生替身節點可理解的 tx_bytes
+
+    calls: [{"package": ..., "module": ..., "function": ..., "arguments": [...]}]
+    gas_payment: 支付 gas 的 coin 物件ID（未指定時不扣款、不鎖定）
+    """
+    payload = {"sender": sender, "calls": calls, "gas_budget": gas_budget, "nonce": random.random()}
+    if gas_payment:
+        payload["gas_payment"] = gas_payment
+    return base64.b64encode(json.dumps(payload).encode()).decode()
+
+
+def stub_gas_payment(tx_bytes: str) -> Optional[str]:
+    """stub 交易指定的 gas coin（真正的 BCS 交易返回 None）"""
+    try:
+        return json.loads(base64.b64decode(tx_bytes)).get("gas_payment")
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+# ============================================================================
+# 延遲與錯誤注入
+# ============================================================================
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """
+    解析延遲分佈（毫秒）:
+        fixed:50 | uniform:10:80 | normal:50:10 | lognormal:<median>:<sigma>
+    """
+    kind, *values = spec.split(":")
+    numbers = [float(v) for v in values]
+    if kind == "fixed" and len(numbers) == 1:
+        return lambda rng: numbers[0]
+    if kind == "uniform" and len(numbers) == 2:
+        return lambda rng: rng.uniform(numbers[0], numbers[1])
+    if kind == "normal" and len(numbers) == 2:
+        return lambda rng: max(0.0, rng.gauss(numbers[0], numbers[1]))
+    if kind == "lognormal" and len(numbers) == 2:
+        import math
+        mu = math.log(max(numbers[0], 1e-6))
+        return lambda rng: rng.lognormvariate(mu, numbers[1])
+    raise ValueError(f"無法解析延遲分佈: {spec}")
+
+
+@dataclass
+class FaultConfig:
+    """延遲與錯誤注入設定（可依方法覆寫）"""
+    latency: Dict[str, str] = field(default_factory=lambda: {"default": "fixed:0"})
+    error_rate: Dict[str, float] = field(default_factory=lambda: {"default": 0.0})
+    # 錯誤型態比例: rpc (JSON-RPC error) / http (503) / timeout (不回應直到客戶端逾時)
+    error_modes: Dict[str, float] = field(default_factory=lambda: {"rpc": 0.7, "http": 0.3, "timeout": 0.0})
+    timeout_seconds: float = 30.0
+
+    def __post_init__(self):
+        self._samplers = {method: parse_distribution(spec) for method, spec in self.latency.items()}
+
+    def update(self, data: Dict[str, Any]):
+        self.latency.update(data.get("latency", {}))
+        self.error_rate.update(data.get("error_rate", {}))
+        self.error_modes = data.get("error_modes", self.error_modes)
+        self.timeout_seconds = data.get("timeout_seconds", self.timeout_seconds)
+        self.__post_init__()
+
+    def latency_ms(self, method: str, rng: random.Random) -> float:
+        sampler = self._samplers.get(method) or self._samplers["default"]
+        return sampler(rng)
+
+    def pick_error(self, method: str, rng: random.Random) -> Optional[str]:
+        rate = self.error_rate.get(method, self.error_rate.get("default", 0.0))
+        if rate <= 0 or rng.random() >= rate:
+            return None
+        modes, weights = zip(*self.error_modes.items())
+        return rng.choices(modes, weights=weights)[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "error_modes": self.error_modes,
+            "timeout_seconds": self.timeout_seconds,
+        }
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+# ============================================================================
+# 鏈狀態
+# ============================================================================
+
+class ChainState:
+    """記憶體內的物件、交易、事件與餘額"""
+
+    def __init__(self, default_balance_mist: int, coins_per_address: int, seed: int = 0):
+        self.default_balance_mist = default_balance_mist
+        self.coins_per_address = coins_per_address
+        self.rng = random.Random(seed)
+        self.objects: Dict[str, Dict[str, Any]] = {}
+        self.transactions: Dict[str, Dict[str, Any]] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.balances: Dict[str, int] = {}
+        self.coins: Dict[str, List[str]] = {}
+        self.checkpoint = 1
+        self._counter = itertools.count(1)
+
+    # === 基本工具 ===
+
+    def _new_id(self) -> str:
+        return "0x" + hashlib.sha256(f"obj-{next(self._counter)}-{self.rng.random()}".encode()).hexdigest()
+
+    def _object_digest(self, object_id: str, version: int) -> str:
+        return base58(hashlib.sha256(f"{object_id}:{version}".encode()).digest())
+
+    def balance(self, address: str) -> int:
+        return self.balances.setdefault(address.lower(), self.default_balance_mist)
+
+    def _credit(self, address: str, amount: int):
+        self.balances[address.lower()] = self.balance(address) + amount
+
+    def create_object(self, object_type: str, fields: Dict[str, Any], owner: Dict[str, Any],
+                      tx_digest: str) -> Dict[str, Any]:
+        object_id = self._new_id()
+        obj = {
+            "objectId": object_id,
+            "version": "1",
+            "digest": self._object_digest(object_id, 1),
+            "type": object_type,
+            "owner": owner,
+            "previousTransaction": tx_digest,
+            "storageRebate": "1520000",
+            "content": {"dataType": "moveObject", "type": object_type, "hasPublicTransfer": False, "fields": fields},
+        }
+        self.objects[object_id] = obj
+        return obj
+
+    def mutate_object(self, object_id: str, changes: Dict[str, Any], tx_digest: str) -> Dict[str, Any]:
+        obj = self.objects[object_id]
+        version = int(obj["version"]) + 1
+        obj["version"] = str(version)
+        obj["digest"] = self._object_digest(object_id, version)
+        obj["previousTransaction"] = tx_digest
+        obj["content"]["fields"].update(changes)
+        return obj
+
+    def get_coins(self, owner: str) -> List[Dict[str, Any]]:
+        owner = owner.lower()
+        if owner not in self.coins:
+            per_coin = self.balance(owner) // max(self.coins_per_address, 1)
+            self.coins[owner] = [
+                self.create_object(
+                    f"0x2::coin::Coin<{SUI_COIN_TYPE}>", {"balance": str(per_coin), "id": {"id": ""}},
+                    {"AddressOwner": owner}, "genesis",
+                )["objectId"]
+                for _ in range(self.coins_per_address)
+            ]
+        return [self.objects[coin_id] for coin_id in self.coins[owner]]
+
+    def seed_escrows(self, count: int, package: str):
+        """預先建立託管物件（供對帳 / 同步壓測使用）"""
+        for trip_id in range(1, count + 1):
+            status = self.rng.choices(
+                [ESCROW_STATUS_LOCKED, ESCROW_STATUS_RELEASED, ESCROW_STATUS_REFUNDED], weights=[6, 3, 1]
+            )[0]
+            self.create_object(
+                f"{package}::payment_escrow::Escrow",
+                {
+                    "trip_id": str(trip_id),
+                    "passenger": "0x" + "1" * 64,
+                    "driver": "0x" + "2" * 64,
+                    "platform": "0x" + "0" * 64,
+                    "total_amount": "110000000",
+                    "driver_amount": "100000000",
+                    "platform_fee": "10000000",
+                    "status": status,
+                },
+                {"Shared": {"initial_shared_version": 1}},
+                "genesis",
+            )
+
+    # === 交易執行 ===
+
+    def execute(self, tx_bytes: str, signatures: List[str], commit: bool = True) -> Dict[str, Any]:
+        raw = base64.b64decode(tx_bytes)
+        digest = base58(hashlib.sha256(raw + b"".join(s.encode() for s in signatures or [])).digest())
+        if commit and digest in self.transactions:
+            return self.transactions[digest]
+
+        try:
+            stub = json.loads(raw)
+            sender, calls, gas_budget = stub["sender"], stub.get("calls", []), int(stub.get("gas_budget", 0))
+            gas_payment = stub.get("gas_payment")
+        except (ValueError, KeyError, TypeError):
+            # 真正的 BCS 交易：無法解析內容，視為成功且不影響狀態
+            sender, calls, gas_budget, gas_payment = "0x" + "0" * 64, [], 10_000_000, None
+
+        created, mutated, events, balance_changes = [], [], [], []
+        status = {"status": "success"}
+        snapshot = None if commit else json.dumps(self.objects)
+
+        for index, call in enumerate(calls):
+            try:
+                self._apply_call(call, sender, digest, created, mutated, events, balance_changes)
+            except RpcError as abort:
+                status = {"status": "failure",
+                          "error": f"MoveAbort(MoveLocation {{ module: {call.get('module')}, "
+                                   f"function_name: Some(\"{call.get('function')}\") }}, {abort.code}) in command {index}"}
+                break
+
+        computation = 1_000_000 + 250_000 * len(calls)
+        storage = 2_000_000 * len(created) + 600_000 * len(mutated)
+        gas_used = {
+            "computationCost": str(computation),
+            "storageCost": str(storage),
+            "storageRebate": str(int(storage * 0.5)),
+            "nonRefundableStorageFee": str(int(storage * 0.005)),
+        }
+        if gas_budget and computation + storage > gas_budget:
+            status = {"status": "failure", "error": "InsufficientGas"}
+        if gas_payment in self.objects:
+            # 失敗的交易同樣扣除 gas
+            gas_coin = self.objects[gas_payment]
+            balance = int(gas_coin["content"]["fields"]["balance"]) - (computation + storage - int(storage * 0.5))
+            mutated.append(self.mutate_object(gas_payment, {"balance": str(max(balance, 0))}, digest))
+
+        timestamp_ms = str(int(time.time() * 1000))
+        for seq, event in enumerate(events):
+            event.update({"id": {"txDigest": digest, "eventSeq": str(seq)}, "sender": sender, "timestampMs": timestamp_ms})
+
+        response = {
+            "digest": digest,
+            "transaction": {
+                "data": {
+                    "messageVersion": "v1",
+                    "transaction": {
+                        "kind": "ProgrammableTransaction",
+                        "inputs": [],
+                        "transactions": [{"MoveCall": {k: call.get(k) for k in ("package", "module", "function")}}
+                                         for call in calls],
+                    },
+                    "sender": sender,
+                    "gasData": {"owner": sender, "price": str(REFERENCE_GAS_PRICE), "budget": str(gas_budget), "payment": []},
+                },
+                "txSignatures": signatures or [],
+            },
+            "effects": {
+                "messageVersion": "v1",
+                "status": status,
+                "executedEpoch": "1",
+                "gasUsed": gas_used,
+                "transactionDigest": digest,
+                "created": [{"owner": o["owner"], "reference": self._ref(o)} for o in created],
+                "mutated": [{"owner": o["owner"], "reference": self._ref(o)} for o in mutated],
+            },
+            "events": events if status["status"] == "success" else [],
+            "objectChanges": [
+                {"type": "created", "sender": sender, "owner": o["owner"], "objectType": o["type"],
+                 "objectId": o["objectId"], "version": o["version"], "digest": o["digest"]} for o in created
+            ] + [
+                {"type": "mutated", "sender": sender, "owner": o["owner"], "objectType": o["type"],
+                 "objectId": o["objectId"], "version": o["version"], "digest": o["digest"]} for o in mutated
+            ],
+            "balanceChanges": balance_changes if status["status"] == "success" else [],
+            "timestampMs": timestamp_ms,
+            "checkpoint": str(self.checkpoint),
+            "confirmedLocalExecution": True,
+        }
+
+        if not commit:
+            self.objects = json.loads(snapshot)
+        elif status["status"] == "success":
+            self.transactions[digest] = response
+            self.events.extend(response["events"])
+            for change in balance_changes:
+                self._credit(change["owner"]["AddressOwner"], int(change["amount"]))
+            self.checkpoint += 1
+        else:
+            self.transactions[digest] = response
+        return response
+
+    def _ref(self, obj: Dict[str, Any]) -> Dict[str, Any]:
+        return {"objectId": obj["objectId"], "version": int(obj["version"]), "digest": obj["digest"]}
+
+    def _apply_call(self, call: Dict[str, Any], sender: str, digest: str, created: list, mutated: list,
+                    events: list, balance_changes: list):
+        package, module, function = call.get("package"), call.get("module"), call.get("function")
+        args = call.get("arguments", [])
+
+        if (module, function) == ("payment_escrow", "lock_payment"):
+            amount, trip_id, driver, platform, platform_fee = int(args[0]), int(args[1]), args[2], args[3], int(args[4])
+            if amount <= platform_fee:
+                raise RpcError(4, "E_INSUFFICIENT_AMOUNT")
+            escrow = self.create_object(
+                f"{package}::payment_escrow::Escrow",
+                {"trip_id": str(trip_id), "passenger": sender, "driver": driver, "platform": platform,
+                 "total_amount": str(amount), "driver_amount": str(amount - platform_fee),
+                 "platform_fee": str(platform_fee), "status": ESCROW_STATUS_LOCKED},
+                {"Shared": {"initial_shared_version": 1}}, digest,
+            )
+            created.append(escrow)
+            balance_changes.append(self._balance_change(sender, -amount))
+            events.append(self._event(package, module, "payment_escrow::PaymentLocked", {
+                "escrow_id": escrow["objectId"], "trip_id": str(trip_id), "passenger": sender, "driver": driver,
+                "total_amount": str(amount), "platform_fee": str(platform_fee),
+            }))
+
+        elif (module, function) in (("payment_escrow", "release_payment"), ("payment_escrow", "refund_payment")):
+            escrow = self.objects.get(args[0])
+            if escrow is None:
+                raise RpcError(0, "object not found")
+            fields = escrow["content"]["fields"]
+            if fields["status"] != ESCROW_STATUS_LOCKED:
+                raise RpcError(1, "E_INVALID_STATUS")
+            if function == "release_payment":
+                if str(args[1]) != fields["trip_id"]:
+                    raise RpcError(2, "E_TRIP_ID_MISMATCH")
+                mutated.append(self.mutate_object(args[0], {"status": ESCROW_STATUS_RELEASED}, digest))
+                balance_changes.append(self._balance_change(fields["driver"], int(fields["driver_amount"])))
+                balance_changes.append(self._balance_change(fields["platform"], int(fields["platform_fee"])))
+                events.append(self._event(package, module, "payment_escrow::PaymentReleased", {
+                    "escrow_id": args[0], "trip_id": fields["trip_id"], "driver": fields["driver"],
+                    "driver_amount": fields["driver_amount"], "platform_fee": fields["platform_fee"],
+                }))
+            else:
+                if sender.lower() != fields["passenger"].lower():
+                    raise RpcError(3, "E_NOT_PASSENGER")
+                mutated.append(self.mutate_object(args[0], {"status": ESCROW_STATUS_REFUNDED}, digest))
+                balance_changes.append(self._balance_change(fields["passenger"], int(fields["total_amount"])))
+                events.append(self._event(package, module, "payment_escrow::PaymentRefunded", {
+                    "escrow_id": args[0], "trip_id": fields["trip_id"], "passenger": fields["passenger"],
+                    "refund_amount": fields["total_amount"],
+                }))
+
+        elif (module, function) in (("trip_receipt", "create_receipt"), ("trip_receipt", "create_receipt_for")):
+            # create_receipt_for 由操作錢包代乘客送出，第一個參數為乘客地址
+            passenger, args = (args[0], args[1:]) if function == "create_receipt_for" else (sender, args)
+            receipt = self.create_object(
+                f"{package}::trip_receipt::TripReceipt",
+                {"trip_id": str(args[0]), "passenger": passenger, "driver": args[1], "distance_km": str(args[4]),
+                 "final_amount": str(args[5]), "completed_at": "1"},
+                {"AddressOwner": passenger}, digest,
+            )
+            created.append(receipt)
+            events.append(self._event(package, module, "trip_receipt::ReceiptCreated", {
+                "receipt_id": receipt["objectId"], "trip_id": str(args[0]), "passenger": passenger,
+                "driver": args[1], "final_amount": str(args[5]),
+            }))
+
+        elif (module, function) == ("pay", "split_vec"):
+            coin_id, amounts = args[0], [int(a) for a in args[1]]
+            coin = self.objects[coin_id]
+            remaining = int(coin["content"]["fields"]["balance"]) - sum(amounts)
+            if remaining < 0:
+                raise RpcError(0, "EInsufficientBalance")
+            mutated.append(self.mutate_object(coin_id, {"balance": str(remaining)}, digest))
+            for amount in amounts:
+                new_coin = self.create_object(f"0x2::coin::Coin<{SUI_COIN_TYPE}>",
+                                              {"balance": str(amount), "id": {"id": ""}},
+                                              {"AddressOwner": sender}, digest)
+                self.coins.setdefault(sender.lower(), []).append(new_coin["objectId"])
+                created.append(new_coin)
+
+        elif (module, function) == ("pay", "join_vec"):
+            coin_id, others = args[0], args[1]
+            total = int(self.objects[coin_id]["content"]["fields"]["balance"])
+            for other in others:
+                total += int(self.objects.pop(other)["content"]["fields"]["balance"])
+                owned = self.coins.get(sender.lower(), [])
+                if other in owned:
+                    owned.remove(other)
+            mutated.append(self.mutate_object(coin_id, {"balance": str(total)}, digest))
+
+        elif (module, function) in (("user_registry", "register_user"), ("user_registry", "register_user_for")):
+            user_address = args[1] if function == "register_user_for" else sender
+            profile = self.create_object(f"{package}::user_registry::UserProfile",
+                                         {"user_address": user_address, "status": 0, "reputation": "100"},
+                                         {"AddressOwner": user_address}, digest)
+            created.append(profile)
+            events.append(self._event(package, module, "events::UserRegistered",
+                                      {"user_id": profile["objectId"], "user_address": user_address}))
+
+        elif (module, function) in (("vehicle_registry", "register_vehicle"),
+                                    ("vehicle_registry", "register_vehicle_for")):
+            owner = args[1] if function == "register_vehicle_for" else sender
+            vehicle = self.create_object(f"{package}::vehicle_registry::Vehicle",
+                                         {"owner": owner, "status": 0, "is_verified": False},
+                                         {"AddressOwner": owner}, digest)
+            created.append(vehicle)
+            events.append(self._event(package, module, "events::VehicleRegistered",
+                                      {"vehicle_id": vehicle["objectId"], "owner": owner}))
+
+        elif (module, function) in (("user_registry", "update_user_status"), ("vehicle_registry", "update_status")):
+            # update_user_status(registry, profile, status) / update_status(vehicle, status)
+            object_id, new_status = (args[1], args[2]) if function == "update_user_status" else (args[0], args[1])
+            if object_id not in self.objects:
+                raise RpcError(0, "object not found")
+            mutated.append(self.mutate_object(object_id, {"status": int(new_status)}, digest))
+
+    def _balance_change(self, address: str, amount: int) -> Dict[str, Any]:
+        return {"owner": {"AddressOwner": address}, "coinType": SUI_COIN_TYPE, "amount": str(amount)}
+
+    @staticmethod
+    def _event(package: str, module: str, event_type: str, parsed: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "packageId": package,
+            "transactionModule": module,
+            "type": f"{package}::{event_type}",
+            "parsedJson": {**parsed, "timestamp": str(int(time.time() * 1000))},
+            "bcs": "",
+        }
+
+    # === 查詢 ===
+
+    def query_transactions(self, tx_filter: Optional[Dict[str, Any]], cursor: Optional[str], limit: Optional[int],
+                           descending: bool) -> Dict[str, Any]:
+        limit = min(int(limit or 50), 50)
+        matches = [tx for tx in self.transactions.values() if self._transaction_matches(tx, tx_filter or {})]
+        if descending:
+            matches.reverse()
+
+        start = 0
+        if cursor:
+            for position, tx in enumerate(matches):
+                if tx["digest"] == cursor:
+                    start = position + 1
+                    break
+
+        page = matches[start:start + limit]
+        return {
+            "data": page,
+            "nextCursor": page[-1]["digest"] if page else cursor,
+            "hasNextPage": start + limit < len(matches),
+        }
+
+    @staticmethod
+    def _transaction_matches(tx: Dict[str, Any], tx_filter: Dict[str, Any]) -> bool:
+        calls = [c["MoveCall"] for c in tx["transaction"]["data"]["transaction"]["transactions"]]
+        if "MoveFunction" in tx_filter:
+            f = tx_filter["MoveFunction"]
+            return any(
+                c["package"] == f.get("package")
+                and f.get("module") in (None, c["module"])
+                and f.get("function") in (None, c["function"])
+                for c in calls
+            )
+        if "FromAddress" in tx_filter:
+            return tx["transaction"]["data"]["sender"] == tx_filter["FromAddress"]
+        return not tx_filter
+
+    def query_events(self, query: Dict[str, Any], cursor: Optional[Dict[str, Any]], limit: Optional[int],
+                     descending: bool) -> Dict[str, Any]:
+        limit = min(int(limit or 50), 1000)
+        matches = [e for e in self.events if self._event_matches(e, query or {})]
+        if descending:
+            matches.reverse()
+
+        start = 0
+        if cursor:
+            key = (cursor.get("txDigest"), str(cursor.get("eventSeq")))
+            for position, event in enumerate(matches):
+                if (event["id"]["txDigest"], event["id"]["eventSeq"]) == key:
+                    start = position + 1
+                    break
+
+        page = matches[start:start + limit]
+        has_next = start + limit < len(matches)
+        return {
+            "data": page,
+            "nextCursor": page[-1]["id"] if page else cursor,
+            "hasNextPage": has_next,
+        }
+
+    @staticmethod
+    def _event_matches(event: Dict[str, Any], query: Dict[str, Any]) -> bool:
+        if not query or "All" in query:
+            return True
+        if "MoveModule" in query:
+            f = query["MoveModule"]
+            return event["packageId"] == f.get("package") and event["transactionModule"] == f.get("module")
+        if "MoveEventType" in query:
+            return event["type"] == query["MoveEventType"]
+        if "MoveEventModule" in query:
+            f = query["MoveEventModule"]
+            return event["type"].startswith(f"{f.get('package')}::{f.get('module')}::")
+        if "Sender" in query:
+            return event["sender"] == query["Sender"]
+        if "Transaction" in query:
+            return event["id"]["txDigest"] == query["Transaction"]
+        if "Package" in query:
+            return event["packageId"] == query["Package"]
+        return False
+
+    def get_object(self, object_id: str) -> Dict[str, Any]:
+        obj = self.objects.get(object_id)
+        if obj is None:
+            return {"error": {"code": "notExists", "object_id": object_id}}
+        return {"data": obj}
+
+
+# ============================================================================
+# JSON-RPC 伺服器
+# ============================================================================
+
+def create_app(state: ChainState, faults: FaultConfig, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Local Sui fullnode stand-in")
+    rng = random.Random(seed)
+    stats: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    # 執行中交易使用的 gas coin
+    locked_gas: set = set()
+
+    def handle(method: str, params: List[Any]) -> Any:
+        if method == "suix_getBalance":
+            owner = params[0]
+            coins = state.get_coins(owner)
+            return {"coinType": SUI_COIN_TYPE, "coinObjectCount": len(coins),
+                    "totalBalance": str(state.balance(owner)), "lockedBalance": {}}
+        if method == "suix_getCoins":
+            coins = state.get_coins(params[0])
+            return {
+                "data": [{"coinType": SUI_COIN_TYPE, "coinObjectId": c["objectId"], "version": c["version"],
+                          "digest": c["digest"], "balance": c["content"]["fields"]["balance"],
+                          "previousTransaction": c["previousTransaction"]} for c in coins],
+                "nextCursor": None,
+                "hasNextPage": False,
+            }
+        if method == "suix_getReferenceGasPrice":
+            return str(REFERENCE_GAS_PRICE)
+        if method == "sui_getTransactionBlock":
+            tx = state.transactions.get(params[0])
+            if tx is None:
+                raise RpcError(-32602, f"Could not find the referenced transaction [TransactionDigest({params[0]})].")
+            return tx
+        if method == "sui_executeTransactionBlock":
+            return state.execute(params[0], params[1] if len(params) > 1 else [])
+        if method == "sui_dryRunTransactionBlock":
+            result = state.execute(params[0], [], commit=False)
+            return {"effects": result["effects"], "events": result["events"],
+                    "objectChanges": result["objectChanges"], "balanceChanges": result["balanceChanges"],
+                    "input": result["transaction"]["data"]}
+        if method == "suix_queryTransactionBlocks":
+            query, cursor, limit, descending = (list(params) + [None, None, None, False])[:4]
+            return state.query_transactions((query or {}).get("filter"), cursor, limit, bool(descending))
+        if method == "suix_queryEvents":
+            query, cursor, limit, descending = (list(params) + [None, None, None, False])[:4]
+            return state.query_events(query, cursor, limit, bool(descending))
+        if method == "sui_getObject":
+            return state.get_object(params[0])
+        if method == "sui_multiGetObjects":
+            if len(params[0]) > 50:
+                raise RpcError(-32602, "Number of objects exceeds the maximum of 50")
+            return [state.get_object(object_id) for object_id in params[0]]
+        if method == "sui_getLatestCheckpointSequenceNumber":
+            return str(state.checkpoint)
+        if method == "sui_getChainIdentifier":
+            return "localnet"
+        raise RpcError(-32601, f"Method not found: {method}")
+
+    async def dispatch(payload: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+        method = payload.get("method", "")
+        request_id = payload.get("id")
+        started = time.perf_counter()
+        stats[method]["calls"] += 1
+
+        gas_payment = None
+        if method == "sui_executeTransactionBlock" and payload.get("params"):
+            gas_payment = stub_gas_payment(payload["params"][0])
+            if gas_payment in locked_gas:
+                stats[method]["gas_conflicts"] += 1
+                await asyncio.sleep(faults.latency_ms(method, rng) / 1000)
+                return {"jsonrpc": "2.0", "id": request_id,
+                        "error": {"code": -32002, "message": f"Transaction is rejected as invalid: object {gas_payment} "
+                                                             "is reserved for another transaction"}}, None
+            if gas_payment:
+                locked_gas.add(gas_payment)
+        try:
+            return await _dispatch(payload, method, request_id, started)
+        finally:
+            locked_gas.discard(gas_payment)
+
+    async def _dispatch(payload: Dict[str, Any], method: str, request_id: Any,
+                        started: float) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+        await asyncio.sleep(faults.latency_ms(method, rng) / 1000)
+
+        fault = faults.pick_error(method, rng)
+        if fault == "timeout":
+            stats[method]["timeouts"] += 1
+            await asyncio.sleep(faults.timeout_seconds)
+        if fault == "http":
+            stats[method]["http_errors"] += 1
+            return None, 503
+        if fault == "rpc":
+            stats[method]["rpc_errors"] += 1
+            return {"jsonrpc": "2.0", "id": request_id,
+                    "error": {"code": -32000, "message": "Injected failure (local fullnode)"}}, None
+
+        try:
+            result = handle(method, payload.get("params") or [])
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except RpcError as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": e.message}}
+        except (IndexError, KeyError, TypeError, ValueError) as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32602, "message": f"Invalid params: {e}"}}
+
+        stats[method]["total_ms"] += (time.perf_counter() - started) * 1000
+        return response, None
+
+    @app.post("/")
+    async def rpc(request: Request):
+        body = await request.json()
+        if isinstance(body, list):
+            results = await asyncio.gather(*(dispatch(item) for item in body))
+            if any(status for _, status in results):
+                return JSONResponse(status_code=503, content={"error": "service unavailable"})
+            return [response for response, _ in results]
+        response, status = await dispatch(body)
+        if status:
+            return JSONResponse(status_code=status, content={"error": "service unavailable"})
+        return response
+
+    @app.get("/__stats")
+    async def get_stats():
+        return {
+            "checkpoint": state.checkpoint,
+            "objects": len(state.objects),
+            "transactions": len(state.transactions),
+            "events": len(state.events),
+            "methods": {
+                method: {**values, "avg_ms": round(values["total_ms"] / values["calls"], 2) if values["calls"] else 0}
+                for method, values in stats.items()
+            },
+            "faults": faults.to_dict(),
+        }
+
+    @app.post("/__config")
+    async def update_config(request: Request):
+        try:
+            faults.update(await request.json())
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+        return faults.to_dict()
+
+    return app
+
+
+def _parse_overrides(values: List[str], cast=str) -> Dict[str, Any]:
+    """解析 method=value，未指定方法時視為 default"""
+    result = {}
+    for value in values:
+        method, _, spec = value.rpartition("=") if "=" in value else ("default", "", value)
+        result[method or "default"] = cast(spec)
+    return result
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local Sui JSON-RPC stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", action="append", default=[],
+                        help="[method=]fixed:ms | uniform:lo:hi | normal:mean:std | lognormal:median:sigma")
+    parser.add_argument("--error-rate", action="append", default=[], help="[method=]rate，例如 0.01")
+    parser.add_argument("--error-modes", default="rpc:0.7,http:0.3,timeout:0",
+                        help="錯誤型態比例，例如 rpc:0.5,http:0.3,timeout:0.2")
+    parser.add_argument("--timeout-seconds", type=float, default=30.0)
+    parser.add_argument("--default-balance", type=int, default=10_000_000_000, help="新地址的預設餘額 (MIST)")
+    parser.add_argument("--coins-per-address", type=int, default=4)
+    parser.add_argument("--seed-escrows", type=int, default=0, help="預先建立的託管物件數量")
+    parser.add_argument("--package", default="0x" + "a" * 64, help="seed 物件使用的合約包 ID")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    faults = FaultConfig(
+        latency={"default": "fixed:0", **_parse_overrides(args.latency)},
+        error_rate={"default": 0.0, **_parse_overrides(args.error_rate, float)},
+        error_modes={mode: float(weight) for mode, weight in
+                     (item.split(":") for item in args.error_modes.split(",") if item)},
+        timeout_seconds=args.timeout_seconds,
+    )
+    state = ChainState(args.default_balance, args.coins_per_address, seed=args.seed)
+    if args.seed_escrows:
+        state.seed_escrows(args.seed_escrows, args.package)
+
+    uvicorn.run(create_app(state, faults, seed=args.seed), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
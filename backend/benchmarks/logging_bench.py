@@ -0,0 +1,111 @@
+# backend/benchmarks/logging_bench.py
+"""
+日誌對事件迴圈延遲的影響
+
+以 1ms 週期的探測 task 量測事件迴圈延遲（實際喚醒時間 - 預期時間），同時由多個
+worker 模擬 complete_trip / Sui 呼叫的熱路徑日誌（每輪 8 行 INFO，之間以 sleep 模擬 I/O），
+比較以下模式:
+
+    off       只輸出 WARNING 以上（熱路徑日誌全部被略過）
+    sync      原本的同步 StreamHandler + RotatingFileHandler
+    queue     QueueHandler + 背景執行緒輸出
+    sampled   queue + 熱路徑 logger 取樣 10%
+
+使用方式:
+    python -m benchmarks.logging_bench --workers 50 --trip-interval-ms 20 --duration 5 [--format json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from app.core.logging_config import logging_stats, setup_logging, stop_logging
+
+HOT_LOGGER = "app.services.trip_service"
+MODES = {
+    "off": {"log_level": "WARNING", "async_logging": False},
+    "sync": {"log_level": "INFO", "async_logging": False},
+    "queue": {"log_level": "INFO", "async_logging": True},
+    "sampled": {"log_level": "INFO", "async_logging": True, "sampling": {HOT_LOGGER: 0.1}},
+}
+
+
+async def hot_path_worker(logger: logging.Logger, stop_at: float, counter: list, trip_interval: float):
+    """模擬一次完成行程的日誌量（與 trip_service / sui_service 的實際訊息相近）"""
+    trip_id = 0
+    while time.perf_counter() < stop_at:
+        trip_id += 1
+        logger.info("🚗 開始完成行程 %s，司機: %s，乘客: %s", trip_id, "driver_bob", "alice123")
+        logger.info("💰 託管對象ID: %s", "0x" + "ab" * 32)
+        logger.info("📞 調用合約 release_payment")
+        logger.info("   Escrow: %s", "0x" + "cd" * 32)
+        await asyncio.sleep(0)
+        logger.info("✅ 合約調用成功: %s", "9xQeWvG816bUx9EPjHmaT23yvVM2ZWbrrpZb9PusVFin")
+        logger.info("✅ 支付已成功釋放給司機，交易Hash: %s", "9xQeWvG816bUx9EPjHmaT23yvVM2ZWbrrpZb9PusVFin")
+        logger.info("💰 車輛收益更新: +%s micro SUI", 100000)
+        logger.info("✅ 行程完成: trip %s, tx %s", trip_id, "9xQeWvG816bUx9EPjHmaT23yvVM2ZWbrrpZb9PusVFin")
+        counter[0] += 1
+        # 模擬資料庫 / RPC 等待
+        await asyncio.sleep(trip_interval)
+
+
+async def probe(stop_at: float, interval: float, lags: list):
+    """量測事件迴圈延遲"""
+    while time.perf_counter() < stop_at:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - expected) * 1000)
+
+
+async def run_mode(workers: int, duration: float, interval: float, trip_interval: float) -> dict:
+    logger = logging.getLogger(HOT_LOGGER)
+    stop_at = time.perf_counter() + duration
+    lags, counter = [], [0]
+    await asyncio.gather(
+        probe(stop_at, interval, lags),
+        *(hot_path_worker(logger, stop_at, counter, trip_interval) for _ in range(workers)),
+    )
+    lags.sort()
+    return {
+        "trips_per_second": round(counter[0] / duration, 1),
+        "lag_p50_ms": round(statistics.median(lags), 3),
+        "lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1], 3),
+        "lag_max_ms": round(lags[-1], 3),
+        "probes": len(lags),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logging event-loop latency benchmark")
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--interval-ms", type=float, default=1.0, help="探測週期")
+    parser.add_argument("--trip-interval-ms", type=float, default=20.0, help="每個 worker 兩次行程之間的 I/O 等待")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, "w") as devnull:
+        for mode in args.modes.split(","):
+            # stdout 導向 /dev/null，只保留檔案寫入的實際成本
+            with contextlib.redirect_stdout(devnull):
+                setup_logging(log_to_file=True, log_format=args.format, log_dir=log_dir, **MODES[mode])
+                results[mode] = asyncio.run(run_mode(
+                    args.workers, args.duration, args.interval_ms / 1000, args.trip_interval_ms / 1000
+                ))
+                results[mode].update(logging_stats())
+                stop_logging()
+            print(f"{mode:8s} {json.dumps(results[mode])}")
+
+    logging.getLogger().handlers.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# backend/benchmarks/speed_table_bench.py
+"""
+車速表查詢成本基準測試
+
+建立與實際規模相近的合成車速表，量測單次 speed_kmh 查表（命中與退回全域平均）
+的平均耗時，超過 1µs 時以非零狀態碼結束。
+
+使用方式:
+    python -m benchmarks.speed_table_bench --cells 200000 --lookups 1000000
+"""
+
+import argparse
+import random
+import sys
+import timeit
+
+from app.services.speed_table import HOURS_PER_WEEK, SpeedTable, unpack_key
+
+BUDGET_NS = 1000
+
+
+def build_table(n_cells: int, cell_size_deg: float, seed: int = 42) -> SpeedTable:
+    """以台北附近的網格建立合成車速表"""
+    rng = random.Random(seed)
+    base_lat = int(24.9 / cell_size_deg)
+    base_lng = int(121.4 / cell_size_deg)
+    cells = {}
+    while len(cells) < n_cells:
+        key = (
+            base_lat + rng.randrange(0, 200),
+            base_lng + rng.randrange(0, 200),
+            rng.randrange(HOURS_PER_WEEK),
+        )
+        cells[key] = rng.uniform(8, 60)
+    hourly = [rng.uniform(15, 40) for _ in range(HOURS_PER_WEEK)]
+    return SpeedTable(cell_size_deg=cell_size_deg, default_speed_kmh=30.0, cells=cells, hourly=hourly)
+
+
+def bench(table: SpeedTable, points, lookups: int) -> float:
+    """返回每次查表的平均奈秒數"""
+    n = len(points)
+    speed_kmh = table.speed_kmh
+
+    def run():
+        for i in range(lookups):
+            lat, lng, hour = points[i % n]
+            speed_kmh(lat, lng, hour)
+
+    def loop_only():
+        for i in range(lookups):
+            lat, lng, hour = points[i % n]
+
+    # 扣除迴圈本身的開銷，只留下查表成本
+    total = min(timeit.repeat(run, number=1, repeat=3))
+    overhead = min(timeit.repeat(loop_only, number=1, repeat=3))
+    return (total - overhead) / lookups * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speed table lookup benchmark")
+    parser.add_argument("--cells", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=1000000)
+    parser.add_argument("--cell-size", type=float, default=0.02)
+    args = parser.parse_args()
+
+    table = build_table(args.cells, args.cell_size)
+    rng = random.Random(7)
+    hit_keys = [unpack_key(key) for key in rng.sample(list(table._cells.keys()), 10000)]
+    hit_points = [
+        ((lat + 0.5) * args.cell_size, (lng + 0.5) * args.cell_size, hour)
+        for lat, lng, hour in hit_keys
+    ]
+    miss_points = [
+        (rng.uniform(20.0, 22.0), rng.uniform(118.0, 119.0), rng.randrange(HOURS_PER_WEEK))
+        for _ in range(10000)
+    ]
+
+    hit_ns = bench(table, hit_points, args.lookups)
+    miss_ns = bench(table, miss_points, args.lookups)
+
+    print(f"cells: {len(table)}, lookups: {args.lookups}")
+    print(f"cell hit:       {hit_ns:8.1f} ns/lookup")
+    print(f"hourly fallback:{miss_ns:8.1f} ns/lookup")
+
+    worst = max(hit_ns, miss_ns)
+    if worst >= BUDGET_NS:
+        print(f"❌ lookup cost {worst:.1f} ns exceeds {BUDGET_NS} ns budget")
+        sys.exit(1)
+    print(f"✅ lookup cost within {BUDGET_NS} ns budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,7 @@ from sqlalchemy import text
 print("🚀 [STEP 1] 開始導入模組...")
 
 from app.main import app
-from app.core.database import get_async_session
+from app.core.database import get_admin_async_session, get_async_session, get_export_async_session
 
 print("🚀 [STEP 2] 導入 Base...")
 from app.models.base import Base
@@ -166,11 +166,39 @@ async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
 @pytest_asyncio.fixture
 async def client() -> AsyncGenerator[AsyncClient, None]:
     """創建測試用的 HTTP 客戶端"""
-    app.dependency_overrides[get_async_session] = override_get_async_session
+    # 管理後台與匯出路由使用各自的會話依賴，同樣改用測試資料庫
+    for dependency in (get_async_session, get_admin_async_session, get_export_async_session):
+        app.dependency_overrides[dependency] = override_get_async_session
     async with AsyncClient(app=app, base_url="http://testserver") as ac:
         yield ac
     app.dependency_overrides.clear()
 
+@pytest.fixture
+def query_budget():
+    """
+    限制區塊內的 SQL 查詢數量
+
+        with query_budget(4):
+            await client.post(...)
+
+    超過上限或出現重複語句（N+1）時測試失敗；allow_repeats=True 可略過重複檢查
+    """
+    from contextlib import contextmanager
+    from app.core.query_counter import track_queries
+
+    @contextmanager
+    def _budget(max_queries: int, allow_repeats: bool = False):
+        with track_queries() as stats:
+            yield stats
+        statements = "\n".join(f"  {count}x {sql}" for sql, count in stats.statements.most_common())
+        assert stats.count <= max_queries, (
+            f"執行了 {stats.count} 條查詢，超過預算 {max_queries}:\n{statements}"
+        )
+        if not allow_repeats:
+            assert not stats.repeated(), f"相同語句重複執行（可能是 N+1）:\n{statements}"
+
+    return _budget
+
 @pytest.fixture
 def sample_user_data():
     """提供測試用的用戶資料"""
@@ -0,0 +1,1246 @@
+# backend/tests/test_services.py
+"""
+測試服務層的純計算邏輯（不需要資料庫）
+"""
+import asyncio
+import json
+import logging
+import queue
+
+import pytest
+
+from app.core.cache import SingleFlightTTLCache
+from app.core.logging_config import JsonFormatter, NonBlockingQueueHandler, SamplingFilter, parse_sampling
+from app.core.metrics import MetricsRegistry
+from app.core.query_counter import record, track_queries
+from app.models.chain_event import ChainEvent
+from app.services.chain_event_service import ChainEventService, LockCriteria, decode_event
+from app.services.contract_metrics_service import metric_row, parse_gas_used
+from app.services.gas_budget_service import GasBudgetEstimator, recommend_budget
+from app.services import outbox_service
+from app.services.gas_coin_pool import GasCoin, GasCoinPool, GasPoolExhaustedError, plan_rebalance
+from app.services.search_service import AdminSearchService, NgramIndex, contains_filter, trigrams
+from app.services.settlement_batcher import SettlementBatcher, failed_command
+from app.services import reconciliation_service
+from app.services.reconciliation_service import EscrowReconciler, classify, is_object_id
+from app.services import analytics_store
+from app.services.analytics_store import AnalyticsStore, month_key, month_range
+from app.services.chain_sync_service import ChainStatusSync, SYNC_TARGETS, move_status
+from app.services.outbox_service import ChainOutboxWorker, retry_delay
+from app.services.export_service import EXPORT_DATASETS, csv_chunks, parquet_chunks, prepare_export
+from app.services.payment_registry import expected_amount_mist, stored_result
+from app.services.trip_partition_service import TripPartitionMaintainer, archivable_months, create_partition_sql
+from app.services.trip_reaper import TripReaper, default_rules, trips_reaped
+from app.services.vehicle_service import VehicleOnboardingService, parse_vehicle_csv
+from app.services.location_service import LocationService
+from app.services.pricing_service import PricingService, compile_rate_table
+from app.services.speed_table import SpeedTable, aggregate_rows, hour_of_week, pack_key, unpack_key
+from app.services.surge_service import SurgeService
+
+
+class TestSurgePricing:
+    """測試網格供需加價"""
+
+    def test_no_surge_when_supply_covers_demand(self):
+        """供給足夠時倍率為 1.0"""
+        assert SurgeService.compute_multiplier(demand=2, supply=5) == 1.0
+        assert SurgeService.compute_multiplier(demand=0, supply=0) == 1.0
+
+    def test_multiplier_grows_and_is_capped(self):
+        """需求越多倍率越高，但不超過上限"""
+        low = SurgeService.compute_multiplier(demand=4, supply=2)
+        high = SurgeService.compute_multiplier(demand=8, supply=2)
+        assert 1.0 < low < high
+        assert SurgeService.compute_multiplier(demand=1000, supply=1) == 3.0
+
+    def test_snapshot_counts_neighbor_cells(self):
+        """統計包含鄰近網格，遠處網格不受影響"""
+        demand = [(25.033, 121.565)] * 6
+        supply = [(25.034, 121.566), (25.045, 121.575)]
+        snapshot = SurgeService.build_snapshot(demand, supply)
+
+        cell = LocationService.grid_cell(25.033, 121.565, 0.02)
+        stats = snapshot.cells[cell]
+        assert stats.demand == 6
+        assert stats.supply == 2
+        assert stats.multiplier > 1.0
+        assert stats.avg_supply_distance_km is not None
+
+        far_cell = LocationService.grid_cell(24.5, 121.0, 0.02)
+        assert far_cell not in snapshot.cells
+        assert snapshot.open_trips == 6
+        assert snapshot.available_vehicles == 2
+
+    def test_stale_table_falls_back_to_base_fare(self):
+        """尚未計算過的加價表返回 1.0"""
+        service = SurgeService()
+        assert service.is_fresh() is False
+        assert service.get_multiplier(25.033, 121.565) == 1.0
+
+
+class TestSingleFlightTTLCache:
+    """測試預估快取"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_computation(self):
+        """並行的相同請求只計算一次"""
+        cache = SingleFlightTTLCache(ttl_seconds=5)
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"fare": 100}
+
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(10)))
+        assert calls == 1
+        assert all(r == {"fare": 100} for r in results)
+
+        await cache.get_or_compute("k", compute)
+        stats = cache.get_stats()
+        assert stats["misses"] == 1
+        assert stats["coalesced"] == 9
+        assert stats["hits"] == 1
+        assert stats["hit_rate"] == round(10 / 11, 4)
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(self):
+        """計算失敗不寫入快取"""
+        cache = SingleFlightTTLCache(ttl_seconds=5)
+
+        async def failing():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            await cache.get_or_compute("k", failing)
+        assert cache.get("k") is None
+        assert cache.get_stats()["errors"] == 1
+
+    def test_expired_entries_are_dropped(self):
+        """過期項目不會被返回，超過容量時淘汰最舊的"""
+        cache = SingleFlightTTLCache(ttl_seconds=-1)
+        cache.set("k", 1)
+        assert cache.get("k") is None
+
+        cache = SingleFlightTTLCache(ttl_seconds=5, max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+        assert cache.get("a") is None
+        assert cache.get("c") == "c"
+        assert cache.stats.evictions == 1
+
+
+class TestSpeedTable:
+    """測試歷史車速表"""
+
+    def test_hour_of_week_starts_on_monday(self):
+        """星期一 00:00（當地時間）為第 0 小時"""
+        # 2025-10-19T16:00:00Z = 台北 2025-10-20（星期一）00:00
+        monday_midnight_taipei = 1760889600
+        assert hour_of_week(monday_midnight_taipei, utc_offset_hours=8) == 0
+        assert hour_of_week(monday_midnight_taipei + 3600 * 25, utc_offset_hours=8) == 25
+
+    def test_key_packing_round_trip(self):
+        """負數索引也能還原"""
+        for key in [(1251, 6078, 0), (-4500, -9000, 167), (0, -1, 3)]:
+            assert unpack_key(pack_key(*key)) == key
+
+    def test_lookup_falls_back_to_hourly_then_default(self):
+        """網格缺資料時退回該小時的全域平均"""
+        rows = [
+            (1251, 6078, 9, 100.0, 300, 10),   # 20 km/h
+            (None, None, 9, 250.0, 500, 25),   # 30 km/h
+            (1251, 6078, 10, 10.0, 60, 2),     # 樣本不足
+        ]
+        table = aggregate_rows(rows, cell_size_deg=0.02, default_speed_kmh=25.0, min_samples=5)
+        assert table.speed_kmh(25.033, 121.565, 9) == pytest.approx(20.0)
+        assert table.speed_kmh(23.0, 120.0, 9) == pytest.approx(30.0)
+        assert table.speed_kmh(25.033, 121.565, 10) == 25.0
+        assert table.estimate_travel_time_minutes(10.0, 25.033, 121.565, hour=9) == 30
+
+    def test_serialization_round_trip(self):
+        """JSON 格式可完整還原"""
+        table = SpeedTable(cell_size_deg=0.02, default_speed_kmh=30.0, cells={(1251, 6078, 9): 18.5})
+        restored = SpeedTable.from_dict(table.to_dict())
+        assert len(restored) == 1
+        assert restored.speed_kmh(25.033, 121.565, 9) == 18.5
+
+
+class TestPricingEngine:
+    """測試統一定價引擎"""
+
+    def test_default_sedan_matches_legacy_trip_rates(self):
+        """sedan 費率與原本 TripService 的計算結果一致"""
+        engine = PricingService(rates_path="")
+        fare = engine.quote(distance_km=4.0, duration_minutes=10)
+        assert fare.vehicle_type == "sedan"
+        assert fare.base_fare == 50000
+        assert fare.distance_fare == 40000
+        assert fare.time_fare == 10000
+        assert fare.platform_fee == 10000
+        assert fare.total_amount == 110000
+        assert fare.driver_amount == 100000
+
+    def test_quote_all_vehicle_types(self):
+        """一次返回所有車型報價，且高級車型較貴"""
+        engine = PricingService(rates_path="")
+        quotes = engine.quote_all(distance_km=5.0, duration_minutes=12, surge_multiplier=1.5)
+        assert set(quotes) == {"sedan", "suv", "minivan", "luxury"}
+        assert quotes["sedan"].total_amount < quotes["suv"].total_amount < quotes["luxury"].total_amount
+        assert all(q.surge_multiplier == 1.5 for q in quotes.values())
+
+    def test_hot_reload_from_file(self, tmp_path):
+        """檔案變更後重新載入，格式錯誤時保留原費率"""
+        rates_file = tmp_path / "rates.json"
+        rates_file.write_text(json.dumps({
+            "platform_fee_rate": 0.2,
+            "vehicle_types": {"sedan": {"base_fare": 1000, "per_km": 100, "per_minute": 10}},
+        }))
+        engine = PricingService(rates_path=str(rates_file))
+        assert engine.quote(1.0, 1).total_amount == int(1110 * 1.2)
+
+        rates_file.write_text("{not json")
+        with pytest.raises(ValueError):
+            engine.reload()
+        assert engine.rates.platform_fee_rate == 0.2
+
+    def test_reload_removing_type_keeps_rate_for_existing_trips(self, tmp_path):
+        """重新載入移除的車型不再接受新報價，既有行程沿用移除前的費率；未知車型退回預設車型"""
+        rates_file = tmp_path / "rates.json"
+        table = {
+            "platform_fee_rate": 0.1,
+            "vehicle_types": {
+                "sedan": {"base_fare": 1000, "per_km": 100, "per_minute": 10},
+                "suv": {"base_fare": 2000, "per_km": 200, "per_minute": 20},
+            },
+        }
+        rates_file.write_text(json.dumps(table))
+        engine = PricingService(rates_path=str(rates_file))
+        before = engine.quote(2.0, 5, vehicle_type="suv").total_amount
+
+        del table["vehicle_types"]["suv"]
+        rates_file.write_text(json.dumps(table))
+        engine.reload()
+        with pytest.raises(ValueError):
+            engine.quote(2.0, 5, vehicle_type="suv")
+        assert engine.quote(2.0, 5, vehicle_type="suv", existing=True).total_amount == before
+        assert engine.quote(2.0, 5, vehicle_type="bus", existing=True).vehicle_type == "sedan"
+        assert engine.get_status()["retired_vehicle_types"]["suv"]["base_fare"] == 2000
+
+        # 車型重新加入後以新費率為準
+        table["vehicle_types"]["suv"] = {"base_fare": 3000, "per_km": 200, "per_minute": 20}
+        rates_file.write_text(json.dumps(table))
+        engine.reload()
+        assert "suv" not in engine.get_status()["retired_vehicle_types"]
+        assert engine.quote(2.0, 5, vehicle_type="suv").total_amount > before
+
+    def test_invalid_table_rejected(self):
+        """不合法的費率表拋出 ValueError"""
+        with pytest.raises(ValueError):
+            compile_rate_table({"platform_fee_rate": 1.5, "vehicle_types": {"sedan": {"base_fare": 1, "per_km": 1, "per_minute": 1}}})
+        with pytest.raises(ValueError):
+            compile_rate_table({"platform_fee_rate": 0.1, "vehicle_types": {}})
+
+
+class TestMetrics:
+    """測試 Prometheus 指標輸出"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """bucket 計數為累積值，+Inf 等於總數"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "test", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(value, "/trips")
+
+        output = registry.render()
+        assert 'latency_seconds_bucket{route="/trips",le="0.1"} 1' in output
+        assert 'latency_seconds_bucket{route="/trips",le="1"} 3' in output
+        assert 'latency_seconds_bucket{route="/trips",le="+Inf"} 4' in output
+        assert 'latency_seconds_count{route="/trips"} 4' in output
+        assert histogram.sum("/trips") == pytest.approx(6.05)
+
+    def test_counter_and_gauge_callback(self):
+        """counter 依標籤累加，gauge callback 在輸出時計算"""
+        registry = MetricsRegistry()
+        counter = registry.counter("rpc_errors_total", "test", ("method",))
+        counter.inc("suix_getBalance")
+        counter.inc("suix_getBalance", amount=2)
+        registry.gauge("pool", "test", ("state",), callback=lambda: {("idle",): 3})
+
+        output = registry.render()
+        assert 'rpc_errors_total{method="suix_getBalance"} 3' in output
+        assert 'pool{state="idle"} 3' in output
+        with pytest.raises(ValueError):
+            counter.inc()
+
+
+class TestQueryCounter:
+    """測試每個請求的查詢計數"""
+
+    def test_nested_tracking_and_repeats(self):
+        """巢狀範圍都會計入，相同語句（忽略空白差異）達門檻視為重複"""
+        with track_queries() as outer:
+            record("SELECT * FROM trips WHERE trip_id = $1", 0.001)
+            with track_queries() as inner:
+                for _ in range(3):
+                    record("SELECT *  FROM users\n WHERE id = $1", 0.002)
+
+        assert inner.count == 3
+        assert outer.count == 4
+        assert outer.total_ms == pytest.approx(7.0)
+        assert inner.repeated(threshold=3) == [("SELECT * FROM users WHERE id = $1", 3)]
+        assert outer.repeated(threshold=4) == []
+
+    def test_no_tracking_outside_scope(self):
+        """沒有啟用的範圍時不記錄"""
+        record("SELECT 1", 0.001)
+        with track_queries() as stats:
+            pass
+        assert stats.count == 0
+
+
+class TestLoggingPipeline:
+    """測試非阻塞日誌管線"""
+
+    @staticmethod
+    def _record(name, level=logging.INFO, msg="trip %s", args=(1,)):
+        return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+    def test_sampling_by_logger_prefix(self):
+        """依最長前綴取樣 INFO，WARNING 一律保留"""
+        sampler = SamplingFilter(parse_sampling("app.services=1.0,app.services.sui_service=0"))
+        assert sampler.filter(self._record("app.services.trip_service"))
+        assert not sampler.filter(self._record("app.services.sui_service"))
+        assert sampler.filter(self._record("app.services.sui_service", level=logging.WARNING))
+        assert sampler.sampled_out == 1
+        with pytest.raises(ValueError):
+            parse_sampling("app.services")
+
+    def test_queue_handler_merges_args_and_drops_when_full(self):
+        """入列時只合併訊息參數；佇列已滿時丟棄 INFO"""
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        handler.handle(self._record("app.x"))
+        handler.handle(self._record("app.x"))
+        assert handler.dropped == 1
+
+        record = handler.queue.get_nowait()
+        assert record.msg == "trip 1" and record.args is None
+        payload = json.loads(JsonFormatter().format(record))
+        assert payload["msg"] == "trip 1" and payload["logger"] == "app.x"
+
+
+class TestChainEventDecoding:
+    """測試鏈上事件解碼"""
+
+    PACKAGE = "0x" + "a" * 64
+
+    def _event(self, struct, parsed, seq="0"):
+        return {
+            "id": {"txDigest": "9xQeWvG816bUx9EPjHmaT23yvVM2ZWbrrpZb9PusVFin", "eventSeq": seq},
+            "packageId": self.PACKAGE,
+            "transactionModule": struct.split("::")[0],
+            "sender": "0x" + "1" * 64,
+            "type": f"{self.PACKAGE}::{struct}",
+            "parsedJson": parsed,
+            "timestampMs": "1760000000000",
+        }
+
+    def test_decode_escrow_and_receipt_events(self):
+        """u64 字串轉為整數，託管 / 收據對象ID 取自事件欄位"""
+        row = decode_event(self._event(
+            "payment_escrow::PaymentLocked", {"escrow_id": "0xe5", "trip_id": "42", "total_amount": "110000000"}
+        ))
+        assert row["event_name"] == "PaymentLocked" and row["module"] == "payment_escrow"
+        assert row["trip_id"] == 42 and row["object_id"] == "0xe5"
+        assert row["event_seq"] == 0 and row["timestamp_ms"] == 1760000000000
+
+        receipt = decode_event(self._event("trip_receipt::ReceiptCreated", {"receipt_id": "0xr1", "trip_id": "42"}, "1"))
+        assert receipt["object_id"] == "0xr1" and receipt["event_seq"] == 1
+
+    def test_decode_rejects_malformed_event(self):
+        """事件型別或 txDigest 缺失時拋出 ValueError"""
+        with pytest.raises(ValueError):
+            decode_event({"id": {"txDigest": "abc", "eventSeq": "0"}, "type": "not-a-move-type"})
+        with pytest.raises(ValueError):
+            decode_event({"id": {}, "type": f"{self.PACKAGE}::payment_escrow::PaymentLocked"})
+
+    @pytest.mark.asyncio
+    async def test_find_lock_skips_events_that_do_not_match_trip(self):
+        """同一 trip_id 的他人鎖定（1 MIST、其他司機）被略過，採用乘客 / 司機 / 金額相符的鎖定"""
+        passenger, driver = "0x" + "1" * 64, "0x" + "d" * 64
+
+        def lock(seq, sender, escrow_id, amount, lock_driver=driver):
+            raw = self._event("payment_escrow::PaymentLocked", {
+                "escrow_id": escrow_id, "trip_id": "42", "passenger": sender, "driver": lock_driver,
+                "total_amount": str(amount), "platform_fee": "0",
+            }, seq)
+            raw["sender"] = sender
+            return ChainEvent(**decode_event(raw))
+
+        stranger = "0x" + "5" * 64
+        events = [lock("0", stranger, "0xfake", 1), lock("1", stranger, "0xfake2", 1_500_000_000, stranger),
+                  lock("2", passenger, "0xreal", 1_499_999_999)]
+
+        class Scalars:
+            def scalars(self):
+                return iter(events)
+
+        class Session:
+            async def execute(self, statement):
+                return Scalars()
+
+        service = ChainEventService(Session())
+        # 錢包端以浮點數換算的金額與車費相差不到 1 micro
+        criteria = LockCriteria.of([passenger.upper().replace("0X", "0x")], driver, 1_500_000_000)
+        assert (await service.find_lock(42, criteria)).object_id == "0xreal"
+        assert await service.find_lock(42, LockCriteria.of([passenger], driver, 2_000_000_000)) is None
+        operators = LockCriteria.of(["0x" + "0" * 63 + "9"], driver, 1_500_000_000)
+        assert await service.find_lock(42, operators) is None
+
+
+class TestContractMetrics:
+    """測試合約交易效能記錄"""
+
+    PACKAGE = "0x" + "a" * 64
+
+    def _tx_block(self, function="release_payment", status="success"):
+        return {
+            "digest": "Fsm6x6RQrLtSxqG8ajGzGhbdDzGbtou6AfdvpfYGT4Mx",
+            "transaction": {"data": {
+                "transaction": {"kind": "ProgrammableTransaction", "transactions": [
+                    {"SplitCoins": ["GasCoin", [{"Input": 0}]]},
+                    {"MoveCall": {"package": self.PACKAGE, "module": "payment_escrow", "function": function}},
+                ]},
+                "gasData": {"budget": "10000000"},
+            }},
+            "effects": {
+                "status": {"status": status, "error": "MoveAbort(1)" if status == "failure" else None},
+                "executedEpoch": "3",
+                "gasUsed": {"computationCost": "1000000", "storageCost": "2000000",
+                            "storageRebate": "978120", "nonRefundableStorageFee": "9880"},
+            },
+            "checkpoint": "1024",
+            "timestampMs": "1760000000000",
+        }
+
+    def test_gas_used_is_net_of_rebate(self):
+        """gas_used = computation + storage - rebate"""
+        gas = parse_gas_used(self._tx_block()["effects"])
+        assert gas["gas_used"] == 1000000 + 2000000 - 978120
+        assert gas["non_refundable_storage_fee"] == 9880
+
+    def test_metric_row_picks_tracked_move_call(self):
+        """未指定函數時取交易中追蹤中的 Move 呼叫；失敗交易保留錯誤"""
+        row = metric_row(self._tx_block(status="failure"))
+        assert (row["package_id"], row["module"], row["function"]) == (self.PACKAGE, "payment_escrow", "release_payment")
+        assert row["status"] == "failure" and row["error"] == "MoveAbort(1)"
+        assert row["gas_budget"] == 10000000 and row["checkpoint"] == 1024 and row["source"] == "backfill"
+
+        with pytest.raises(ValueError):
+            metric_row(self._tx_block(function="split"))
+
+
+class TestGasBudgetEstimator:
+    """測試 gas 預算估算"""
+
+    def test_recommend_budget_rounds_up_and_clamps(self):
+        """p99 × 安全係數向上取整，並限制在上下限之間"""
+        assert recommend_budget(3_250_000, margin=1.2, min_budget=1_000_000, max_budget=50_000_000) == 3_900_000
+        assert recommend_budget(3_250_001, margin=1.0, min_budget=1_000_000, max_budget=50_000_000) == 3_300_000
+        assert recommend_budget(10_000, margin=1.2, min_budget=1_000_000, max_budget=50_000_000) == 1_000_000
+        assert recommend_budget(10**9, margin=1.2, min_budget=1_000_000, max_budget=50_000_000) == 50_000_000
+
+    def test_falls_back_to_default_without_enough_samples(self):
+        """樣本不足的函數沿用預設預算；預估手續費使用扣除 rebate 後的 p50"""
+        estimator = GasBudgetEstimator()
+        estimator.apply({
+            ("payment_escrow", "lock_payment"): {"samples": 500, "p99_gross": 3_250_000, "p50_net": 2_250_000},
+            ("payment_escrow", "release_payment"): {"samples": 2, "p99_gross": 1_850_000, "p50_net": 1_550_000},
+        })
+        assert estimator.budget_for("payment_escrow", "lock_payment") < 10_000_000
+        assert estimator.expected_fee("payment_escrow", "lock_payment") == 2_250_000
+        assert estimator.budget_for("payment_escrow", "release_payment") == 10_000_000
+        assert estimator.budget_for("ride_matching", "match_request") == 25_000_000
+        assert estimator.get_status()["budgets"]["payment_escrow::release_payment"]["source"] == "default"
+
+
+class TestGasCoinPool:
+    """測試 gas coin 池"""
+
+    OWNER = "0x" + "a" * 64
+
+    def _coin(self, object_id, balance):
+        return GasCoin(object_id=object_id, balance=balance, owner=self.OWNER)
+
+    def test_plan_rebalance_merges_dust_and_splits_largest(self):
+        """零碎 coin 合併到最大的 coin，再拆出不足的數量（來源至少保留一個面額）"""
+        coins = [self._coin("big", 1_000), self._coin("ok", 200), self._coin("dust1", 10), self._coin("dust2", 5)]
+        plan = plan_rebalance(coins, target_count=8, coin_balance=200, min_balance=50)
+        assert plan.source.object_id == "big"
+        assert {c.object_id for c in plan.merge} == {"dust1", "dust2"}
+        assert plan.split_count == 4  # (1000 + 15 - 200) // 200
+
+        balanced = [self._coin(f"c{i}", 200) for i in range(8)]
+        assert plan_rebalance(balanced, target_count=8, coin_balance=200, min_balance=50) is None
+
+    @pytest.mark.asyncio
+    async def test_lease_is_exclusive_and_waits_for_release(self):
+        """同一個 coin 不會同時租給兩筆交易；沒有空閒 coin 時等待歸還或逾時"""
+        class Operator:
+            address = self.OWNER
+
+        pool = GasCoinPool()
+        pool.add_operator(Operator())
+        pool.set_coins(self.OWNER, [self._coin("c1", 100_000_000), self._coin("c2", 100_000_000)])
+
+        async with pool.lease(10_000_000) as first, pool.lease(10_000_000) as second:
+            assert first.coin.object_id != second.coin.object_id
+            with pytest.raises(GasPoolExhaustedError):
+                async with pool.lease(10_000_000, timeout=0.05):
+                    pass
+            waiting = asyncio.create_task(pool.lease(10_000_000, timeout=1.0).__aenter__())
+            await asyncio.sleep(0)
+            assert not waiting.done()
+        lease = await waiting
+        assert lease.coin.object_id in {"c1", "c2"}
+
+        # 池中沒有任何 coin 足以支付時立即失敗
+        with pytest.raises(GasPoolExhaustedError):
+            async with pool.lease(10**12, timeout=1.0):
+                pass
+
+
+class TestSettlementBatcher:
+    """測試結算批次提交"""
+
+    OWNER = "0x" + "a" * 64
+    PACKAGE = "0x" + "b" * 64
+
+    def _pool(self, submitted):
+        owner = self.OWNER
+
+        class Operator:
+            address = owner
+
+            async def execute_calls(self, calls, gas_coin_id, gas_budget):
+                submitted.append([call.arguments[0][1] for call in calls])
+                # escrow "0xbad" 的 release_payment abort，整筆 PTB 失敗
+                for index, call in enumerate(calls):
+                    if call.arguments[0] == ("object", "0xbad"):
+                        return {"digest": f"tx{len(submitted)}", "status": "failure",
+                                "error": f"MoveAbort(..., 1) in command {index}", "events": []}
+                return {"digest": f"tx{len(submitted)}", "status": "success", "events": []}
+
+        pool = GasCoinPool()
+        pool.add_operator(Operator())
+        pool.set_coins(owner, [GasCoin("c1", 10**9, owner), GasCoin("c2", 10**9, owner)])
+        return pool
+
+    def test_failed_command_index(self):
+        """從 effects 錯誤取出失敗的指令索引"""
+        assert failed_command("MoveAbort(MoveLocation { module: payment_escrow }, 2) in command 3") == 3
+        assert failed_command("InsufficientGas") is None
+        assert failed_command(None) is None
+
+    @pytest.mark.asyncio
+    async def test_batches_calls_and_isolates_aborted_call(self):
+        """時間窗內的呼叫合併為一筆 PTB；abort 的呼叫單獨回報失敗，其餘重新提交"""
+        submitted = []
+        batcher = SettlementBatcher(self._pool(submitted), max_batch_size=10, flush_ms=20)
+        results = await asyncio.gather(
+            batcher.release(self.PACKAGE, "0x1", 1),
+            batcher.release(self.PACKAGE, "0xbad", 2),
+            batcher.release(self.PACKAGE, "0x3", 3),
+        )
+        assert submitted == [["0x1", "0xbad", "0x3"], ["0x1", "0x3"]]
+        assert results[0]["success"] and results[2]["success"]
+        assert results[0]["transaction_hash"] == results[2]["transaction_hash"] == "tx2"
+        assert results[0]["batch_size"] == 2
+        assert not results[1]["success"] and "command 1" in results[1]["error"]
+
+
+class TestEscrowReconciliation:
+    """測試託管對帳"""
+
+    @staticmethod
+    def _escrow(status, trip_id, tx="txPrev"):
+        return {"data": {"content": {"fields": {"status": status, "trip_id": str(trip_id)}},
+                         "previousTransaction": tx}}
+
+    def test_classify(self):
+        """比對行程狀態與鏈上託管狀態"""
+        oid = "0x" + "e" * 64
+        assert classify(1, "in_progress", oid, oid, self._escrow(1, 1)) is None
+        assert classify(1, "completed", oid, oid, self._escrow(2, 1)) is None
+
+        item = classify(1, "in_progress", oid, oid, self._escrow(2, 1, tx="txRelease"))
+        assert (item.issue, item.action, item.chain_tx) == ("released_on_chain", "mark_completed", "txRelease")
+        assert classify(1, "accepted", oid, oid, self._escrow(3, 1)).action == "mark_cancelled"
+        assert classify(1, "completed", oid, oid, self._escrow(1, 1)).action == "release"
+        # 需要人工處理：退款、trip_id 不符、物件不存在、無法解析的鎖定交易
+        assert classify(1, "cancelled", oid, oid, self._escrow(1, 1)).action == "manual"
+        assert classify(1, "completed", oid, oid, self._escrow(2, 99)).issue == "trip_id_mismatch"
+        assert classify(1, "completed", oid, oid, {"error": {"code": "notExists"}}).issue == "escrow_missing"
+        assert classify(1, "completed", "9xDigest", None, None).issue == "unresolved_lock_tx"
+
+        assert is_object_id(oid) and not is_object_id("9xDigest")
+
+    @pytest.mark.asyncio
+    async def test_fetch_objects_in_chunks(self, monkeypatch):
+        """物件以每次 50 個分批讀取，重複的物件ID只讀一次"""
+        calls = []
+
+        async def fake_rpc(method, params, timeout=10.0, node_url=None):
+            calls.append(params[0])
+            return {"result": [self._escrow(1, int(oid, 16)) for oid in params[0]]}
+
+        monkeypatch.setattr(reconciliation_service, "sui_rpc_call", fake_rpc)
+        reconciler = EscrowReconciler(page_size=200, rpc_concurrency=2)
+        ids = [hex(i) for i in range(1, 121)]
+        objects = await reconciler.fetch_objects(ids + ids[:10])
+        assert sorted(len(chunk) for chunk in calls) == [20, 50, 50]
+        assert len(objects) == 120 and reconciler.stats["rpc_calls"] == 3
+
+    @pytest.mark.asyncio
+    async def test_apply_releases_vehicles_of_closed_trips(self):
+        """修正為完成 / 取消的行程在同一交易中把車輛設回 available"""
+        from collections import namedtuple
+        from sqlalchemy.dialects import postgresql
+        from app.services.reconciliation_service import Discrepancy
+
+        Row = namedtuple("Row", "vehicle_id")
+
+        class Result:
+            def __init__(self, rows):
+                self.rows = rows
+
+            def all(self):
+                return self.rows
+
+        class Session:
+            def __init__(self):
+                self.statements = []
+
+            async def execute(self, statement):
+                compiled = statement.compile(dialect=postgresql.dialect())
+                sql = str(compiled)
+                self.statements.append((sql, compiled.params))
+                if "status=%(status)s" in sql and "completed_at" in sql:
+                    return Result([Row("V1"), Row(None)])
+                if "cancelled_at" in sql:
+                    return Result([Row("V2")])
+                return Result([])
+
+        def item(trip_id, action):
+            return Discrepancy(trip_id=trip_id, escrow_ref="0x1", object_id="0x1", trip_status="in_progress",
+                               chain_status="released", issue="released_on_chain", action=action, chain_tx="tx")
+
+        session = Session()
+        applied = await EscrowReconciler().apply(
+            session, [item(1, "mark_completed"), item(2, "mark_completed"), item(3, "mark_cancelled")],
+            actions=("mark_completed", "mark_cancelled"),
+        )
+        assert applied == {"mark_completed": 2, "mark_cancelled": 1}
+        vehicle_sql, params = session.statements[-1]
+        assert vehicle_sql.startswith("UPDATE vehicles SET status=")
+        assert params["vehicle_id_1"] == ["V1", "V2"] and params["status"] == "available"
+
+
+class TestChainStatusSync:
+    """測試鏈上狀態批次同步"""
+
+    @staticmethod
+    def _object(move_type, status):
+        return {"data": {"content": {"type": f"0xa{move_type}", "fields": {"status": status}}}}
+
+    def test_status_mapping_keeps_finer_backend_states(self):
+        """Move 狀態經 ContractStatus 映射；maintenance / banned 等較細的後端狀態不被覆蓋"""
+        vehicle, user = SYNC_TARGETS["vehicle"], SYNC_TARGETS["user"]
+        assert vehicle.plan("available", 2) == ("drift", "on_trip")
+        assert vehicle.plan("maintenance", 0) == ("unchanged", None)
+        assert vehicle.plan("available", 9) == ("unknown_status", None)
+        assert user.plan(True, 2) == ("changed", False) and user.plan(False, 2) == ("unchanged", None)
+        assert move_status(None, vehicle.move_type) == ("missing", None)
+        assert move_status(self._object("::user_registry::UserProfile", 0), vehicle.move_type) == ("type_mismatch", None)
+        assert move_status(self._object(vehicle.move_type, "1"), vehicle.move_type) == ("ok", 1)
+
+    @pytest.mark.asyncio
+    async def test_page_applied_with_single_update(self, monkeypatch):
+        """一頁物件分批讀取後只執行一個 UPDATE，變更以 CASE 寫入"""
+        from collections import namedtuple
+        from sqlalchemy.dialects import postgresql
+
+        objects = {f"0x{i:x}": self._object("::user_registry::UserProfile", i % 3) for i in range(1, 121)}
+        objects.pop("0x5")
+
+        async def fake_rpc(method, params, timeout=10.0, node_url=None):
+            return {"result": [objects.get(oid, {"error": {"code": "notExists"}}) for oid in params[0]]}
+
+        class Session:
+            def __init__(self):
+                self.statements = []
+
+            async def execute(self, statement):
+                self.statements.append(statement)
+
+        monkeypatch.setattr(reconciliation_service, "sui_rpc_call", fake_rpc)
+        Row = namedtuple("Row", "id blockchain_object_id is_active")
+        rows = [Row(i, f"0x{i:x}", True) for i in range(1, 121)]
+        session = Session()
+        sync = ChainStatusSync("user", rpc_concurrency=2)
+        changes = await sync.sync_page(session, rows)
+        assert sync.stats["rpc_calls"] == 3 and sync.stats["missing"] == 1
+        assert changes[1] is False and changes[2] is False and 3 not in changes
+        assert sync.stats["changed"] + sync.stats["unchanged"] == 119
+        assert len(session.statements) == 1
+        sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+        assert "CASE" in sql and "chain_synced_at" in sql
+
+    @pytest.mark.asyncio
+    async def test_vehicle_status_is_report_only(self, monkeypatch):
+        """鏈上為 offline（0）的 available / on_trip 車輛只回報不一致，不寫入 vehicles.status"""
+        from collections import namedtuple
+        from sqlalchemy.dialects import postgresql
+
+        async def fake_rpc(method, params, timeout=10.0, node_url=None):
+            return {"result": [self._object("::vehicle_registry::Vehicle", 0) for _ in params[0]]}
+
+        class Session:
+            def __init__(self):
+                self.statements = []
+
+            async def execute(self, statement):
+                self.statements.append(statement)
+
+        monkeypatch.setattr(reconciliation_service, "sui_rpc_call", fake_rpc)
+        Row = namedtuple("Row", "vehicle_id blockchain_object_id status")
+        session = Session()
+        sync = ChainStatusSync("vehicle")
+        changes = await sync.sync_page(session, [Row("V001", "0x1", "available"), Row("V002", "0x2", "on_trip")])
+        assert changes == {"V001": "offline", "V002": "offline"}
+        assert sync.stats["drift"] == 2 and sync.stats["changed"] == 0
+        sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+        assert "chain_synced_at" in sql and "CASE" not in sql and "status" not in sql.replace("chain_synced_at", "")
+
+
+class TestTripReaper:
+    """測試逾時行程清理"""
+
+    def test_rules_use_status_requested_at_index(self):
+        """逾時條件以 (status, requested_at) 篩選，ACCEPTED 從接單時間起算且只取消尚未鎖定託管的行程"""
+        from datetime import datetime, timezone
+        from sqlalchemy.dialects import postgresql
+        from app.models.ride import Trip
+
+        rules = {rule.status: rule for rule in default_rules()}
+        assert set(rules) == {"requested", "accepted"}
+        now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        requested = str(rules["requested"].condition(now).compile(dialect=postgresql.dialect()))
+        accepted = str(rules["accepted"].condition(now).compile(dialect=postgresql.dialect()))
+        assert "trips.requested_at <" in requested and "escrow_object_id" not in requested
+        assert "matched_at" not in requested
+        assert "trips.escrow_object_id IS NULL" in accepted
+        assert "trips.requested_at <" in accepted and "coalesce(trips.matched_at, trips.requested_at) <" in accepted
+        index = next(i for i in Trip.__table__.indexes if i.name == "ix_trips_status_requested_at")
+        assert [c.name for c in index.columns] == ["status", "requested_at"]
+
+    @pytest.mark.asyncio
+    async def test_sweep_batches_until_short_batch(self):
+        """每種狀態分批取消，不足一批或達到批數上限時停止，並累計指標"""
+        batches = {"requested": [3, 3, 1], "accepted": [3, 3, 3, 3]}
+        commits = []
+
+        class Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def commit(self):
+                commits.append(1)
+
+        class Reaper(TripReaper):
+            async def reap_batch(self, session, rule, now):
+                return batches[rule.status].pop(0)
+
+        before = trips_reaped.value("requested")
+        reaper = Reaper(batch_size=3, max_batches=3)
+        reaped = await reaper.sweep(session_maker=Session)
+        assert reaped == {"requested": 7, "accepted": 9}
+        assert batches == {"requested": [], "accepted": [3]}
+        assert len(commits) == 6
+        assert trips_reaped.value("requested") - before == 7
+
+
+class TestVehicleOnboarding:
+    """測試車隊批次上架"""
+
+    def test_csv_rows_validated_with_in_batch_duplicates(self):
+        """CSV 逐列驗證，批次內重複的車輛ID / 車牌與格式錯誤各自回報"""
+        rows = parse_vehicle_csv(
+            "\ufeffvehicle_id,plate_number,model,vehicle_type,hourly_rate,current_charge_percent,current_lat\n"
+            "V001,ABC-1234,Model 3,sedan,100,90,25.03\n"
+            "V002,ABC-1234,Model Y,suv,120,80,\n"
+            "V001,XYZ-9999,Model Y,suv,120,80,\n"
+            "V003,XYZ-0001,Model Y,truck,120,80,\n"
+        )
+        assert "current_lat" not in rows[1]
+        results, valid = VehicleOnboardingService(session=None).validate(rows)
+        assert [r["status"] for r in results if "status" in r] == ["duplicate", "duplicate", "invalid"]
+        assert [(row, v.vehicle_id) for row, v in valid] == [(0, "V001")]
+        assert "第 0 列" in results[1]["error"] and "vehicle_type" in results[3]["error"]
+        with pytest.raises(ValueError):
+            parse_vehicle_csv("vehicle_id,color\nV001,red\n")
+
+    @pytest.mark.asyncio
+    async def test_batched_registration_maps_events_in_command_order(self):
+        """同一筆 PTB 的 register_vehicle_for 依 VehicleRegistered 事件順序取得物件ID"""
+        owner = "0x" + "a" * 64
+
+        class Operator:
+            address = owner
+
+            async def execute_calls(self, calls, gas_coin_id, gas_budget):
+                events = [{"type": "0xb::events::VehicleRegistered", "parsedJson": {"vehicle_id": f"0xobj{i}"}}
+                          for i, call in enumerate(calls)]
+                return {"digest": "tx1", "status": "success", "events": events}
+
+        pool = GasCoinPool()
+        pool.add_operator(Operator())
+        pool.set_coins(owner, [GasCoin("c1", 10**9, owner)])
+        batcher = SettlementBatcher(pool, max_batch_size=10, flush_ms=10)
+        results = await asyncio.gather(*(
+            batcher.register_vehicle("0xb", "0xregistry", "0xowner", b"\x01" * 32, f"V00{i}") for i in range(3)
+        ))
+        assert [r["object_id"] for r in results] == ["0xobj0", "0xobj1", "0xobj2"]
+        assert {r["transaction_hash"] for r in results} == {"tx1"} and results[0]["batch_size"] == 3
+
+
+class TestChainOutbox:
+    """測試鏈上註冊 outbox"""
+
+    @pytest.mark.asyncio
+    async def test_complete_retries_with_backoff_until_max_attempts(self, monkeypatch):
+        """成功寫回物件ID，失敗依次數退避重試，達上限標記為 failed"""
+        from collections import namedtuple
+        from datetime import datetime, timezone
+
+        monkeypatch.setattr(outbox_service.settings, "CHAIN_OUTBOX_RETRY_BASE_SECONDS", 5.0)
+        monkeypatch.setattr(outbox_service.settings, "CHAIN_OUTBOX_MAX_ATTEMPTS", 3)
+        assert [retry_delay(n) for n in (1, 2, 3)] == [5.0, 10.0, 20.0] and retry_delay(50) == 3600
+
+        class Session:
+            def __init__(self):
+                self.statements = []
+
+            async def execute(self, statement):
+                self.statements.append(statement)
+
+        Entry = namedtuple("Entry", "id kind aggregate_id payload attempts created_at")
+        now = datetime.now(timezone.utc)
+        entries = [Entry(1, "register_user", "17", {}, 1, now), Entry(2, "register_vehicle", "V001", {}, 1, now),
+                   Entry(3, "register_vehicle", "V002", {}, 3, now)]
+        results = [{"success": True, "object_id": "0xuser", "transaction_hash": "tx1"},
+                   {"success": False, "error": "timeout"}, {"success": False, "error": "MoveAbort"}]
+        failed_before = outbox_service.outbox_processed.value("register_vehicle", "failed")
+        session = Session()
+        counts = await ChainOutboxWorker(batch_size=10).complete(session, entries, results, now)
+        assert counts == {"done": 1, "retry": 1, "failed": 1}
+        # 寫回 users、標記完成、更新失敗項目
+        assert [statement.table.name for statement in session.statements] == ["users", "chain_outbox", "chain_outbox"]
+        assert outbox_service.outbox_processed.value("register_vehicle", "failed") == failed_before + 1
+
+        # 成功但沒有物件ID時重試，不標記完成
+        session = Session()
+        counts = await ChainOutboxWorker(batch_size=10).complete(
+            session, entries[:1], [{"success": True, "object_id": None, "transaction_hash": "tx2"}], now
+        )
+        assert counts == {"done": 0, "retry": 1, "failed": 0}
+        assert [statement.table.name for statement in session.statements] == ["chain_outbox"]
+
+    @pytest.mark.asyncio
+    async def test_user_and_vehicle_registrations_share_ptb(self):
+        """register_user_for 與 register_vehicle_for 合併在同一筆 PTB，各自依事件順序取得物件ID"""
+        owner = "0x" + "a" * 64
+
+        class Operator:
+            address = owner
+
+            async def execute_calls(self, calls, gas_coin_id, gas_budget):
+                events = []
+                for i, call in enumerate(calls):
+                    name, field = (("UserRegistered", "user_id") if call.function == "register_user_for"
+                                   else ("VehicleRegistered", "vehicle_id"))
+                    events.append({"type": f"0xb::events::{name}", "parsedJson": {field: f"0x{name[0]}{i}"}})
+                return {"digest": "tx1", "status": "success", "events": events}
+
+        pool = GasCoinPool()
+        pool.add_operator(Operator())
+        pool.set_coins(owner, [GasCoin("c1", 10**9, owner)])
+        batcher = SettlementBatcher(pool, max_batch_size=10, flush_ms=10)
+        results = await asyncio.gather(
+            batcher.register_user("0xb", "0xusers", "0xuser1", b"\x01" * 32, 1),
+            batcher.register_vehicle("0xb", "0xvehicles", owner, b"\x02" * 32, "V001"),
+            batcher.register_user("0xb", "0xusers", "0xuser2", b"\x03" * 32, 2),
+        )
+        assert [r["object_id"] for r in results] == ["0xU0", "0xV1", "0xU2"]
+        assert {r["transaction_hash"] for r in results} == {"tx1"}
+
+    @pytest.mark.asyncio
+    async def test_registrations_use_admin_operator_in_separate_ptb(self, monkeypatch):
+        """多個操作錢包時註冊只由 registry admin 送出，且不與結算呼叫合併；無法決定 admin 時不送出"""
+        admin, other = "0x" + "a" * 64, "0x" + "c" * 64
+        submitted = []
+
+        def operator(address):
+            class Operator:
+                async def execute_calls(self, calls, gas_coin_id, gas_budget):
+                    submitted.append((address, [call.function for call in calls]))
+                    events = [{"type": "0xb::events::UserRegistered", "parsedJson": {"user_id": "0xu"}}
+                              for call in calls if call.function == "register_user_for"]
+                    return {"digest": f"tx{len(submitted)}", "status": "success", "events": events}
+
+            Operator.address = address
+            return Operator()
+
+        pool = GasCoinPool()
+        for address in (other, admin):
+            pool.add_operator(operator(address))
+            pool.set_coins(address, [GasCoin(f"{address[-1]}1", 10**9, address)])
+        # 非 admin 的錢包有較多 coin，未指定時優先租用
+        pool.set_coins(other, [GasCoin(f"c{i}", 10**9, other) for i in range(3)])
+        batcher = SettlementBatcher(pool, max_batch_size=10, flush_ms=10)
+
+        monkeypatch.setattr(outbox_service.settings, "REGISTRY_ADMIN_ADDRESS", "")
+        missing = await batcher.register_user("0xb", "0xusers", "0xuser1", b"\x01" * 32, 1)
+        assert not missing["success"] and "REGISTRY_ADMIN_ADDRESS" in missing["error"] and submitted == []
+
+        monkeypatch.setattr(outbox_service.settings, "REGISTRY_ADMIN_ADDRESS", admin.upper().replace("0X", "0x"))
+        registered, released = await asyncio.gather(
+            batcher.register_user("0xb", "0xusers", "0xuser1", b"\x01" * 32, 1),
+            batcher.release("0xb", "0x1", 7),
+        )
+        assert registered["object_id"] == "0xu" and released["success"]
+        assert sorted(submitted) == sorted([(admin, ["register_user_for"]), (other, ["release_payment"])])
+
+
+class TestPaymentRegistry:
+    """測試支付處理冪等紀錄"""
+
+    def test_expected_amount_and_stored_result(self):
+        """車費換算為 MIST；已鎖定紀錄返回與首次處理相同的結果"""
+        from app.models.payment import ProcessedPayment
+
+        assert expected_amount_mist(1.5) == 1_500_000_000
+        assert expected_amount_mist(0.1234567) == 123_457_000
+        with pytest.raises(ValueError):
+            expected_amount_mist(None)
+        record = ProcessedPayment(tx_hash="tx1", trip_id=1, status="locked", amount_received=10**9,
+                                  platform_fee=10**8, escrow_object_id="0xe", contract_tx_hash="tx2")
+        result = stored_result(record)
+        assert result["success"] and result["escrow_object_id"] == "0xe" and result["payment_tx_hash"] == "tx1"
+
+    @pytest.mark.asyncio
+    async def test_replay_does_not_touch_chain(self, monkeypatch):
+        """已處理的轉帳直接以保存的結果回應；用於其他行程的轉帳返回 409"""
+        from fastapi import HTTPException
+        from app.api.v1 import payment_proxy
+        from app.models.payment import ProcessedPayment
+
+        record = ProcessedPayment(tx_hash="tx1", trip_id=7, status="locked", amount_received=10**9,
+                                  platform_fee=10**8, escrow_object_id="0xe", contract_tx_hash="tx2")
+
+        class Result:
+            def scalar_one_or_none(self):
+                return record
+
+        class Session:
+            executed = 0
+
+            async def execute(self, statement):
+                Session.executed += 1
+                return Result()
+
+        async def no_chain(*args, **kwargs):
+            raise AssertionError("重複的請求不應接觸鏈")
+
+        monkeypatch.setattr(payment_proxy.sui_service, "verify_payment_transaction", no_chain)
+        monkeypatch.setattr(payment_proxy.sui_service, "call_contract_lock_payment", no_chain)
+        request = payment_proxy.ProcessPaymentRequest(trip_id=7, tx_hash="tx1")
+        result = await payment_proxy.process_payment(request, db=Session())
+        assert result["escrow_object_id"] == "0xe" and Session.executed == 1
+
+        with pytest.raises(HTTPException) as exc:
+            await payment_proxy.process_payment(payment_proxy.ProcessPaymentRequest(trip_id=8, tx_hash="tx1"),
+                                                db=Session())
+        assert exc.value.status_code == 409
+
+
+class TestStreamingExport:
+    """測試管理後台串流匯出"""
+
+    @staticmethod
+    async def _partitions(rows, size):
+        for start in range(0, len(rows), size):
+            yield rows[start:start + size]
+
+    def test_statement_filters_and_validation(self):
+        """日期區間與狀態篩選寫入查詢並依主鍵排序；無效的狀態 / 格式 / 區間拋出 ValueError"""
+        from datetime import datetime, timezone
+        from sqlalchemy.dialects import postgresql
+
+        start, end = datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 2, 1, tzinfo=timezone.utc)
+        _, stmt = prepare_export("trips", "csv", start, end, ["completed", "cancelled"])
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "trips.requested_at >=" in sql and "trips.requested_at <" in sql
+        assert "trips.status IN" in sql and sql.rstrip().endswith("ORDER BY trips.trip_id")
+        for args in (("trips", "csv", None, None, ["paid"]), ("trips", "xlsx"), ("users", "csv"),
+                     ("payments", "csv", end, start)):
+            with pytest.raises(ValueError):
+                prepare_export(*args)
+
+    @pytest.mark.asyncio
+    async def test_chunks_per_partition(self):
+        """每批輸出一個區塊：CSV 標頭加每批一段，Parquet 每批一個 row group"""
+        import io
+        from datetime import datetime, timezone
+
+        columns = EXPORT_DATASETS["payments"].columns
+        now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        rows = [(f"0x{i}", i, 1, 2, None, 1.5, "1500000", 0.1, "completed", "crypto", None, None, now, None)
+                for i in range(25)]
+        counter = [0]
+        chunks = [c async for c in csv_chunks(columns, self._partitions(rows, 10), counter)]
+        assert len(chunks) == 4 and counter == [25]
+        lines = b"".join(chunks).decode().splitlines()
+        assert lines[0].startswith("transaction_id,trip_id") and len(lines) == 26
+
+        pq = pytest.importorskip("pyarrow.parquet")
+        data = b"".join([c async for c in parquet_chunks(columns, self._partitions(rows, 10))])
+        parquet = pq.ParquetFile(io.BytesIO(data))
+        assert parquet.metadata.num_rows == 25 and parquet.metadata.num_row_groups == 3
+        assert parquet.read().column("created_at").to_pylist()[0] == now
+
+
+class TestAnalyticsStore:
+    """測試儀表板分析資料"""
+
+    @pytest.mark.asyncio
+    async def test_months_to_export(self, tmp_path, monkeypatch):
+        """第一次匯出從最早一筆資料的月份開始；有 manifest 後重新匯出最近 N 個月與有變更的較早月份"""
+        from datetime import date, datetime, timezone
+        from sqlalchemy.dialects import postgresql
+
+        class Result:
+            def scalar(self):
+                return datetime(2024, 11, 20, tzinfo=timezone.utc)
+
+            def all(self):
+                return [(datetime(2024, 11, 1),)]
+
+        class Session:
+            statements = []
+
+            async def execute(self, statement):
+                self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+                return Result()
+
+        store = AnalyticsStore(str(tmp_path))
+        now = datetime(2025, 2, 3, tzinfo=timezone.utc)
+        months = await store.months_to_export(Session(), "trips", now)
+        assert [month_key(m) for m in months] == ["2024-11", "2024-12", "2025-01", "2025-02"]
+
+        (tmp_path / "trips").mkdir()
+        store._save_manifest("trips", {"months": {month_key(m): {"rows": 1} for m in months}})
+        monkeypatch.setattr(analytics_store.settings, "ANALYTICS_REFRESH_MONTHS", 2)
+        assert await store.months_to_export(Session(), "trips", now) == [date(2025, 1, 1), date(2025, 2, 1)]
+
+        # 上次匯出後 2024-11 的行程完成：該月一併重新匯出
+        store._save_manifest("trips", {"months": {}, "updated_at": "2025-02-01T00:00:00+00:00"})
+        session = Session()
+        months = await store.months_to_export(session, "trips", now)
+        assert months == [date(2024, 11, 1), date(2025, 1, 1), date(2025, 2, 1)]
+        assert "trips.completed_at >=" in session.statements[-1] and "trips.cancelled_at >=" in session.statements[-1]
+        # full：不論 manifest，從最早的月份開始
+        full = await store.months_to_export(Session(), "trips", now, full=True)
+        assert [month_key(m) for m in full] == ["2024-11", "2024-12", "2025-01", "2025-02"]
+        assert month_range(date(2025, 3, 1), date(2025, 2, 1)) == []
+
+    @pytest.mark.asyncio
+    async def test_duckdb_revenue_over_monthly_files(self, tmp_path):
+        """DuckDB 讀取分月 Parquet：依完成時間分組，只計入已完成的付款"""
+        pytest.importorskip("duckdb")
+        pytest.importorskip("pyarrow")
+        from datetime import datetime, timezone
+
+        async def partitions(rows):
+            yield rows
+
+        columns = EXPORT_DATASETS["payments"].columns
+        rows_by_month = {
+            "2025-01": [
+                (f"0x{i}", i, 1, 2, None, 10.0, "1", 0.1, status, "crypto", None, None,
+                 datetime(2025, 1, 31, 23, tzinfo=timezone.utc), completed)
+                for i, (status, completed) in enumerate([
+                    ("completed", datetime(2025, 2, 1, 1, tzinfo=timezone.utc)),
+                    ("completed", None),
+                    ("failed", None),
+                ])
+            ],
+            "2025-02": [("0xf", 9, 1, 2, None, 5.0, "1", 0.1, "completed", "fiat", None, None,
+                         datetime(2025, 2, 2, tzinfo=timezone.utc), None)],
+        }
+        for month, rows in rows_by_month.items():
+            directory = tmp_path / "payments" / f"month={month}"
+            directory.mkdir(parents=True)
+            data = b"".join([c async for c in parquet_chunks(columns, partitions(rows))])
+            (directory / "data.parquet").write_bytes(data)
+
+        store = AnalyticsStore(str(tmp_path))
+        buckets = await store.revenue("daily", None, datetime(2025, 2, 2))
+        assert [(b.strftime("%Y-%m-%d"), float(total), count) for b, _, _, total, count in buckets] == [
+            ("2025-01-31", 10.0, 1), ("2025-02-01", 10.0, 1),
+        ]
+        distribution = sorted(await store.payment_distribution())
+        assert [(t, c, float(a)) for t, c, a in distribution] == [("crypto", 2, 20.0), ("fiat", 1, 5.0)]
+
+
+class TestAdminSearch:
+    """測試管理後台搜尋"""
+
+    def test_ngram_index_matches_pg_trgm_rules(self):
+        """三字元組規則與 pg_trgm 相同；子字串相符優先，其次依相似度，打錯字仍可相符"""
+        assert trigrams("Tesla Model-3") == {
+            "  t", " te", "tes", "esl", "sla", "la ", "  m", " mo", "mod", "ode", "del", "el ", "  3", " 3 "
+        }
+        index = NgramIndex.build([
+            (1, "alice", "Alice Wang"), (2, "bob", None), (3, "malice99", "Mal"), (4, "alicia", "Ali"),
+        ])
+        assert [key for key, _ in index.search("alice", 0.6)] == [1, 3, 4]
+        assert index.search("wang", 0.6) == [(1, 1.0)]
+        assert [key for key, _ in index.search("alicee", 0.6)] == [1]
+        assert index.search("zzz", 0.6) == [] and index.search("--", 0.6) == []
+
+    @pytest.mark.asyncio
+    async def test_trigram_backend_uses_indexable_operators(self, monkeypatch):
+        """pg_trgm 後端以 ILIKE（跳脫萬用字元）或 %> 篩選，包含完整字串者優先；空白查詢不相符"""
+        from sqlalchemy.dialects import postgresql
+        from app.config import settings
+
+        class Result:
+            def scalar(self):
+                return 1
+
+            def all(self):
+                return [(7, 0.8)]
+
+        class Session:
+            statements = []
+
+            async def execute(self, statement):
+                self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+                return Result()
+
+        monkeypatch.setattr(settings, "ADMIN_SEARCH_BACKEND", "trigram")
+        service, session = AdminSearchService(), Session()
+        hits, total = await service.search(session, "users", "50%_off", 10)
+        assert hits == [(7, 0.8)] and total == 1
+        _, count_sql, page_sql = session.statements
+        assert "users.username ILIKE" in page_sql and "ESCAPE '!'" in page_sql
+        assert "users.display_name %%>" in page_sql and "word_similarity" in page_sql
+        assert "ORDER BY anon_1.partial, anon_1.score DESC" in page_sql
+
+    def test_list_filter_is_plain_substring_match(self):
+        """列表篩選是不截斷的 ILIKE 子字串比對（跳脫萬用字元），不使用相似度"""
+        from sqlalchemy import select
+        from sqlalchemy.dialects import postgresql
+        from app.models.user import User
+
+        stmt = select(User.id).where(contains_filter((User.username, User.display_name), "50%_off"))
+        sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        assert "users.username ILIKE '%%50!%%!_off%%' ESCAPE '!'" in sql
+        assert "users.display_name ILIKE" in sql
+        assert "%>" not in sql and "LIMIT" not in sql
+
+
+class TestTripPartitions:
+    """測試行程月分區與歸檔"""
+
+    def test_month_bounds_and_archivable_partitions(self):
+        """月分區以 UTC 月初為界；只歸檔早於 N 個月的月分區（不含預設分區），0 代表不歸檔"""
+        from datetime import date, datetime, timezone
+
+        assert create_partition_sql(date(2024, 12, 1)) == (
+            "CREATE TABLE IF NOT EXISTS trips_p2024_12 PARTITION OF trips "
+            "FOR VALUES FROM ('2024-12-01 00:00:00+00') TO ('2025-01-01 00:00:00+00')"
+        )
+        partitions = ["trips_default", "trips_p2024_11", "trips_p2024_12", "trips_p2025_01", "trips_p2025_06"]
+        now = datetime(2025, 7, 15, tzinfo=timezone.utc)
+        assert archivable_months(partitions, now, 6) == [date(2024, 11, 1), date(2024, 12, 1)]
+        assert archivable_months(partitions, now, 0) == []
+
+    class _ArchiveResult:
+        def __init__(self, value):
+            self.value = value
+
+        def scalar(self):
+            return self.value
+
+    class _ArchiveSession:
+        """依 SQL 內容回應計數的假會話"""
+
+        def __init__(self, open_trips=0, in_flight=0):
+            self.open_trips = open_trips
+            self.in_flight = in_flight
+            self.statements = []
+
+        async def execute(self, statement, params=None):
+            sql = str(statement)
+            self.statements.append(sql)
+            if "to_regclass" in sql:
+                return TestTripPartitions._ArchiveResult(params["table"])
+            if "NOT IN" in sql:
+                return TestTripPartitions._ArchiveResult(self.open_trips)
+            if "status IN" in sql:
+                return TestTripPartitions._ArchiveResult(self.in_flight)
+            return TestTripPartitions._ArchiveResult(42)
+
+    @pytest.mark.asyncio
+    async def test_archive_skips_partition_with_open_trips(self):
+        """分區內仍有未結束的行程時不歸檔；歸檔時將分區移到 trips_archive schema"""
+        from datetime import date
+
+        maintainer = TripPartitionMaintainer()
+        busy = self._ArchiveSession(open_trips=3)
+        result = await maintainer.archive_month(busy, date(2024, 1, 1), "detach")
+        assert result == {"partition": "trips_p2024_01", "status": "skipped", "open_trips": 3}
+        assert len(busy.statements) == 1
+
+        idle = self._ArchiveSession()
+        result = await maintainer.archive_month(idle, date(2024, 1, 1), "detach")
+        assert result == {"partition": "trips_p2024_01", "status": "archived", "mode": "detach", "rows": 42}
+        assert idle.statements[-3:] == [
+            "ALTER TABLE trips DETACH PARTITION trips_p2024_01",
+            "CREATE SCHEMA IF NOT EXISTS trips_archive",
+            "ALTER TABLE trips_p2024_01 SET SCHEMA trips_archive",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_archive_skips_pending_refunds_and_keeps_dependent_rows(self):
+        """行程仍有未決退款或處理中的支付時不歸檔；歸檔不搬移或刪除評價、付款等參照資料列"""
+        from datetime import date
+
+        maintainer = TripPartitionMaintainer()
+        pending = self._ArchiveSession(in_flight=2)
+        result = await maintainer.archive_month(pending, date(2024, 1, 1), "file")
+        assert result == {"partition": "trips_p2024_01", "status": "skipped",
+                          "in_flight": {"refund_requests": 2, "processed_payments": 2}}
+        assert not any("DETACH" in sql for sql in pending.statements)
+
+        settled = self._ArchiveSession()
+        result = await maintainer.archive_month(settled, date(2024, 1, 1), "file")
+        assert result["status"] == "archived"
+        assert not any(sql.startswith(("CREATE TABLE", "DELETE", "DROP")) for sql in settled.statements)
+        assert not any("reviews" in sql or "payment_transactions" in sql for sql in settled.statements)
@@ -1,8 +1,11 @@
 module decentralized_ride::trip_receipt {
     use std::string::String;
-    use sui::object::{Self, UID};
+    use sui::object::{Self, ID, UID};
     use sui::tx_context::{Self, TxContext};
     use sui::transfer;
+    use sui::event;
+    use decentralized_ride::constants;
+    use decentralized_ride::user_registry::{Self, UserRegistry};
 
     /// 行程收據 - 不可篡改的證明
     public struct TripReceipt has key, store {
@@ -17,6 +20,68 @@ module decentralized_ride::trip_receipt {
         completed_at: u64,
     }
 
+    /// 收據創建事件（供鏈下索引器讀取）
+    public struct ReceiptCreated has copy, drop {
+        receipt_id: ID,
+        trip_id: u64,
+        passenger: address,
+        driver: address,
+        final_amount: u64,
+    }
+
+    /// 收據簽發設定 - 只有列入 operators 的後端操作錢包可以代乘客創建收據
+    public struct ReceiptIssuer has key {
+        id: UID,
+        admin: address,
+        operators: vector<address>,
+    }
+
+    #[test_only]
+    public fun init_for_testing(ctx: &mut TxContext) {
+        init(ctx);
+    }
+
+    fun init(ctx: &mut TxContext) {
+        share_issuer(tx_context::sender(ctx), ctx);
+    }
+
+    /// 建立收據簽發設定（僅 UserRegistry 的 admin）
+    /// 套件升級不會執行 init，已發佈的套件以此建立 ReceiptIssuer 後設定 RECEIPT_ISSUER_ID
+    public entry fun create_issuer(registry: &UserRegistry, ctx: &mut TxContext) {
+        let admin = tx_context::sender(ctx);
+        assert!(admin == user_registry::get_admin(registry), constants::e_unauthorized());
+        share_issuer(admin, ctx);
+    }
+
+    fun share_issuer(admin: address, ctx: &mut TxContext) {
+        transfer::share_object(ReceiptIssuer {
+            id: object::new(ctx),
+            admin,
+            operators: vector[admin],
+        });
+    }
+
+    /// 新增操作錢包（僅 admin）
+    public entry fun add_operator(issuer: &mut ReceiptIssuer, operator: address, ctx: &mut TxContext) {
+        assert!(tx_context::sender(ctx) == issuer.admin, constants::e_unauthorized());
+        if (!vector::contains(&issuer.operators, &operator)) {
+            vector::push_back(&mut issuer.operators, operator);
+        };
+    }
+
+    /// 移除操作錢包（僅 admin）
+    public entry fun remove_operator(issuer: &mut ReceiptIssuer, operator: address, ctx: &mut TxContext) {
+        assert!(tx_context::sender(ctx) == issuer.admin, constants::e_unauthorized());
+        let (found, index) = vector::index_of(&issuer.operators, &operator);
+        if (found) {
+            vector::remove(&mut issuer.operators, index);
+        };
+    }
+
+    public fun is_operator(issuer: &ReceiptIssuer, operator: address): bool {
+        vector::contains(&issuer.operators, &operator)
+    }
+
     /// 創建收據 - 只能在支付釋放後調用
     public entry fun create_receipt(
         trip_id: u64,
@@ -26,11 +91,50 @@ module decentralized_ride::trip_receipt {
         distance_km: u64,
         final_amount: u64,
         ctx: &mut TxContext
+    ) {
+        let passenger = tx_context::sender(ctx);
+        mint(passenger, trip_id, driver, pickup_hash, dropoff_hash, distance_km, final_amount, ctx);
+    }
+
+    /// 代乘客創建收據 - 後端操作錢包在結算批次中調用，收據轉移給乘客
+    public entry fun create_receipt_for(
+        issuer: &ReceiptIssuer,
+        passenger: address,
+        trip_id: u64,
+        driver: address,
+        pickup_hash: vector<u8>,
+        dropoff_hash: vector<u8>,
+        distance_km: u64,
+        final_amount: u64,
+        ctx: &mut TxContext
+    ) {
+        assert!(is_operator(issuer, tx_context::sender(ctx)), constants::e_unauthorized());
+        mint(passenger, trip_id, driver, pickup_hash, dropoff_hash, distance_km, final_amount, ctx);
+    }
+
+    /// 收據內容（測試與鏈下驗證用）
+    public fun get_trip_id(receipt: &TripReceipt): u64 {
+        receipt.trip_id
+    }
+
+    public fun get_final_amount(receipt: &TripReceipt): u64 {
+        receipt.final_amount
+    }
+
+    fun mint(
+        passenger: address,
+        trip_id: u64,
+        driver: address,
+        pickup_hash: vector<u8>,
+        dropoff_hash: vector<u8>,
+        distance_km: u64,
+        final_amount: u64,
+        ctx: &mut TxContext
     ) {
         let receipt = TripReceipt {
             id: object::new(ctx),
             trip_id,
-            passenger: tx_context::sender(ctx),
+            passenger,
             driver,
             pickup_hash,
             dropoff_hash,
@@ -39,7 +143,15 @@ module decentralized_ride::trip_receipt {
             completed_at: tx_context::epoch(ctx),
         };
         
+        event::emit(ReceiptCreated {
+            receipt_id: object::id(&receipt),
+            trip_id,
+            passenger,
+            driver,
+            final_amount,
+        });
+        
         // 轉移給乘客作為永久記錄
-        transfer::transfer(receipt, tx_context::sender(ctx));
+        transfer::transfer(receipt, passenger);
     }
 }
\ No newline at end of file
@@ -3,7 +3,8 @@ module autodrive::payment_escrow {
     use sui::sui::SUI;
     use sui::transfer;
     use sui::tx_context::{Self, TxContext};
-    use sui::object::{Self, UID};
+    use sui::object::{Self, ID, UID};
+    use sui::event;
     
     /// 託管狀態
     const STATUS_LOCKED: u8 = 1;
@@ -16,6 +17,31 @@ module autodrive::payment_escrow {
     const E_NOT_PASSENGER: u64 = 3;
     const E_INSUFFICIENT_AMOUNT: u64 = 4;
     
+    /// 事件（供鏈下索引器以 suix_queryEvents 依模組分頁讀取）
+    public struct PaymentLocked has copy, drop {
+        escrow_id: ID,
+        trip_id: u64,
+        passenger: address,
+        driver: address,
+        total_amount: u64,
+        platform_fee: u64,
+    }
+    
+    public struct PaymentReleased has copy, drop {
+        escrow_id: ID,
+        trip_id: u64,
+        driver: address,
+        driver_amount: u64,
+        platform_fee: u64,
+    }
+    
+    public struct PaymentRefunded has copy, drop {
+        escrow_id: ID,
+        trip_id: u64,
+        passenger: address,
+        refund_amount: u64,
+    }
+    
     /// 託管對象
     public struct Escrow has key, store {
         id: UID,
@@ -58,6 +84,15 @@ module autodrive::payment_escrow {
             status: STATUS_LOCKED,
         };
         
+        event::emit(PaymentLocked {
+            escrow_id: object::id(&escrow),
+            trip_id,
+            passenger,
+            driver,
+            total_amount,
+            platform_fee,
+        });
+        
         // 轉移託管對象給平台（或共享對象）
         transfer::share_object(escrow);
     }
@@ -85,6 +120,14 @@ module autodrive::payment_escrow {
         
         // 更新狀態
         escrow.status = STATUS_RELEASED;
+        
+        event::emit(PaymentReleased {
+            escrow_id: object::id(escrow),
+            trip_id,
+            driver: escrow.driver,
+            driver_amount: escrow.driver_amount,
+            platform_fee: escrow.platform_fee,
+        });
     }
     
     /// 退款 - 只有乘客可以調用（取消行程時）
@@ -106,6 +149,13 @@ module autodrive::payment_escrow {
         
         // 更新狀態
         escrow.status = STATUS_REFUNDED;
+        
+        event::emit(PaymentRefunded {
+            escrow_id: object::id(escrow),
+            trip_id: escrow.trip_id,
+            passenger: escrow.passenger,
+            refund_amount,
+        });
     }
     
     /// 查詢託管狀態
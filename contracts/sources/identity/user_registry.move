@@ -57,6 +57,10 @@ module decentralized_ride::user_registry {
     public fun get_total_users(registry: &UserRegistry): u64 {
         registry.total_users
     }
+
+    public fun get_admin(registry: &UserRegistry): address {
+        registry.admin
+    }
     
     /// 用戶註冊 - 簡化版
     public entry fun register_user(
@@ -65,7 +69,26 @@ module decentralized_ride::user_registry {
         ctx: &mut TxContext
     ) {
         let user_address = tx_context::sender(ctx);
-        
+        mint(registry, user_address, did_hash, ctx);
+    }
+
+    /// 代用戶註冊 - 後端操作錢包（registry admin）由 outbox 批次送出，檔案轉移給用戶
+    public entry fun register_user_for(
+        registry: &mut UserRegistry,
+        user_address: address,
+        did_hash: vector<u8>,
+        ctx: &mut TxContext
+    ) {
+        assert!(tx_context::sender(ctx) == registry.admin, constants::e_unauthorized());
+        mint(registry, user_address, did_hash, ctx);
+    }
+
+    fun mint(
+        registry: &mut UserRegistry,
+        user_address: address,
+        did_hash: vector<u8>,
+        ctx: &mut TxContext
+    ) {
         let user_profile = UserProfile {
             id: object::new(ctx),
             user_address,
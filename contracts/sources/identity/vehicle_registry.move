@@ -56,7 +56,26 @@ module decentralized_ride::vehicle_registry {
         ctx: &mut TxContext
     ) {
         let owner = tx_context::sender(ctx);
-        
+        mint(registry, owner, vehicle_data_hash, ctx);
+    }
+
+    /// 代車主註冊車輛 - 後端操作錢包（registry admin）由 outbox 批次送出，車輛轉移給車主
+    public entry fun register_vehicle_for(
+        registry: &mut VehicleRegistry,
+        owner: address,
+        vehicle_data_hash: vector<u8>,
+        ctx: &mut TxContext
+    ) {
+        assert!(tx_context::sender(ctx) == registry.admin, constants::e_unauthorized());
+        mint(registry, owner, vehicle_data_hash, ctx);
+    }
+
+    fun mint(
+        registry: &mut VehicleRegistry,
+        owner: address,
+        vehicle_data_hash: vector<u8>,
+        ctx: &mut TxContext
+    ) {
         let vehicle = Vehicle {
             id: object::new(ctx),
             owner,
@@ -0,0 +1,114 @@
+// tests/unit_tests/business_tests/trip_receipt_test.move
+#[test_only]
+module decentralized_ride::trip_receipt_test {
+    use sui::test_scenario::{Self as test, next_tx, ctx};
+    use decentralized_ride::trip_receipt::{Self, ReceiptIssuer, TripReceipt};
+    use decentralized_ride::user_registry::{Self, UserRegistry};
+
+    #[test]
+    public fun test_operator_creates_receipt_for_passenger() {
+        let admin = @admin;
+        let operator = @0xB0;
+        let passenger = @alice;
+        let mut scenario = test::begin(admin);
+        {
+            trip_receipt::init_for_testing(ctx(&mut scenario));
+        };
+
+        // admin 新增第二個操作錢包
+        next_tx(&mut scenario, admin);
+        {
+            let mut issuer = test::take_shared<ReceiptIssuer>(&scenario);
+            trip_receipt::add_operator(&mut issuer, operator, ctx(&mut scenario));
+            assert!(trip_receipt::is_operator(&issuer, operator), 1);
+            test::return_shared(issuer);
+        };
+
+        next_tx(&mut scenario, operator);
+        {
+            let issuer = test::take_shared<ReceiptIssuer>(&scenario);
+            trip_receipt::create_receipt_for(
+                &issuer, passenger, 42, @bob, b"pickup", b"dropoff", 12, 1_500_000_000, ctx(&mut scenario)
+            );
+            test::return_shared(issuer);
+        };
+
+        // 收據轉移給乘客
+        next_tx(&mut scenario, passenger);
+        {
+            let receipt = test::take_from_sender<TripReceipt>(&scenario);
+            assert!(trip_receipt::get_trip_id(&receipt) == 42, 2);
+            assert!(trip_receipt::get_final_amount(&receipt) == 1_500_000_000, 3);
+            test::return_to_sender(&scenario, receipt);
+        };
+
+        test::end(scenario);
+    }
+
+    #[test]
+    #[expected_failure(abort_code = 1001, location = decentralized_ride::trip_receipt)] // E_UNAUTHORIZED
+    public fun test_non_operator_cannot_create_receipt() {
+        let admin = @admin;
+        let stranger = @bob;
+        let mut scenario = test::begin(admin);
+        {
+            trip_receipt::init_for_testing(ctx(&mut scenario));
+        };
+
+        // 非操作錢包嘗試代乘客創建收據（應該失敗）
+        next_tx(&mut scenario, stranger);
+        {
+            let issuer = test::take_shared<ReceiptIssuer>(&scenario);
+            trip_receipt::create_receipt_for(
+                &issuer, @alice, 42, stranger, b"pickup", b"dropoff", 12, 1_000_000_000_000, ctx(&mut scenario)
+            );
+            test::return_shared(issuer);
+        };
+
+        test::end(scenario);
+    }
+
+    #[test]
+    public fun test_registry_admin_creates_issuer_after_upgrade() {
+        let admin = @admin;
+        let mut scenario = test::begin(admin);
+        {
+            // 升級後的套件沒有執行 trip_receipt::init，只有既有的 UserRegistry
+            user_registry::init_for_testing(ctx(&mut scenario));
+        };
+
+        next_tx(&mut scenario, admin);
+        {
+            let registry = test::take_shared<UserRegistry>(&scenario);
+            trip_receipt::create_issuer(&registry, ctx(&mut scenario));
+            test::return_shared(registry);
+        };
+
+        next_tx(&mut scenario, admin);
+        {
+            let issuer = test::take_shared<ReceiptIssuer>(&scenario);
+            assert!(trip_receipt::is_operator(&issuer, admin), 1);
+            test::return_shared(issuer);
+        };
+
+        test::end(scenario);
+    }
+
+    #[test]
+    #[expected_failure(abort_code = 1001, location = decentralized_ride::trip_receipt)] // E_UNAUTHORIZED
+    public fun test_non_admin_cannot_create_issuer() {
+        let mut scenario = test::begin(@admin);
+        {
+            user_registry::init_for_testing(ctx(&mut scenario));
+        };
+
+        next_tx(&mut scenario, @bob);
+        {
+            let registry = test::take_shared<UserRegistry>(&scenario);
+            trip_receipt::create_issuer(&registry, ctx(&mut scenario));
+            test::return_shared(registry);
+        };
+
+        test::end(scenario);
+    }
+}
@@ -0,0 +1,209 @@
+# contracts/tools/analyzers/gas_optimizer.py
+"""
+Gas 預算分析
+
+後端原本對每個合約呼叫寫死 gas_budget="10000000"；執行期改由 GasBudgetEstimator 以
+p99(computation + storage) × GAS_BUDGET_MARGIN 決定預算。此工具用來檢視與補充估算依據:
+
+    analyze   依 contract_tx_metrics（performance_tracker 記錄 / 回填的 effects）列出每個 Move 函數的
+              樣本數、gas 不足的失敗次數、平均預留預算、p50 / p99 用量、建議預算與過度預留倍數
+    dry-run   對指定的交易（base64 tx bytes）執行 sui_dryRunTransactionBlock，輸出 gas 用量；
+              --store 將結果以 source=dry_run 寫入 contract_tx_metrics，
+              讓尚無鏈上歷史的函數（例如剛升級的合約）也能估算預算
+
+dry-run 輸入檔格式（JSON）:
+    {"payment_escrow::release_payment": ["<tx bytes base64>", ...], ...}
+
+使用方式（在 backend/ 的環境變數下執行）:
+    python contracts/tools/analyzers/gas_optimizer.py analyze [--days 7] [--margin 1.2] [--json]
+    python contracts/tools/analyzers/gas_optimizer.py dry-run --input dry_runs.json [--store] [--node-url ...]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+# 共用後端的設定、模型與 RPC 工具
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "backend"))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import case, func, select  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.core.database import async_session_maker, init_db  # noqa: E402
+from app.models.contract_metric import ContractTxMetric as M  # noqa: E402
+from app.services.contract_metrics_service import metric_row, parse_gas_used, store_metrics  # noqa: E402
+from app.services.gas_budget_service import DEFAULT_BUDGETS, FALLBACK_BUDGET, recommend_budget  # noqa: E402
+from app.utils.blockchain import sui_rpc_call  # noqa: E402
+
+logger = logging.getLogger("gas_optimizer")
+
+# effects.status.error 中代表 gas 預算不足的字串
+OUT_OF_GAS_MARKER = "InsufficientGas"
+
+
+# ============================================================================
+# 歷史分析
+# ============================================================================
+
+async def analyze_history(days: int, margin: float) -> List[Dict[str, Any]]:
+    """每個 Move 函數的 gas 用量與建議預算"""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    gross = M.computation_cost + M.storage_cost
+    success = M.status == "success"
+    # percentile_cont 忽略 NULL，只計算成功交易
+    success_gross = case((success, gross))
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(
+                M.module,
+                M.function,
+                func.count().filter(success).label("samples"),
+                func.count().filter(M.error.contains(OUT_OF_GAS_MARKER)).label("out_of_gas"),
+                func.count().filter(M.source == "dry_run").label("dry_runs"),
+                func.avg(M.gas_budget).filter(M.source != "dry_run").label("avg_budget"),
+                func.percentile_cont(0.5).within_group(success_gross).label("p50_gross"),
+                func.percentile_cont(0.99).within_group(success_gross).label("p99_gross"),
+                func.max(success_gross).label("max_gross"),
+            )
+            .where(M.executed_at >= since)
+            .group_by(M.module, M.function)
+            .order_by(M.module, M.function)
+        )
+        rows = result.all()
+
+    analysis = []
+    for row in rows:
+        current = DEFAULT_BUDGETS.get((row.module, row.function), FALLBACK_BUDGET)
+        enough = row.samples >= settings.GAS_BUDGET_MIN_SAMPLES and row.p99_gross is not None
+        recommended = recommend_budget(row.p99_gross, margin) if enough else current
+        analysis.append({
+            "function": f"{row.module}::{row.function}",
+            "samples": row.samples,
+            "dry_runs": row.dry_runs,
+            "out_of_gas": row.out_of_gas,
+            "avg_budget": round(float(row.avg_budget)) if row.avg_budget is not None else None,
+            "p50_gross": round(float(row.p50_gross)) if row.p50_gross is not None else None,
+            "p99_gross": round(float(row.p99_gross)) if row.p99_gross is not None else None,
+            "max_gross": row.max_gross,
+            "default_budget": current,
+            "recommended_budget": recommended,
+            "enough_samples": enough,
+            # 預設預算相對於實際 p99 的倍數（越大代表預留越多）
+            "over_reservation": round(current / float(row.p99_gross), 2) if row.p99_gross else None,
+        })
+    return analysis
+
+
+def print_analysis(analysis: List[Dict[str, Any]], days: int, margin: float):
+    print(f"\n=== Gas 預算分析（最近 {days} 天，安全係數 {margin}，最少樣本 {settings.GAS_BUDGET_MIN_SAMPLES}） ===")
+    if not analysis:
+        print("（沒有資料，請先執行 performance_tracker.py backfill 或 dry-run --store）")
+        return
+    width = max(len(item["function"]) for item in analysis) + 2
+    print(f"{'function':<{width}}{'n':>6}{'dry':>5}{'oog':>5}{'p50':>12}{'p99':>12}{'default':>12}"
+          f"{'recommend':>12}{'over':>7}")
+    for item in analysis:
+        p50 = f"{item['p50_gross']:,}" if item["p50_gross"] is not None else "-"
+        p99 = f"{item['p99_gross']:,}" if item["p99_gross"] is not None else "-"
+        over = f"{item['over_reservation']}x" if item["over_reservation"] is not None else "-"
+        recommended = f"{item['recommended_budget']:,}" + ("" if item["enough_samples"] else "*")
+        print(f"{item['function']:<{width}}{item['samples']:>6}{item['dry_runs']:>5}{item['out_of_gas']:>5}"
+              f"{p50:>12}{p99:>12}{item['default_budget']:>12,}{recommended:>12}{over:>7}")
+    print("* 樣本不足，沿用預設預算")
+
+
+# ============================================================================
+# Dry-run
+# ============================================================================
+
+async def dry_run(tx_bytes: str, node_url: Optional[str] = None) -> Dict[str, Any]:
+    """執行 dry-run，返回可交給 metric_row 的交易結構"""
+    response = await sui_rpc_call("sui_dryRunTransactionBlock", [tx_bytes], timeout=30.0, node_url=node_url)
+    if "error" in response:
+        raise RuntimeError(f"sui_dryRunTransactionBlock 失敗: {response['error']}")
+    result = response["result"]
+    effects = result.get("effects") or {}
+    return {
+        "digest": effects.get("transactionDigest"),
+        "effects": effects,
+        "transaction": {"data": result.get("input") or {}},
+    }
+
+
+async def run_dry_runs(inputs: Dict[str, List[str]], node_url: Optional[str], store: bool) -> List[Dict[str, Any]]:
+    package_id = settings.CONTRACT_PACKAGE_ID
+    summary, rows = [], []
+    for target, transactions in inputs.items():
+        module, _, function = target.partition("::")
+        if not function:
+            raise SystemExit(f"函數名稱格式應為 module::function: {target}")
+        gross_values, failures = [], 0
+        for tx_bytes in transactions:
+            tx_block = await dry_run(tx_bytes, node_url)
+            gas = parse_gas_used(tx_block["effects"])
+            if (tx_block["effects"].get("status") or {}).get("status") != "success":
+                failures += 1
+            gross_values.append(gas["computation_cost"] + gas["storage_cost"])
+            if store and tx_block["digest"]:
+                rows.append(metric_row(tx_block, package_id, module, function, source="dry_run"))
+        summary.append({
+            "function": target,
+            "dry_runs": len(transactions),
+            "failures": failures,
+            "max_gross": max(gross_values) if gross_values else None,
+            "suggested_budget": recommend_budget(max(gross_values)) if gross_values else None,
+        })
+
+    if rows:
+        await init_db()
+        async with async_session_maker() as session:
+            await store_metrics(session, rows)
+            await session.commit()
+        logger.info("💾 已寫入 %s 筆 dry-run 結果", len(rows))
+    return summary
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+async def main(args):
+    if args.command == "analyze":
+        margin = args.margin or settings.GAS_BUDGET_MARGIN
+        analysis = await analyze_history(args.days, margin)
+        if args.json:
+            print(json.dumps(analysis, ensure_ascii=False, indent=2))
+        else:
+            print_analysis(analysis, args.days, margin)
+        return
+
+    with open(args.input, encoding="utf-8") as f:
+        inputs = json.load(f)
+    summary = await run_dry_runs(inputs, args.node_url, args.store)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-function gas budget analysis")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    analyze_parser = subparsers.add_parser("analyze", help="依歷史 effects 分析每個函數的 gas 預算")
+    analyze_parser.add_argument("--days", type=int, default=settings.GAS_BUDGET_WINDOW_DAYS, help="分析最近幾天")
+    analyze_parser.add_argument("--margin", type=float, help="安全係數（預設 GAS_BUDGET_MARGIN）")
+    analyze_parser.add_argument("--json", action="store_true", help="輸出 JSON")
+
+    dry_run_parser = subparsers.add_parser("dry-run", help="以 dry-run 量測交易的 gas 用量")
+    dry_run_parser.add_argument("--input", required=True, help="JSON: {\"module::function\": [tx_bytes, ...]}")
+    dry_run_parser.add_argument("--store", action="store_true", help="將結果寫入 contract_tx_metrics")
+    dry_run_parser.add_argument("--node-url", help="fullnode JSON-RPC 位址（預設 SUI_NODE_URL）")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
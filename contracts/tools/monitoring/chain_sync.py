@@ -0,0 +1,93 @@
+# contracts/tools/monitoring/chain_sync.py
+"""
+鏈上狀態批次同步工具
+
+以 sui_multiGetObjects 分頁讀取 UserProfile / Vehicle 物件，經 ContractStatus 映射後
+每頁以一個 UPDATE 寫回 users.is_active / vehicles.status（規則見 app/services/chain_sync_service.py）。
+
+    --ids / --ids-file  指定物件ID（每行一個）
+    --all-stale         同步 chain_synced_at 為空或早於 --stale-minutes 的所有資料列
+
+每頁輸出進度與吞吐量，結束時輸出統計（stderr）；--output 時每筆變更一行 JSON。
+車輛只回報與鏈上不一致的資料列（drift），不寫入 vehicles.status。
+
+使用方式（在 backend/ 的環境變數下執行）:
+    python contracts/tools/monitoring/chain_sync.py vehicle --all-stale [--limit 100000]
+    python contracts/tools/monitoring/chain_sync.py user --ids-file users.txt --output changes.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+# 共用後端的設定、模型與 RPC 工具
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "backend"))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app.core.database import async_session_maker, init_db  # noqa: E402
+from app.services.chain_sync_service import SYNC_TARGETS, ChainStatusSync  # noqa: E402
+
+logger = logging.getLogger("chain_sync")
+
+
+def read_ids(args) -> list:
+    ids = [i for i in (args.ids or "").split(",") if i]
+    if args.ids_file:
+        with open(args.ids_file, encoding="utf-8") as f:
+            ids.extend(line.strip() for line in f if line.strip())
+    return ids
+
+
+async def main(args):
+    await init_db()
+    sync = ChainStatusSync(args.object_type, node_url=args.node_url, page_size=args.page_size,
+                           rpc_concurrency=args.rpc_concurrency)
+    if args.all_stale:
+        pages = sync.sync_stale(async_session_maker, limit=args.limit, stale_minutes=args.stale_minutes)
+    else:
+        ids = read_ids(args)
+        if not ids:
+            raise SystemExit("請指定 --ids / --ids-file 或 --all-stale")
+        pages = sync.sync_ids(async_session_maker, ids)
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    last = time.perf_counter()
+    try:
+        async for changes in pages:
+            if output:
+                for key, value in changes.items():
+                    output.write(json.dumps({"key": key, "status": value}, ensure_ascii=False) + "\n")
+            now = time.perf_counter()
+            summary = sync.summary()
+            logger.info("🔄 已同步 %s 筆（%s 筆變更、%s 筆不一致），%s objects/s，本頁 %.2fs",
+                        summary["rows"], summary["changed"], summary["drift"], summary["objects_per_second"],
+                        now - last)
+            last = now
+    finally:
+        if output:
+            output.close()
+
+    print(json.dumps(sync.summary(), ensure_ascii=False, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk sync user / vehicle status from on-chain objects")
+    parser.add_argument("object_type", choices=sorted(SYNC_TARGETS), help="物件類型")
+    parser.add_argument("--ids", help="逗號分隔的物件ID")
+    parser.add_argument("--ids-file", help="物件ID檔案（每行一個）")
+    parser.add_argument("--all-stale", action="store_true", help="同步所有過期（或從未同步）的資料列")
+    parser.add_argument("--stale-minutes", type=float, help="過期門檻（預設 CHAIN_SYNC_STALE_MINUTES）")
+    parser.add_argument("--limit", type=int, help="--all-stale 時最多同步的資料列數")
+    parser.add_argument("--output", help="變更 JSONL 路徑")
+    parser.add_argument("--page-size", type=int, help="每頁資料列數（預設 CHAIN_SYNC_PAGE_SIZE）")
+    parser.add_argument("--rpc-concurrency", type=int, help="並行的 RPC 請求數（預設 CHAIN_SYNC_RPC_CONCURRENCY）")
+    parser.add_argument("--node-url", help="fullnode JSON-RPC 位址（預設 SUI_NODE_URL）")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                        stream=sys.stderr)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
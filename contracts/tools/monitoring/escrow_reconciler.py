@@ -0,0 +1,98 @@
+# contracts/tools/monitoring/escrow_reconciler.py
+"""
+託管對帳工具
+
+依 trip_id 分頁掃描有 escrow_object_id 的行程，以 sui_multiGetObjects 批次讀取鏈上
+Escrow 物件並與行程狀態比對（規則見 app/services/reconciliation_service.py）。
+
+預設只輸出修復計畫（每筆不一致一行 JSON）與統計；--apply 時套用可自動修復的項目:
+
+    mark_completed  鏈上已釋放、行程仍在進行中 -> completed（blockchain_tx_id = 釋放交易）
+    mark_cancelled  鏈上已退款、行程仍在進行中 -> cancelled
+    release         行程已完成、鏈上仍鎖定 -> release_payment（經 settlement_batcher 合併為 PTB）
+
+其餘（託管不存在、trip_id 不符、取消但仍鎖定等）標記為 manual，只列入計畫。
+
+使用方式（在 backend/ 的環境變數下執行）:
+    python contracts/tools/monitoring/escrow_reconciler.py [--output plan.jsonl] [--limit 100000]
+    python contracts/tools/monitoring/escrow_reconciler.py --apply [--actions mark_completed,mark_cancelled]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+# 共用後端的設定、模型與 RPC 工具
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "backend"))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app.core.database import async_session_maker, init_db  # noqa: E402
+from app.services.gas_coin_pool import gas_coin_pool  # noqa: E402
+from app.services.reconciliation_service import AUTO_ACTIONS, EscrowReconciler  # noqa: E402
+from app.services.settlement_batcher import settlement_batcher  # noqa: E402
+
+logger = logging.getLogger("escrow_reconciler")
+
+
+async def main(args):
+    await init_db()
+    actions = tuple(a for a in args.actions.split(",") if a) if args.actions else AUTO_ACTIONS
+    unknown = set(actions) - set(AUTO_ACTIONS)
+    if unknown:
+        raise SystemExit(f"不支援的修復動作: {', '.join(sorted(unknown))}（可用: {', '.join(AUTO_ACTIONS)}）")
+    if args.apply and "release" in actions:
+        gas_coin_pool.start()
+
+    reconciler = EscrowReconciler(node_url=args.node_url, page_size=args.page_size,
+                                  rpc_concurrency=args.rpc_concurrency)
+    issues, applied = Counter(), Counter()
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    started = time.perf_counter()
+    try:
+        async for discrepancies in reconciler.scan(async_session_maker, args.after, args.limit):
+            for item in discrepancies:
+                issues[item.issue] += 1
+                output.write(json.dumps(item.to_dict(), ensure_ascii=False) + "\n")
+            if args.apply and discrepancies:
+                async with async_session_maker() as session:
+                    applied.update(await reconciler.apply(session, discrepancies, actions))
+                    await session.commit()
+            logger.info("🔎 已掃描 %s 筆行程，%s 筆不一致", reconciler.stats["trips"],
+                        reconciler.stats["discrepancies"])
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        await settlement_batcher.close()
+        await gas_coin_pool.stop()
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        **reconciler.stats,
+        "seconds": round(elapsed, 2),
+        "trips_per_second": round(reconciler.stats["trips"] / elapsed, 1) if elapsed else None,
+        "issues": dict(issues),
+        "applied": dict(applied) if args.apply else None,
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile escrowed trips against on-chain Escrow objects")
+    parser.add_argument("--apply", action="store_true", help="套用可自動修復的項目（預設只輸出計畫）")
+    parser.add_argument("--actions", help=f"逗號分隔的修復動作（預設 {','.join(AUTO_ACTIONS)}）")
+    parser.add_argument("--output", help="修復計畫 JSONL 路徑（預設輸出到 stdout）")
+    parser.add_argument("--after", type=int, default=0, help="從此 trip_id 之後開始掃描")
+    parser.add_argument("--limit", type=int, help="最多掃描的行程數（以頁為單位）")
+    parser.add_argument("--page-size", type=int, help="每頁行程數（預設 RECONCILE_PAGE_SIZE）")
+    parser.add_argument("--rpc-concurrency", type=int, help="並行的 RPC 請求數（預設 RECONCILE_RPC_CONCURRENCY）")
+    parser.add_argument("--node-url", help="fullnode JSON-RPC 位址（預設 SUI_NODE_URL）")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                        stream=sys.stderr)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
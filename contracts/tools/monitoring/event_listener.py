@@ -0,0 +1,146 @@
+# contracts/tools/monitoring/event_listener.py
+"""
+鏈上事件索引器
+
+常駐迴圈，對 payment_escrow / trip_receipt 兩個模組各自從持久化游標開始以
+suix_queryEvents（升冪、每頁 EVENT_INDEXER_PAGE_SIZE 筆）分頁讀取事件，解碼後批次
+寫入後端資料庫的 chain_events，游標與事件在同一個交易中推進；中斷後重啟會從上次
+的位置繼續，重複處理同一頁也不會產生重複資料。
+
+追上最新事件後每 EVENT_INDEXER_POLL_SECONDS 秒輪詢一次，RPC 失敗時指數退避。
+
+使用方式（在 backend/ 的環境變數下執行）:
+    python contracts/tools/monitoring/event_listener.py [--once] [--package 0x...] [--node-url http://127.0.0.1:9000]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+# 共用後端的設定、模型與 RPC 工具
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "backend"))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app.config import settings  # noqa: E402
+from app.core.database import async_session_maker, init_db  # noqa: E402
+from app.services.chain_event_service import INDEXED_MODULES, ChainEventService, decode_event  # noqa: E402
+from app.utils.blockchain import sui_rpc_call  # noqa: E402
+
+logger = logging.getLogger("event_listener")
+
+
+class EventListener:
+    """將指定套件的模組事件索引到 chain_events"""
+
+    def __init__(self, package_id: str, modules=INDEXED_MODULES, node_url: Optional[str] = None,
+                 page_size: Optional[int] = None, poll_seconds: Optional[float] = None):
+        if not package_id:
+            raise ValueError("未設定合約套件 ID（CONTRACT_PACKAGE_ID 或 --package）")
+        self.package_id = package_id
+        self.modules = tuple(modules)
+        self.node_url = node_url
+        self.page_size = page_size or settings.EVENT_INDEXER_PAGE_SIZE
+        self.poll_seconds = settings.EVENT_INDEXER_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self.indexed = 0
+
+    def source(self, module: str) -> str:
+        """游標名稱（同一資料庫可索引多個套件）"""
+        return f"{self.package_id}::{module}"
+
+    async def fetch_page(self, module: str, cursor: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        response = await sui_rpc_call(
+            "suix_queryEvents",
+            [{"MoveEventModule": {"package": self.package_id, "module": module}}, cursor, self.page_size, False],
+            node_url=self.node_url,
+        )
+        if "error" in response:
+            raise RuntimeError(f"suix_queryEvents 失敗: {response['error']}")
+        return response["result"]
+
+    async def index_module(self, module: str) -> Tuple[int, bool]:
+        """
+        處理一頁事件
+
+        Returns:
+            (新增事件數, 是否還有下一頁)
+        """
+        source = self.source(module)
+        async with async_session_maker() as session:
+            service = ChainEventService(session)
+            cursor = await service.get_cursor(source)
+            page = await self.fetch_page(module, cursor)
+
+            rows = []
+            for raw in page.get("data", []):
+                try:
+                    rows.append(decode_event(raw))
+                except ValueError as e:
+                    logger.warning("⚠️ 略過無法解析的事件: %s", e)
+
+            # 空頁時節點仍可能回傳目前的游標，保持原位即可
+            next_cursor = page.get("nextCursor") if page.get("data") else None
+            inserted = await service.store_page(source, rows, next_cursor)
+
+        if inserted:
+            logger.info("📥 %s: 新增 %s 筆事件", module, inserted)
+        self.indexed += inserted
+        return inserted, bool(page.get("hasNextPage"))
+
+    async def run_once(self) -> int:
+        """把每個模組追到最新，返回新增事件數"""
+        before = self.indexed
+        for module in self.modules:
+            has_next = True
+            while has_next:
+                _, has_next = await self.index_module(module)
+        return self.indexed - before
+
+    async def run_forever(self, stop: Optional[asyncio.Event] = None):
+        stop = stop or asyncio.Event()
+        backoff = self.poll_seconds
+        logger.info("🎧 事件索引器啟動: package=%s, modules=%s", self.package_id, ", ".join(self.modules))
+        while not stop.is_set():
+            try:
+                await self.run_once()
+                backoff = self.poll_seconds
+            except Exception as e:
+                backoff = min(max(backoff * 2, 1.0), settings.EVENT_INDEXER_MAX_BACKOFF_SECONDS)
+                logger.error("❌ 事件索引失敗，%.1f 秒後重試: %s", backoff, e)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("🛑 事件索引器停止，本次共索引 %s 筆事件", self.indexed)
+
+
+async def main(args):
+    await init_db()
+    listener = EventListener(
+        package_id=args.package or settings.CONTRACT_PACKAGE_ID,
+        node_url=args.node_url,
+        page_size=args.page_size,
+        poll_seconds=args.poll_seconds,
+    )
+    if args.once:
+        inserted = await listener.run_once()
+        logger.info("✅ 索引完成: 新增 %s 筆事件", inserted)
+    else:
+        await listener.run_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index payment_escrow / trip_receipt events into chain_events")
+    parser.add_argument("--package", help="合約套件 ID（預設 CONTRACT_PACKAGE_ID）")
+    parser.add_argument("--node-url", help="fullnode JSON-RPC 位址（預設 SUI_NODE_URL）")
+    parser.add_argument("--page-size", type=int, help="每頁事件數（上限 50）")
+    parser.add_argument("--poll-seconds", type=float, help="追上最新事件後的輪詢間隔")
+    parser.add_argument("--once", action="store_true", help="追到最新後結束")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,222 @@
+# contracts/tools/monitoring/performance_tracker.py
+"""
+合約效能追蹤
+
+後端提交的交易（release_payment、create_receipt 等）由 ContractPerformanceTracker 在執行期
+記錄提交到確定的延遲與 gasUsed；此工具補上由前端錢包送出、後端看不到的交易，並輸出報表:
+
+    backfill  以 suix_queryTransactionBlocks（MoveFunction 過濾）從持久化游標分頁讀取
+              lock_payment / release_payment / refund_payment / create_receipt 的交易，
+              將 effects.gasUsed 寫入 contract_tx_metrics（回填資料沒有延遲）
+    report    每個 Move 函數的 gas 與延遲百分位（p50 / p90 / p99）；
+              --split-at 比較合約升級前後，gas 或延遲 p50 / p99 增加超過門檻時標示為退化
+
+使用方式（在 backend/ 的環境變數下執行）:
+    python contracts/tools/monitoring/performance_tracker.py backfill [--package 0x...] [--node-url ...]
+    python contracts/tools/monitoring/performance_tracker.py report --since 2025-01-01 [--by-package]
+    python contracts/tools/monitoring/performance_tracker.py report --split-at 2025-03-01T12:00 [--threshold 0.1]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# 共用後端的設定、模型與 RPC 工具
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "backend"))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app.config import settings  # noqa: E402
+from app.core.database import async_session_maker, init_db  # noqa: E402
+from app.models.chain_event import ChainEventCursor  # noqa: E402
+from app.services.contract_metrics_service import (  # noqa: E402
+    REPORT_PERCENTILES, TRACKED_FUNCTIONS, metric_row, move_calls, percentile_report, store_metrics,
+)
+from app.utils.blockchain import sui_rpc_call  # noqa: E402
+
+logger = logging.getLogger("performance_tracker")
+
+# 比較升級前後時檢查的指標
+REGRESSION_METRICS = ("gas_used", "computation_cost", "finality_latency_ms")
+
+
+# ============================================================================
+# 回填
+# ============================================================================
+
+async def backfill_function(package_id: str, module: str, function: str,
+                            node_url: Optional[str] = None, page_size: int = 50) -> int:
+    """從游標開始回填單一 Move 函數的交易，返回寫入筆數"""
+    source = f"tx:{package_id}::{module}::{function}"
+    inserted = 0
+    has_next = True
+    while has_next:
+        async with async_session_maker() as session:
+            cursor_row = await session.get(ChainEventCursor, source)
+            cursor = cursor_row.tx_digest if cursor_row else None
+
+            response = await sui_rpc_call(
+                "suix_queryTransactionBlocks",
+                [
+                    {
+                        "filter": {"MoveFunction": {"package": package_id, "module": module, "function": function}},
+                        "options": {"showInput": True, "showEffects": True},
+                    },
+                    cursor, page_size, False,
+                ],
+                timeout=30.0, node_url=node_url,
+            )
+            if "error" in response:
+                raise RuntimeError(f"suix_queryTransactionBlocks 失敗: {response['error']}")
+            page = response["result"]
+
+            rows = []
+            for tx_block in page.get("data", []):
+                # 結算批次（多個 Move 呼叫的 PTB）的 gas 無法歸屬到單一函數
+                if len(move_calls(tx_block)) > 1:
+                    continue
+                try:
+                    rows.append(metric_row(tx_block, package_id, module, function))
+                except ValueError as e:
+                    logger.warning("⚠️ 略過交易: %s", e)
+
+            if page.get("data"):
+                if cursor_row is None:
+                    cursor_row = ChainEventCursor(source=source, events_indexed=0)
+                    session.add(cursor_row)
+                cursor_row.tx_digest = page.get("nextCursor")
+                cursor_row.events_indexed = (cursor_row.events_indexed or 0) + len(rows)
+            # 交易資料與游標在同一個交易中提交
+            inserted += await store_metrics(session, rows)
+            await session.commit()
+            has_next = bool(page.get("hasNextPage"))
+
+    return inserted
+
+
+async def backfill(args):
+    package_id = args.package or settings.CONTRACT_PACKAGE_ID
+    if not package_id:
+        raise SystemExit("未設定合約套件 ID（CONTRACT_PACKAGE_ID 或 --package）")
+    await init_db()
+    for module, function in TRACKED_FUNCTIONS:
+        inserted = await backfill_function(package_id, module, function, args.node_url, args.page_size)
+        logger.info("📥 %s::%s: 寫入 %s 筆交易", module, function, inserted)
+
+
+# ============================================================================
+# 報表
+# ============================================================================
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _key(entry: Dict[str, Any]) -> tuple:
+    return entry["module"], entry["function"]
+
+
+def find_regressions(before: List[Dict[str, Any]], after: List[Dict[str, Any]],
+                     threshold: float) -> List[Dict[str, Any]]:
+    """p50 / p99 增加超過 threshold（比例）的指標"""
+    baseline = {_key(entry): entry for entry in before}
+    regressions = []
+    for entry in after:
+        previous = baseline.get(_key(entry))
+        if not previous:
+            continue
+        for metric in REGRESSION_METRICS:
+            for percentile in ("p50", "p99"):
+                old, new = previous[metric].get(percentile), entry[metric].get(percentile)
+                if old and new is not None and (new - old) / old > threshold:
+                    regressions.append({
+                        "function": f"{entry['module']}::{entry['function']}",
+                        "metric": f"{metric} {percentile}",
+                        "before": old,
+                        "after": new,
+                        "change": round((new - old) / old, 4),
+                    })
+    return regressions
+
+
+def _format_value(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:,.0f}"
+
+
+def print_report(title: str, report: List[Dict[str, Any]]):
+    print(f"\n=== {title} ===")
+    if not report:
+        print("（沒有資料）")
+        return
+    percentiles = [f"p{int(round(q * 100))}" for q in REPORT_PERCENTILES]
+    names = [
+        f"{entry['module']}::{entry['function']}" + (f" @{entry['package_id'][:10]}" if "package_id" in entry else "")
+        for entry in report
+    ]
+    width = max(len(name) for name in names) + 2
+    header = f"{'function':<{width}}{'n':>7}{'fail':>6}" + "".join(
+        f"{name + ' ' + p:>18}" for name in ("gas", "finality_ms") for p in percentiles
+    )
+    print(header)
+    for name, entry in zip(names, report):
+        cells = [entry["gas_used"][p] for p in percentiles] + [entry["finality_latency_ms"][p] for p in percentiles]
+        print(f"{name:<{width}}{entry['count']:>7}{entry['failures']:>6}" + "".join(f"{_format_value(v):>18}" for v in cells))
+
+
+async def report(args):
+    since, until, split_at = _parse_time(args.since), _parse_time(args.until), _parse_time(args.split_at)
+    async with async_session_maker() as session:
+        if split_at:
+            before = await percentile_report(session, since, split_at, args.by_package)
+            after = await percentile_report(session, split_at, until, args.by_package)
+            regressions = find_regressions(before, after, args.threshold)
+            result = {"before": before, "after": after, "regressions": regressions}
+        else:
+            result = {"report": await percentile_report(session, since, until, args.by_package)}
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+        return
+
+    if split_at:
+        print_report(f"升級前 (< {split_at.isoformat()})", result["before"])
+        print_report(f"升級後 (>= {split_at.isoformat()})", result["after"])
+        print(f"\n=== 退化（增加 > {args.threshold:.0%}） ===")
+        for item in result["regressions"] or []:
+            print(f"⚠️ {item['function']:<34}{item['metric']:<24}{item['before']:>14,.0f} -> {item['after']:>14,.0f}"
+                  f"  ({item['change']:+.1%})")
+        if not result["regressions"]:
+            print("✅ 沒有發現退化")
+    else:
+        print_report("合約效能", result["report"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Contract gas and finality latency tracker")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = subparsers.add_parser("backfill", help="從鏈上回填交易的 gas 用量")
+    backfill_parser.add_argument("--package", help="合約套件 ID（預設 CONTRACT_PACKAGE_ID）")
+    backfill_parser.add_argument("--node-url", help="fullnode JSON-RPC 位址（預設 SUI_NODE_URL）")
+    backfill_parser.add_argument("--page-size", type=int, default=50, help="每頁交易數（上限 50）")
+
+    report_parser = subparsers.add_parser("report", help="每個 Move 函數的百分位報表")
+    report_parser.add_argument("--since", help="開始時間（ISO 8601，UTC）")
+    report_parser.add_argument("--until", help="結束時間（ISO 8601，UTC）")
+    report_parser.add_argument("--split-at", help="比較此時間（例如合約升級）前後")
+    report_parser.add_argument("--threshold", type=float, default=0.1, help="退化門檻（比例）")
+    report_parser.add_argument("--by-package", action="store_true", help="再依套件 ID 分組")
+    report_parser.add_argument("--json", action="store_true", help="輸出 JSON")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    parsed = parser.parse_args()
+    asyncio.run(backfill(parsed) if parsed.command == "backfill" else report(parsed))
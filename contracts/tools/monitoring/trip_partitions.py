@@ -0,0 +1,88 @@
+# contracts/tools/monitoring/trip_partitions.py
+"""
+行程月分區管理工具
+
+    status   列出分區與歸檔設定
+    migrate  將既有的 trips 轉換為月分區表（單一交易；完成後 trips_legacy 保留供核對）
+    ensure   建立本月到未來 TRIP_PARTITION_MONTHS_AHEAD 個月的分區
+    archive  歸檔早於 TRIP_ARCHIVE_AFTER_MONTHS 個月的分區（--dry-run 只列出）
+
+規則見 app/services/trip_partition_service.py。migrate 期間 trips 無法讀寫，請在維護時段執行；
+確認資料無誤後以 --drop-legacy 刪除 trips_legacy。
+
+使用方式（在 backend/ 的環境變數下執行）:
+    python contracts/tools/monitoring/trip_partitions.py migrate
+    python contracts/tools/monitoring/trip_partitions.py archive --after-months 12 --mode file --dry-run
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+# 共用後端的設定與資料庫連線
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "backend"))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import text  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.core.database import route_session  # noqa: E402
+from app.services.trip_partition_service import (  # noqa: E402
+    ensure_partitions, migrate_to_partitioned, trip_partition_maintainer,
+)
+
+
+async def main(args):
+    if args.after_months is not None:
+        settings.TRIP_ARCHIVE_AFTER_MONTHS = args.after_months
+    if args.mode:
+        settings.TRIP_ARCHIVE_MODE = args.mode
+
+    # 轉換與刪除 trips_legacy 是長時間的批次語句，不使用 interactive 的 statement_timeout
+    async with route_session("export") as session:
+        if args.command == "status":
+            result = await trip_partition_maintainer.get_status(session)
+        elif args.command == "migrate":
+            if args.drop_legacy:
+                # 尚未歸檔的月份中，trips_legacy 的每一筆都必須已複製到 trips
+                missing = (await session.execute(text(
+                    "SELECT count(*) FROM trips_legacy l "
+                    "WHERE l.requested_at >= (SELECT min(requested_at) FROM trips) AND NOT EXISTS ("
+                    "SELECT 1 FROM trips t WHERE t.trip_id = l.trip_id AND t.requested_at = l.requested_at)"
+                ))).scalar()
+                if missing:
+                    raise SystemExit(f"trips_legacy 有 {missing} 筆不在 trips 中，不刪除")
+                await session.execute(text("DROP TABLE trips_legacy"))
+                result = {"dropped": "trips_legacy"}
+            else:
+                try:
+                    result = await migrate_to_partitioned(session, args.months_ahead)
+                except ValueError as e:
+                    raise SystemExit(str(e))
+            await session.commit()
+        elif args.command == "ensure":
+            result = {"created": await ensure_partitions(session, months_ahead=args.months_ahead)}
+            await session.commit()
+        else:
+            result = None
+
+    if args.command == "archive":
+        result = await trip_partition_maintainer.run_once(dry_run=args.dry_run)
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monthly partitioning and archival of trips")
+    parser.add_argument("command", choices=["status", "migrate", "ensure", "archive"])
+    parser.add_argument("--months-ahead", type=int, help="預先建立的未來月分區數（預設 TRIP_PARTITION_MONTHS_AHEAD）")
+    parser.add_argument("--drop-legacy", action="store_true", help="migrate: 刪除轉換後保留的 trips_legacy")
+    parser.add_argument("--after-months", type=int, help="archive: 歸檔早於此月數的分區（預設 TRIP_ARCHIVE_AFTER_MONTHS）")
+    parser.add_argument("--mode", choices=["detach", "file"], help="archive: 歸檔方式（預設 TRIP_ARCHIVE_MODE）")
+    parser.add_argument("--dry-run", action="store_true", help="archive: 只列出會歸檔的分區")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                        stream=sys.stderr)
+    asyncio.run(main(parser.parse_args()))